@@ -0,0 +1,148 @@
+"""
+CLI command for "local bench" command
+"""
+
+import io
+import logging
+import click
+
+from bsamcli.cli.main import pass_context, common_options as cli_framework_options
+from bsamcli.commands.local.cli_common.options import invoke_common_options
+from bsamcli.commands.exceptions import UserException
+from bsamcli.commands.local.cli_common.invoke_context import InvokeContext
+from bsamcli.commands.local.lib.bench import Bench, InvokeTarget, HttpTarget
+from bsamcli.commands.validate.lib.exceptions import InvalidSamDocumentException
+
+LOG = logging.getLogger(__name__)
+
+
+HELP_TEXT = """
+You can use this command to measure the latency of your function locally. The function is invoked over and over
+for the given duration, and the latency percentiles, errors, cold starts and throughput are reported at the end.\n
+\b
+Invoking a CFC function with four invokes in flight for 30 seconds
+$ bsam local bench "HelloWorldFunction" -e event.json --concurrency 4 --duration 30\n
+\b
+Invoking a CFC function 20 times per second, and saving the latency histogram
+$ bsam local bench "HelloWorldFunction" --rate 20 --histogram-file run1.hgrm\n
+\b
+Sending requests to a running "bsam local start-api"
+$ bsam local bench --url http://127.0.0.1:3000/hello --method GET --concurrency 8\n
+"""
+
+
+@click.command("bench", help=HELP_TEXT, short_help="Measures the latency of a local CFC function.")
+@click.option("--event", '-e',
+              type=click.Path(),
+              help="JSON file containing event data passed to every invoke, or '-' for stdin. Defaults to an empty "
+                   "event")
+@click.option("--duration",
+              type=click.FloatRange(min=0),
+              default=10,
+              show_default=True,
+              help="Seconds to run the benchmark for.")
+@click.option("--concurrency",
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              help="Number of invokes in flight at the same time.")
+@click.option("--rate",
+              type=click.FloatRange(min=0),
+              help="Invokes to start per second. Latencies count from when an invoke was due, so they include the "
+                   "time it waited for one of the --concurrency invokes to finish. Defaults to invoking again as "
+                   "soon as an invoke finished.")
+@click.option("--url",
+              help="Send the events to this URL of a running start-api or start-lambda endpoint instead of invoking "
+                   "the function directly.")
+@click.option("--method",
+              default="POST",
+              show_default=True,
+              help="HTTP method of the requests sent to --url.")
+@click.option("--histogram-file",
+              type=click.Path(dir_okay=False),
+              help="Write the latency distribution to this file in the .hgrm format of HdrHistogram, to compare "
+                   "runs over time.")
+@invoke_common_options
+@cli_framework_options
+@click.argument('function_identifier', required=False)
+@pass_context
+def cli(ctx, function_identifier, template, event, duration, concurrency, rate, url, method, histogram_file,
+        env_vars, debug_port, debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image,
+        image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile, region):
+
+    # All logic must be implemented in the ``do_cli`` method. This helps with easy unit testing
+
+    do_cli(ctx, function_identifier, template, event, duration, concurrency, rate, url, method, histogram_file,
+           env_vars, debug_port, debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image,
+           image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile, region)  # pragma: no cover
+
+
+def do_cli(ctx, function_identifier, template, event, duration, concurrency, rate,  # pylint: disable=R0914
+           url, method, histogram_file, env_vars, debug_port, debug_args, docker_volume_basedir, docker_network,
+           log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile, region):
+    """
+    Implementation of the ``cli`` method, just separated out for unit testing purposes
+    """
+
+    LOG.debug("local bench command is called")
+
+    if debug_port:
+        raise UserException("Functions cannot be debugged while benchmarking them.")
+
+    event_data = _get_event(event) if event else "{}"
+
+    if url:
+        try:
+            target = HttpTarget(url, method=method, body=event_data)
+        except ValueError as ex:
+            raise UserException(str(ex))
+
+        result = Bench(target, duration, concurrency=concurrency, rate=rate).run()
+
+    else:
+        try:
+            # Every invoke in flight gets a warm container to return to, so the run measures warm invokes after the
+            # first few cold ones
+            with InvokeContext(template_file=template,
+                               function_identifier=function_identifier,
+                               env_vars_file=env_vars,
+                               docker_volume_basedir=docker_volume_basedir,
+                               docker_network=docker_network,
+                               log_file=log_file,
+                               skip_pull_image=skip_pull_image,
+                               image_cache_ttl=image_cache_ttl,
+                               metrics_file=metrics_file,
+                               limit_cpu=limit_cpu,
+                               cpu_curve=cpu_curve,
+                               aws_profile=profile,
+                               debug_args=debug_args,
+                               aws_region=region,
+                               warm_containers=True,
+                               warm_pool_size=concurrency) as context:
+
+                if not context.function_provider.get(context.function_name):
+                    raise UserException("Function {} not found in template".format(context.function_name))
+
+                target = InvokeTarget(context.local_lambda_runner, context.function_name, event_data)
+                result = Bench(target, duration, concurrency=concurrency, rate=rate).run()
+
+        except InvalidSamDocumentException as ex:
+            raise UserException(str(ex))
+
+    click.echo(result.format())
+
+    if histogram_file:
+        with io.open(histogram_file, 'w', encoding='utf-8') as fp:
+            result.histogram.write_percentiles(fp)
+
+
+def _get_event(event_file_name):
+    """
+    Read the event JSON data from the given file, or from stdin if the file name is '-'
+
+    :param string event_file_name: Path to event file, or '-' for stdin
+    :return string: Contents of the event file or stdin
+    """
+
+    with click.open_file(event_file_name, 'r') as fp:
+        return fp.read()
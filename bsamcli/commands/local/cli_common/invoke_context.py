@@ -11,10 +11,16 @@ import requests
 import yaml
 
 from bsamcli.yamlhelper import yaml_parse
+from bsamcli.lib.samlib.cfc_credential_helper import default_config_location
 from bsamcli.commands.local.lib.local_lambda import LocalLambdaRunner
 from bsamcli.commands.local.lib.debug_context import DebugContext
 from bsamcli.local.lambdafn.runtime import CfcRuntime
+from bsamcli.local.lambdafn.artifact_cache import ArtifactCache
+from bsamcli.local.lambdafn.metrics import MetricsFile
 from bsamcli.local.docker.manager import ContainerManager
+from bsamcli.local.docker.image_cache import ImageCache
+from bsamcli.local.docker.cpu_curve import CpuCurve
+from bsamcli.local.docker.client import get_docker_client
 from .user_exceptions import InvokeContextException, DebugContextException
 from ..lib.sam_function_provider import SamFunctionProvider
 
@@ -43,6 +49,10 @@ class InvokeContext(object):
     This class sets up some resources that need to be cleaned up after the context object is used.
     """
 
+    # Records when runtime images were last pulled, so every CLI run does not have to pull them again
+    _IMAGE_CACHE_FILE = os.path.join(default_config_location, "image_cache.json")
+    _ARTIFACT_CACHE_DIR = os.path.join(default_config_location, "artifacts")
+
     def __init__(self,
                  template_file,
                  function_identifier=None,
@@ -51,11 +61,19 @@ class InvokeContext(object):
                  docker_network=None,
                  log_file=None,
                  skip_pull_image=None,
+                 image_cache_ttl=None,
+                 metrics_file=None,
+                 limit_cpu=False,
+                 cpu_curve=None,
                  aws_profile=None,
                  debug_port=None,
                  debug_args=None,
                  debugger_path=None,
-                 aws_region=None):
+                 aws_region=None,
+                 warm_containers=False,
+                 warm_pool_size=None,
+                 persistent_containers=False,
+                 standby_containers=0):
         """
         Initialize the context
 
@@ -76,6 +94,14 @@ class InvokeContext(object):
             created
         skip_pull_image bool
             Should we skip pulling the Docker container image?
+        image_cache_ttl int
+            Number of seconds after which a pulled Docker container image is pulled again
+        metrics_file str
+            Path to a file to append the metrics of every invoke to, as JSON lines
+        limit_cpu bool
+            Give every function a share of the CPU proportional to its memory size
+        cpu_curve bsamcli.local.docker.cpu_curve.CpuCurve
+            Curve giving the CPU share of a memory size. Implies ``limit_cpu``. Defaults to the curve of CFC
         aws_profile str
             Name of the profile to fetch AWS credentials from
         debug_port int
@@ -84,6 +110,14 @@ class InvokeContext(object):
             Additional arguments passed to the debugger
         debugger_path str
             Path to the directory of the debugger to mount on Docker
+        warm_containers bool
+            Reuse containers across invokes of the same function instead of creating one per invoke
+        warm_pool_size int
+            Maximum number of idle containers kept for reuse. Defaults to the default of ``ContainerManager``
+        persistent_containers bool
+            Keep reused containers running and stream every event into them instead of restarting them per invoke
+        standby_containers int
+            Number of containers to create ahead of time for every function
         """
         self._template_file = template_file
         self._function_identifier = function_identifier
@@ -92,17 +126,27 @@ class InvokeContext(object):
         self._docker_network = docker_network
         self._log_file = log_file
         self._skip_pull_image = skip_pull_image
+        self._image_cache_ttl = image_cache_ttl
+        self._metrics_file = metrics_file
+        self._cpu_curve = cpu_curve or (CpuCurve() if limit_cpu else None)
         self._aws_profile = aws_profile
         self._aws_region = aws_region
         self._debug_port = debug_port
         self._debug_args = debug_args
         self._debugger_path = debugger_path
+        self._warm_containers = warm_containers
+        self._warm_pool_size = warm_pool_size
+        self._persistent_containers = persistent_containers
+        self._standby_containers = standby_containers
 
         self._template_dict = None
         self._function_provider = None
         self._env_vars_value = None
         self._log_file_handle = None
         self._debug_context = None
+        self._container_manager = None
+        self._artifact_cache = None
+        self._metrics_file_writer = None
 
     def __enter__(self):
         """
@@ -128,9 +172,14 @@ class InvokeContext(object):
 
     def __exit__(self, *args):
         """
-        Cleanup any necessary opened files
+        Cleanup any necessary opened files and containers kept warm or on standby for reuse
         """
 
+        if self._container_manager:
+            self._container_manager.stop_standby_containers()
+            self._container_manager.stop_warm_containers()
+            self._container_manager = None
+
         if self._log_file_handle:
             self._log_file_handle.close()
             self._log_file_handle = None
@@ -170,10 +219,25 @@ class InvokeContext(object):
             locally
         """
 
-        container_manager = ContainerManager(docker_network_id=self._docker_network,
-                                             skip_pull_image=self._skip_pull_image)
-
-        cfc_runtime = CfcRuntime(container_manager)
+        # All runners share one container manager, so warm containers can be reused across them and removed on exit.
+        # They share the artifact cache too, so every jar is copied only once, and one writer of the metrics file.
+        if not self._container_manager:
+            image_cache = ImageCache(cache_file=self._IMAGE_CACHE_FILE, ttl=self._image_cache_ttl)
+            self._container_manager = ContainerManager(docker_network_id=self._docker_network,
+                                                       skip_pull_image=self._skip_pull_image,
+                                                       image_cache=image_cache,
+                                                       warm_pool_size=self._warm_pool_size,
+                                                       standby_count=self._standby_containers)
+            self._artifact_cache = ArtifactCache(cache_dir=self._ARTIFACT_CACHE_DIR)
+            self._metrics_file_writer = MetricsFile(self._metrics_file) if self._metrics_file else None
+
+        cfc_runtime = CfcRuntime(self._container_manager,
+                                 warm_containers=self._warm_containers,
+                                 persistent_containers=self._persistent_containers,
+                                 standby_containers=bool(self._standby_containers),
+                                 artifact_cache=self._artifact_cache,
+                                 metrics_file=self._metrics_file_writer,
+                                 cpu_curve=self._cpu_curve)
         return LocalLambdaRunner(local_runtime=cfc_runtime,
                                  function_provider=self._function_provider,
                                  cwd=self.get_cwd(),
@@ -222,6 +286,15 @@ class InvokeContext(object):
 
         return byte_stderr
 
+    @property
+    def function_provider(self):
+        """
+        Returns the provider of the functions in the template
+
+        :return bsamcli.commands.local.lib.sam_function_provider.SamFunctionProvider: Function provider
+        """
+        return self._function_provider
+
     @property
     def template(self):
         """
@@ -231,6 +304,33 @@ class InvokeContext(object):
         """
         return self._template_dict
 
+    @property
+    def template_file(self):
+        """
+        Returns the path to the template file
+
+        :return string: Path to the template
+        """
+        return self._template_file
+
+    def reload_template(self):
+        """
+        Reads the template file again, ex: after it was edited, and replaces the template and the function provider
+        of this context. Runners created earlier keep the function provider they were created with.
+
+        :return dict: Template data as a dictionary
+        :raises InvokeContextException: If the template file was not found or the data was not a JSON/YAML. The
+            template read before is kept then
+        """
+
+        template_dict = self._get_template_data(self._template_file)
+        function_provider = SamFunctionProvider(template_dict)
+
+        self._template_dict = template_dict
+        self._function_provider = function_provider
+
+        return template_dict
+
     def get_cwd(self):
         """
         Get the working directory. This is usually relative to the directory that contains the template. If a Docker
@@ -353,7 +453,7 @@ class InvokeContext(object):
         :raises InvokeContextException: If Docker is not available
         """
 
-        docker_client = docker_client or docker.from_env()
+        docker_client = docker_client or get_docker_client()
 
         try:
             docker_client.ping()
@@ -5,6 +5,8 @@ Common CLI options for invoke command
 import os
 import click
 
+from bsamcli.local.docker.cpu_curve import CpuCurve
+
 _TEMPLATE_OPTION_DEFAULT_VALUE = "template.[yaml|yml]"
 
 
@@ -32,6 +34,25 @@ def get_or_default_template_file_name(ctx, param, provided_value):
     return os.path.abspath(provided_value)
 
 
+def parse_cpu_curve(ctx, param, provided_value):
+    """
+    Parses the points of a CPU curve given on the command line
+
+    :param ctx: Click Context
+    :param param: Param name
+    :param provided_value: Value provided by Click, ex: "128:0.1,3008:1.7"
+    :return bsamcli.local.docker.cpu_curve.CpuCurve: The curve. None, if no value was provided
+    """
+
+    if not provided_value:
+        return None
+
+    try:
+        return CpuCurve.parse(provided_value)
+    except ValueError as ex:
+        raise click.BadParameter(str(ex))
+
+
 def template_common_option(f):
     """
     Common ClI option for template
@@ -78,7 +99,38 @@ def service_common_options(port):
                          help="Local hostname or IP address to bind to (default: '127.0.0.1')"),
             click.option("--port", "-p",
                          default=port,
-                         help="Local port number to listen on (default: '{}')".format(str(port)))
+                         help="Local port number to listen on (default: '{}')".format(str(port))),
+            click.option("--warm-containers",
+                         is_flag=True,
+                         help="Reuse CFC function containers across invokes instead of creating a new container "
+                              "for every request. Contents of /tmp are kept between invokes, like on CFC.",
+                         envvar="SAM_WARM_CONTAINERS"),
+            click.option("--persistent-containers",
+                         is_flag=True,
+                         help="Keep CFC function containers running between invokes and stream every event into the "
+                              "running container. Implies --warm-containers.",
+                         envvar="SAM_PERSISTENT_CONTAINERS"),
+            click.option("--standby-containers",
+                         type=click.IntRange(min=0),
+                         default=0,
+                         help="Number of containers to create ahead of time for every CFC function, so creating the "
+                              "container is not part of the invoke. Standby containers are attached to "
+                              "--docker-network only, instead of also to the default bridge network.",
+                         envvar="SAM_STANDBY_CONTAINERS"),
+            click.option("--threads",
+                         type=click.IntRange(min=1),
+                         help="Serve requests with a fixed pool of this many threads per process and keep connections "
+                              "alive, instead of Flask's development server, which starts a thread for every "
+                              "connection. Requests are served one at a time while debugging."),
+            click.option("--processes",
+                         type=click.IntRange(min=1),
+                         default=1,
+                         help="Number of worker processes listening on the port together, each with its own warm "
+                              "containers. Implies the thread pool of --threads (default: 16 threads per process)."),
+            click.option("--drain-timeout",
+                         type=click.FloatRange(min=0),
+                         help="Seconds to wait for requests in flight when stopping a server started with --threads or "
+                              "--processes (default: 10).")
         ]
 
         # Reverse the list to maintain ordering of options in help text printed with --help
@@ -134,7 +186,31 @@ def invoke_common_options(f):
                      is_flag=True,
                      help="Specify whether CLI should skip pulling down the latest Docker image for CFC runtime.",
                      envvar="SAM_SKIP_PULL_IMAGE"),
-                
+
+        click.option('--image-cache-ttl',
+                     type=int,
+                     help="Number of seconds after which the CFC runtime Docker image is pulled again. Images pulled "
+                          "more recently are used as they are. Set to 0 to pull on every run (default: one day).",
+                     envvar="SAM_IMAGE_CACHE_TTL"),
+
+        click.option('--metrics-file',
+                     type=click.Path(dir_okay=False, writable=True),
+                     help="JSON lines file to append the metrics of every invoke to: durations of the invoke phases, "
+                          "cold start and memory used. They are also printed as a REPORT line after every invoke.",
+                     envvar="SAM_METRICS_FILE"),
+
+        click.option('--limit-cpu',
+                     is_flag=True,
+                     help="Give every function a share of the CPU proportional to its memory size, like in CFC, "
+                          "instead of all CPUs of the machine. Makes local durations closer to the cloud.",
+                     envvar="SAM_LIMIT_CPU"),
+
+        click.option('--cpu-curve',
+                     callback=parse_cpu_curve,
+                     help="Comma separated MEMORY:CPUS points of the curve that gives the CPU share of a memory "
+                          "size, ex: 128:0.1,3008:1.7. Implies --limit-cpu (default: 1 CPU at 1769 MB).",
+                     envvar="SAM_CPU_CURVE"),
+
         click.option('--profile',
                      help="Specify which BCE credentials profile to use."),
 
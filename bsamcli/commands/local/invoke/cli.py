@@ -9,6 +9,7 @@ from bsamcli.cli.main import pass_context, common_options as cli_framework_optio
 from bsamcli.commands.local.cli_common.options import invoke_common_options
 from bsamcli.commands.exceptions import UserException
 from bsamcli.commands.local.cli_common.invoke_context import InvokeContext
+from bsamcli.commands.local.lib.batch_invoke import BatchInvoker, iter_events
 from bsamcli.local.lambdafn.exceptions import FunctionNotFound
 from bsamcli.commands.validate.lib.exceptions import InvalidSamDocumentException
 
@@ -25,6 +26,9 @@ $ bsam local invoke "HelloWorldFunction" -e event.json\n
 \b
 Invoking a CFC function using input from stdin
 $ echo '{"message": "Hey, are you there?" }' | bsam local invoke "HelloWorldFunction" \n
+\b
+Invoking a CFC function with every event of a JSON lines file, four events at a time
+$ bsam local invoke "HelloWorldFunction" --events events.jsonl --concurrency 4\n
 """
 STDIN_FILE_NAME = "-"
 
@@ -36,21 +40,34 @@ STDIN_FILE_NAME = "-"
               help="JSON file containing event data passed to the CFC function during invoke. If this option "
                    "is not specified, we will default to reading JSON from stdin")
 @click.option("--no-event", is_flag=True, default=False, help="Invoke Function with an empty event")
+@click.option("--events",
+              type=click.Path(exists=True, allow_dash=True),
+              help="Invoke the function once per event read from this path, and write one result line per event. "
+                   "Pass a directory of .json event files, or a file with one JSON event per line. Use '-' to "
+                   "read events from stdin")
+@click.option("--concurrency",
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              help="Number of events invoked at the same time with --events. Containers are reused across events")
 @invoke_common_options
 @cli_framework_options
 @click.argument('function_identifier', required=False)
 @pass_context
-def cli(ctx, function_identifier, template, event, no_event, env_vars, debug_port,
-        debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region):
+def cli(ctx, function_identifier, template, event, no_event, events, concurrency, env_vars, debug_port, debug_args,
+        docker_volume_basedir, docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu,
+        cpu_curve, profile, region):
 
     # All logic must be implemented in the ``do_cli`` method. This helps with easy unit testing
 
-    do_cli(ctx, function_identifier, template, event, no_event, env_vars, debug_port,
-           debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region)  # pragma: no cover
+    do_cli(ctx, function_identifier, template, event, no_event, events, concurrency, env_vars, debug_port,
+           debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image, image_cache_ttl,
+           metrics_file, limit_cpu, cpu_curve, profile, region)  # pragma: no cover
 
 
-def do_cli(ctx, function_identifier, template, event, no_event, env_vars, debug_port,
-           debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region):
+def do_cli(ctx, function_identifier, template, event, no_event, events, concurrency,  # pylint: disable=R0914
+           env_vars, debug_port, debug_args, docker_volume_basedir, docker_network, log_file, skip_pull_image,
+           image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile, region):
     """
     Implementation of the ``cli`` method, just separated out for unit testing purposes
     """
@@ -61,7 +78,16 @@ def do_cli(ctx, function_identifier, template, event, no_event, env_vars, debug_
         # Do not know what the user wants. no_event and event both passed in.
         raise UserException("no_event and event cannot be used together. Please provide only one.")
 
-    if no_event:
+    if events and (no_event or event != STDIN_FILE_NAME):
+        raise UserException("events cannot be used together with event or no_event. Please provide only one.")
+
+    if events and debug_port and concurrency > 1:
+        # Every debugged container would wait for the debugger on the same port
+        raise UserException("Only one event can be debugged at a time. Please use a concurrency of 1.")
+
+    if events:
+        event_data = None
+    elif no_event:
         event_data = "{}"
     else:
         event_data = _get_event(event)
@@ -76,10 +102,20 @@ def do_cli(ctx, function_identifier, template, event, no_event, env_vars, debug_
                            docker_network=docker_network,
                            log_file=log_file,
                            skip_pull_image=skip_pull_image,
+                           image_cache_ttl=image_cache_ttl,
+                           metrics_file=metrics_file,
+                           limit_cpu=limit_cpu,
+                           cpu_curve=cpu_curve,
                            aws_profile=profile,
                            debug_port=debug_port,
                            debug_args=debug_args,
-                           aws_region=region) as context:
+                           aws_region=region,
+                           warm_containers=bool(events),
+                           warm_pool_size=concurrency if events else None) as context:
+
+            if events:
+                _invoke_events(context, events, concurrency)
+                return
 
             # Invoke the function
             context.local_lambda_runner.invoke(context.function_name,
@@ -93,6 +129,30 @@ def do_cli(ctx, function_identifier, template, event, no_event, env_vars, debug_
         raise UserException(str(ex))
 
 
+def _invoke_events(context, events, concurrency):
+    """
+    Invoke the function once per event read from the given path, and print a summary of all invokes to stderr
+
+    :param InvokeContext context: Context to invoke the function in
+    :param string events: Path to a directory of event files or a JSON lines file, or '-' for stdin
+    :param int concurrency: Number of events to invoke at the same time
+    """
+
+    if events == STDIN_FILE_NAME:
+        LOG.info("Reading invoke payloads from stdin, one per line")
+
+    invoker = BatchInvoker(context.local_lambda_runner,
+                           context.function_name,
+                           concurrency=concurrency,
+                           stderr=context.stderr)
+    try:
+        summary = invoker.run(iter_events(events))
+    except (IOError, OSError, UnicodeDecodeError) as ex:
+        raise UserException("Unable to read events from {}: {}".format(events, ex))
+
+    click.echo(summary.format(), err=True)
+
+
 def _get_event(event_file_name):
     """
     Read the event JSON data from the given file. If no file is provided, read the event from stdin.
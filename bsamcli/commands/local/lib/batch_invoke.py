@@ -0,0 +1,207 @@
+"""
+Runs a stream of events through a local function, several at a time
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import click
+
+from bsamcli.lib.utils.stats import summarize
+from bsamcli.local.lambdafn.batch import InvokeBatch, elapsed_ms
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound
+from bsamcli.local.services.base_local_service import LambdaOutputParser
+
+LOG = logging.getLogger(__name__)
+
+STDIN_FILE_NAME = "-"
+
+
+def iter_events(path):
+    """
+    Reads events one by one from the given path, so a large sample never has to fit in memory.
+
+    A directory holds one event per ``.json`` file, read in the order of their names. Any other path, or '-' for stdin,
+    is read as JSON lines, with one event per non-blank line.
+
+    :param string path: Directory of event files, or path to a JSON lines file
+    :return: Generator of (event_id, event) tuples. The ID names the file, or the file and line, the event came from
+    """
+
+    if path != STDIN_FILE_NAME and os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            if name.endswith(".json") and os.path.isfile(file_path):
+                with io.open(file_path, 'r', encoding='utf-8') as fp:
+                    yield name, fp.read()
+        return
+
+    source = "stdin" if path == STDIN_FILE_NAME else os.path.basename(path)
+    with click.open_file(path, 'r') as fp:
+        for line_number, line in enumerate(fp, 1):
+            if line.strip():
+                yield "{}:{}".format(source, line_number), line.strip()
+
+
+class BatchInvoker(InvokeBatch):
+    """
+    Invokes one function with every event of a stream, running up to ``concurrency`` invokes at the same time. Every
+    worker thread pulls the next event as soon as its invoke finished, so slow events don't hold up the others.
+
+    One result line is written per event, as JSON, in the order the invokes finished. Logs of the function are
+    written per invoke as a whole, so the logs of concurrent invokes don't interleave.
+    """
+
+    def __init__(self, lambda_runner, function_name, concurrency=1, output=None, stderr=None):
+        """
+        Initialize the invoker
+
+        :param bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner lambda_runner: Runner to invoke the function
+        :param string function_name: Name of the function to invoke
+        :param int concurrency: Optional. Maximum number of invokes running at the same time. Defaults to 1
+        :param io.TextIOBase output: Optional. Stream the result lines are written to. Defaults to stdout
+        :param io.BaseIO stderr: Optional. Stream the logs of the function are written to, as bytes
+        """
+
+        super(BatchInvoker, self).__init__(lambda_runner, function_name, stderr=stderr)
+        self.concurrency = max(concurrency, 1)
+        self.output = output or sys.stdout
+
+        self._output_lock = threading.Lock()
+        self._results = []
+
+    def run(self, events):
+        """
+        Invokes the function with all of the given events. Blocks until all invokes completed.
+
+        :param events: Iterable of (event_id, event) tuples, ex: as returned by ``iter_events``
+        :return BatchSummary: Summary of all invokes
+        :raises FunctionNotFound: If the function does not exist. No further events are invoked then
+        """
+
+        self._results = []
+
+        start = time.time()
+        self._run(events, self.concurrency, "batch-invoke")
+
+        return BatchSummary(self._results, time.time() - start)
+
+    def _done(self, event, result):
+        with self._output_lock:
+            self._results.append(result)
+            self.output.write(json.dumps(result) + "\n")
+            self.output.flush()
+
+    def _invoke(self, event):
+        """
+        Invokes the function with one event
+
+        :param tuple event: (event_id, event) tuple
+        :return dict: Result line of the invoke
+        """
+
+        event_id, event_data = event
+        stdout = io.BytesIO()
+        stderr = io.BytesIO()
+        result = {"id": event_id}
+
+        start = time.time()
+        try:
+            metrics = self.lambda_runner.invoke(self.function_name, event_data, stdout=stdout, stderr=stderr)
+        except FunctionNotFound:
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            result.update(self._failed(ex), latency_ms=elapsed_ms(start))
+            return result
+
+        result["latency_ms"] = elapsed_ms(start)
+
+        response, logs, is_error = LambdaOutputParser.get_lambda_output(stdout)
+        result.update(self._classify(metrics, is_error))
+        if result["status"] != self.TIMEOUT:
+            result["response"] = response
+
+        if self.stderr:
+            with self._output_lock:
+                if logs:
+                    self.stderr.write(logs + b"\n")
+                self.stderr.write(stderr.getvalue())
+                self.stderr.flush()
+
+        return result
+
+
+class BatchSummary(object):
+    """
+    Aggregates the results of a batch of invokes
+    """
+
+    def __init__(self, results, elapsed):
+        """
+        :param list results: Result lines of all invokes
+        :param float elapsed: Seconds the whole batch took
+        """
+
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def counts(self):
+        """
+        :return dict: Number of invokes by status
+        """
+
+        counts = {}
+        for result in self.results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return counts
+
+    @property
+    def throughput(self):
+        """
+        :return float: Invokes completed per second
+        """
+
+        return len(self.results) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def latency(self):
+        """
+        :return dict: Distribution of the latencies of all invokes in milliseconds, ex: ``p99``
+        """
+
+        return summarize([result["latency_ms"] for result in self.results])
+
+    @property
+    def cold_starts(self):
+        """
+        :return int: Number of invokes that had to start a new container
+        """
+
+        return sum(1 for result in self.results if result.get("cold"))
+
+    def format(self):
+        """
+        :return string: Human readable summary of the batch
+        """
+
+        counts = ", ".join("{} {}".format(count, status) for status, count in sorted(self.counts.items()))
+        lines = [
+            "Invoked {} events in {:.2f}s ({:.2f} events/s): {}".format(len(self.results),
+                                                                        self.elapsed,
+                                                                        self.throughput,
+                                                                        counts or "none"),
+            "Cold starts: {}".format(self.cold_starts),
+        ]
+
+        latency = self.latency
+        if latency:
+            lines.append("Latency (ms): min {min:.1f}, p50 {p50:.1f}, p90 {p90:.1f}, p99 {p99:.1f}, "
+                         "max {max:.1f}".format(**latency))
+
+        return "\n".join(lines)
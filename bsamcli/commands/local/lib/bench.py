@@ -0,0 +1,282 @@
+"""
+Load generator measuring the latency of local functions
+"""
+
+import http.client
+import io
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from bsamcli.lib.utils.histogram import LatencyHistogram
+from bsamcli.local.services.base_local_service import LambdaOutputParser
+
+LOG = logging.getLogger(__name__)
+
+
+class InvokeTarget(object):
+    """
+    Runs a function directly through a ``LocalLambdaRunner``
+    """
+
+    def __init__(self, lambda_runner, function_name, event):
+        """
+        :param bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner lambda_runner: Runner to invoke the function
+        :param string function_name: Name of the function to invoke
+        :param string event: Event passed to every invoke
+        """
+
+        self.lambda_runner = lambda_runner
+        self.function_name = function_name
+        self.event = event
+
+    def __call__(self):
+        """
+        Invokes the function once
+
+        :return tuple: (is_error, is_cold). ``is_cold`` is None, if it is not known
+        """
+
+        stdout = io.BytesIO()
+
+        # Logs of the function would drown the report. Only the response counts.
+        metrics = self.lambda_runner.invoke(self.function_name, self.event, stdout=stdout, stderr=io.BytesIO())
+
+        _, _, is_error = LambdaOutputParser.get_lambda_output(stdout)
+        timed_out = bool(metrics and metrics.timed_out)
+        return is_error or timed_out, metrics.cold if metrics else None
+
+
+class HttpTarget(object):
+    """
+    Sends requests to a running ``start-api`` or ``start-lambda`` endpoint. Every worker thread keeps its connection
+    open across requests, so connecting is not part of the measured latency.
+    """
+
+    def __init__(self, url, method="POST", body=None, timeout=None):
+        """
+        :param string url: URL to send the requests to, ex: http://127.0.0.1:3001/2015-03-31/functions/Name/invocations
+        :param string method: Optional. HTTP method of the requests. Defaults to POST
+        :param string body: Optional. Body of every request
+        :param float timeout: Optional. Seconds to wait for a response
+        """
+
+        parsed = urlsplit(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("Not an HTTP URL: {}".format(url))
+
+        self.url = url
+        self.method = method
+        self.body = body.encode('utf-8') if body is not None else None
+        self.timeout = timeout
+
+        self._parsed = parsed
+        self._local = threading.local()
+
+    def __call__(self):
+        """
+        Sends one request
+
+        :return tuple: (is_error, is_cold). ``is_cold`` is always None, the endpoint does not tell
+        """
+
+        path = self._parsed.path or "/"
+        if self._parsed.query:
+            path += "?" + self._parsed.query
+
+        status, headers = self.send(self.method, path, body=self.body)
+
+        is_error = status >= 400 or bool(headers.get("x-amz-function-error"))
+        return is_error, None
+
+    def send(self, method, path, body=None, headers=None):
+        """
+        Sends a request to the host of the URL, over the connection of the current thread
+
+        :param string method: HTTP method
+        :param string path: Path of the request, including the query string
+        :param bytes body: Optional. Body of the request
+        :param dict headers: Optional. Headers of the request
+        :return tuple: (status, headers) of the response. Header names are lower case
+        """
+
+        connection = self._get_connection()
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            response.read()
+        except Exception:
+            # The connection is in an unknown state. Open a new one for the next request.
+            self._local.connection = None
+            connection.close()
+            raise
+
+        return response.status, {name.lower(): value for name, value in response.getheaders()}
+
+    def _get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self._parsed.scheme == "https" \
+                else http.client.HTTPConnection
+            connection = connection_class(self._parsed.hostname, self._parsed.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+
+class Bench(object):
+    """
+    Calls a target over and over for a fixed duration, and records the latency of every call.
+
+    Without a rate, every worker thread calls the target again as soon as its last call returned, which keeps
+    ``concurrency`` calls in flight at all times. With a rate, calls are started on a fixed schedule instead, and
+    ``concurrency`` bounds the calls in flight. The latency of a scheduled call counts from when it was due, not from
+    when a worker was free to make it, so a function that cannot keep up shows in the latencies instead of silently
+    lowering the rate. All calls due within the duration are made, so the run takes longer then.
+    """
+
+    def __init__(self, target, duration, concurrency=1, rate=None):
+        """
+        :param target: Callable making one call, ex: ``InvokeTarget``. Returns (is_error, is_cold)
+        :param float duration: Seconds to run for. Calls in flight at the end are waited for
+        :param int concurrency: Optional. Number of calls in flight at the same time. Defaults to 1
+        :param float rate: Optional. Calls to start per second
+        """
+
+        self.target = target
+        self.duration = duration
+        self.concurrency = max(concurrency, 1)
+        self.rate = rate
+
+        self._lock = threading.Lock()
+        self._result = None
+        self._next_call = 0
+        self._start = None
+
+    def run(self):
+        """
+        Runs the benchmark. Blocks until the duration passed and all calls returned.
+
+        :return BenchResult: Latencies and counts of all calls
+        """
+
+        self._result = BenchResult()
+        self._next_call = 0
+        self._start = time.time()
+
+        workers = [threading.Thread(target=self._work, name="bench-{}".format(index))
+                   for index in range(self.concurrency)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self._result.elapsed = time.time() - self._start
+        return self._result
+
+    def _work(self):
+        histogram = LatencyHistogram()
+
+        while True:
+            due = self._next_due()
+            if due is None:
+                break
+
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                is_error, is_cold = self.target()
+            except Exception as ex:  # pylint: disable=broad-except
+                LOG.debug("Call failed", exc_info=True)
+                is_error, is_cold = True, None
+                self._result.add_failure(str(ex))
+
+            histogram.record((time.time() - due) * 1000)
+            self._result.add_call(is_error, is_cold)
+
+        self._result.add_histogram(histogram)
+
+    def _next_due(self):
+        """
+        :return float: Time the next call is due at, or None if the benchmark is over
+        """
+
+        if not self.rate:
+            now = time.time()
+            return now if now - self._start < self.duration else None
+
+        # Every call due within the duration is made, even if the target fell behind, so the late ones are measured
+        with self._lock:
+            offset = self._next_call / float(self.rate)
+            if offset >= self.duration:
+                return None
+            self._next_call += 1
+
+        return self._start + offset
+
+
+class BenchResult(object):
+    """
+    Latencies and counts of the calls of a benchmark. Safe to update from several threads.
+    """
+
+    # Number of distinct failure messages kept for the report
+    _MAX_FAILURES = 5
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.calls = 0
+        self.errors = 0
+        self.cold_starts = 0
+        self.elapsed = 0.0
+        self.failures = []
+
+        self._lock = threading.Lock()
+
+    def add_call(self, is_error, is_cold):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1 if is_error else 0
+            self.cold_starts += 1 if is_cold else 0
+
+    def add_failure(self, message):
+        with self._lock:
+            if message not in self.failures and len(self.failures) < self._MAX_FAILURES:
+                self.failures.append(message)
+
+    def add_histogram(self, histogram):
+        with self._lock:
+            self.histogram.merge(histogram)
+
+    @property
+    def throughput(self):
+        """
+        :return float: Calls completed per second
+        """
+
+        return self.calls / self.elapsed if self.elapsed else 0.0
+
+    def format(self):
+        """
+        :return string: Human readable report of the benchmark
+        """
+
+        lines = [
+            "Calls:       {} in {:.2f}s ({:.2f}/s)".format(self.calls, self.elapsed, self.throughput),
+            "Errors:      {}".format(self.errors),
+            "Cold starts: {}".format(self.cold_starts),
+        ]
+
+        if self.histogram.total_count:
+            lines.append("Latency (ms): p50 {:.1f}, p90 {:.1f}, p99 {:.1f}, max {:.1f}".format(
+                self.histogram.get_value_at_percentile(50),
+                self.histogram.get_value_at_percentile(90),
+                self.histogram.get_value_at_percentile(99),
+                self.histogram.max))
+
+        lines.extend("Failure: {}".format(message) for message in self.failures)
+
+        return "\n".join(lines)
@@ -0,0 +1,55 @@
+"""
+Invalidates state kept for functions when their code changes
+"""
+
+import logging
+
+from bsamcli.lib.utils.file_watcher import FileWatcher
+
+LOG = logging.getLogger(__name__)
+
+
+class CodeWatcher(object):
+    """
+    Watches the code of every function of a runner. When the code of a function changed, its warm and standby
+    containers are discarded, along with anything else cached for it, so the next invoke runs the new code. Functions
+    whose code did not change keep their state.
+    """
+
+    def __init__(self, lambda_runner, on_change=None, interval=None, debounce=None):
+        """
+        :param bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner lambda_runner: Runner of the functions
+        :param callable on_change: Optional. Called with the name of every function whose code changed, after its
+            containers were discarded, ex: to drop its cached responses
+        :param float interval: Optional. Seconds between two checks for changes
+        :param float debounce: Optional. Seconds the code must not change for, before it is invalidated
+        """
+
+        self.lambda_runner = lambda_runner
+        self.on_change = on_change
+        self._watcher = FileWatcher(self._invalidate, interval=interval, debounce=debounce)
+
+    def start(self):
+        """
+        Starts watching the code in the background
+        """
+
+        for function_name, code_path in self.lambda_runner.get_code_paths().items():
+            self._watcher.watch(code_path, function_name)
+
+        self._watcher.start()
+
+    def stop(self):
+        """
+        Stops watching the code
+        """
+
+        self._watcher.stop()
+
+    def _invalidate(self, function_names):
+        for function_name in sorted(function_names):
+            LOG.info("Code of %s changed. Its next invoke runs the new code.", function_name)
+            self.lambda_runner.invalidate(function_name)
+
+            if self.on_change:
+                self.on_change(function_name)
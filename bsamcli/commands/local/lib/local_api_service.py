@@ -6,8 +6,15 @@ import os
 import logging
 
 from bsamcli.local.apigw.local_apigw_service import LocalApigwService, Route
+from bsamcli.local.apigw.response_cache import ResponseCache
+from bsamcli.local.apigw.traffic_recorder import TrafficRecorder
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler, get_function_concurrency
+from bsamcli.lib.utils.file_watcher import FileWatcher
+from bsamcli.commands.local.cli_common.user_exceptions import InvokeContextException
+from bsamcli.commands.local.lib.code_watcher import CodeWatcher
 from bsamcli.commands.local.lib.sam_api_provider import SamApiProvider
 from bsamcli.commands.local.lib.exceptions import NoApisDefined
+from bsamcli.commands.validate.lib.exceptions import InvalidSamDocumentException
 
 LOG = logging.getLogger(__name__)
 
@@ -22,7 +29,15 @@ class LocalApiService(object):
                  lambda_invoke_context,
                  port,
                  host,
-                 static_dir):
+                 static_dir,
+                 max_concurrency=None,
+                 max_queue_size=None,
+                 queue_timeout=None,
+                 record_file=None,
+                 cache_ttl=None,
+                 cache_max_bytes=None,
+                 cache_key_headers=None,
+                 server=None):
         """
         Initialize the local API service.
 
@@ -31,16 +46,42 @@ class LocalApiService(object):
         :param int port: Port to listen on
         :param string host: Local hostname or IP address to bind to
         :param string static_dir: Optional, directory from which static files will be mounted
+        :param int max_concurrency: Optional. Maximum number of functions invoked at the same time
+        :param int max_queue_size: Optional. Maximum number of requests waiting for an invoke to finish
+        :param int queue_timeout: Optional. Seconds a request waits before it is throttled
+        :param string record_file: Optional. File to record every request and response to, as JSON lines
+        :param int cache_ttl: Optional. Seconds to cache responses of GET routes for, unless the stage of their API
+            configures caching in the template
+        :param int cache_max_bytes: Optional. Maximum size of all cached responses together
+        :param list(str) cache_key_headers: Optional. Request headers that are part of the cache key
+        :param bsamcli.local.services.server.PooledServer server: Optional. Server to run on. Defaults to Flask's
+            development server
         """
 
         self.port = port
         self.host = host
         self.static_dir = static_dir
+        self.scheduler = InvokeScheduler(max_concurrency=max_concurrency,
+                                         function_concurrency=get_function_concurrency(
+                                             lambda_invoke_context.function_provider.get_all()),
+                                         max_queue_size=max_queue_size,
+                                         queue_timeout=queue_timeout)
 
+        self.lambda_invoke_context = lambda_invoke_context
         self.cwd = lambda_invoke_context.get_cwd()
         self.api_provider = SamApiProvider(lambda_invoke_context.template, cwd=self.cwd)
         self.lambda_runner = lambda_invoke_context.local_lambda_runner
         self.stderr_stream = lambda_invoke_context.stderr
+        self.recorder = TrafficRecorder(record_file) if record_file else None
+        self.cache_ttl = cache_ttl
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_key_headers = cache_key_headers
+        self.server = server
+
+        self._service = None
+        self._routing_list = None
+        self._response_cache = None
+        self._code_watcher = None
 
     def start(self):
         """
@@ -51,11 +92,20 @@ class LocalApiService(object):
         NOTE: This is a blocking call that will not return until the thread is interrupted with SIGINT/SIGTERM
         """
 
-        routing_list = self._make_routing_list(self.api_provider)
+        routing_list = self._make_routing_list(self.api_provider, cache_ttl=self.cache_ttl)
 
         if not routing_list:
             raise NoApisDefined("No APIs available in SAM template")
 
+        if self.server and self.server.supervises(self.lambda_runner.is_debugging()):
+            # Worker processes serve the requests. Each of them fetches the images and watches the code and template.
+            self.server.supervise()
+            return
+
+        response_cache = None
+        if any(route.cache_ttl for route in routing_list):
+            response_cache = ResponseCache(max_bytes=self.cache_max_bytes)
+
         static_dir_path = self._make_static_dir_path(self.cwd, self.static_dir)
 
         # We care about passing only stderr to the Service and not stdout because stdout from Docker container
@@ -67,27 +117,133 @@ class LocalApiService(object):
                                     static_dir=static_dir_path,
                                     port=self.port,
                                     host=self.host,
-                                    stderr=self.stderr_stream)
+                                    stderr=self.stderr_stream,
+                                    scheduler=self.scheduler,
+                                    recorder=self.recorder,
+                                    response_cache=response_cache,
+                                    cache_key_headers=self.cache_key_headers,
+                                    server=self.server)
 
         service.create()
 
+        self._service = service
+        self._routing_list = routing_list
+        self._response_cache = response_cache
+
+        # Fetch runtime images before accepting requests, so that the first request does not wait for an image pull
+        self.lambda_runner.prefetch_images()
+
         # Print out the list of routes that will be mounted
         self._print_routes(self.api_provider, self.host, self.port)
         LOG.info("You can now browse to the above endpoints to invoke your functions. "
-                 "You do not need to restart/reload SAM CLI while working on your functions "
-                 "changes will be reflected instantly/automatically. You only need to restart "
-                 "SAM CLI if you update your AWS SAM template")
+                 "You do not need to restart/reload SAM CLI while working on your functions or your template, "
+                 "changes will be reflected instantly/automatically.")
+        if response_cache:
+            LOG.info("Stats of the response cache are served at http://%s:%s%s",
+                     self.host, self.port, LocalApigwService.RESPONSE_CACHE_PATH)
+
+        # Containers and responses kept for a function are dropped as soon as its code changes. Changes of the
+        # template swap the routes and functions in place.
+        self._start_code_watcher()
+        template_watcher = FileWatcher(self._reload_template)
+        template_watcher.watch(self.lambda_invoke_context.template_file, "template")
+        template_watcher.start()
+
+        try:
+            service.run()
+        finally:
+            template_watcher.stop()
+            self._code_watcher.stop()
+            if self._response_cache:
+                LOG.info("Response cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, "
+                         "%(entries)d responses cached (%(bytes)d bytes)", self._response_cache.stats)
+
+    def _start_code_watcher(self):
+        """
+        Starts watching the code of the functions the runner currently has, instead of the ones watched before
+        """
+
+        if self._code_watcher:
+            self._code_watcher.stop()
+
+        self._code_watcher = CodeWatcher(self.lambda_runner,
+                                         on_change=self._response_cache.clear if self._response_cache else None)
+        self._code_watcher.start()
+
+    def _reload_template(self, _=None):
+        """
+        Reads the template again after it changed, and applies the differences to the running service. Functions
+        whose configuration changed, or that were removed, lose their containers and cached responses. Everything
+        kept for other functions stays. The routes are swapped at once, if they changed. A template that cannot be
+        read is logged, and the service keeps running as it was.
+        """
+
+        LOG.info("Template changed, reloading it")
+
+        old_function_provider = self.lambda_runner.provider
+        try:
+            template = self.lambda_invoke_context.reload_template()
+            api_provider = SamApiProvider(template, cwd=self.cwd)
+            routing_list = self._make_routing_list(api_provider, cache_ttl=self.cache_ttl)
+        except (InvokeContextException, InvalidSamDocumentException) as ex:
+            LOG.error("Unable to reload the template. Serving the APIs of the last valid template. %s", ex)
+            return
+
+        if not routing_list:
+            LOG.error("No APIs available in the template anymore. Serving the APIs of the last valid template.")
+            return
 
-        service.run()
+        function_provider = self.lambda_invoke_context.function_provider
+
+        # State of changed functions is dropped while the runner still has their old configuration, ex: the path to
+        # their old code
+        for function_name in self._get_changed_functions(old_function_provider, function_provider):
+            LOG.info("Configuration of %s changed. Its next invoke runs the new configuration.", function_name)
+            self.lambda_runner.invalidate(function_name)
+            if self._response_cache:
+                self._response_cache.clear(function_name)
+
+        self.lambda_runner.provider = function_provider
+        self.scheduler.function_concurrency = get_function_concurrency(function_provider.get_all())
+        self.api_provider = api_provider
+
+        if [_route_signature(route) for route in routing_list] != \
+                [_route_signature(route) for route in self._routing_list]:
+            if any(route.cache_ttl for route in routing_list) and not self._response_cache:
+                self._response_cache = ResponseCache(max_bytes=self.cache_max_bytes)
+                self._service.response_cache = self._response_cache
+
+            self._service.update_routes(routing_list)
+            self._routing_list = routing_list
+            self._print_routes(api_provider, self.host, self.port)
+
+        # Functions may have been added, or their code moved
+        self._start_code_watcher()
+
+    @staticmethod
+    def _get_changed_functions(old_function_provider, new_function_provider):
+        """
+        Returns the functions that were removed or whose configuration changed
+
+        :param bsamcli.commands.local.lib.provider.FunctionProvider old_function_provider: Functions before the change
+        :param bsamcli.commands.local.lib.provider.FunctionProvider new_function_provider: Functions after the change
+        :return list(str): Names of the changed functions
+        """
+
+        return sorted(function.name for function in old_function_provider.get_all()
+                      if new_function_provider.get(function.name) != function)
 
     @staticmethod
-    def _make_routing_list(api_provider):
+    def _make_routing_list(api_provider, cache_ttl=None):
         """
         Returns a list of routes to configure the Local API Service based on the APIs configured in the template.
 
         Parameters
         ----------
         api_provider : bsamcli.commands.local.lib.sam_api_provider.SamApiProvider
+        cache_ttl : int
+            Optional. Seconds to cache responses of GET routes for, if the template does not configure caching for
+            their API
 
         Returns
         -------
@@ -97,8 +253,12 @@ class LocalApiService(object):
 
         routes = []
         for api in api_provider.get_all():
+            route_cache_ttl = api.cache_ttl
+            if route_cache_ttl is None and api.method == "GET":
+                route_cache_ttl = cache_ttl
+
             route = Route(methods=[api.method], function_name=api.function_name, path=api.path,
-                          binary_types=api.binary_media_types)
+                          binary_types=api.binary_media_types, cache_ttl=route_cache_ttl)
             routes.append(route)
 
         return routes
@@ -166,3 +326,11 @@ class LocalApiService(object):
         if os.path.exists(static_dir_path):
             LOG.info("Mounting static files from %s at /", static_dir_path)
             return static_dir_path
+
+
+def _route_signature(route):
+    """
+    :param Route route: Route of the service
+    :return tuple: Everything that makes up the route, to tell if routes changed
+    """
+    return tuple(route.methods), route.function_name, route.path, tuple(route.binary_types), route.cache_ttl
@@ -54,7 +54,7 @@ class LocalLambdaRunner(object):
         self.aws_region = aws_region
         self.debug_context = debug_context
 
-    def invoke(self, function_name, event, is_installing=None, stdout=None, stderr=None):
+    def invoke(self, function_name, event, is_installing=None, stdout=None, stderr=None, request_id=None):
         """
         Find the Lambda function with given name and invoke it. Pass the given event to the function and return
         response through the given streams.
@@ -65,6 +65,8 @@ class LocalLambdaRunner(object):
         :param string event: Event data passed to the function. Must be a valid JSON String.
         :param io.BaseIO stdout: Stream to write the output of the Lambda function to.
         :param io.BaseIO stderr: Stream to write the Lambda runtime logs to.
+        :param string request_id: Optional. ID of the request the function sees. A new one is generated by default
+        :return bsamcli.local.lambdafn.metrics.InvokeMetrics: Metrics of the invoke, ex: its duration
         :raises FunctionNotfound: When we cannot find a function with the given name
         """
 
@@ -81,8 +83,43 @@ class LocalLambdaRunner(object):
         config = self._get_invoke_config(function)
 
         # Invoke the function
-        self.local_runtime.invoke(config, self.cwd, event, debug_context=self.debug_context,
-                                  is_installing=is_installing, stdout=stdout, stderr=stderr)
+        return self.local_runtime.invoke(config, self.cwd, event, debug_context=self.debug_context,
+                                         is_installing=is_installing, stdout=stdout, stderr=stderr,
+                                         request_id=request_id)
+
+    def prefetch_images(self):
+        """
+        Fetches the runtime images of all functions in the provider ahead of time, so that no invoke has to wait for
+        an image pull. This blocks until all images are available.
+        """
+
+        runtimes = [function.runtime for function in self.provider.get_all() if function.runtime]
+        self.local_runtime.prefetch_images(runtimes)
+
+    def get_code_paths(self):
+        """
+        Returns the paths to the code of all functions in the provider, ex: to watch them for changes
+
+        :return dict: Function name to the absolute path to its code
+        """
+
+        return {function.name: self._get_code_path(function.codeuri) for function in self.provider.get_all()}
+
+    def invalidate(self, function_name):
+        """
+        Discards containers and other state kept for the given function, because its code changed. The next invoke
+        runs the new code in a new container. Functions sharing the code are invalidated too.
+
+        :param string function_name: Name of the function
+        """
+
+        function = self.provider.get(function_name)
+        if not function:
+            return
+
+        code_path = self._get_code_path(function.codeuri)
+        removed = self.local_runtime.invalidate(code_path)
+        LOG.debug("Invalidated %s, removed %d containers running its old code", function_name, removed)
 
     def is_debugging(self):
         """
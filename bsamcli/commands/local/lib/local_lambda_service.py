@@ -3,7 +3,10 @@ Connects the CLI with Local Lambda Invoke Service.
 """
 import logging
 
+from bsamcli.commands.local.lib.code_watcher import CodeWatcher
+from bsamcli.local.lambda_service.event_queue import EventInvokeQueue
 from bsamcli.local.lambda_service.local_lambda_invoke_service import LocalLambdaInvokeService
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler, get_function_concurrency
 
 LOG = logging.getLogger(__name__)
 
@@ -17,7 +20,12 @@ class LocalLambdaService(object):
     def __init__(self,
                  lambda_invoke_context,
                  port,
-                 host):
+                 host,
+                 server=None,
+                 event_workers=None,
+                 event_retries=None,
+                 event_retry_delay=None,
+                 event_dead_letter_file=None):
         """
         Initialize the Local Lambda Invoke service.
 
@@ -25,12 +33,30 @@ class LocalLambdaService(object):
             that can help with Lambda invocation
         :param int port: Port to listen on
         :param string host: Local hostname or IP address to bind to
+        :param bsamcli.local.services.server.PooledServer server: Optional. Server to run on. Defaults to Flask's
+            development server
+        :param int event_workers: Optional. Number of asynchronous invokes running at the same time
+        :param int event_retries: Optional. Number of times a failed asynchronous invoke is retried
+        :param float event_retry_delay: Optional. Seconds before the first retry of a failed asynchronous invoke
+        :param string event_dead_letter_file: Optional. Path of the file asynchronous invokes that failed for good are
+            appended to
         """
 
         self.port = port
         self.host = host
+        self.server = server
         self.lambda_runner = lambda_invoke_context.local_lambda_runner
         self.stderr_stream = lambda_invoke_context.stderr
+        self.event_queue = EventInvokeQueue(self.lambda_runner,
+                                            workers=event_workers,
+                                            max_retries=event_retries,
+                                            retry_delay=event_retry_delay,
+                                            dead_letter_file=event_dead_letter_file,
+                                            stderr=self.stderr_stream)
+
+        # Batch invocations run no more invokes of a function at once than its reserved concurrency
+        self.scheduler = InvokeScheduler(function_concurrency=get_function_concurrency(
+            lambda_invoke_context.function_provider.get_all()))
 
     def start(self):
         """
@@ -41,6 +67,12 @@ class LocalLambdaService(object):
         NOTE: This is a blocking call that will not return until the thread is interrupted with SIGINT/SIGTERM
         """
 
+        if self.server and self.server.supervises(self.lambda_runner.is_debugging()):
+            # Worker processes serve the requests. Each of them fetches the images, watches the code and runs its own
+            # asynchronous invokes.
+            self.server.supervise()
+            return
+
         # We care about passing only stderr to the Service and not stdout because stdout from Docker container
         # contains the response to the API which is sent out as HTTP response. Only stderr needs to be printed
         # to the console or a log file. stderr from Docker container contains runtime logs and output of print
@@ -48,11 +80,29 @@ class LocalLambdaService(object):
         service = LocalLambdaInvokeService(lambda_runner=self.lambda_runner,
                                            port=self.port,
                                            host=self.host,
-                                           stderr=self.stderr_stream)
+                                           stderr=self.stderr_stream,
+                                           server=self.server,
+                                           event_queue=self.event_queue,
+                                           scheduler=self.scheduler)
 
         service.create()
 
+        # Fetch runtime images before accepting requests, so that the first request does not wait for an image pull
+        self.lambda_runner.prefetch_images()
+
         LOG.info("Starting the Local Lambda Service. You can now invoke your Lambda Functions defined in your template"
                  " through the endpoint.")
 
-        service.run()
+        # Containers kept for a function are dropped as soon as its code changes
+        code_watcher = CodeWatcher(self.lambda_runner)
+        code_watcher.start()
+        self.event_queue.start()
+
+        try:
+            service.run()
+        finally:
+            code_watcher.stop()
+            self.event_queue.stop()
+            if self.event_queue.accepted:
+                LOG.info("Asynchronous invokes: %(accepted)d accepted, %(succeeded)d succeeded, %(failed)d failed, "
+                         "%(retried)d retried, %(dead_lettered)d dropped", self.event_queue.stats)
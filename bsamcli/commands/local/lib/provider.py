@@ -34,8 +34,13 @@ Function = namedtuple("Function", [
 
     # Lambda Execution IAM Role ARN. In the future, this can be used by Local Lambda runtime to assume the IAM role
     # to get credentials to run the container with. This gives a much higher fidelity simulation of cloud Lambda.
-    "rolearn"
+    "rolearn",
+
+    # Maximum number of concurrent invokes of this function (ReservedConcurrentExecutions). None if not limited
+    "reserved_concurrency"
 ])
+Function.__new__.__defaults__ = (None,  # reserved_concurrency is optional and defaults to None
+                                 )
 
 
 class FunctionProvider(object):
@@ -78,10 +83,14 @@ _ApiTuple = namedtuple("Api", [
     "cors",
 
     # List(Str). List of the binary media types the API
-    "binary_media_types"
+    "binary_media_types",
+
+    # Int. Seconds responses of this API are cached for, if the stage of the API caches them
+    "cache_ttl"
 ])
 _ApiTuple.__new__.__defaults__ = (None,  # Cors is optional and defaults to None
-                                  []     # binary_media_types is optional and defaults to empty
+                                  [],    # binary_media_types is optional and defaults to empty
+                                  None   # cache_ttl is optional and defaults to no caching
                                   )
 
 
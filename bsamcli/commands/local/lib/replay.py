@@ -0,0 +1,269 @@
+"""
+Replays recorded HTTP traffic against a local endpoint
+"""
+
+import io
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from bsamcli.lib.utils.stats import summarize
+from bsamcli.local.apigw.traffic_recorder import decode_body
+
+LOG = logging.getLogger(__name__)
+
+# Headers that belong to the connection the request was recorded on, not to the request itself
+_CONNECTION_HEADERS = ("host", "content-length", "connection", "keep-alive", "transfer-encoding", "upgrade")
+
+
+class RecordingException(Exception):
+    """
+    Raised when a recorded request cannot be read
+    """
+    pass
+
+
+def load_recording(path):
+    """
+    Reads the requests of a file recorded with ``start-api --record``, or exported from production in the same
+    format. Only ``method`` and ``path`` are required. Requests without a ``timestamp`` are replayed right after the
+    one in front of them.
+
+    :param string path: Path to the JSON lines file
+    :return: Generator of (line_number, request) tuples, with the request being the recorded object
+    :raises RecordingException: If a line is not a recorded request
+    """
+
+    with io.open(path, 'r', encoding='utf-8') as fp:
+        for line_number, line in enumerate(fp, 1):
+            if not line.strip():
+                continue
+
+            try:
+                recorded = json.loads(line)
+            except ValueError as ex:
+                raise RecordingException("Line {} of {} is not valid JSON: {}".format(line_number, path, ex))
+
+            if not isinstance(recorded, dict) or not recorded.get("method") or not recorded.get("path"):
+                raise RecordingException("Line {} of {} has no method or path".format(line_number, path))
+
+            yield line_number, recorded
+
+
+def load_durations(path):
+    """
+    Reads the durations of the requests of a recording or of a replay's results, to compare a replay against
+
+    :param string path: Path to the JSON lines file
+    :return dict: Line number of the recorded request to its duration in milliseconds
+    """
+
+    durations = {}
+    for line_number, recorded in load_recording(path):
+        if recorded.get("duration_ms") is not None:
+            durations[recorded.get("line", line_number)] = recorded["duration_ms"]
+    return durations
+
+
+class Replayer(object):
+    """
+    Sends recorded requests to an endpoint with the same spacing in time they were recorded with, or a scaled one.
+    Up to ``concurrency`` requests are in flight at the same time. A request that is due while all of them are busy
+    is sent as soon as one is free.
+    """
+
+    def __init__(self, target, concurrency=1, speed=1.0, output=None):
+        """
+        :param bsamcli.commands.local.lib.bench.HttpTarget target: Endpoint to send the requests to. Paths of the
+            requests are appended to the path of its URL
+        :param int concurrency: Optional. Number of requests in flight at the same time. Defaults to 1
+        :param float speed: Optional. Factor to speed up the recording by, ex: 2 replays it in half the time. 0 sends
+            every request as soon as possible. Defaults to 1, the recorded speed
+        :param io.TextIOBase output: Optional. Stream to write the result of every request to, as JSON lines
+        """
+
+        self.target = target
+        self.concurrency = max(concurrency, 1)
+        self.speed = speed
+        self.output = output
+
+        self._base_path = urlsplit(target.url).path.rstrip("/")
+        self._requests = None
+        self._lock = threading.Lock()
+        self._results = []
+        self._start = None
+        self._first_timestamp = None
+        self._last_offset = 0.0
+        self._error = None
+
+    def run(self, requests):
+        """
+        Replays the given requests. Blocks until all of them were answered.
+
+        :param requests: Iterable of (line_number, request) tuples, ex: as returned by ``load_recording``
+        :return ReplayResult: Durations of all requests
+        :raises RecordingException: If a request cannot be read. No further requests are sent then
+        """
+
+        self._requests = iter(requests)
+        self._results = []
+        self._error = None
+        self._first_timestamp = None
+        self._last_offset = 0.0
+        self._start = time.time()
+
+        workers = [threading.Thread(target=self._work, name="replay-{}".format(index))
+                   for index in range(self.concurrency)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if self._error:
+            raise self._error  # pylint: disable=raising-bad-type
+
+        return ReplayResult(sorted(self._results, key=lambda result: result["line"]), time.time() - self._start)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if self._error:
+                    return
+
+                try:
+                    item = next(self._requests, None)
+                except RecordingException as ex:
+                    # Stop all workers, ``run`` raises it
+                    self._error = ex
+                    return
+
+                if item is None:
+                    return
+                due = self._get_due(item[1])
+
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            result = self._send(*item)
+
+            with self._lock:
+                self._results.append(result)
+                if self.output:
+                    self.output.write(json.dumps(result) + "\n")
+                    self.output.flush()
+
+    def _get_due(self, recorded):
+        """
+        :return float: Time the given request is due at
+        """
+
+        timestamp = recorded.get("timestamp")
+        if not self.speed or timestamp is None:
+            return self._start + self._last_offset
+
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+
+        self._last_offset = max(timestamp - self._first_timestamp, 0) / float(self.speed)
+        return self._start + self._last_offset
+
+    def _send(self, line_number, recorded):
+        """
+        Sends one recorded request
+
+        :return dict: Result of the request
+        """
+
+        headers = {name: value for name, value in (recorded.get("headers") or {}).items()
+                   if name.lower() not in _CONNECTION_HEADERS}
+        body = decode_body(recorded.get("body"), recorded.get("is_base64_encoded"))
+
+        result = {"line": line_number, "method": recorded["method"], "path": recorded["path"]}
+
+        start = time.time()
+        try:
+            status, _ = self.target.send(recorded["method"], self._base_path + recorded["path"],
+                                         body=body or None, headers=headers)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOG.debug("Replaying line %d failed", line_number, exc_info=True)
+            result.update(error=str(ex), duration_ms=round((time.time() - start) * 1000, 3))
+            return result
+
+        result.update(status=status, duration_ms=round((time.time() - start) * 1000, 3))
+        return result
+
+
+class ReplayResult(object):
+    """
+    Results of a replay, with the means to compare them against an earlier run
+    """
+
+    # Number of requests listed as the largest regressions
+    _MAX_REGRESSIONS = 5
+
+    def __init__(self, results, elapsed):
+        """
+        :param list results: Result of every request, in the order of the recording
+        :param float elapsed: Seconds the replay took
+        """
+
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def errors(self):
+        """
+        :return int: Number of requests that failed or were answered with a 5xx status
+        """
+
+        return sum(1 for result in self.results if "error" in result or result["status"] >= 500)
+
+    def format(self, baseline=None):
+        """
+        :param dict baseline: Optional. Line number to the duration of the request in an earlier run, in milliseconds
+        :return string: Human readable report of the replay, compared against the baseline
+        """
+
+        throughput = len(self.results) / self.elapsed if self.elapsed else 0.0
+        lines = ["Replayed {} requests in {:.2f}s ({:.2f}/s): {} errors".format(len(self.results), self.elapsed,
+                                                                                throughput, self.errors)]
+
+        durations = {result["line"]: result["duration_ms"] for result in self.results}
+        replayed = summarize(list(durations.values()), percents=(50, 90, 99))
+        if not replayed:
+            return "\n".join(lines)
+
+        baseline = {line: duration for line, duration in (baseline or {}).items() if line in durations}
+        before = summarize(list(baseline.values()), percents=(50, 90, 99))
+
+        lines.append("{:<12} {:>12} {:>12} {:>22}".format("Latency (ms)", "baseline", "replay", "delta"))
+        for key in ("p50", "p90", "p99", "max"):
+            if before:
+                lines.append("{:<12} {:>12.3f} {:>12.3f} {:>22}".format(key, before[key], replayed[key],
+                                                                        _format_delta(before[key], replayed[key])))
+            else:
+                lines.append("{:<12} {:>12} {:>12.3f} {:>22}".format(key, "-", replayed[key], "-"))
+
+        regressions = sorted(((durations[line] - duration, line) for line, duration in baseline.items()),
+                             reverse=True)
+        regressions = [(delta, line) for delta, line in regressions[:self._MAX_REGRESSIONS] if delta > 0]
+        if regressions:
+            lines.append("Largest regressions:")
+            for delta, line in regressions:
+                result = next(result for result in self.results if result["line"] == line)
+                lines.append("  {} {} (line {}): {:.3f} ms -> {:.3f} ms".format(result["method"], result["path"],
+                                                                                line, baseline[line],
+                                                                                durations[line]))
+
+        return "\n".join(lines)
+
+
+def _format_delta(before, after):
+    delta = after - before
+    if not before:
+        return "{:+.3f}".format(delta)
+    return "{:+.3f} ({:+.1f}%)".format(delta, delta / before * 100)
@@ -128,6 +128,10 @@ class SamApiProvider(ApiProvider):
         uri = properties.get("DefinitionUri")
         binary_media = properties.get("BinaryMediaTypes", [])
 
+        # The stage settings apply to the APIs defined on functions too, so they are collected even without Swagger
+        if properties.get("CacheClusterEnabled"):
+            collector.add_method_settings(logical_id, properties.get("MethodSettings") or [])
+
         if not body and not uri:
             # Swagger is not found anywhere.
             LOG.debug("Skipping resource '%s'. Swagger document not found in DefinitionBody and DefinitionUri",
@@ -324,13 +328,19 @@ class ApiCollector(object):
     # This is intentional because it allows us to easily extend this class to support future properties on the API.
     # We will store properties of Implicit APIs also in this format which converges the handling of implicit & explicit
     # APIs.
-    Properties = namedtuple("Properties", ["apis", "binary_media_types", "cors"])
+    Properties = namedtuple("Properties", ["apis", "binary_media_types", "cors", "method_settings"])
+
+    # Seconds API Gateway caches responses for, unless the method settings say otherwise
+    _DEFAULT_CACHE_TTL = 300
 
     def __init__(self):
         # API properties stored per resource. Key is the LogicalId of the AWS::Serverless::Api resource and
         # value is the properties
         self.by_resource = {}
 
+        # LogicalIds of the resources whose stage has a cache cluster
+        self._cache_enabled = set()
+
     def __iter__(self):
         """
         Iterator to iterate through all the APIs stored in the collector. In each iteration, this yields the
@@ -387,6 +397,25 @@ class ApiCollector(object):
             else:
                 LOG.debug("Unsupported data type of binary media type value of resource '%s'", logical_id)
 
+    def add_method_settings(self, logical_id, method_settings):
+        """
+        Stores the method settings of the stage of the API with given logical ID. Only called for stages with a
+        cache cluster, because caching is all that is read from the settings.
+
+        Parameters
+        ----------
+        logical_id : str
+            LogicalId of the AWS::Serverless::Api resource
+
+        method_settings : list of dict
+            MethodSettings of the resource
+        """
+        properties = self._get_properties(logical_id)
+        properties.method_settings.extend(setting for setting in method_settings if isinstance(setting, dict))
+
+        # An empty list still means the stage has a cache cluster. Mark it, so it is not mistaken for no cluster.
+        self._cache_enabled.add(logical_id)
+
     def _get_apis_with_config(self, logical_id):
         """
         Returns the list of APIs in this resource along with other extra configuration such as binary media types,
@@ -413,13 +442,70 @@ class ApiCollector(object):
 
         result = []
         for api in properties.apis:
+            cache_ttl = None
+            if logical_id in self._cache_enabled:
+                cache_ttl = self._get_cache_ttl(properties.method_settings, api)
+
             # Create a copy of the API with updated configuration
             updated_api = api._replace(binary_media_types=binary_media,
-                                       cors=cors)
+                                       cors=cors,
+                                       cache_ttl=cache_ttl)
             result.append(updated_api)
 
         return result
 
+    @staticmethod
+    def _get_cache_ttl(method_settings, api):
+        """
+        Returns how long responses of the API are cached by a stage with a cache cluster. Like on API Gateway, GET
+        methods are cached for 300 seconds, unless MethodSettings say otherwise. Settings of a specific resource path
+        win over the ones of all paths ("/*").
+
+        Parameters
+        ----------
+        method_settings : list of dict
+            MethodSettings of the stage
+        api : bsamcli.commands.local.lib.provider.Api
+            API to get the cache TTL of
+
+        Returns
+        -------
+        int or None
+            Seconds responses are cached for. None, if they are not cached
+        """
+
+        enabled = api.method == "GET"
+        ttl = ApiCollector._DEFAULT_CACHE_TTL
+
+        matching = [setting for setting in method_settings if ApiCollector._method_setting_matches(setting, api)]
+        for setting in sorted(matching, key=lambda setting: setting.get("ResourcePath", "/*") != "/*"):
+            if "CachingEnabled" in setting:
+                enabled = str(setting["CachingEnabled"]).lower() == "true"
+            if "CacheTtlInSeconds" in setting:
+                try:
+                    ttl = int(setting["CacheTtlInSeconds"])
+                except (TypeError, ValueError):
+                    LOG.debug("Unsupported CacheTtlInSeconds value of method setting %s", setting)
+
+        return ttl if enabled and ttl > 0 else None
+
+    @staticmethod
+    def _method_setting_matches(setting, api):
+        """
+        Does the method setting apply to the API? Resource paths are escaped like in CloudFormation, ex: /~1pets for
+        the path /pets. "/*" and "*" match all paths and methods.
+        """
+        method = setting.get("HttpMethod", "*")
+        if method != "*" and method.upper() != api.method:
+            return False
+
+        resource_path = setting.get("ResourcePath", "/*")
+        if resource_path == "/*":
+            return True
+
+        path = resource_path[1:].replace("~1", "/")
+        return ("/" + path.lstrip("/")) == api.path
+
     def _get_properties(self, logical_id):
         """
         Returns the properties of resource with given logical ID. If a resource is not found, then it returns an
@@ -440,7 +526,8 @@ class ApiCollector(object):
             self.by_resource[logical_id] = self.Properties(apis=[],
                                                            # Use a set() to be able to easily de-dupe
                                                            binary_media_types=set(),
-                                                           cors=None)
+                                                           cors=None,
+                                                           method_settings=[])
 
         return self.by_resource[logical_id]
 
@@ -8,6 +8,8 @@ import click
 from .invoke.cli import cli as invoke_cli
 from .generate_event.cli import cli as generate_event_cli
 from .install.cli import cli as install_cli
+from .bench.cli import cli as bench_cli
+from .replay.cli import cli as replay_cli
 # from .start_lambda.cli import cli as start_lambda_cli
 # from .start_api.cli import cli as start_api_cli
 
@@ -24,5 +26,7 @@ def cli():
 cli.add_command(invoke_cli)
 cli.add_command(generate_event_cli)
 cli.add_command(install_cli)
+cli.add_command(bench_cli)
+cli.add_command(replay_cli)
 # cli.add_command(start_api_cli)
 # cli.add_command(start_lambda_cli)
@@ -0,0 +1,87 @@
+"""
+CLI command for "local replay" command
+"""
+
+import io
+import logging
+import click
+
+from bsamcli.cli.main import pass_context, common_options as cli_framework_options
+from bsamcli.commands.exceptions import UserException
+from bsamcli.commands.local.lib.bench import HttpTarget
+from bsamcli.commands.local.lib.replay import Replayer, RecordingException, load_recording, load_durations
+
+LOG = logging.getLogger(__name__)
+
+
+HELP_TEXT = """
+You can use this command to replay HTTP traffic recorded with "bsam local start-api --record", or exported from
+production in the same format, against a running local endpoint. Requests are sent with the spacing in time they
+were recorded with, and their latencies are compared against the recorded ones, or against an earlier replay.\n
+\b
+Recording traffic, then replaying it twice as fast
+$ bsam local start-api --record traffic.jsonl
+$ bsam local replay traffic.jsonl --speed 2 --output run1.jsonl\n
+\b
+Comparing a replay against an earlier one
+$ bsam local replay traffic.jsonl --speed 2 --baseline run1.jsonl\n
+"""
+
+
+@click.command("replay", help=HELP_TEXT, short_help="Replays recorded HTTP traffic against a local endpoint.")
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.option("--url",
+              default="http://127.0.0.1:3000",
+              show_default=True,
+              help="Base URL of the endpoint to send the requests to. The recorded paths are appended to it.")
+@click.option("--speed",
+              type=click.FloatRange(min=0),
+              default=1.0,
+              show_default=True,
+              help="Factor to speed up the recording by, ex: 2 replays it in half the time. 0 sends every request as "
+                   "soon as possible.")
+@click.option("--concurrency",
+              type=click.IntRange(min=1),
+              default=8,
+              show_default=True,
+              help="Maximum number of requests in flight at the same time.")
+@click.option("--output", "-o",
+              type=click.Path(dir_okay=False),
+              help="Write the result of every request to this file as JSON lines, to use as --baseline later.")
+@click.option("--baseline",
+              type=click.Path(exists=True, dir_okay=False),
+              help="Compare latencies against this file of an earlier replay. Defaults to the latencies recorded in "
+                   "the replayed file.")
+@cli_framework_options
+@pass_context
+def cli(ctx, recording, url, speed, concurrency, output, baseline):
+
+    # All logic must be implemented in the ``do_cli`` method. This helps with easy unit testing
+
+    do_cli(ctx, recording, url, speed, concurrency, output, baseline)  # pragma: no cover
+
+
+def do_cli(ctx, recording, url, speed, concurrency, output, baseline):
+    """
+    Implementation of the ``cli`` method, just separated out for unit testing purposes
+    """
+
+    LOG.debug("local replay command is called")
+
+    try:
+        target = HttpTarget(url)
+    except ValueError as ex:
+        raise UserException(str(ex))
+
+    output_file = io.open(output, 'w', encoding='utf-8') if output else None
+    try:
+        durations = load_durations(baseline or recording)
+        result = Replayer(target, concurrency=concurrency, speed=speed, output=output_file).run(
+            load_recording(recording))
+    except RecordingException as ex:
+        raise UserException(str(ex))
+    finally:
+        if output_file:
+            output_file.close()
+
+    click.echo(result.format(baseline=durations))
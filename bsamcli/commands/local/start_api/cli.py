@@ -12,6 +12,7 @@ from bsamcli.commands.local.lib.exceptions import NoApisDefined
 from bsamcli.commands.exceptions import UserException
 from bsamcli.commands.local.lib.local_api_service import LocalApiService
 from bsamcli.commands.validate.lib.exceptions import InvalidSamDocumentException
+from bsamcli.local.services.server import get_server
 
 LOG = logging.getLogger(__name__)
 
@@ -37,31 +38,75 @@ and point SAM to the directory or file containing build artifacts.
               default="public",
               help="Any static assets (e.g. CSS/Javascript/HTML) files located in this directory "
                    "will be presented at /")
+@click.option("--max-concurrency",
+              type=int,
+              help="Maximum number of CFC functions invoked at the same time. Requests beyond it wait for a running "
+                   "invoke to finish. Functions are also limited by ReservedConcurrentExecutions in the template. "
+                   "Unlimited by default.")
+@click.option("--max-queue-size",
+              type=int,
+              help="Maximum number of requests waiting for a function to become available. Requests beyond it are "
+                   "throttled with HTTP 429 (default: 100).")
+@click.option("--queue-timeout",
+              type=int,
+              help="Seconds a request waits for a function to become available before it is throttled with HTTP 429 "
+                   "(default: 30).")
+@click.option("--record",
+              type=click.Path(dir_okay=False),
+              help="Append every request and its response, with timing, to this file as JSON lines. Replay the file "
+                   "with 'bsam local replay'.")
+@click.option("--cache-ttl",
+              type=click.IntRange(min=0),
+              help="Cache successful responses of GET routes for this many seconds, so repeated requests don't invoke "
+                   "the function again. Stage cache settings of an API in the template (CacheClusterEnabled and "
+                   "MethodSettings) take precedence. Send 'Cache-Control: max-age=0' to skip the cache.")
+@click.option("--cache-max-bytes",
+              type=click.IntRange(min=1),
+              help="Maximum size of all cached responses together. Least recently used responses are evicted beyond "
+                   "it (default: 64 MB).")
+@click.option("--cache-key-header",
+              multiple=True,
+              help="Request header that is part of the cache key, in addition to the method, path and query string. "
+                   "Can be repeated.")
 @invoke_common_options
 @cli_framework_options
 @pass_context
 def cli(ctx,
         # start-api Specific Options
-        host, port, static_dir,
+        host, port, warm_containers, persistent_containers, standby_containers, threads, processes, drain_timeout,
+        static_dir, max_concurrency, max_queue_size, queue_timeout, record, cache_ttl, cache_max_bytes,
+        cache_key_header,
 
         # Common Options for Lambda Invoke
         template, env_vars, debug_port, debug_args, debugger_path, docker_volume_basedir,
-        docker_network, log_file, skip_pull_image, profile, region
+        docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile,
+        region
         ):
     # All logic must be implemented in the ``do_cli`` method. This helps with easy unit testing
 
-    do_cli(ctx, host, port, static_dir, template, env_vars, debug_port, debug_args, debugger_path,
-           docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region)  # pragma: no cover
+    do_cli(ctx, host, port, warm_containers, persistent_containers, standby_containers, threads, processes,
+           drain_timeout, static_dir, max_concurrency, max_queue_size, queue_timeout, record, cache_ttl,
+           cache_max_bytes, cache_key_header, template, env_vars, debug_port, debug_args, debugger_path,
+           docker_volume_basedir, docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu,
+           cpu_curve, profile, region)  # pragma: no cover
 
 
-def do_cli(ctx, host, port, static_dir, template, env_vars, debug_port, debug_args,  # pylint: disable=R0914
-           debugger_path, docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region):
+def do_cli(ctx, host, port, warm_containers, persistent_containers, standby_containers,  # pylint: disable=R0914
+           threads, processes, drain_timeout, static_dir, max_concurrency, max_queue_size, queue_timeout, record,
+           cache_ttl, cache_max_bytes, cache_key_header, template, env_vars, debug_port, debug_args, debugger_path,
+           docker_volume_basedir, docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu,
+           cpu_curve, profile, region):
     """
     Implementation of the ``cli`` method, just separated out for unit testing purposes
     """
 
     LOG.debug("local start-api command is called")
 
+    try:
+        server = get_server(threads=threads, processes=processes, drain_timeout=drain_timeout)
+    except ValueError as ex:
+        raise UserException(str(ex))
+
     # Pass all inputs to setup necessary context to invoke function locally.
     # Handler exception raised by the processor for invalid args and print errors
 
@@ -73,16 +118,31 @@ def do_cli(ctx, host, port, static_dir, template, env_vars, debug_port, debug_ar
                            docker_network=docker_network,
                            log_file=log_file,
                            skip_pull_image=skip_pull_image,
+                           image_cache_ttl=image_cache_ttl,
+                           metrics_file=metrics_file,
+                           limit_cpu=limit_cpu,
+                           cpu_curve=cpu_curve,
                            aws_profile=profile,
                            debug_port=debug_port,
                            debug_args=debug_args,
                            debugger_path=debugger_path,
-                           aws_region=region) as invoke_context:
+                           aws_region=region,
+                           warm_containers=warm_containers,
+                           persistent_containers=persistent_containers,
+                           standby_containers=standby_containers) as invoke_context:
 
             service = LocalApiService(lambda_invoke_context=invoke_context,
                                       port=port,
                                       host=host,
-                                      static_dir=static_dir)
+                                      static_dir=static_dir,
+                                      max_concurrency=max_concurrency,
+                                      max_queue_size=max_queue_size,
+                                      queue_timeout=queue_timeout,
+                                      record_file=record,
+                                      cache_ttl=cache_ttl,
+                                      cache_max_bytes=cache_max_bytes,
+                                      cache_key_headers=list(cache_key_header),
+                                      server=server)
             service.start()
 
     except NoApisDefined:
@@ -11,6 +11,7 @@ from bsamcli.commands.local.cli_common.invoke_context import InvokeContext
 from bsamcli.commands.local.cli_common.user_exceptions import UserException
 from bsamcli.commands.local.lib.local_lambda_service import LocalLambdaService
 from bsamcli.commands.validate.lib.exceptions import InvalidSamDocumentException
+from bsamcli.local.services.server import get_server
 
 LOG = logging.getLogger(__name__)
 
@@ -50,31 +51,56 @@ Here is a Python example:
                help=HELP_TEXT,
                short_help="Starts a local endpoint you can use to invoke your local Lambda functions.")
 @service_common_options(3001)
+@click.option("--event-workers",
+              type=click.IntRange(min=1),
+              help="Number of asynchronous invokes (invocation type 'Event') running at the same time (default: 4).")
+@click.option("--event-retries",
+              type=click.IntRange(min=0, max=2),
+              help="Number of times a failed asynchronous invoke is retried, like CFC does (default: 2).")
+@click.option("--event-retry-delay",
+              type=click.FloatRange(min=0),
+              help="Seconds before a failed asynchronous invoke is retried the first time. Every further retry waits "
+                   "twice as long (default: 60).")
+@click.option("--event-dead-letter-file",
+              type=click.Path(dir_okay=False),
+              help="Append asynchronous invokes that failed after all retries to this file as JSON lines.")
 @invoke_common_options
 @cli_framework_options
 @pass_context
 def cli(ctx,
         # start-lambda Specific Options
-        host, port,
+        host, port, warm_containers, persistent_containers, standby_containers, threads, processes, drain_timeout,
+        event_workers, event_retries, event_retry_delay, event_dead_letter_file,
 
         # Common Options for Lambda Invoke
         template, env_vars, debug_port, debug_args, debugger_path, docker_volume_basedir,
-        docker_network, log_file, skip_pull_image, profile, region
+        docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile,
+        region
         ):
     # All logic must be implemented in the ``do_cli`` method. This helps with easy unit testing
 
-    do_cli(ctx, host, port, template, env_vars, debug_port, debug_args, debugger_path, docker_volume_basedir,
-           docker_network, log_file, skip_pull_image, profile, region)  # pragma: no cover
+    do_cli(ctx, host, port, warm_containers, persistent_containers, standby_containers, threads, processes,
+           drain_timeout, event_workers, event_retries, event_retry_delay, event_dead_letter_file, template, env_vars,
+           debug_port, debug_args, debugger_path, docker_volume_basedir, docker_network, log_file, skip_pull_image,
+           image_cache_ttl, metrics_file, limit_cpu, cpu_curve, profile, region)  # pragma: no cover
 
 
-def do_cli(ctx, host, port, template, env_vars, debug_port, debug_args,  # pylint: disable=R0914
-           debugger_path, docker_volume_basedir, docker_network, log_file, skip_pull_image, profile, region):
+def do_cli(ctx, host, port, warm_containers, persistent_containers, standby_containers,  # pylint: disable=R0914
+           threads, processes, drain_timeout, event_workers, event_retries, event_retry_delay,
+           event_dead_letter_file, template, env_vars, debug_port, debug_args, debugger_path,
+           docker_volume_basedir, docker_network, log_file, skip_pull_image, image_cache_ttl, metrics_file, limit_cpu,
+           cpu_curve, profile, region):
     """
     Implementation of the ``cli`` method, just separated out for unit testing purposes
     """
 
     LOG.debug("local start_lambda command is called")
 
+    try:
+        server = get_server(threads=threads, processes=processes, drain_timeout=drain_timeout)
+    except ValueError as ex:
+        raise UserException(str(ex))
+
     # Pass all inputs to setup necessary context to invoke function locally.
     # Handler exception raised by the processor for invalid args and print errors
 
@@ -86,15 +112,27 @@ def do_cli(ctx, host, port, template, env_vars, debug_port, debug_args,  # pylin
                            docker_network=docker_network,
                            log_file=log_file,
                            skip_pull_image=skip_pull_image,
+                           image_cache_ttl=image_cache_ttl,
+                           metrics_file=metrics_file,
+                           limit_cpu=limit_cpu,
+                           cpu_curve=cpu_curve,
                            aws_profile=profile,
                            debug_port=debug_port,
                            debug_args=debug_args,
                            debugger_path=debugger_path,
-                           aws_region=region) as invoke_context:
+                           aws_region=region,
+                           warm_containers=warm_containers,
+                           persistent_containers=persistent_containers,
+                           standby_containers=standby_containers) as invoke_context:
 
             service = LocalLambdaService(lambda_invoke_context=invoke_context,
                                          port=port,
-                                         host=host)
+                                         host=host,
+                                         server=server,
+                                         event_workers=event_workers,
+                                         event_retries=event_retries,
+                                         event_retry_delay=event_retry_delay,
+                                         event_dead_letter_file=event_dead_letter_file)
             service.start()
 
     except InvalidSamDocumentException as ex:
@@ -0,0 +1,125 @@
+"""
+Base64 encoding and decoding in chunks, so large payloads are not copied as a whole
+"""
+
+import base64
+import re
+
+# Base64 in the standard alphabet, without whitespace, padded to a multiple of 4 characters
+_PLAIN_BASE64 = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+# Base64 of this many bytes at once. A multiple of 3, so no chunk but the last one is padded
+_ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+# Decode this many characters of Base64 at once. A multiple of 4, so no chunk starts in the middle of a group
+_DECODE_CHUNK_SIZE = 4 * 64 * 1024
+
+
+class PayloadTooLargeError(Exception):
+    """
+    Raised when encoding a stream would produce more than the given limit
+    """
+    pass
+
+
+def encoded_size(size):
+    """
+    Returns the size of the Base64 encoding of the given number of bytes
+
+    :param int size: Number of bytes to encode
+    :return int: Number of characters of the encoding, including padding
+    """
+    return (size + 2) // 3 * 4
+
+
+def encode_stream(stream, limit=None, chunk_size=None):
+    """
+    Reads a stream of bytes to its end, and encodes it to Base64 chunk by chunk. Joining the chunks gives the same
+    string as encoding all bytes at once.
+
+    :param io.BaseIO stream: Stream to read from
+    :param int limit: Optional. Maximum number of characters of the encoding
+    :param int chunk_size: Optional. Number of bytes to read at once. Must be a multiple of 3
+    :return list(str): Chunks of the encoding
+    :raises PayloadTooLargeError: If the encoding is longer than the limit. The stream is not read any further then
+    """
+
+    chunk_size = chunk_size or _ENCODE_CHUNK_SIZE
+    if chunk_size % 3:
+        raise ValueError("Chunk size must be a multiple of 3")
+
+    chunks = []
+    size = 0
+    pending = b""
+
+    while True:
+        data = stream.read(chunk_size - len(pending))
+        if not data:
+            break
+
+        pending += data
+        if len(pending) < chunk_size:
+            # Streams may return less than asked for. Only full chunks are encoded without padding.
+            continue
+
+        size += encoded_size(len(pending))
+        if limit is not None and size > limit:
+            raise PayloadTooLargeError("Base64 of the payload is larger than {} bytes".format(limit))
+
+        chunks.append(base64.b64encode(pending).decode('ascii'))
+        pending = b""
+
+    if pending:
+        size += encoded_size(len(pending))
+        if limit is not None and size > limit:
+            raise PayloadTooLargeError("Base64 of the payload is larger than {} bytes".format(limit))
+
+        chunks.append(base64.b64encode(pending).decode('ascii'))
+
+    return chunks
+
+
+def decoded_size(data):
+    """
+    Returns the number of bytes the given Base64 decodes to, without decoding it
+
+    :param str data: Base64 without whitespace
+    :return int: Number of bytes. None, if the data is not plain Base64, ex: has line breaks
+    """
+
+    if not is_plain_base64(data):
+        return None
+
+    return len(data) // 4 * 3 - (len(data) - len(data.rstrip("=")))
+
+
+def is_plain_base64(data):
+    """
+    :param str data: Data to check
+    :return bool: True, if the data is Base64 without whitespace or other characters, that can be decoded in chunks
+    """
+
+    return len(data) % 4 == 0 and _PLAIN_BASE64.fullmatch(data) is not None
+
+
+def decode_string(data, chunk_size=None):
+    """
+    Decodes Base64 chunk by chunk, so the decoded bytes need not be held in memory all at once, ex: to stream them out
+    as a response. Base64 with line breaks or other characters outside of its alphabet, which are ignored like
+    ``base64.b64decode`` does, is decoded at once.
+
+    :param str data: Base64 to decode
+    :param int chunk_size: Optional. Number of characters to decode at once. Must be a multiple of 4
+    :return generator(bytes): Chunks of decoded bytes
+    :raises binascii.Error: If the data is not Base64. Raised on the first chunk already
+    """
+
+    chunk_size = chunk_size or _DECODE_CHUNK_SIZE
+    if chunk_size % 4:
+        raise ValueError("Chunk size must be a multiple of 4")
+
+    if not is_plain_base64(data):
+        # Raises right away, if the data is not Base64 at all
+        return iter([base64.b64decode(data)])
+
+    return (base64.b64decode(data[start:start + chunk_size]) for start in range(0, len(data), chunk_size))
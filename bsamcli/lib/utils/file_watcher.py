@@ -0,0 +1,163 @@
+"""
+Watches files and directories for changes
+"""
+
+import logging
+import os
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class FileWatcher(object):
+    """
+    Polls files and directories for changes to their contents, and reports the tags of the changed paths to a
+    callback. Changes are batched: the callback runs only once no path changed for ``debounce`` seconds, so a
+    ``git checkout`` touching hundreds of files is reported once, after it finished.
+
+    Polling compares the modification time and size of every file, which works the same on every platform and file
+    system, including the network file systems and shared folders Docker mounts code from, where inotify events are
+    not delivered. Version control directories and Python bytecode are ignored, as the function writes the latter
+    itself when it runs. Dependency directories, which often hold more files than all the rest of the code, are not
+    walked. Installing or removing a package still changes the directory itself, and usually a lock file next to it.
+    """
+
+    # Directories that never contain code a function runs
+    _IGNORED_DIRECTORIES = frozenset([".git", ".hg", ".svn", ".idea", ".vscode", "__pycache__",
+                                      ".tox", ".mypy_cache", ".pytest_cache"])
+
+    # Directories of installed dependencies. Only the directory itself is checked, not the files below it.
+    _DEPENDENCY_DIRECTORIES = frozenset(["node_modules", "bower_components", ".venv", "venv"])
+
+    # Files that change without the code changing, ex: swap files of editors
+    _IGNORED_SUFFIXES = (".pyc", ".pyo", ".swp", ".swx", "~")
+
+    _DEFAULT_INTERVAL = 1.0
+    _DEFAULT_DEBOUNCE = 0.5
+
+    def __init__(self, callback, interval=None, debounce=None):
+        """
+        :param callable callback: Called with the set of tags of the changed paths. Runs on the thread of the watcher
+        :param float interval: Optional. Seconds between two polls. Defaults to 1
+        :param float debounce: Optional. Seconds no path must change for, before the changes are reported.
+            Defaults to 0.5
+        """
+
+        self.callback = callback
+        self.interval = interval or self._DEFAULT_INTERVAL
+        self.debounce = debounce if debounce is not None else self._DEFAULT_DEBOUNCE
+
+        # Path to the tags it was watched with
+        self._paths = {}
+        # Path to the (mtime, size) of every file below it, as of the last poll
+        self._snapshots = {}
+
+        self._pending = set()
+        self._last_change = None
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, path, tag):
+        """
+        Watches a file, or a directory and everything below it. Call before ``start``.
+
+        :param string path: Path to watch. Need not exist yet
+        :param tag: Reported to the callback when the path changed, ex: the name of the function it belongs to
+        """
+
+        self._paths.setdefault(os.path.abspath(path), set()).add(tag)
+
+    def start(self):
+        """
+        Takes the first snapshot of all watched paths, and starts polling them in a background thread
+        """
+
+        for path in self._paths:
+            self._snapshots[path] = self._snapshot(path)
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="file-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops polling. Changes that were not reported yet are dropped.
+        """
+
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        """
+        Checks all watched paths once, and runs the callback if there are changes and no path changed for
+        ``debounce`` seconds
+
+        :return set: Tags reported to the callback. Empty, if nothing was reported
+        """
+
+        now = time.time()
+
+        for path, tags in self._paths.items():
+            snapshot = self._snapshot(path)
+            if snapshot != self._snapshots.get(path):
+                self._snapshots[path] = snapshot
+                self._pending.update(tags)
+                self._last_change = now
+
+        if not self._pending or now - self._last_change < self.debounce:
+            return set()
+
+        tags, self._pending = self._pending, set()
+        try:
+            self.callback(tags)
+        except Exception:  # pylint: disable=broad-except
+            # Keep watching. A failing callback must not stop later changes from being reported.
+            LOG.warning("Unable to handle changes of %s", sorted(tags), exc_info=True)
+
+        return tags
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def _snapshot(self, path):
+        """
+        :return dict: Path of every file below the given path to its (mtime, size). Empty, if the path does not exist
+        """
+
+        if os.path.isfile(path):
+            return {path: _stat(path)}
+
+        snapshot = {}
+        for root, dirs, names in os.walk(path):
+            for name in dirs:
+                if name in self._DEPENDENCY_DIRECTORIES:
+                    dir_path = os.path.join(root, name)
+                    snapshot[dir_path] = _stat(dir_path)
+
+            dirs[:] = [name for name in dirs
+                       if name not in self._IGNORED_DIRECTORIES and name not in self._DEPENDENCY_DIRECTORIES]
+
+            for name in names:
+                if name.endswith(self._IGNORED_SUFFIXES):
+                    continue
+
+                file_path = os.path.join(root, name)
+                snapshot[file_path] = _stat(file_path)
+
+        return snapshot
+
+
+def _stat(path):
+    try:
+        stats = os.stat(path)
+    except OSError:
+        # Removed while walking the directory. The next poll sees it gone.
+        return None
+
+    return stats.st_mtime_ns, stats.st_size
@@ -0,0 +1,207 @@
+"""
+Latency histogram with a fixed relative precision, in the style of HdrHistogram
+"""
+
+import math
+
+
+class LatencyHistogram(object):
+    """
+    Records latencies in buckets whose width grows with the value, so every recorded value is kept to within a fixed
+    relative precision, no matter whether it is a millisecond or a minute. Memory only grows with the range of the
+    values, not with their number, so a long benchmark can record every request.
+
+    Values are recorded in milliseconds and bucketed in microseconds. With 3 significant digits, the default, a
+    value is off by at most 0.1%.
+
+    ``write_percentiles`` writes the percentile distribution in the ``.hgrm`` format of HdrHistogram, so runs can be
+    compared with its plotting tools.
+    """
+
+    # Resolution of the recorded values, relative to milliseconds
+    _UNITS_PER_MS = 1000
+
+    def __init__(self, significant_digits=3):
+        """
+        :param int significant_digits: Number of significant decimal digits every value is kept to. Between 1 and 5
+        """
+
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+
+        self.significant_digits = significant_digits
+
+        # Values below the sub bucket count are recorded exactly. Above, every power of two is split in half as many
+        # buckets, which keeps their width within the precision.
+        self._sub_bucket_bits = int(math.ceil(math.log(2 * 10 ** significant_digits, 2)))
+
+        self._counts = {}
+        self.total_count = 0
+        self.min = None
+        self.max = None
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+
+    def record(self, value_ms, count=1):
+        """
+        Records a value
+
+        :param float value_ms: Value in milliseconds. Negative values are recorded as 0
+        :param int count: Optional. Number of times the value occurred. Defaults to 1
+        """
+
+        value_ms = max(value_ms, 0.0)
+        key = self._get_bucket(int(round(value_ms * self._UNITS_PER_MS)))
+        self._counts[key] = self._counts.get(key, 0) + count
+
+        self.total_count += count
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+        self._sum += value_ms * count
+        self._sum_of_squares += value_ms * value_ms * count
+
+    def merge(self, other):
+        """
+        Adds all values recorded by another histogram of the same precision to this one
+
+        :param LatencyHistogram other: Histogram to add
+        """
+
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Only histograms of the same precision can be merged")
+
+        for key, count in other._counts.items():  # pylint: disable=protected-access
+            self._counts[key] = self._counts.get(key, 0) + count
+
+        if other.total_count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+        self.total_count += other.total_count
+        self._sum += other._sum  # pylint: disable=protected-access
+        self._sum_of_squares += other._sum_of_squares  # pylint: disable=protected-access
+
+    @property
+    def mean(self):
+        """
+        :return float: Mean of the recorded values in milliseconds, exactly. None, if no value was recorded
+        """
+
+        return self._sum / self.total_count if self.total_count else None
+
+    @property
+    def stddev(self):
+        """
+        :return float: Standard deviation of the recorded values in milliseconds. None, if no value was recorded
+        """
+
+        if not self.total_count:
+            return None
+
+        variance = self._sum_of_squares / self.total_count - self.mean ** 2
+        return math.sqrt(max(variance, 0.0))
+
+    def get_value_at_percentile(self, percent):
+        """
+        Returns the highest value, within the precision, that the given percentage of the recorded values are below or
+        at. Never more than the highest value recorded.
+
+        :param float percent: Percentile between 0 and 100
+        :return float: Value in milliseconds. None, if no value was recorded
+        """
+
+        if not self.total_count:
+            return None
+
+        count_at_percentile = max(int(math.ceil(percent / 100.0 * self.total_count)), 1)
+
+        seen = 0
+        for key in sorted(self._counts):
+            seen += self._counts[key]
+            if seen >= count_at_percentile:
+                return min(self._get_highest_equivalent(key) / float(self._UNITS_PER_MS), self.max)
+
+        return self.max
+
+    def iter_percentiles(self, ticks_per_half_distance=5):
+        """
+        Iterates the percentile distribution like HdrHistogram does. Percentiles are reported in steps that get finer
+        the closer they get to 100%, ex: every 10% up to 50%, every 5% up to 75%, and so on.
+
+        :param int ticks_per_half_distance: Number of steps between a percentile and halfway to 100%
+        :return: Generator of (value_ms, percentile, total_count) tuples, with the percentile between 0 and 1
+        """
+
+        if not self.total_count:
+            return
+
+        buckets = sorted(self._counts)
+        cumulative = []
+        seen = 0
+        for key in buckets:
+            seen += self._counts[key]
+            cumulative.append(seen)
+
+        index = 0
+        level = 0.0
+        while True:
+            count_at_level = min(max(int(math.ceil(level / 100.0 * self.total_count)), 1), self.total_count)
+            while cumulative[index] < count_at_level:
+                index += 1
+
+            value = min(self._get_highest_equivalent(buckets[index]) / float(self._UNITS_PER_MS), self.max)
+
+            if cumulative[index] == self.total_count:
+                # Reached the highest value. HdrHistogram always ends the distribution at 100%.
+                yield value, 1.0, self.total_count
+                return
+
+            yield value, level / 100.0, cumulative[index]
+
+            # Halve the step every time the distance to 100% is halved
+            half_distance = int(math.floor(math.log(100.0 / (100.0 - level), 2))) + 1
+            level += 100.0 / (ticks_per_half_distance * 2 ** half_distance)
+
+    def write_percentiles(self, stream, ticks_per_half_distance=5):
+        """
+        Writes the percentile distribution in the ``.hgrm`` text format of HdrHistogram, with values in milliseconds
+
+        :param io.TextIOBase stream: Stream to write to
+        :param int ticks_per_half_distance: Number of steps between a percentile and halfway to 100%
+        """
+
+        header = u"{:>12} {:>14} {:>10} {:>14}\n\n"
+        stream.write(header.format("Value", "Percentile", "TotalCount", "1/(1-Percentile)"))
+
+        for value, percentile, total_count in self.iter_percentiles(ticks_per_half_distance):
+            if percentile < 1.0:
+                stream.write(u"{:12.3f} {:2.12f} {:10d} {:14.2f}\n".format(value, percentile, total_count,
+                                                                           1.0 / (1.0 - percentile)))
+            else:
+                stream.write(u"{:12.3f} {:2.12f} {:10d}\n".format(value, percentile, total_count))
+
+        mean, stddev, maximum = self.mean or 0.0, self.stddev or 0.0, self.max or 0.0
+        stream.write(u"#[Mean    = {:12.3f}, StdDeviation   = {:12.3f}]\n".format(mean, stddev))
+        stream.write(u"#[Max     = {:12.3f}, Total count    = {:12d}]\n".format(maximum, self.total_count))
+        sub_buckets = 2 ** self._sub_bucket_bits
+        stream.write(u"#[Buckets = {:12d}, SubBuckets     = {:12d}]\n".format(len(self._counts), sub_buckets))
+
+    def _get_bucket(self, value):
+        """
+        :return int: Lowest value of the bucket the given value falls in
+        """
+
+        shift = value.bit_length() - self._sub_bucket_bits
+        if shift <= 0:
+            return value
+        return (value >> shift) << shift
+
+    def _get_highest_equivalent(self, bucket):
+        """
+        :return int: Highest value that falls in the bucket starting at the given value
+        """
+
+        shift = bucket.bit_length() - self._sub_bucket_bits
+        if shift <= 0:
+            return bucket
+        return bucket + (1 << shift) - 1
@@ -0,0 +1,65 @@
+"""
+Statistics of latency samples
+"""
+
+import math
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the given percentile of the values, using the nearest-rank method. The result is always one of the values,
+    never an interpolation between two of them.
+        Ex: percentile([1, 2, 3, 4], 50) -> 2
+
+    Parameters
+    ----------
+    sorted_values : list
+        Values to compute the percentile of, sorted in ascending order
+    percent : float
+        Percentile to compute, between 0 and 100
+
+    Returns
+    -------
+    float
+        Value below or at which the given percentage of the values are. None, if there are no values
+    """
+
+    if not sorted_values:
+        return None
+
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(values, percents=(50, 90, 99)):
+    """
+    Summarizes the distribution of the given values
+
+    Parameters
+    ----------
+    values : list
+        Values to summarize, in any order
+    percents : tuple
+        Percentiles to include in the summary
+
+    Returns
+    -------
+    dict
+        Minimum as ``min``, maximum as ``max``, mean as ``mean`` and every percentile as ``p<percent>``, ex: ``p99``.
+        Empty, if there are no values
+    """
+
+    if not values:
+        return {}
+
+    sorted_values = sorted(values)
+    summary = {
+        "min": sorted_values[0],
+        "max": sorted_values[-1],
+        "mean": sum(sorted_values) / float(len(sorted_values)),
+    }
+
+    for percent in percents:
+        summary["p{}".format(percent)] = percentile(sorted_values, percent)
+
+    return summary
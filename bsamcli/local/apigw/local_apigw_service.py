@@ -1,14 +1,18 @@
 """API Gateway Local Service"""
-import io
 import json
 import logging
 import base64
+import time
 
-from flask import Flask, request
+from flask import Flask, request, g, current_app, has_app_context
 
-from bsamcli.local.services.base_local_service import BaseLocalService, LambdaOutputParser, CaseInsensitiveDict
-from bsamcli.local.lambdafn.exceptions import FunctionNotFound
-from bsamcli.local.events.api_event import ContextIdentity, RequestContext, ApiGatewayLambdaEvent
+from bsamcli.lib.utils.base64_stream import PayloadTooLargeError, encode_stream, encoded_size, decode_string, \
+    decoded_size
+from bsamcli.local.services.base_local_service import BaseLocalService, LambdaOutputStream, CaseInsensitiveDict
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound, FunctionThrottled
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler
+from bsamcli.local.events.api_event import ApiGatewayLambdaEventTemplate
+from .response_cache import CachedResponse
 from .service_error_responses import ServiceErrorResponses
 from .path_converter import PathConverter
 
@@ -17,18 +21,20 @@ LOG = logging.getLogger(__name__)
 
 class Route(object):
 
-    def __init__(self, methods, function_name, path, binary_types=None):
+    def __init__(self, methods, function_name, path, binary_types=None, cache_ttl=None):
         """
         Creates an ApiGatewayRoute
 
         :param list(str) methods: List of HTTP Methods
         :param function_name: Name of the Lambda function this API is connected to
         :param str path: Path off the base url
+        :param int cache_ttl: Optional. Seconds successful responses of this route are cached for. Not cached by default
         """
         self.methods = methods
         self.function_name = function_name
         self.path = path
         self.binary_types = binary_types or []
+        self.cache_ttl = cache_ttl
 
 
 class LocalApigwService(BaseLocalService):
@@ -36,7 +42,25 @@ class LocalApigwService(BaseLocalService):
     _DEFAULT_PORT = 3000
     _DEFAULT_HOST = '127.0.0.1'
 
-    def __init__(self, routing_list, lambda_runner, static_dir=None, port=None, host=None, stderr=None):
+    # Key of the routes in the extensions of the Flask application
+    _ROUTES_EXTENSION = "bsam_routes"
+
+    # (Flask endpoint, HTTP method) to the template of the events of the route. Routes are the same for every
+    # service, as the endpoint is the path of the route, so this is shared.
+    _event_templates = {}
+
+    # CFC limits the payload of a synchronous invoke, and the response of the function, to 6 MB
+    _MAX_REQUEST_PAYLOAD_SIZE = 6 * 1024 * 1024
+    _MAX_RESPONSE_PAYLOAD_SIZE = 6 * 1024 * 1024
+
+    # Bodies without a Content-Length are read this many bytes at once
+    _READ_CHUNK_SIZE = 64 * 1024
+
+    # Serves the stats of the response cache while the service runs. Routes of the API take precedence.
+    RESPONSE_CACHE_PATH = '/local/response-cache'
+
+    def __init__(self, routing_list, lambda_runner, static_dir=None, port=None, host=None, stderr=None,
+                 scheduler=None, recorder=None, response_cache=None, cache_key_headers=None, server=None):
         """
         Creates an ApiGatewayService
 
@@ -50,37 +74,96 @@ class LocalApigwService(BaseLocalService):
         :param str host: Optional. host to start the service on
           Defaults to '127.0.0.1
         :param io.BaseIO stderr: Optional stream where the stderr from Docker container should be written to
+        :param bsamcli.local.services.invoke_scheduler.InvokeScheduler scheduler: Optional. Limits the number of
+            concurrent invokes. Defaults to no limits
+        :param bsamcli.local.apigw.traffic_recorder.TrafficRecorder recorder: Optional. Records every request and its
+            response
+        :param bsamcli.local.apigw.response_cache.ResponseCache response_cache: Optional. Cache for the responses of
+            routes with a cache TTL. Nothing is cached without it
+        :param list(str) cache_key_headers: Optional. Names of the request headers that are part of the cache key, in
+            addition to the method, path and query string
+        :param bsamcli.local.services.server.PooledServer server: Optional. Server to run on. Defaults to Flask's
+            development server
         """
-        super(LocalApigwService, self).__init__(lambda_runner.is_debugging(), port=port, host=host)
+        super(LocalApigwService, self).__init__(lambda_runner.is_debugging(), port=port, host=host, server=server)
         self.routing_list = routing_list
         self.lambda_runner = lambda_runner
         self.static_dir = static_dir
         self._dict_of_routes = {}
         self.stderr = stderr
+        self.scheduler = scheduler or InvokeScheduler()
+        self.recorder = recorder
+        self.response_cache = response_cache
+        self.cache_key_headers = cache_key_headers or []
 
     def create(self):
         """
         Creates a Flask Application that can be started.
         """
 
-        self._app = Flask(__name__,
-                          static_url_path="",  # Mount static files at root '/'
-                          static_folder=self.static_dir  # Serve static files from this directory
-                          )
+        self._app = self._create_app(self.routing_list)
+        self._dict_of_routes = self._app.extensions[self._ROUTES_EXTENSION]
 
-        for api_gateway_route in self.routing_list:
+    def update_routes(self, routing_list):
+        """
+        Replaces the routes of the running service, ex: after the template changed. The new routes are set up
+        completely before they are swapped in at once, so every request is served either by the old or by the new
+        routes. Requests in flight finish on the routes they started on.
+
+        :param list(Route) routing_list: Routes to serve from now on
+        """
+
+        app = self._create_app(routing_list)
+
+        self.routing_list = routing_list
+        self._dict_of_routes = app.extensions[self._ROUTES_EXTENSION]
+
+        # The server keeps calling the application it was started with, which hands every request to its wsgi_app
+        self._app.wsgi_app = app.wsgi_app
+
+    def _create_app(self, routing_list):
+        """
+        Creates a Flask Application serving the given routes. The routes are kept in the extensions of the
+        application, so a request is always matched against the routes of the application that serves it.
+
+        :param list(Route) routing_list: Routes to serve
+        :return flask.Flask: Application
+        """
+
+        app = Flask(__name__,
+                    static_url_path="",  # Mount static files at root '/'
+                    static_folder=self.static_dir  # Serve static files from this directory
+                    )
+
+        dict_of_routes = {}
+        for api_gateway_route in routing_list:
             path = PathConverter.convert_path_to_flask(api_gateway_route.path)
             for route_key in self._generate_route_keys(api_gateway_route.methods,
                                                        path):
-                self._dict_of_routes[route_key] = api_gateway_route
+                dict_of_routes[route_key] = api_gateway_route
+
+            app.add_url_rule(path,
+                             endpoint=path,
+                             view_func=self._request_handler,
+                             methods=api_gateway_route.methods,
+                             provide_automatic_options=False)
+
+        if self.RESPONSE_CACHE_PATH not in app.view_functions:
+            app.add_url_rule(self.RESPONSE_CACHE_PATH,
+                             endpoint=self.RESPONSE_CACHE_PATH,
+                             view_func=self._response_cache_handler,
+                             methods=['GET'],
+                             provide_automatic_options=False)
+
+        app.extensions[self._ROUTES_EXTENSION] = dict_of_routes
 
-            self._app.add_url_rule(path,
-                                   endpoint=path,
-                                   view_func=self._request_handler,
-                                   methods=api_gateway_route.methods,
-                                   provide_automatic_options=False)
+        self._construct_error_handling(app)
 
-        self._construct_error_handling()
+        if self.recorder:
+            app.before_request(self._start_recording)
+            app.after_request(self._record_exchange)
+
+        return app
 
     def _generate_route_keys(self, methods, path):
         """
@@ -98,16 +181,63 @@ class LocalApigwService(BaseLocalService):
     def _route_key(method, path):
         return '{}:{}'.format(path, method)
 
-    def _construct_error_handling(self):
+    @staticmethod
+    def _construct_error_handling(app):
         """
         Updates the Flask app with Error Handlers for different Error Codes
+
+        :param flask.Flask app: Application to update
         """
         # Both path and method not present
-        self._app.register_error_handler(404, ServiceErrorResponses.route_not_found)
+        app.register_error_handler(404, ServiceErrorResponses.route_not_found)
         # Path is present, but method not allowed
-        self._app.register_error_handler(405, ServiceErrorResponses.route_not_found)
+        app.register_error_handler(405, ServiceErrorResponses.route_not_found)
         # Something went wrong
-        self._app.register_error_handler(500, ServiceErrorResponses.lambda_failure_response)
+        app.register_error_handler(500, ServiceErrorResponses.lambda_failure_response)
+
+    @staticmethod
+    def _start_recording():
+        """
+        Remembers when the current request arrived, so its duration can be recorded
+        """
+        g.recording_started_at = time.time()
+        g.recording_start = time.perf_counter()
+
+    def _record_exchange(self, response):
+        """
+        Records the current request along with the given response. Streamed responses, ex: static files, are recorded
+        without their body, so they don't have to be read into memory.
+
+        :param flask.Response response: Response to the current request
+        :return flask.Response: The given response, unchanged
+        """
+        duration_ms = (time.perf_counter() - g.recording_start) * 1000
+
+        response_body = None
+        if not (response.direct_passthrough or response.is_streamed):
+            response_body = response.get_data()
+
+        self.recorder.record(timestamp=g.recording_started_at,
+                             method=request.method,
+                             path=request.full_path if request.query_string else request.path,
+                             headers=dict(request.headers),
+                             body=self._get_recorded_body(),
+                             status=response.status_code,
+                             response_headers=dict(response.headers),
+                             response_body=response_body,
+                             duration_ms=duration_ms)
+        return response
+
+    @staticmethod
+    def _get_recorded_body():
+        """
+        :return bytes: Body of the current request. Empty, if it has no Content-Length and was not read for an invoke
+        """
+        if request.content_length is not None:
+            return request.get_data()
+
+        # Such a body is read only up to the payload limit, see _read_body
+        return g.get("request_body", b"")
 
     def _request_handler(self, **kwargs):
         """
@@ -119,7 +249,8 @@ class LocalApigwService(BaseLocalService):
         * If we don't find the function, we will throw a 502 (just like the 404 and 405 responses we get
           from Flask.
         * Since we found a Lambda function to invoke, we construct the Lambda Event from the request
-        * Then Invoke the Lambda function (docker container)
+        * Then Invoke the Lambda function (docker container), once the scheduler has a concurrency slot for it. If
+          it does not, we return a 429 like API Gateway does when throttled
         * We then transform the response or errors we get from the Invoke and return the data back to
           the caller
 
@@ -129,23 +260,52 @@ class LocalApigwService(BaseLocalService):
         """
         route = self._get_current_route(request)
 
+        cache_key = None
+        if route.cache_ttl and self.response_cache:
+            cache_key = self._cache_key(request, route, self.cache_key_headers)
+
+            # Like on API Gateway, "Cache-Control: max-age=0" skips the cache. The new response replaces the cached one.
+            if request.headers.get("Cache-Control", "").replace(" ", "").lower() != "max-age=0":
+                cached = self.response_cache.get(cache_key)
+                if cached:
+                    headers = CaseInsensitiveDict(cached.headers)
+                    headers["X-Cache"] = "Hit from bsam"
+                    return self.service_response(cached.body, headers, cached.status_code)
+
         try:
-            event = self._construct_event(request, self.port, route.binary_types)
+            # The recorder needs the body of the request after the invoke. Otherwise it is read in chunks.
+            event = self._construct_event(request, self.port, route.binary_types, stream_body=not self.recorder)
         except UnicodeDecodeError:
             return ServiceErrorResponses.lambda_failure_response()
+        except PayloadTooLargeError as ex:
+            LOG.error("Unable to invoke %s: %s", route.function_name, ex)
+            return ServiceErrorResponses.request_too_large()
 
-        stdout_stream = io.BytesIO()
+        stdout_stream = LambdaOutputStream()
 
         try:
-            self.lambda_runner.invoke(route.function_name, event, stdout=stdout_stream, stderr=self.stderr)
-        except FunctionNotFound:
-            return ServiceErrorResponses.lambda_not_found_response()
-
-        lambda_response, lambda_logs, _ = LambdaOutputParser.get_lambda_output(stdout_stream)
-
-        if self.stderr and lambda_logs:
-            # Write the logs to stderr if available.
-            self.stderr.write(lambda_logs)
+            try:
+                with self.scheduler.slot(route.function_name):
+                    self.lambda_runner.invoke(route.function_name, event, stdout=stdout_stream, stderr=self.stderr)
+            except FunctionNotFound:
+                return ServiceErrorResponses.lambda_not_found_response()
+            except FunctionThrottled:
+                return ServiceErrorResponses.lambda_throttled_response()
+
+            if self.stderr and stdout_stream.has_logs:
+                # Write the logs to stderr if available.
+                stdout_stream.write_logs(self.stderr)
+
+            if stdout_stream.response_size > self._MAX_RESPONSE_PAYLOAD_SIZE:
+                LOG.error("Function returned a response of %d bytes, which is more than the %d bytes allowed",
+                          stdout_stream.response_size, self._MAX_RESPONSE_PAYLOAD_SIZE)
+                return ServiceErrorResponses.lambda_failure_response()
+
+            # The response of API Gateway is inside of the JSON the function returns. Only this last line of the
+            # output is read into memory to parse it.
+            lambda_response = stdout_stream.read_response().decode('utf-8')
+        finally:
+            stdout_stream.close()
 
         try:
             (status_code, headers, body) = self._parse_lambda_output(lambda_response,
@@ -156,8 +316,30 @@ class LocalApigwService(BaseLocalService):
                       "statusCode in the response object). Response received: %s", lambda_response)
             return ServiceErrorResponses.lambda_failure_response()
 
+        if (cache_key or self.recorder) and not isinstance(body, (str, bytes)):
+            # The body is decoded from base64 while it is sent. Cached and recorded responses need all of it.
+            body = b"".join(body)
+
+        if cache_key:
+            # Only successful responses are cached, so an error is not served again after it was fixed
+            if 200 <= status_code < 300:
+                self.response_cache.put(cache_key, route.cache_ttl, CachedResponse(status_code, dict(headers), body),
+                                        tag=route.function_name)
+            headers["X-Cache"] = "Miss from bsam"
+
         return self.service_response(body, headers, status_code)
 
+    def _response_cache_handler(self):
+        """
+        Returns the state of the response cache, see ``ResponseCache.stats``
+
+        :return: A Flask Response with the state as JSON. 403, like a missing route, if there is no cache
+        """
+        if not self.response_cache:
+            return ServiceErrorResponses.route_not_found()
+
+        return self.service_response(json.dumps(self.response_cache.stats), {'Content-Type': 'application/json'}, 200)
+
     def _get_current_route(self, flask_request):
         """
         Get the route (Route) based on the current request
@@ -168,8 +350,11 @@ class LocalApigwService(BaseLocalService):
         endpoint = flask_request.endpoint
         method = flask_request.method
 
+        # Routes of the application serving the request. The routes of the service may have been swapped since.
+        dict_of_routes = current_app.extensions[self._ROUTES_EXTENSION] if has_app_context() else self._dict_of_routes
+
         route_key = self._route_key(method, endpoint)
-        route = self._dict_of_routes.get(route_key, None)
+        route = dict_of_routes.get(route_key, None)
 
         if not route:
             LOG.debug("Lambda function for the route not found. This should not happen because Flask is "
@@ -179,6 +364,27 @@ class LocalApigwService(BaseLocalService):
 
         return route
 
+    @staticmethod
+    def _cache_key(flask_request, route, key_headers):
+        """
+        Returns the key the response to the request is cached under. Requests with the same method, path, query string
+        and values of the key headers get the same response. The response of a route with binary media types depends
+        on the Accept header too, so it is always part of their key.
+
+        :param request flask_request: Flask Request
+        :param Route route: Route of the request
+        :param list(str) key_headers: Names of the request headers that are part of the key
+        :return tuple: Cache key
+        """
+        query_string = tuple(sorted(LocalApigwService._query_string_params(flask_request).items()))
+
+        header_names = list(key_headers)
+        if route.binary_types:
+            header_names.append("Accept")
+        headers = tuple((name.lower(), flask_request.headers.get(name)) for name in header_names)
+
+        return flask_request.method, flask_request.path, query_string, headers
+
     # Consider moving this out to its own class. Logic is started to get dense and looks messy @jfuss
     @staticmethod
     def _parse_lambda_output(lambda_output, binary_types, flask_request):
@@ -186,7 +392,8 @@ class LocalApigwService(BaseLocalService):
         Parses the output from the Lambda Container
 
         :param str lambda_output: Output from Lambda Invoke
-        :return: Tuple(int, dict, str, bool)
+        :return: Tuple(int, dict, str, bool). A body the function encoded with base64 is decoded while it is sent,
+            so it is an iterator over chunks of bytes then
         """
         json_output = json.loads(lambda_output)
 
@@ -209,7 +416,11 @@ class LocalApigwService(BaseLocalService):
             headers["Content-Type"] = "application/json"
 
         if LocalApigwService._should_base64_decode_body(binary_types, flask_request, headers, is_base_64_encoded):
-            body = base64.b64decode(body)
+            size = decoded_size(body)
+            if size is not None and "Content-Length" not in headers:
+                # Streamed out without Content-Length otherwise
+                headers["Content-Length"] = str(size)
+            body = decode_string(body)
 
         return status_code, headers, body
 
@@ -240,38 +451,78 @@ class LocalApigwService(BaseLocalService):
         return best_match_mimetype and is_best_match_in_binary_types and is_base_64_encoded
 
     @staticmethod
-    def _construct_event(flask_request, port, binary_types):
+    def _read_body(flask_request, limit):
+        """
+        Reads the body of the request. A body without a Content-Length, ex: a chunked one, is read from the stream of
+        the request only until it is larger than the limit. As the request does not return it again, it is kept for
+        the traffic recorder.
+
+        :param request flask_request: Flask Request
+        :param int limit: Maximum number of bytes of a body without a Content-Length
+        :return bytes: Body of the request
+        :raises PayloadTooLargeError: If the body is larger than the limit. The stream is not read any further then
+        """
+
+        if flask_request.content_length is not None:
+            # Checked against the limit before
+            return flask_request.get_data()
+
+        chunks = []
+        size = 0
+        while True:
+            chunk = flask_request.stream.read(LocalApigwService._READ_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > limit:
+                raise PayloadTooLargeError("Body is larger than {} bytes".format(limit))
+            chunks.append(chunk)
+
+        body = b"".join(chunks)
+        if has_app_context():
+            g.request_body = body
+        return body
+
+    @staticmethod
+    def _construct_event(flask_request, port, binary_types, stream_body=False):
         """
         Helper method that constructs the Event to be passed to Lambda
 
         :param request flask_request: Flask Request
+        :param bool stream_body: Optional. Read a binary body from the stream of the request, and encode it to base64
+            in chunks. The body of the request cannot be read again afterwards
         :return: String representing the event
+        :raises PayloadTooLargeError: If the event is larger than a function can be invoked with. A request with a
+            Content-Length is rejected before its body is read, any other body is read only up to the limit
         """
 
-        identity = ContextIdentity(source_ip=flask_request.remote_addr)
-
-        endpoint = PathConverter.convert_path_to_api_gateway(flask_request.endpoint)
         method = flask_request.method
-
-        request_data = flask_request.get_data()
+        max_size = LocalApigwService._MAX_REQUEST_PAYLOAD_SIZE
 
         request_mimetype = flask_request.mimetype
 
         is_base_64 = LocalApigwService._should_base64_encode(binary_types, request_mimetype)
 
+        content_length = flask_request.content_length
+        if content_length is not None:
+            body_size = encoded_size(content_length) if is_base_64 else content_length
+            if body_size > max_size:
+                raise PayloadTooLargeError("Body of {} bytes is larger than {} bytes".format(body_size, max_size))
+
         if is_base_64:
             LOG.debug("Incoming Request seems to be binary. Base64 encoding the request data before sending to Lambda.")
-            request_data = base64.b64encode(request_data)
-
-        if request_data:
-            # Flask does not parse/decode the request data. We should do it ourselves
-            request_data = request_data.decode('utf-8')
-
-        context = RequestContext(resource_path=endpoint,
-                                 http_method=method,
-                                 stage="prod",
-                                 identity=identity,
-                                 path=endpoint)
+            if stream_body:
+                request_data = encode_stream(flask_request.stream, limit=max_size)
+            else:
+                # Bytes whose base64 fits into the limit
+                request_data = LocalApigwService._read_body(flask_request, max_size // 4 * 3)
+                request_data = base64.b64encode(request_data).decode('ascii')
+        else:
+            request_data = LocalApigwService._read_body(flask_request, max_size)
+            if request_data:
+                # Flask does not parse/decode the request data. We should do it ourselves
+                request_data = request_data.decode('utf-8')
 
         event_headers = dict(flask_request.headers)
         event_headers["X-Forwarded-Proto"] = flask_request.scheme
@@ -282,20 +533,46 @@ class LocalApigwService(BaseLocalService):
         # with APIGW
         query_string_dict = LocalApigwService._query_string_params(flask_request)
 
-        event = ApiGatewayLambdaEvent(http_method=method,
-                                      body=request_data,
-                                      resource=endpoint,
-                                      request_context=context,
-                                      query_string_params=query_string_dict,
-                                      headers=event_headers,
-                                      path_parameters=flask_request.view_args,
-                                      path=flask_request.path,
-                                      is_base_64_encoded=is_base_64)
-
-        event_str = json.dumps(event.to_dict())
+        template = LocalApigwService._get_event_template(flask_request.endpoint, method)
+
+        event_str = template.to_json(body=request_data,
+                                     query_string_params=query_string_dict,
+                                     headers=event_headers,
+                                     path_parameters=flask_request.view_args,
+                                     path=flask_request.path,
+                                     is_base_64_encoded=is_base_64,
+                                     source_ip=flask_request.remote_addr)
+
+        # The event is ASCII, non ASCII characters are escaped. Its length is its size in bytes.
+        if len(event_str) > max_size:
+            raise PayloadTooLargeError("Event of {} bytes is larger than {} bytes".format(len(event_str), max_size))
+
         LOG.debug("Constructed String representation of Event to invoke Lambda. Event: %s", event_str)
         return event_str
 
+    @staticmethod
+    def _get_event_template(endpoint, method):
+        """
+        Returns the template of the events of a route. It is created on the first request of the route, and reused
+        for the following ones, so they don't have to convert the path and serialize the request context again.
+
+        :param str endpoint: Flask endpoint of the route, ie. its path as defined in Flask
+        :param str method: HTTP method of the request
+        :return ApiGatewayLambdaEventTemplate: Template of the events
+        """
+
+        key = (endpoint, method)
+        template = LocalApigwService._event_templates.get(key)
+
+        if not template:
+            # Created twice at worst, when two threads serve the first requests of a route at the same time
+            template = ApiGatewayLambdaEventTemplate(http_method=method,
+                                                     resource=PathConverter.convert_path_to_api_gateway(endpoint),
+                                                     stage="prod")
+            LocalApigwService._event_templates[key] = template
+
+        return template
+
     @staticmethod
     def _query_string_params(flask_request):
         """
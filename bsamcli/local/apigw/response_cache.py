@@ -0,0 +1,153 @@
+"""
+Cache of responses of the local API Gateway service
+"""
+
+import collections
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+CachedResponse = collections.namedtuple("CachedResponse", ["status_code", "headers", "body"])
+
+
+class ResponseCache(object):
+    """
+    Keeps responses of functions for a while, so repeated requests to a cached route are answered without invoking the
+    function again, like the cache of an API Gateway stage. Entries expire after the TTL of their route. When the
+    cache grows beyond ``max_bytes``, the least recently used entries are evicted. This class is thread-safe.
+    """
+
+    # Size of the bodies of all entries together, if not given
+    _DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=None):
+        """
+        Parameters
+        ----------
+        max_bytes int
+            Optional. Maximum size of the bodies of all cached responses together. Defaults to 64 MB
+        """
+        self.max_bytes = max_bytes or self._DEFAULT_MAX_BYTES
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Key to (expires_at, size, CachedResponse, tag), least recently used first
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached response for the given key, and counts a hit or a miss
+
+        Parameters
+        ----------
+        key tuple
+            Key of the request, ex: as returned by ``LocalApigwService._cache_key``
+
+        Returns
+        -------
+        CachedResponse
+            The cached response, or None if there is none or it expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+
+            if not entry:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, ttl, response, tag=None):
+        """
+        Caches a response for the given number of seconds. Responses larger than the whole cache are not cached.
+
+        Parameters
+        ----------
+        key tuple
+            Key of the request
+        ttl int
+            Seconds to keep the response for
+        response CachedResponse
+            Response to cache. The body must be bytes or str
+        tag
+            Optional. Groups responses to remove together with ``clear``, ex: the name of the function that returned
+            the response
+        """
+        size = len(response.body or b"")
+        if size > self.max_bytes or ttl <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.time() + ttl, size, response, tag)
+            self._size += size
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self, tag=None):
+        """
+        Removes cached responses, ex: when the code of a function changed
+
+        Parameters
+        ----------
+        tag
+            Optional. Removes only the responses cached with this tag. Defaults to removing all responses
+        """
+        with self._lock:
+            if tag is None:
+                self._entries.clear()
+                self._size = 0
+                return
+
+            for key in [key for key, entry in self._entries.items() if entry[3] == tag]:
+                self._remove(key)
+
+    @property
+    def stats(self):
+        """
+        Returns
+        -------
+        dict
+            Number of hits, misses and evictions so far, along with the number and size of the cached responses
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _evict(self):
+        """
+        Removes expired entries, then the least recently used ones until the cache fits into ``max_bytes`` again
+        """
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            self._remove(key)
+
+        while self._size > self.max_bytes:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[1]
+        self._size -= size
@@ -0,0 +1,108 @@
+"""
+Records the HTTP traffic of the local API Gateway service
+"""
+
+import base64
+import io
+import json
+import logging
+import threading
+
+LOG = logging.getLogger(__name__)
+
+
+class TrafficRecorder(object):
+    """
+    Appends every request served, along with its response and how long it took, to a file as JSON lines. The file can
+    be replayed against the service later with ``bsam local replay``. Safe to use from several threads.
+
+    Every line is an object with these keys:
+
+    * ``timestamp``: Unix time the request arrived at, in seconds
+    * ``method``, ``path`` (including the query string), ``headers`` and ``body`` of the request
+    * ``status``, ``response_headers`` and ``response_body`` of the response. The body of a streamed response is
+      not recorded and null
+    * ``duration_ms``: Milliseconds it took to serve the request
+    * ``is_base64_encoded`` and ``response_is_base64_encoded``: True, if the body was not UTF-8 text and is
+      recorded base64 encoded
+    """
+
+    def __init__(self, path):
+        """
+        :param string path: Path of the file to append to. Created if it does not exist
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, timestamp, method, path, headers, body, status, response_headers, response_body, duration_ms):
+        """
+        Appends one request and its response
+
+        :param float timestamp: Unix time the request arrived at
+        :param string method: HTTP method of the request
+        :param string path: Path of the request, including the query string
+        :param dict headers: Headers of the request
+        :param bytes body: Body of the request
+        :param int status: Status code of the response
+        :param dict response_headers: Headers of the response
+        :param bytes response_body: Body of the response. None, if it was not recorded
+        :param float duration_ms: Milliseconds it took to serve the request
+        """
+
+        request_body, is_base64_encoded = _encode_body(body)
+        response_body, response_is_base64_encoded = _encode_body(response_body)
+
+        line = json.dumps({
+            "timestamp": timestamp,
+            "method": method,
+            "path": path,
+            "headers": headers,
+            "body": request_body,
+            "is_base64_encoded": is_base64_encoded,
+            "status": status,
+            "response_headers": response_headers,
+            "response_body": response_body,
+            "response_is_base64_encoded": response_is_base64_encoded,
+            "duration_ms": round(duration_ms, 3),
+        })
+
+        try:
+            with self._lock:
+                with io.open(self.path, 'a', encoding='utf-8') as fp:
+                    fp.write(line + u"\n")
+        except (IOError, OSError) as ex:
+            # Serving the request matters more than recording it
+            LOG.warning("Unable to record request to %s: %s", self.path, ex)
+
+
+def decode_body(body, is_base64_encoded):
+    """
+    Reverses the encoding of a recorded body
+
+    :param string body: Recorded body. May be None
+    :param bool is_base64_encoded: Was the body recorded base64 encoded?
+    :return bytes: Body as it was sent
+    """
+
+    if body is None:
+        return None
+
+    if is_base64_encoded:
+        return base64.b64decode(body)
+
+    return body.encode('utf-8')
+
+
+def _encode_body(body):
+    """
+    :return tuple: (body, is_base64_encoded). The body is text, or base64 if it is not UTF-8 text
+    """
+
+    if body is None:
+        return None, False
+
+    try:
+        return body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode('ascii'), True
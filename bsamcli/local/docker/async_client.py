@@ -0,0 +1,505 @@
+"""
+Client of the Docker Engine API that talks to the daemon over its Unix socket with asyncio
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shlex
+import struct
+from urllib.parse import quote, urlencode
+
+LOG = logging.getLogger(__name__)
+
+_DEFAULT_BASE_URL = "unix:///var/run/docker.sock"
+
+# Header of a frame of multiplexed container output: stream type, 3 bytes padding and payload size
+_FRAME_HEADER = struct.Struct('>BxxxL')
+
+# Options of the Docker SDK's ``containers.create`` that map one to one to a field of the HostConfig
+_HOST_CONFIG_OPTIONS = {
+    "cpu_period": "CpuPeriod",
+    "cpu_quota": "CpuQuota",
+    "network": "NetworkMode",
+    "init": "Init",
+    "tmpfs": "Tmpfs",
+    "security_opt": "SecurityOpt",
+    "cap_add": "CapAdd",
+}
+
+_MEMORY_UNITS = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+class AsyncDockerClient(object):
+    """
+    Minimal Docker Engine API client for asyncio. It covers what running a function takes: checking and pulling
+    images, creating, starting, attaching to, waiting for and removing containers. Waiting on the daemon does not
+    block a thread, so a single event loop can drive many containers at once.
+
+    Connections are kept open and reused for the next request. Attaching to a container takes a connection of its
+    own, which is closed once the output ends. Use the client from one event loop only.
+    """
+
+    # Version of the Engine API requests are made against. Docker 17.12 and later support it.
+    API_VERSION = "1.35"
+
+    _DEFAULT_MAX_IDLE_CONNECTIONS = 32
+
+    def __init__(self, base_url=None, api_version=None, max_idle_connections=None):
+        """
+        :param string base_url: Optional. Address of the Docker daemon, ex: unix:///var/run/docker.sock. Defaults to
+            ``DOCKER_HOST``, or the default socket if it is not set
+        :param string api_version: Optional. Version of the Engine API to use
+        :param int max_idle_connections: Optional. Number of idle connections kept open for reuse
+        :raise ValueError: If the daemon does not listen on a Unix socket
+        """
+
+        base_url = base_url or os.environ.get("DOCKER_HOST") or _DEFAULT_BASE_URL
+        if not base_url.startswith("unix://"):
+            raise ValueError("Only Docker daemons listening on a Unix socket are supported, not {}".format(base_url))
+
+        self.socket_path = base_url[len("unix://"):]
+        self.api_version = api_version or self.API_VERSION
+        self.max_idle_connections = max_idle_connections or self._DEFAULT_MAX_IDLE_CONNECTIONS
+
+        self._idle_connections = []
+
+    async def ping(self):
+        """
+        :return bool: True, if the daemon responds
+        """
+        await self.request("GET", "/_ping")
+        return True
+
+    async def inspect_image(self, image_name):
+        """
+        :param string image_name: Name of the image
+        :return dict: Attributes of the image
+        :raise AsyncDockerNotFound: If the image is not available locally
+        """
+        return await self.request("GET", "/images/{}/json".format(_quote(image_name)))
+
+    async def pull_image(self, image_name):
+        """
+        Pulls the image from its registry, yielding the progress messages of the daemon as they arrive
+
+        :param string image_name: Name of the image, with an optional tag
+        :return: Async iterator of decoded progress messages
+        """
+        repository, tag = _parse_repository_tag(image_name)
+        params = {"fromImage": repository, "tag": tag or "latest"}
+
+        async for message in self._stream_json("POST", "/images/create", params=params):
+            yield message
+
+    async def create_container(self, image_name, options, name=None):
+        """
+        :param string image_name: Image to create the container from
+        :param dict options: Options of the container, as keyword arguments of the Docker SDK's
+            ``containers.create``. See ``Container.get_create_options``
+        :param string name: Optional. Name of the container
+        :return string: ID of the created container
+        """
+        params = {"name": name} if name else None
+        result = await self.request("POST", "/containers/create", params=params,
+                                    body=_get_create_config(image_name, options))
+
+        for warning in result.get("Warnings") or []:
+            LOG.debug("Docker warned creating a container of %s: %s", image_name, warning)
+
+        return result["Id"]
+
+    async def connect_network(self, network_id, container_id):
+        await self.request("POST", "/networks/{}/connect".format(_quote(network_id)),
+                           body={"Container": container_id})
+
+    async def start_container(self, container_id):
+        await self.request("POST", "/containers/{}/start".format(_quote(container_id)))
+
+    async def wait_container(self, container_id):
+        """
+        Waits for the container to exit
+
+        :return int: Exit code of the container
+        """
+        result = await self.request("POST", "/containers/{}/wait".format(_quote(container_id)))
+        return result.get("StatusCode")
+
+    async def remove_container(self, container_id, force=True):
+        """
+        :param string container_id: ID of the container
+        :param bool force: Optional. Remove the container even if it is running
+        """
+        await self.request("DELETE", "/containers/{}".format(_quote(container_id)),
+                           params={"force": int(bool(force))})
+
+    async def attach(self, container_id, logs=False):
+        """
+        Attaches to stdout and stderr of the container. Attach before starting the container to receive all of its
+        output.
+
+        :param string container_id: ID of the container
+        :param bool logs: Optional. Also receive output the container wrote before attaching
+        :return AttachedOutput: Output of the container. Close it when done
+        """
+
+        reader, writer = await self._connect()
+
+        try:
+            params = {"stdout": 1, "stderr": 1, "stream": 1, "logs": int(bool(logs))}
+            await self._send(writer, "POST", "/containers/{}/attach".format(_quote(container_id)), params, None,
+                             upgrade=True)
+            status, headers = await _read_head(reader)
+
+            if status not in (101, 200):
+                _raise_for_status(status, await _read_body(reader, headers, status))
+        except BaseException:
+            writer.close()
+            raise
+
+        return AttachedOutput(reader, writer)
+
+    async def request(self, method, path, params=None, body=None):
+        """
+        Sends a request to the Engine API and reads the whole response
+
+        :param string method: HTTP method
+        :param string path: Path of the API, without the version
+        :param dict params: Optional. Query parameters
+        :param body: Optional. Request body, sent as JSON
+        :return: Decoded JSON response. Raw bytes, if the response is not JSON
+        :raise AsyncDockerAPIError: If the daemon responds with an error
+        """
+
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+
+        reader, writer, reused = await self._get_connection()
+        try:
+            try:
+                await self._send(writer, method, path, params, data)
+                status, headers = await _read_head(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+
+                # The daemon closed the idle connection in the meantime. Try once more on a new one.
+                LOG.debug("Idle connection to the Docker daemon was closed. Reconnecting")
+                writer.close()
+                reader, writer = await self._connect()
+                await self._send(writer, method, path, params, data)
+                status, headers = await _read_head(reader)
+
+            payload = await _read_body(reader, headers, status)
+        except BaseException:
+            writer.close()
+            raise
+
+        self._release(reader, writer, headers)
+
+        _raise_for_status(status, payload)
+
+        if payload and headers.get("content-type", "").startswith("application/json"):
+            return json.loads(payload.decode('utf-8'))
+
+        return payload
+
+    async def close(self):
+        """
+        Closes the idle connections
+        """
+        connections, self._idle_connections = self._idle_connections, []
+        for _, writer in connections:
+            writer.close()
+
+    async def _stream_json(self, method, path, params=None):
+        """
+        Sends a request and decodes the response as a stream of JSON messages, one per line, as they arrive
+        """
+
+        reader, writer = await self._connect()
+
+        try:
+            await self._send(writer, method, path, params, None)
+            status, headers = await _read_head(reader)
+
+            if status >= 400:
+                _raise_for_status(status, await _read_body(reader, headers, status))
+
+            pending = b""
+            async for chunk in _iter_body(reader, headers, status):
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line.decode('utf-8'))
+
+            if pending.strip():
+                yield json.loads(pending.decode('utf-8'))
+        finally:
+            writer.close()
+
+    async def _get_connection(self):
+        """
+        :return tuple: Reader, writer and whether the connection was used before
+        """
+        while self._idle_connections:
+            reader, writer = self._idle_connections.pop()
+            if not reader.at_eof():
+                return reader, writer, True
+
+            writer.close()
+
+        reader, writer = await self._connect()
+        return reader, writer, False
+
+    async def _connect(self):
+        return await asyncio.open_unix_connection(self.socket_path)
+
+    def _release(self, reader, writer, headers):
+        """
+        Keeps the connection for the next request, unless the daemon is going to close it
+        """
+        if headers.get("connection", "").lower() == "close" or reader.at_eof() or \
+                len(self._idle_connections) >= self.max_idle_connections:
+            writer.close()
+            return
+
+        self._idle_connections.append((reader, writer))
+
+    async def _send(self, writer, method, path, params, data, upgrade=False):
+        url = "/v{}{}".format(self.api_version, path)
+        if params:
+            url += "?" + urlencode(params)
+
+        lines = ["{} {} HTTP/1.1".format(method, url),
+                 "Host: docker",
+                 "User-Agent: bsam-cli"]
+
+        if data is not None:
+            lines.append("Content-Type: application/json")
+            lines.append("Content-Length: {}".format(len(data)))
+        elif method in ("POST", "PUT"):
+            lines.append("Content-Length: 0")
+
+        if upgrade:
+            # Docker hands the connection over to the raw output stream of the container
+            lines.append("Connection: Upgrade")
+            lines.append("Upgrade: tcp")
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (data or b""))
+        await writer.drain()
+
+
+class AttachedOutput(object):
+    """
+    Output of an attached container. Iterate over it asynchronously to receive (frame type, data) tuples, where frame
+    type 1 is stdout and 2 is stderr. Iteration ends when the container exits.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            header = await self._reader.readexactly(_FRAME_HEADER.size)
+        except asyncio.IncompleteReadError as ex:
+            if ex.partial:
+                LOG.debug("Container output ended in the middle of a frame header")
+            raise StopAsyncIteration
+
+        frame_type, size = _FRAME_HEADER.unpack(header)
+
+        try:
+            return frame_type, await self._reader.readexactly(size)
+        except asyncio.IncompleteReadError as ex:
+            # Output ended early, ex: the container was removed. Hand out what arrived.
+            return frame_type, ex.partial
+
+    def close(self):
+        self._writer.close()
+
+
+class AsyncDockerAPIError(Exception):
+
+    def __init__(self, status, message):
+        super(AsyncDockerAPIError, self).__init__("{}: {}".format(status, message))
+        self.status = status
+        self.message = message
+
+
+class AsyncDockerNotFound(AsyncDockerAPIError):
+    pass
+
+
+async def _read_head(reader):
+    """
+    Reads the status line and the headers of a response
+
+    :return tuple: Status code and a dictionary of headers with lower case names
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+
+    status = int(lines[0].split(" ", 2)[1])
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    return status, headers
+
+
+async def _read_body(reader, headers, status=200):
+    chunks = []
+    async for chunk in _iter_body(reader, headers, status):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _iter_body(reader, headers, status=200):
+    """
+    Reads the response body as it arrives, chunked or with a known length
+    """
+
+    if status in (204, 304) or 100 <= status < 200:
+        return
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if not size:
+                # Last chunk. Skip the (empty) trailer.
+                await reader.readuntil(b"\r\n")
+                return
+
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)
+            yield chunk
+
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        if remaining:
+            yield await reader.readexactly(remaining)
+
+    else:
+        # No length given. The body ends when the daemon closes the connection.
+        while True:
+            chunk = await reader.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _raise_for_status(status, payload):
+    if status < 400:
+        return
+
+    message = payload.decode('utf-8', 'replace') if isinstance(payload, bytes) else str(payload)
+    try:
+        message = json.loads(message).get("message", message)
+    except (ValueError, AttributeError):
+        pass
+
+    if status == 404:
+        raise AsyncDockerNotFound(status, message)
+
+    raise AsyncDockerAPIError(status, message)
+
+
+def _quote(value):
+    return quote(value, safe="/:")
+
+
+def _parse_repository_tag(image_name):
+    """
+    Splits "repo/name:tag" into repository and tag. A colon in front of the last slash belongs to a registry port.
+    """
+    repository, _, tag = image_name.rpartition(":")
+    if not repository or "/" in tag:
+        return image_name, None
+    return repository, tag
+
+
+def _get_create_config(image_name, options):
+    """
+    Translates the options of the Docker SDK's ``containers.create`` into the body of an Engine API request to create
+    a container. Only options containers of this package use are supported.
+
+    :param string image_name: Image to create the container from
+    :param dict options: Options of the container
+    :return dict: Body of the request
+    :raise ValueError: If an option is not supported
+    """
+
+    options = dict(options)
+    host_config = {}
+    config = {
+        "Image": image_name,
+        "Tty": bool(options.pop("tty", False)),
+        "AttachStdout": True,
+        "AttachStderr": True,
+        "HostConfig": host_config,
+    }
+
+    for name, field in (("command", "Cmd"), ("entrypoint", "Entrypoint")):
+        value = options.pop(name, None)
+        if value:
+            config[field] = shlex.split(value) if isinstance(value, str) else list(value)
+
+    working_dir = options.pop("working_dir", None)
+    if working_dir:
+        config["WorkingDir"] = working_dir
+
+    environment = options.pop("environment", None)
+    if environment:
+        if isinstance(environment, dict):
+            environment = ["{}={}".format(name, value) for name, value in environment.items()]
+        config["Env"] = list(environment)
+
+    volumes = options.pop("volumes", None)
+    if volumes:
+        host_config["Binds"] = ["{}:{}:{}".format(host_path, volume["bind"], volume.get("mode", "rw"))
+                                for host_path, volume in volumes.items()]
+
+    ports = options.pop("ports", None)
+    if ports:
+        config["ExposedPorts"] = {"{}/tcp".format(port): {} for port in ports}
+        host_config["PortBindings"] = {"{}/tcp".format(port): [{"HostPort": str(host_port)}]
+                                       for port, host_port in ports.items()}
+
+    mem_limit = options.pop("mem_limit", None)
+    if mem_limit:
+        host_config["Memory"] = _parse_bytes(mem_limit)
+
+    for name, field in _HOST_CONFIG_OPTIONS.items():
+        if name in options:
+            host_config[field] = options.pop(name)
+
+    if options:
+        raise ValueError("Container options not supported by the asyncio Docker client: {}"
+                         .format(", ".join(sorted(options))))
+
+    return config
+
+
+def _parse_bytes(value):
+    """
+    :param value: Number of bytes, or a string with a unit, ex: 128m
+    :return int: Number of bytes
+    """
+    if isinstance(value, int):
+        return value
+
+    value = value.strip().lower()
+    if value[-1] in _MEMORY_UNITS:
+        return int(value[:-1]) * _MEMORY_UNITS[value[-1]]
+
+    return int(value)
@@ -0,0 +1,195 @@
+"""
+Runs containers from an asyncio event loop
+"""
+
+import asyncio
+import logging
+import sys
+
+from .async_client import AsyncDockerClient, AsyncDockerAPIError, AsyncDockerNotFound
+from .container import Container
+from .image_cache import ImageCache
+from .manager import DockerImageNotFoundException, _PullProgress
+
+LOG = logging.getLogger(__name__)
+
+
+class AsyncContainerManager(object):
+    """
+    Counterpart of ``ContainerManager`` for asyncio. It creates, runs and removes the same containers, but talks to
+    the Docker daemon through an ``AsyncDockerClient``, so no thread is blocked while a container runs. Every
+    container is created for one run. Use an instance from one event loop only.
+    """
+
+    def __init__(self, docker_network_id=None, docker_client=None, skip_pull_image=False, image_cache=None):
+        """
+        Instantiate the container manager
+
+        :param docker_network_id: Optional Docker network to run the containers in
+        :param bsamcli.local.docker.async_client.AsyncDockerClient docker_client: Optional. Client to talk to the
+            Docker daemon with. Defaults to a client of the daemon in ``DOCKER_HOST``
+        :param bool skip_pull_image: Should we pull new Docker container image?
+        :param bsamcli.local.docker.image_cache.ImageCache image_cache: Optional. Cache of recently pulled images
+        """
+
+        self.docker_network_id = docker_network_id
+        self.docker_client = docker_client or AsyncDockerClient()
+        self.skip_pull_image = skip_pull_image
+        self.image_cache = image_cache or ImageCache()
+
+        # Checks of images in progress. Concurrent runs of a new image wait for the same check instead of pulling it
+        # several times over.
+        self._image_checks = {}
+
+    async def run(self, container):
+        """
+        Creates the container and starts it. Returns right after the container started.
+
+        :param bsamcli.local.docker.container.Container container: Container to run
+        :return bsamcli.local.docker.async_client.AttachedOutput: Output of the container, from its start on. Pass it
+            to ``wait_for_logs``
+        :raises DockerImageNotFoundException: If the Docker image was not available in the server
+        """
+
+        if not container.is_created():
+            await self.create(container)
+
+        # Attach before starting, so no output is lost and none is replayed
+        output = await self.docker_client.attach(container.id)
+        _mark(container, "attached")
+
+        try:
+            await self.docker_client.start_container(container.id)
+        except BaseException:
+            output.close()
+            raise
+
+        _mark(container, "started")
+        return output
+
+    async def create(self, container):
+        """
+        Creates the container in Docker, pulling its image first if necessary
+
+        :param bsamcli.local.docker.container.Container container: Container to create
+        """
+
+        await self._ensure_image(container.image)
+        _mark(container, "image_checked")
+
+        container.network_id = self.docker_network_id
+        container.id = await self.docker_client.create_container(container.image, container.get_create_options())
+        _mark(container, "created")
+
+        if container.network_id and not container.connect_network_on_create:
+            await self.docker_client.connect_network(container.network_id, container.id)
+
+    async def wait_for_logs(self, container, output, stdout=None, stderr=None):
+        """
+        Writes the output of the container to the given streams until the container exits
+
+        :param bsamcli.local.docker.container.Container container: Running container
+        :param bsamcli.local.docker.async_client.AttachedOutput output: Output returned by ``run``
+        :param io.BaseIO stdout: Optional. Stream that receives stdout data of the container
+        :param io.BaseIO stderr: Optional. Stream that receives stderr data of the container
+        """
+
+        stdout_write = stdout.write if stdout else None
+        stderr_write = stderr.write if stderr else None
+
+        try:
+            async for frame_type, data in output:
+                _mark(container, "first_output")
+
+                if frame_type == Container._STDOUT_FRAME_TYPE and stdout_write:  # pylint: disable=W0212
+                    stdout_write(data)
+                elif frame_type == Container._STDERR_FRAME_TYPE and stderr_write:  # pylint: disable=W0212
+                    stderr_write(data)
+        finally:
+            output.close()
+
+    async def stop(self, container):
+        """
+        Removes the container, even if it is still running
+
+        :param bsamcli.local.docker.container.Container container: Container to remove
+        """
+
+        if not container.is_created():
+            return
+
+        try:
+            await self.docker_client.remove_container(container.id, force=True)
+        except AsyncDockerNotFound:
+            LOG.debug("Container with ID %s does not exist. Skipping deletion", container.id)
+        except AsyncDockerAPIError as ex:
+            # Removal started already, ex: by the timeout of the function
+            if not ("removal of container" in ex.message and "is already in progress" in ex.message):
+                raise
+
+        container.id = None
+
+    async def _ensure_image(self, image_name):
+        """
+        Makes sure the image is available locally, pulling it if necessary. Every image is checked only once per
+        process, like ``ContainerManager`` does.
+
+        :raises DockerImageNotFoundException: If the Docker image was not available in the server
+        """
+
+        if self.image_cache.is_verified(image_name):
+            return
+
+        check = self._image_checks.get(image_name)
+        if check is None:
+            check = asyncio.ensure_future(self._check_image(image_name))
+            self._image_checks[image_name] = check
+            check.add_done_callback(lambda _: self._image_checks.pop(image_name, None))
+
+        # One run giving up, ex: when it is cancelled, must not cancel the check the others wait for
+        await asyncio.shield(check)
+
+    async def _check_image(self, image_name):
+        if not await self._has_image(image_name) or \
+                (not self.skip_pull_image and self.image_cache.is_stale(image_name)):
+            await self.pull_image(image_name)
+            self.image_cache.record_pull(image_name)
+            return
+
+        self.image_cache.mark_verified(image_name)
+
+    async def pull_image(self, image_name, stream=None):
+        """
+        Ask Docker to pull the container image with given name.
+
+        :param string image_name: Name of the image
+        :param stream: Optional stream to write output to. Defaults to stdout
+        :raises DockerImageNotFoundException: If the Docker image was not available in the server
+        """
+
+        stream = stream or sys.stdout
+        stream.write(u"\nFetching {} Docker container image...\n".format(image_name))
+
+        progress = _PullProgress(image_name, stream)
+        try:
+            async for line in self.docker_client.pull_image(image_name):
+                progress.update(line)
+        except AsyncDockerNotFound as ex:
+            raise DockerImageNotFoundException(str(ex))
+
+        progress.done()
+
+    async def _has_image(self, image_name):
+        """
+        :return bool: True, if the image is available locally
+        """
+        try:
+            await self.docker_client.inspect_image(image_name)
+            return True
+        except AsyncDockerNotFound:
+            return False
+
+
+def _mark(container, phase):
+    if container.metrics:
+        container.metrics.mark(phase)
@@ -4,11 +4,19 @@ Wrapper to Docker Attach API
 
 import struct
 import logging
+import socket as socket_module
 from socket import timeout
-from docker.utils.socket import read, read_exactly, SocketError
+from docker.utils.socket import read, SocketError
 
 LOG = logging.getLogger(__name__)
 
+# Every frame starts with 8 bytes of header: [8]byte{STREAM_TYPE, 0, 0, 0, SIZE1, SIZE2, SIZE3, SIZE4}
+_HEADER = struct.Struct('>BxxxL')
+_HEADER_SIZE = _HEADER.size
+
+# Size of the buffer the output is read into. Big enough to take in many frames with one system call.
+_READ_BUFFER_SIZE = 64 * 1024
+
 
 def attach(docker_client, container, stdout=True, stderr=True, logs=False):
     """
@@ -66,6 +74,60 @@ def attach(docker_client, container, stdout=True, stderr=True, logs=False):
     return _read_socket(socket)
 
 
+def exec_attach(docker_client, container, cmd, input_data=None, environment=None):
+    """
+    Runs a command inside an already running container and attaches to it, much like ``docker exec -i``. The given
+    input data is streamed to the command's stdin, which is then closed so the command sees end of file. stdout and
+    stderr of the command are demultiplexed the same way as in ``attach``.
+
+    Every call gets its own stream, so output of one command is never mixed with output of another.
+
+    Parameters
+    ----------
+    docker_client : docker.Client
+        Docker client used to talk to Docker daemon
+
+    container : docker.container
+        Instance of the running container to execute the command in
+
+    cmd : list
+        Command to execute
+
+    input_data : bytes
+        Optional. Data written to stdin of the command
+
+    environment : dict
+        Optional. Additional environment variables for the command
+
+    Returns
+    -------
+    str
+        ID of the exec instance. Use it to look up the exit code of the command after the output is consumed
+    Iterator
+        Iterator of (frame type, data) tuples
+    """
+
+    api_client = docker_client.api
+
+    exec_id = api_client.exec_create(container.id,
+                                     cmd,
+                                     stdout=True,
+                                     stderr=True,
+                                     stdin=input_data is not None,
+                                     environment=environment)["Id"]
+
+    socket = api_client.exec_start(exec_id, socket=True)
+
+    if input_data is not None:
+        # Raw socket underneath the SDK's socket wrapper. We write to it directly and close the write side to signal
+        # end of input while keeping the read side open for output.
+        raw_socket = getattr(socket, "_sock", socket)
+        raw_socket.sendall(input_data)
+        raw_socket.shutdown(socket_module.SHUT_WR)
+
+    return exec_id, _read_socket(socket)
+
+
 def _read_socket(socket):
     """
     The stdout and stderr data from the container multiplexed into one stream of response from the Docker API.
@@ -80,6 +142,13 @@ def _read_socket(socket):
         Stdout => Frame Type = 1
         Stderr => Frame Type = 2
 
+    Data is read from the socket into one reusable buffer, as much as fits with every read. All frames that are in the
+    buffer are then parsed at once. Chatty functions write many small frames, so this takes much fewer system calls
+    than reading every header and payload separately. Payloads are handed out as ``memoryview`` slices of the buffer
+    without copying them. A payload that does not fit into the buffer is handed out in several pieces.
+
+    NOTE: The buffer is reused. The data is valid only until the iterator is advanced. Callers that need to keep the
+    data must copy it, for example with ``bytes(data)``.
 
     Parameters
     ----------
@@ -90,92 +159,101 @@ def _read_socket(socket):
     -------
     int
         Type of the stream (1 => stdout, 2 => stderr)
-    str
+    memoryview
         Data in the stream
     """
 
+    buf = bytearray(_READ_BUFFER_SIZE)
+    view = memoryview(buf)
+
+    # Data that was read, but not handed out yet, is between start and end
+    start = end = 0
+
+    # Type of the frame being handed out and the number of its payload bytes that were not read yet
+    frame_type = None
+    payload_remaining = 0
+
     # Keep reading the stream until the stream terminates
     while True:
 
-        try:
+        # Hand out everything that is in the buffer already
+        while True:
+            if payload_remaining:
+                if start == end:
+                    break
+
+                size = min(payload_remaining, end - start)
+                payload_remaining -= size
+                start += size
+                yield frame_type, view[start - size:start]
 
-            payload_type, payload_size = _read_header(socket)
-            if payload_size < 0:
-                # Something is wrong with the data stream. Payload size can't be less than zero
+            elif end - start >= _HEADER_SIZE:
+                # >BxxxL is the struct notation to unpack data in correct header format in big-endian
+                frame_type, payload_remaining = _HEADER.unpack_from(buf, start)
+                start += _HEADER_SIZE
+
+            else:
                 break
 
-            for data in _read_payload(socket, payload_size):
-                yield payload_type, data
+        if start == end:
+            start = end = 0
+        elif start:
+            # Only the beginning of a header is left. Move it to the front, so the rest of the buffer can be filled.
+            buf[:end - start] = buf[start:end]
+            start, end = 0, end - start
+
+        try:
+
+            read_size = _read_into(socket, view[end:])
 
         except timeout:
             # Timeouts are normal during debug sessions and long running tasks
             LOG.debug("Ignoring docker socket timeout")
+            continue
 
         except SocketError:
-            # There isn't enough data in the stream. Probably the socket terminated
+            # Probably the socket terminated
             break
 
-
-def _read_payload(socket, payload_size):
-    """
-    From the given socket, reads and yields payload of the given size. With sockets, we don't receive all data at
-    once. Therefore this method will yield each time we read some data from the socket until the payload_size has
-    reached or socket has no more data.
-
-    Parameters
-    ----------
-    socket
-        Socket to read from
-
-    payload_size : int
-        Size of the payload to read. Exactly these many bytes are read from the socket before stopping the yield.
-
-    Yields
-    -------
-    int
-        Type of the stream (1 => stdout, 2 => stderr)
-    str
-        Data in the stream
-    """
-
-    remaining = payload_size
-    while remaining > 0:
-
-        # Try and read as much as possible
-        data = read(socket, remaining)
-        if data is None:
-            # ``read`` will terminate with an empty string. This is just a transient state where we didn't get any data
+        if read_size is None:
+            # This is just a transient state where we didn't get any data
             continue
 
-        if len(data) == 0:  # pylint: disable=C1801
-            # Empty string. Socket does not have any more data. We are done here even if we haven't read full payload
+        if not read_size:
+            # Socket does not have any more data. We are done here even if we haven't read full payload
             break
 
-        remaining -= len(data)
-        yield data
+        end += read_size
 
 
-def _read_header(socket):
+def _read_into(socket, view):
     """
-    Reads the header from socket stream to determine the size of next frame to read. Header is 8 bytes long, where
-    the first byte is the stream type and last four bytes (bigendian) is size of the payload
-
-        header := [8]byte{STREAM_TYPE, 0, 0, 0, SIZE1, SIZE2, SIZE3, SIZE4}
+    Reads from the socket into the given buffer, as much as is available and fits.
 
     Parameters
     ----------
     socket
-        Socket to read the responses from
+        Socket to read from
+
+    view : memoryview
+        Writable buffer to read into
 
     Returns
     -------
     int
-        Type of the frame
-    int
-        Size of the payload
+        Number of bytes read. 0 when the socket has no more data. None, if no data was available for now
     """
 
-    data = read_exactly(socket, 8)
+    if hasattr(socket, "recv_into"):
+        return socket.recv_into(view)
+
+    if hasattr(socket, "readinto"):
+        return socket.readinto(view)
+
+    # Fall back to reading a copy, with the Docker SDK's handling of the different kinds of sockets
+    data = read(socket, len(view))
+    if data is None:
+        return None
 
-    # >BxxxL is the struct notation to unpack data in correct header format in big-endian
-    return struct.unpack('>BxxxL', data)
+    view[:len(data)] = data
+    return len(data)
@@ -4,6 +4,7 @@ Represents Cfc runtime containers.
 
 import logging
 import os
+import shutil
 from enum import Enum
 from .container import Container
 
@@ -53,6 +54,30 @@ class CfcContainer(Container):
     # This is the dictionary that represents where the debugger_path arg is mounted in docker to as readonly.
     _DEBUGGER_VOLUME_MOUNT = {"bind": _DEBUGGER_VOLUME_MOUNT_PATH, "mode": "ro"}
 
+    # Persistent containers run this instead of the runtime, so they stay up between invokes. The runtime is started
+    # for each invoke with ``docker exec``.
+    _PERSISTENT_ENTRY_POINT = ["/bin/sh", "-c", "trap 'exit 0' TERM; while true; do sleep 3600 & wait $!; done"]
+
+    # Stores the event streamed through stdin where the runtime expects it, then hands over to the runtime command
+    _PERSISTENT_INVOKE_SCRIPT = "mkdir -p {0} && cat > {0}/event.json && exec \"$@\"".format(
+        _DEFAULT_CONTAINER_EVENT_PATH)
+
+    # Containers that serve more than one invoke keep the environment they were created with, including the request
+    # ID of the invoke that created them. Their runtime is started through this script, which takes the request ID of
+    # every invoke from a file written next to its event instead.
+    _REQUEST_ID_FILE_NAME = "request_id"
+    _REUSED_INVOKE_SCRIPT = ("_REQUEST_ID=\"$(cat {0}/{1} 2>/dev/null || echo \"$_REQUEST_ID\")\" && "
+                             "export _REQUEST_ID && exec \"$@\"").format(
+                                 _DEFAULT_CONTAINER_EVENT_PATH, _REQUEST_ID_FILE_NAME)
+
+    # Options of standby containers. They are created ahead of time, so anything that shortens the start of the
+    # function is worth doing at create time. An init process reaps zombies and forwards signals, so the container
+    # stops right away instead of waiting for the stop timeout.
+    _STANDBY_OPTIONS = {"init": True}
+
+    # Keeps /tmp in memory. Only used when the container is not restarted, as restarting clears a tmpfs.
+    _TMPFS_OPTIONS = {"tmpfs": {"/tmp": "rw,exec,mode=1777"}}
+
     def __init__(self,
                  runtime,
                  handler,
@@ -60,7 +85,13 @@ class CfcContainer(Container):
                  memory_mb=128,
                  env_vars=None,
                  event_path=None,
-                 debug_options=None):
+                 debug_options=None,
+                 persistent=False,
+                 docker_client=None,
+                 standby=False,
+                 tmpfs_tmp=False,
+                 cpu_curve=None,
+                 reused=False):
         """
         Initializes the class
 
@@ -70,7 +101,20 @@ class CfcContainer(Container):
             to the container to execute
         :param int memory_mb: Optional. Max limit of memory in MegaBytes this CFC function can use.
         :param dict env_vars: Optional. Dictionary containing environment variables passed to container
+        :param string event_path: Optional. Path to the event file on host. Its directory is mounted into the
+            container and removed when the container is deleted
         :param DebugContext debug_options: Optional. Contains container debugging info (port, debugger path)
+        :param bool persistent: Optional. Keep the container running between invokes and send every event to it
+            through ``invoke``, instead of running the function once when the container starts
+        :param docker_client: Optional. Docker client to talk to the Docker daemon with
+        :param bool standby: Optional. The container is created ahead of time. Runs it with an init process and
+            connects the network while creating it
+        :param bool tmpfs_tmp: Optional. Mount a tmpfs at /tmp
+        :param bsamcli.local.docker.cpu_curve.CpuCurve cpu_curve: Optional. Limits the CPU the function may use to
+            the share this curve gives its memory. Without it, the function may use all CPUs of the host
+        :param bool reused: Optional. The container may serve other invokes than the one it is created for. Its
+            runtime reads the request ID of every invoke from ``request_id_path``. Persistent containers get the
+            request ID with every invoke already
         """
 
         if not Runtime.has_value(runtime):
@@ -79,8 +123,18 @@ class CfcContainer(Container):
         image = CfcContainer._get_image(runtime)
         ports = CfcContainer._get_exposed_ports(debug_options)
         entry = CfcContainer._get_entry_point(runtime, debug_options)
+        if persistent:
+            entry = self._PERSISTENT_ENTRY_POINT
         additional_options = CfcContainer._get_additional_options(runtime, debug_options)
+        if standby or tmpfs_tmp:
+            additional_options = dict(additional_options or {})
+            if standby:
+                additional_options.update(self._STANDBY_OPTIONS)
+            if tmpfs_tmp:
+                additional_options.update(self._TMPFS_OPTIONS)
         additional_volumes = CfcContainer._get_additional_volumes(event_path, debug_options)
+        # A debugger is of no use when the function crawls along on a small CPU share
+        cpu_limit = cpu_curve.get_cpus(memory_mb) if cpu_curve and memory_mb and not debug_options else None
 
         super(CfcContainer, self).__init__(image,
                                            None,
@@ -91,7 +145,83 @@ class CfcContainer(Container):
                                            entrypoint=entry,
                                            env_vars=env_vars,
                                            container_opts=additional_options,
-                                           additional_volumes=additional_volumes)
+                                           additional_volumes=additional_volumes,
+                                           docker_client=docker_client,
+                                           cpu_limit=cpu_limit)
+
+        self.event_path = event_path
+        self.persistent = persistent
+        self.request_id_path = os.path.join(os.path.dirname(event_path), self._REQUEST_ID_FILE_NAME) \
+            if reused and event_path else None
+        self.connect_network_on_create = standby
+        self._runtime_command = None
+
+    def get_create_options(self):
+        """
+        Returns the options to create the Docker container with. The runtime of a reused container is wrapped, so it
+        picks up the request ID of every invoke.
+
+        :return dict: Options of the container, except its image
+        """
+        kwargs = super(CfcContainer, self).get_create_options()
+
+        if self.request_id_path:
+            # Docker drops the command of the image when the entry point is replaced, so the wrapper runs both
+            kwargs["entrypoint"] = ["/bin/sh", "-c", self._REUSED_INVOKE_SCRIPT, "sh"] + self._get_runtime_command()
+
+        return kwargs
+
+    def start(self, input_data=None):
+        """
+        Starts the container. A persistent container keeps running after its first start, so starting it again to
+        serve another invoke is a no-op.
+        """
+        if self.persistent and self._has_run:
+            return
+
+        super(CfcContainer, self).start(input_data=input_data)
+
+    def invoke(self, event, request_id=None, stdout=None, stderr=None):
+        """
+        Runs the function once inside the persistent container. The event is streamed to the container over the
+        Docker socket and output of this invoke alone is written to the given streams.
+
+        :param string event: Event passed to the function
+        :param string request_id: Optional. Request ID of this invoke
+        :param io.BaseIO stdout: Optional. Stream that receives stdout of the function
+        :param io.BaseIO stderr: Optional. Stream that receives stderr of the function
+        :return int: Exit code of the runtime
+        """
+
+        if not self.persistent:
+            raise RuntimeError("Only persistent containers can be invoked. Start the container instead")
+
+        cmd = ["/bin/sh", "-c", self._PERSISTENT_INVOKE_SCRIPT, "sh"] + self._get_runtime_command()
+        environment = {"_REQUEST_ID": request_id} if request_id else None
+
+        return self.execute(cmd,
+                            input_data=(event or "").encode("utf-8"),
+                            environment=environment,
+                            stdout=stdout,
+                            stderr=stderr)
+
+    def delete(self):
+        """
+        Removes the container along with the event directory that was mounted into it.
+        """
+        super(CfcContainer, self).delete()
+
+        if self.event_path:
+            shutil.rmtree(os.path.dirname(self.event_path), ignore_errors=True)
+
+    def _get_runtime_command(self):
+        """
+        :return list: Command that starts the runtime, as configured in the image. Looked up once per container
+        """
+        if self._runtime_command is None:
+            self._runtime_command = self.get_image_command()
+
+        return self._runtime_command
 
     @staticmethod
     def _get_exposed_ports(debug_options):
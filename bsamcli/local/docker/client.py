@@ -0,0 +1,45 @@
+"""
+Provides the Docker client shared by everything in this process that talks to the Docker daemon
+"""
+
+import logging
+import threading
+
+import docker
+
+LOG = logging.getLogger(__name__)
+
+# Number of connections to the Docker daemon kept open for reuse. Local services invoke functions from many threads at
+# once, and every one of them talks to the daemon to create, start and remove its container.
+_DEFAULT_MAX_POOL_SIZE = 32
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_docker_client():
+    """
+    Returns the process-wide Docker client, creating it on first use from the environment (``DOCKER_HOST`` etc). The
+    client keeps a pool of connections to the daemon, so requests made from different threads reuse connections
+    instead of opening new ones. This method is thread-safe.
+
+    :return docker.DockerClient: Docker client
+    """
+
+    global _client  # pylint: disable=global-statement
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+
+    return _client
+
+
+def _create_client():
+    try:
+        return docker.from_env(max_pool_size=_DEFAULT_MAX_POOL_SIZE)
+    except TypeError:
+        # Older versions of the Docker SDK do not support sizing the connection pool
+        LOG.debug("Docker SDK does not support max_pool_size. Using the default connection pool size")
+        return docker.from_env()
@@ -5,7 +5,8 @@ Representation of a generic Docker container
 import logging
 import docker
 
-from bsamcli.local.docker.attach_api import attach
+from bsamcli.local.docker.attach_api import attach, exec_attach
+from bsamcli.local.docker.client import get_docker_client
 
 LOG = logging.getLogger(__name__)
 
@@ -24,6 +25,9 @@ class Container(object):
     _STDOUT_FRAME_TYPE = 1
     _STDERR_FRAME_TYPE = 2
 
+    # Length of the period in microseconds the CPU quota of a container applies to. This is Docker's default.
+    _CPU_PERIOD_US = 100000
+
     def __init__(self,
                  image,
                  cmd,
@@ -35,7 +39,8 @@ class Container(object):
                  env_vars=None,
                  docker_client=None,
                  container_opts=None,
-                 additional_volumes=None):
+                 additional_volumes=None,
+                 cpu_limit=None):
         """
         Initializes the class with given configuration. This does not automatically create or run the container.
 
@@ -48,6 +53,7 @@ class Container(object):
         :param dict exposed_ports: Optional. Dict of ports to expose
         :param list entrypoint: Optional. Entry point process for the container. Defaults to the value in Dockerfile
         :param dict env_vars: Optional. Dict of environment variables to setup in the container
+        :param float cpu_limit: Optional. Number of CPUs the container may use, ex: 0.5 for half of one CPU
         """
 
         self._image = image
@@ -58,16 +64,31 @@ class Container(object):
         self._entrypoint = entrypoint
         self._env_vars = env_vars
         self._memory_limit_mb = memory_limit_mb
+        self._cpu_limit = cpu_limit
         self._network_id = None
         self._container_opts = container_opts
         self._additional_volumes = additional_volumes
 
-        # Use the given Docker client or create new one
-        self.docker_client = docker_client or docker.from_env()
+        # Attach the network while creating the container, instead of connecting it in a separate call after the
+        # container was created. The container is then connected to this network only, not to the default bridge.
+        self.connect_network_on_create = False
+
+        # Use the given Docker client or the one shared by the process. The shared client is looked up on first use,
+        # so containers run through the asyncio manager never create it.
+        self._docker_client = docker_client
 
         # Runtime properties of the container. They won't have value until container is created or started
         self.id = None
 
+        # A container that already ran once can be started again to serve another invocation. Such a container is
+        # attached to *before* it starts, so we only receive output of the new run and not logs of the earlier ones.
+        self._has_run = False
+        self._attached_output_itr = None
+
+        # Record of the invoke this container currently serves, if it is measured. Phases of the container's life
+        # cycle are marked on it as they happen.
+        self.metrics = None
+
     def create(self):
         """
         Calls Docker API to creates the Docker container instance. Creating the container does *not* run the container.
@@ -80,6 +101,26 @@ class Container(object):
         if self.is_created():
             raise RuntimeError("This container already exists. Cannot create again.")
 
+        kwargs = self.get_create_options()
+
+        real_container = self.docker_client.containers.create(self._image, **kwargs)
+        self.id = real_container.id
+        self._mark("created")
+
+        if self.network_id and not self.connect_network_on_create:
+            network = self.docker_client.networks.get(self.network_id)
+            network.connect(self.id)
+
+        return self.id
+
+    def get_create_options(self):
+        """
+        Returns the options to create the Docker container with, as keyword arguments of the Docker SDK's
+        ``containers.create``
+
+        :return dict: Options of the container, except its image
+        """
+
         LOG.info("Mounting %s as %s inside runtime container", self._host_dir, self._working_dir)
 
         kwargs = {
@@ -116,14 +157,15 @@ class Container(object):
             # Ex: 128m => 128MB
             kwargs["mem_limit"] = "{}m".format(self._memory_limit_mb)
 
-        real_container = self.docker_client.containers.create(self._image, **kwargs)
-        self.id = real_container.id
+        if self._cpu_limit:
+            # Ex: 0.5 CPUs => 50ms of CPU time in every 100ms period
+            kwargs["cpu_period"] = self._CPU_PERIOD_US
+            kwargs["cpu_quota"] = int(self._cpu_limit * self._CPU_PERIOD_US)
 
-        if self.network_id:
-            network = self.docker_client.networks.get(self.network_id)
-            network.connect(self.id)
+        if self.network_id and self.connect_network_on_create:
+            kwargs["network"] = self.network_id
 
-        return self.id
+        return kwargs
 
     def delete(self):
         """
@@ -150,6 +192,8 @@ class Container(object):
                 raise ex
 
         self.id = None
+        self._has_run = False
+        self._attached_output_itr = None
 
     # cfc_container 集成了这个 container 类，调用这个 start 方法启动容器
     # 这里调用 docker sdk，启动容器
@@ -173,8 +217,18 @@ class Container(object):
         # Get the underlying container instance from Docker API
         real_container = self.docker_client.containers.get(self.id)
 
+        if self._has_run:
+            self._attached_output_itr = attach(self.docker_client,
+                                               container=real_container,
+                                               stdout=True,
+                                               stderr=True,
+                                               logs=False)
+            self._mark("attached")
+
         # Start the container
         real_container.start()
+        self._has_run = True
+        self._mark("started")
 
     def wait_for_logs(self, stdout=None, stderr=None):
 
@@ -185,6 +239,12 @@ class Container(object):
         if not self.is_created():
             raise RuntimeError("Container does not exist. Cannot get logs for this container")
 
+        if self._attached_output_itr:
+            # We attached before starting the container. Read from that stream instead.
+            logs_itr, self._attached_output_itr = self._attached_output_itr, None
+            self._write_container_output(self._mark_first_output(logs_itr), stdout=stdout, stderr=stderr)
+            return
+
         real_container = self.docker_client.containers.get(self.id)
 
         # Fetch both stdout and stderr streams from Docker as a single iterator.
@@ -193,8 +253,85 @@ class Container(object):
                           stdout=True,
                           stderr=True,
                           logs=True)
+        self._mark("attached")
+
+        self._write_container_output(self._mark_first_output(logs_itr), stdout=stdout, stderr=stderr)
+
+    def execute(self, cmd, input_data=None, environment=None, stdout=None, stderr=None):
+        """
+        Runs a command in the running container and waits for it to finish. stdout and stderr of the command are
+        written to the given streams.
+
+        :param list cmd: Command to execute
+        :param bytes input_data: Optional. Data sent to the command through its stdin
+        :param dict environment: Optional. Additional environment variables for the command
+        :param io.BaseIO stdout: Optional. Stream that receives stdout data of the command
+        :param io.BaseIO stderr: Optional. Stream that receives stderr data of the command
+        :return int: Exit code of the command
+        :raise RuntimeError: If the container was not created
+        """
+
+        if not self.is_created():
+            raise RuntimeError("Container does not exist. Cannot execute a command in this container")
+
+        real_container = self.docker_client.containers.get(self.id)
+
+        exec_id, output_itr = exec_attach(self.docker_client,
+                                          container=real_container,
+                                          cmd=cmd,
+                                          input_data=input_data,
+                                          environment=environment)
+
+        # The command runs as soon as it is attached to
+        self._mark("attached")
+        self._mark("started")
+
+        self._write_container_output(self._mark_first_output(output_itr), stdout=stdout, stderr=stderr)
+
+        return self.docker_client.api.exec_inspect(exec_id).get("ExitCode")
+
+    def get_image_command(self):
+        """
+        Returns the command the image runs when started with its default entry point and command.
+
+        :return list: Entry point followed by the command, as configured in the image
+        """
+
+        config = self.docker_client.images.get(self._image).attrs.get("Config") or {}
+
+        return (config.get("Entrypoint") or []) + (config.get("Cmd") or [])
+
+    def _mark(self, phase):
+        """
+        Marks the given phase on the record of the current invoke, if it is measured
+        """
+        if self.metrics:
+            self.metrics.mark(phase)
+
+    def _mark_first_output(self, output_itr):
+        """
+        Passes the output through, marking when the first of it arrives
+
+        :param output_itr: Iterator returned by the Docker Attach command
+        :return: Iterator over the same output
+        """
+        if not self.metrics:
+            return output_itr
 
-        self._write_container_output(logs_itr, stdout=stdout, stderr=stderr)
+        return self._iter_marking_first_output(output_itr, self.metrics)
+
+    @staticmethod
+    def _iter_marking_first_output(output_itr, metrics):
+        output_itr = iter(output_itr)
+
+        for frame in output_itr:
+            metrics.mark("first_output")
+            yield frame
+            break
+
+        # Pass everything after the first frame on without looking at it
+        for frame in output_itr:
+            yield frame
 
     @staticmethod
     def _write_container_output(output_itr, stdout=None, stderr=None):
@@ -211,22 +348,38 @@ class Container(object):
             Stream to write stderr data from the Container into
         """
 
+        # Look up the write methods once. This loop runs for every chunk of output, which adds up for functions
+        # that log a lot.
+        stdout_write = stdout.write if stdout else None
+        stderr_write = stderr.write if stderr else None
+
         # Iterator returns a tuple of (frame_type, data) where the frame type determines which stream we write output
-        # to
+        # to. The data is only valid until the iterator is advanced, so it is written right away.
         for frame_type, data in output_itr:
 
-            if frame_type == Container._STDOUT_FRAME_TYPE and stdout:
+            if frame_type == Container._STDOUT_FRAME_TYPE and stdout_write:
                 # Frame type 1 is stdout data.
-                stdout.write(data)
+                stdout_write(data)
 
-            elif frame_type == Container._STDERR_FRAME_TYPE and stderr:
+            elif frame_type == Container._STDERR_FRAME_TYPE and stderr_write:
                 # Frame type 2 is stderr data.
-                stderr.write(data)
+                stderr_write(data)
 
-            else:
+            elif LOG.isEnabledFor(logging.DEBUG):
                 # Either an unsupported frame type or stream for this frame type is not configured
                 LOG.debug("Dropping Docker container output because of unconfigured frame type. "
-                          "Frame Type: %s. Data: %s", frame_type, data)
+                          "Frame Type: %s. Data: %s", frame_type, bytes(data))
+
+    @property
+    def docker_client(self):
+        """
+        :return docker.DockerClient: Docker client this container talks to the Docker daemon with
+        """
+        return self._docker_client or get_docker_client()
+
+    @docker_client.setter
+    def docker_client(self, value):
+        self._docker_client = value
 
     @property
     def network_id(self):
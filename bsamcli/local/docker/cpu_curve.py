@@ -0,0 +1,76 @@
+"""
+Maps the memory of a function to the CPU share it gets, the way CFC allocates CPU proportionally to memory
+"""
+
+import multiprocessing
+
+
+class CpuCurve(object):
+    """
+    Piecewise linear curve from the memory size of a function in MB to the number of CPUs it may use. Between two
+    points of the curve the CPU share is interpolated. Beyond the last point, the last segment is extended. The result
+    never exceeds the number of CPUs of the Docker host.
+
+        curve = CpuCurve.parse("128:0.1,1024:0.6,3072:2")
+        curve.get_cpus(512)     # 0.314...
+    """
+
+    # Like the cloud, a function gets a full CPU at 1769 MB, and a proportional share of it below
+    DEFAULT_POINTS = ((0, 0.0), (1769, 1.0))
+
+    # Docker does not allow a CPU quota below 1 ms per period
+    MIN_CPUS = 0.01
+
+    def __init__(self, points=None, max_cpus=None):
+        """
+        :param list points: Optional. (memory MB, CPUs) tuples. Defaults to ``DEFAULT_POINTS``
+        :param float max_cpus: Optional. Upper limit of CPUs. Defaults to the number of CPUs of this machine
+        :raise ValueError: If there are less than two points, or CPUs go down while memory goes up
+        """
+        self.points = sorted(points or self.DEFAULT_POINTS)
+        self.max_cpus = max_cpus or multiprocessing.cpu_count()
+
+        if len(self.points) < 2:
+            raise ValueError("A CPU curve needs at least two points")
+
+        for (memory, cpus), (next_memory, next_cpus) in zip(self.points, self.points[1:]):
+            if memory == next_memory or cpus > next_cpus or cpus < 0:
+                raise ValueError("CPUs of a CPU curve must grow with memory. Check points {}:{} and {}:{}"
+                                 .format(memory, cpus, next_memory, next_cpus))
+
+    def get_cpus(self, memory_mb):
+        """
+        :param int memory_mb: Memory size of the function in MB
+        :return float: Number of CPUs the function may use
+        """
+
+        # Find the segment the memory falls into. Memory outside of the curve uses the first or last segment.
+        segment = 0
+        while segment < len(self.points) - 2 and memory_mb > self.points[segment + 1][0]:
+            segment += 1
+
+        (memory, cpus), (next_memory, next_cpus) = self.points[segment], self.points[segment + 1]
+        value = cpus + (memory_mb - memory) * (next_cpus - cpus) / float(next_memory - memory)
+
+        return min(max(value, self.MIN_CPUS), self.max_cpus)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Creates a curve from a comma separated list of MEMORY:CPUS points, ex: "128:0.1,3008:1.7"
+
+        :param string spec: Points of the curve
+        :return CpuCurve: The curve
+        :raise ValueError: If the points can't be parsed or don't make up a valid curve
+        """
+
+        points = []
+        for point in spec.split(","):
+            try:
+                memory, cpus = point.split(":")
+                points.append((int(memory), float(cpus)))
+            except ValueError:
+                raise ValueError("Invalid point '{}' of CPU curve. Expected MEMORY:CPUS, ex: 128:0.1"
+                                 .format(point.strip()))
+
+        return cls(points)
@@ -0,0 +1,132 @@
+"""
+Remembers which runtime images were recently pulled, so we don't go to the registry on every invoke
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class ImageCache(object):
+    """
+    Keeps the time an image was last pulled from the registry. Pulling is skipped until the entry is
+    older than the TTL. Entries are optionally persisted to a JSON file, so they are shared across CLI runs.
+
+    Within one process an image needs to be checked only once. After that, ``is_verified`` returns True and callers
+    can skip talking to Docker about this image altogether. This class is thread-safe.
+    """
+
+    # Pull an image at most once a day by default
+    _DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+    def __init__(self, cache_file=None, ttl=None):
+        """
+        Initialize the cache
+
+        :param string cache_file: Optional. Path to a JSON file to persist the cache to. If not given, the cache lives
+            only as long as this process
+        :param int ttl: Optional. Number of seconds after which an image is pulled again
+        """
+
+        self.cache_file = cache_file
+        self.ttl = ttl if ttl is not None else self._DEFAULT_TTL_SECONDS
+
+        self._lock = threading.Lock()
+        self._entries = None
+        self._verified = set()
+
+    def is_verified(self, image_name):
+        """
+        Was the image already checked by this process?
+
+        :param string image_name: Name of the image
+        :return bool: True, if the image was checked and is available locally
+        """
+        with self._lock:
+            return image_name in self._verified
+
+    def mark_verified(self, image_name):
+        """
+        Remember that the image is available locally, so this process does not need to check it again
+
+        :param string image_name: Name of the image
+        """
+        with self._lock:
+            self._verified.add(image_name)
+
+    def is_stale(self, image_name):
+        """
+        Is it time to pull the image from the registry again?
+
+        :param string image_name: Name of the image
+        :return bool: True, if the image was never pulled or was pulled more than ``ttl`` seconds ago
+        """
+        with self._lock:
+            entry = self._get_entries().get(image_name)
+
+        if not entry:
+            return True
+
+        return time.time() - entry.get("last_checked", 0) >= self.ttl
+
+    def record_pull(self, image_name):
+        """
+        Record that the image was just pulled from the registry. This also marks the image verified.
+
+        :param string image_name: Name of the image
+        """
+        with self._lock:
+            entries = self._get_entries()
+            entries[image_name] = {
+                "last_checked": time.time()
+            }
+            self._verified.add(image_name)
+            self._save(entries)
+
+    def _get_entries(self):
+        """
+        Loads the persisted entries the first time they are needed. Must be called while holding the lock.
+
+        :return dict: Image name to {"last_checked"} dictionary
+        """
+        if self._entries is None:
+            self._entries = self._load()
+
+        return self._entries
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+
+        try:
+            with open(self.cache_file, 'r') as fp:
+                entries = json.load(fp)
+        except (IOError, OSError, ValueError) as ex:
+            # A broken cache only means we pull again. Don't fail the invoke for it.
+            LOG.debug("Ignoring unreadable image cache %s: %s", self.cache_file, ex)
+            return {}
+
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, entries):
+        if not self.cache_file:
+            return
+
+        cache_dir = os.path.dirname(self.cache_file)
+
+        try:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+            # Write to a temporary file and move it in place, so concurrent CLI runs never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(entries, fp, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except (IOError, OSError) as ex:
+            LOG.debug("Unable to save image cache to %s: %s", self.cache_file, ex)
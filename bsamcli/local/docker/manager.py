@@ -4,8 +4,15 @@ Provides classes that interface with Docker to create, execute and manage contai
 
 import logging
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import docker
 
+from .client import get_docker_client
+from .image_cache import ImageCache
+
 LOG = logging.getLogger(__name__)
 
 
@@ -16,21 +23,67 @@ class ContainerManager(object):
     serve requests faster. It is also thread-safe.
     """
 
+    # Maximum number of idle warm containers kept around, across all function configurations
+    _DEFAULT_WARM_POOL_SIZE = 8
+
+    # Idle warm containers older than this many seconds are removed instead of being reused
+    _DEFAULT_WARM_IDLE_TIMEOUT = 600
+
+    # Number of images fetched at the same time by ``prefetch_images``
+    _DEFAULT_PREFETCH_WORKERS = 4
+
+    # Number of standby containers created at the same time in the background
+    _STANDBY_WORKERS = 2
+
     def __init__(self,
                  docker_network_id=None,
                  docker_client=None,
-                 skip_pull_image=False):
+                 skip_pull_image=False,
+                 warm_pool_size=None,
+                 warm_idle_timeout=None,
+                 image_cache=None,
+                 standby_count=0):
         """
         Instantiate the container manager
 
         :param docker_network_id: Optional Docker network to run this container in.
-        :param docker_client: Optional docker client object
+        :param docker_client: Optional docker client object. Defaults to the client shared by the process
         :param bool skip_pull_image: Should we pull new Docker container image?
+        :param int warm_pool_size: Optional. Maximum number of idle warm containers to keep for reuse
+        :param int warm_idle_timeout: Optional. Seconds an idle warm container is kept before it is removed
+        :param bsamcli.local.docker.image_cache.ImageCache image_cache: Optional. Cache of recently pulled images.
+            Defaults to a cache that lives only as long as this process
+        :param int standby_count: Optional. Number of created, but not yet started, containers to keep ready for
+            every function configuration served by ``get_standby_container``. Defaults to 0
         """
 
         self.skip_pull_image = skip_pull_image
         self.docker_network_id = docker_network_id
-        self.docker_client = docker_client or docker.from_env()
+        self.docker_client = docker_client or get_docker_client()
+        self.image_cache = image_cache or ImageCache()
+
+        # Serializes checks of the same image, so concurrent invokes of a new image don't pull it several times over.
+        # Different images can still be pulled in parallel.
+        self._image_locks = {}
+        self._image_locks_lock = threading.Lock()
+
+        self.warm_pool_size = warm_pool_size if warm_pool_size is not None else self._DEFAULT_WARM_POOL_SIZE
+        self.warm_idle_timeout = warm_idle_timeout if warm_idle_timeout is not None \
+            else self._DEFAULT_WARM_IDLE_TIMEOUT
+
+        # Idle warm containers, keyed by the function configuration they were created for. Each value is a list of
+        # (container, released_at) tuples, oldest first.
+        self._warm_containers = {}
+        self._warm_lock = threading.Lock()
+
+        # Created containers waiting to be started, keyed by function configuration, along with the number of
+        # containers being created in the background for every key
+        self.standby_count = standby_count
+        self._standby_containers = {}
+        self._standby_pending = {}
+        self._standby_lock = threading.Lock()
+        self._standby_executor = None
+        self._standby_stopped = False
 
     def run(self, container, is_installing=None, input_data=None, warm=False):
         """
@@ -39,21 +92,20 @@ class ContainerManager(object):
         :param bsamcli.local.docker.container.Container container: Container to create and run
         :param input_data: Optional. Input data sent to the container through container's stdin.
         :param bool warm: Indicates if an existing container can be reused. Defaults False ie. a new container will
-            be created for every request.
+            be created for every request. When True, ``container`` may be one that was returned by
+            ``get_warm_container`` and already exists in Docker, in which case it is simply started again.
         :raises DockerImageNotFoundException: If the Docker image was not available in the server
         """
 
-        if warm:
-            raise ValueError("The facility to invoke warm container does not exist")
+        if warm and container.is_created():
+            # Reusing a container we created earlier. Its image is already present, so go straight to starting it.
+            LOG.debug("Reusing warm container %s", container.id)
+            container.start(input_data=input_data)
+            return
 
-        image_name = container.image
-
-        # Pull a new image if: a) Image is not available OR b) We are not asked to skip pulling the image
-        if not self.has_image(image_name) or not self.skip_pull_image:
-            self.pull_image(image_name)
-        else:
-            if not is_installing:
-                LOG.info("Requested to skip pulling images ...\n")
+        self._ensure_image(container.image, is_installing)
+        if container.metrics:
+            container.metrics.mark("image_checked")
 
         if not container.is_created():
             # Create the container first before running.
@@ -71,6 +123,126 @@ class ContainerManager(object):
         """
         container.delete()
 
+    def get_warm_container(self, key):
+        """
+        Returns an idle container that was created earlier for the same function configuration, so the caller can
+        run it again instead of creating a new one. Containers that have been idle for too long are removed.
+
+        :param key: Hashable key identifying the function configuration
+        :return bsamcli.local.docker.container.Container: Idle container, or None if none is available
+        """
+
+        expired = []
+        container = None
+
+        with self._warm_lock:
+            expired.extend(self._pop_expired_containers())
+
+            idle = self._warm_containers.get(key)
+            if idle:
+                # Most recently used container first. It is the one most likely to still have warm caches.
+                container, _ = idle.pop()
+                if not idle:
+                    del self._warm_containers[key]
+
+        self._delete_containers(expired)
+        return container
+
+    def release(self, container, key):
+        """
+        Hands a container that finished running back to the warm pool so it can be reused by a later invocation of
+        the same function configuration. If the pool is full, the least recently used container is removed.
+
+        :param bsamcli.local.docker.container.Container container: Container to release
+        :param key: Hashable key identifying the function configuration
+        """
+
+        if not container.is_created():
+            # Container was removed while running, ex: when the function timed out. Nothing to keep.
+            return
+
+        expired = []
+
+        with self._warm_lock:
+            expired.extend(self._pop_expired_containers())
+
+            self._warm_containers.setdefault(key, []).append((container, time.time()))
+
+            while self._warm_container_count() > self.warm_pool_size:
+                expired.append(self._pop_least_recently_used_container())
+
+        self._delete_containers(expired)
+
+    def stop_warm_containers(self):
+        """
+        Removes every idle container kept in the warm pool. Call this before shutting down.
+        """
+
+        with self._warm_lock:
+            containers = [container for idle in self._warm_containers.values() for container, _ in idle]
+            self._warm_containers = {}
+
+        self._delete_containers(containers)
+
+    def get_standby_container(self, key, factory):
+        """
+        Returns a container that was created ahead of time for the given function configuration, so creating it is
+        not part of the invoke. Every call also kicks off creating replacements in the background, keeping
+        ``standby_count`` containers ready for the next invokes.
+
+        :param key: Hashable key identifying the function configuration
+        :param callable factory: Returns a new, not yet created, container for this function configuration
+        :return bsamcli.local.docker.container.Container: Container that is created already, if one was ready.
+            Otherwise a new container from ``factory`` that ``run`` will create
+        """
+
+        with self._standby_lock:
+            ready = self._standby_containers.get(key)
+            container = ready.pop(0) if ready else None
+
+        self._refill_standby_containers(key, factory)
+
+        return container or factory()
+
+    def stop_standby_containers(self):
+        """
+        Removes every standby container, and stops creating new ones. Call this before shutting down.
+        """
+
+        with self._standby_lock:
+            self._standby_stopped = True
+            containers = [container for ready in self._standby_containers.values() for container in ready]
+            self._standby_containers = {}
+            executor = self._standby_executor
+
+        if executor:
+            # Containers still being created are removed as soon as they are done
+            executor.shutdown(wait=True)
+
+        self._delete_containers(containers)
+
+    def discard_containers(self, matches):
+        """
+        Removes the idle warm containers and the standby containers of every function configuration the given
+        predicate matches, ex: because the code of the function changed and the containers would run the old code.
+        Containers running an invoke right now are not affected.
+
+        :param callable matches: Called with the key of a function configuration. Returns True, if its containers
+            must be removed
+        :return int: Number of containers removed
+        """
+
+        with self._warm_lock:
+            keys = [key for key in self._warm_containers if matches(key)]
+            containers = [container for key in keys for container, _ in self._warm_containers.pop(key)]
+
+        with self._standby_lock:
+            keys = [key for key in self._standby_containers if matches(key)]
+            containers.extend(container for key in keys for container in self._standby_containers.pop(key))
+
+        self._delete_containers(containers)
+        return len(containers)
+
     def pull_image(self, image_name, stream=None):
         """
         Ask Docker to pull the container image with given name.
@@ -88,16 +260,73 @@ class ContainerManager(object):
             raise DockerImageNotFoundException(str(ex))
 
         # io streams, especially StringIO, work only with unicode strings
-        stream.write(u"\nFetching {} Docker container image...".format(image_name))
+        stream.write(u"\nFetching {} Docker container image...\n".format(image_name))
 
         # Each line contains information on progress of the pull. Each line is a JSON string
-        for _ in result_itr:
-            # For every line, print a dot to show progress
-            stream.write(u'.')
-            stream.flush()
+        progress = _PullProgress(image_name, stream)
+        for line in result_itr:
+            progress.update(line)
+
+        progress.done()
+
+    def prefetch_images(self, image_names, max_workers=None):
+        """
+        Makes sure all the given images are available locally, pulling them in parallel where necessary. Images that
+        can't be fetched are logged and skipped. Invokes using them fail the same way they would without prefetching.
+
+        :param list image_names: Names of the images
+        :param int max_workers: Optional. Maximum number of images to fetch at the same time
+        """
+
+        image_names = sorted(set(image_names))
+        if not image_names:
+            return
 
-        # We are done. Go to the next line
-        stream.write(u"\n")
+        LOG.info("Fetching %d runtime image(s) before starting", len(image_names))
+
+        def ensure_image(image_name):
+            try:
+                self._ensure_image(image_name)
+            except (DockerImageNotFoundException, docker.errors.APIError) as ex:
+                LOG.warning("Unable to fetch image %s: %s", image_name, ex)
+
+        with ThreadPoolExecutor(max_workers=max_workers or self._DEFAULT_PREFETCH_WORKERS) as executor:
+            # Consume the results so that unexpected exceptions surface here
+            list(executor.map(ensure_image, image_names))
+
+    def _ensure_image(self, image_name, is_installing=None):
+        """
+        Makes sure the image is available locally, pulling it if necessary. Every image is checked only once per
+        process. After that, invokes of the same image don't talk to Docker or the registry about it anymore.
+
+        :param string image_name: Name of the image
+        :raises DockerImageNotFoundException: If the Docker image was not available in the server
+        """
+
+        if self.image_cache.is_verified(image_name):
+            return
+
+        with self._image_locks_lock:
+            image_lock = self._image_locks.setdefault(image_name, threading.Lock())
+
+        with image_lock:
+            if self.image_cache.is_verified(image_name):
+                # Another invoke checked this image while we were waiting
+                return
+
+            # Pull a new image if: a) Image is not available OR b) We are not asked to skip pulling the image and the
+            # image was not pulled recently
+            if not self.has_image(image_name) or (not self.skip_pull_image and self.image_cache.is_stale(image_name)):
+                self.pull_image(image_name)
+                self.image_cache.record_pull(image_name)
+                return
+
+            if self.skip_pull_image and not is_installing:
+                LOG.info("Requested to skip pulling images ...\n")
+            elif not self.skip_pull_image:
+                LOG.debug("Image %s was pulled recently. Skipping pull", image_name)
+
+            self.image_cache.mark_verified(image_name)
 
     def has_image(self, image_name):
         """
@@ -113,6 +342,149 @@ class ContainerManager(object):
         except docker.errors.ImageNotFound:
             return False
 
+    def _warm_container_count(self):
+        return sum(len(idle) for idle in self._warm_containers.values())
+
+    def _pop_expired_containers(self):
+        """
+        Removes idle containers that were released more than ``warm_idle_timeout`` seconds ago from the pool.
+        Must be called while holding the lock.
+
+        :return list: Containers that were removed from the pool and must be deleted
+        """
+
+        deadline = time.time() - self.warm_idle_timeout
+        expired = []
+
+        for key in list(self._warm_containers.keys()):
+            idle = self._warm_containers[key]
+            expired.extend(container for container, released_at in idle if released_at < deadline)
+
+            idle = [(container, released_at) for container, released_at in idle if released_at >= deadline]
+            if idle:
+                self._warm_containers[key] = idle
+            else:
+                del self._warm_containers[key]
+
+        return expired
+
+    def _pop_least_recently_used_container(self):
+        """
+        Removes the container that has been idle the longest from the pool. Must be called while holding the lock.
+
+        :return bsamcli.local.docker.container.Container: Container that must be deleted
+        """
+
+        key = min(self._warm_containers, key=lambda k: self._warm_containers[k][0][1])
+        idle = self._warm_containers[key]
+
+        container, _ = idle.pop(0)
+        if not idle:
+            del self._warm_containers[key]
+
+        return container
+
+    def _refill_standby_containers(self, key, factory):
+        with self._standby_lock:
+            missing = self.standby_count - len(self._standby_containers.get(key, [])) - \
+                self._standby_pending.get(key, 0)
+            if missing <= 0 or self._standby_stopped:
+                return
+
+            self._standby_pending[key] = self._standby_pending.get(key, 0) + missing
+            if not self._standby_executor:
+                self._standby_executor = ThreadPoolExecutor(max_workers=self._STANDBY_WORKERS)
+
+            for _ in range(missing):
+                self._standby_executor.submit(self._create_standby_container, key, factory)
+
+    def _create_standby_container(self, key, factory):
+        """
+        Creates one standby container. Runs in the background.
+        """
+
+        container = None
+        keep = False
+
+        try:
+            container = factory()
+            self._ensure_image(container.image)
+            container.network_id = self.docker_network_id
+            container.create()
+        except (DockerImageNotFoundException, docker.errors.DockerException) as ex:
+            # The invoke that needs this container will create one by itself, and report the error if there is one
+            LOG.debug("Unable to create standby container: %s", ex)
+        except Exception:  # pylint: disable=broad-except
+            # Nobody waits for the result of this thread. Report the error here, instead of losing it.
+            LOG.warning("Unable to create standby container", exc_info=True)
+        finally:
+            # Whatever happened, this container is no longer pending. Otherwise no container is ever created again
+            # to replace it.
+            with self._standby_lock:
+                self._standby_pending[key] -= 1
+
+                keep = container is not None and container.is_created() and not self._standby_stopped
+                if keep:
+                    self._standby_containers.setdefault(key, []).append(container)
+
+        if container is not None and not keep:
+            self.stop(container)
+
+    def _delete_containers(self, containers):
+        # Deleting talks to the Docker daemon, so this is done outside of the lock
+        for container in containers:
+            LOG.debug("Removing idle container %s", container.id)
+            self.stop(container)
+
+
+class _PullProgress(object):
+    """
+    Reports progress of an image pull as a percentage of downloaded bytes. A line is written every time another
+    ``_STEP`` percent is done, so that pulls of several images running in parallel can be told apart.
+    """
+
+    _STEP = 10
+
+    def __init__(self, image_name, stream):
+        self._image_name = image_name
+        self._stream = stream
+        self._layers = {}
+        self._reported = 0
+
+    def update(self, line):
+        """
+        :param dict line: One decoded progress message from the Docker pull API
+        :raises DockerImageNotFoundException: If the Docker daemon reported the pull failed
+        """
+
+        if not isinstance(line, dict):
+            return
+
+        if line.get("error"):
+            raise DockerImageNotFoundException(line["error"])
+
+        detail = line.get("progressDetail") or {}
+        if line.get("id") and line.get("status") == "Downloading" and detail.get("total"):
+            self._layers[line["id"]] = (detail.get("current", 0), detail["total"])
+
+        downloaded = sum(current for current, _ in self._layers.values())
+        total = sum(layer_total for _, layer_total in self._layers.values())
+        if not total:
+            return
+
+        percent = downloaded * 100 // total
+        if percent >= self._reported + self._STEP:
+            self._reported = percent - percent % self._STEP
+            self._write(u"{}% of {:.1f}MB".format(self._reported, total / (1024.0 * 1024.0)))
+
+    def done(self):
+        self._write(u"done")
+
+    def _write(self, message):
+        # Write whole lines at once, so output of concurrent pulls does not interleave mid-line
+        self._stream.write(u"{}: {}\n".format(self._image_name, message))
+        self._stream.flush()
+
 
 class DockerImageNotFoundException(Exception):
     pass
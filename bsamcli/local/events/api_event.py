@@ -1,5 +1,8 @@
 """Holds Classes for API Gateway to Lambda Events"""
 
+import json
+from json.encoder import encode_basestring_ascii
+
 
 class ContextIdentity(object):
 
@@ -199,3 +202,112 @@ class ApiGatewayLambdaEvent(object):
                      }
 
         return json_dict
+
+
+class ApiGatewayLambdaEventTemplate(object):
+    """
+    Serializes the ApiGatewayLambdaEvents of one route and method. Everything that is the same for every request of
+    the route, like its RequestContext, is serialized once when the template is created. Every request only
+    serializes its own fields, and joins them with the serialized rest in a single pass. The JSON is the same as the
+    one of ``json.dumps(ApiGatewayLambdaEvent(...).to_dict())``.
+    """
+
+    # Stand in for the fields of a request in the serialized rest of the event. The NUL characters make sure they
+    # cannot be the value of a field, like a resource path.
+    _FIELD_MARKER = "\u0000{}\u0000"
+
+    # Fields of the event that differ between requests, in the order of ``to_json``'s arguments
+    _REQUEST_FIELDS = ("body", "queryStringParameters", "headers", "pathParameters", "path", "isBase64Encoded",
+                       "sourceIp")
+
+    _encode = json.JSONEncoder().encode
+
+    def __init__(self, http_method, resource, stage):
+        """
+        Constructs an ApiGatewayLambdaEventTemplate
+
+        :param str http_method: HTTPMethod of the route
+        :param str resource: Resource of the route, ie. its path as defined in API Gateway
+        :param str stage: Api Gateway Stage
+        """
+
+        markers = {field: self._FIELD_MARKER.format(field) for field in self._REQUEST_FIELDS}
+
+        identity = ContextIdentity(source_ip=markers["sourceIp"])
+        context = RequestContext(resource_path=resource,
+                                 http_method=http_method,
+                                 stage=stage,
+                                 identity=identity,
+                                 path=resource)
+
+        event = ApiGatewayLambdaEvent(http_method=http_method, resource=resource, request_context=context).to_dict()
+        for field in self._REQUEST_FIELDS[:-1]:
+            event[field] = markers[field]
+
+        serialized_markers = [self._encode(markers[field]) for field in self._REQUEST_FIELDS]
+        self._fragments, self._order = self._split(json.dumps(event), serialized_markers)
+
+    def to_json(self, body, query_string_params, headers, path_parameters, path, is_base_64_encoded, source_ip):
+        """
+        Serializes the event of one request
+
+        :param str body: Body or data for the request. If it is base64 encoded, it may be a list of chunks of base64,
+            which are joined into the event without copying them before
+        :param dict query_string_params: Query String parameters
+        :param dict headers: dict of the request Headers
+        :param dict path_parameters: Path Parameters
+        :param str path: Path of the request
+        :param bool is_base_64_encoded: True if the data is base64 encoded.
+        :param str source_ip: Source Ip of the request
+        :return str: JSON of the event
+        """
+
+        encode = self._encode
+        quote = encode_basestring_ascii
+
+        body_parts = None
+        if is_base_64_encoded and body:
+            # Base64 never needs escaping in JSON
+            body_parts = ['"'] + (body if isinstance(body, list) else [body]) + ['"']
+
+        # None instead of empty values, like ApiGatewayLambdaEvent.to_dict. Strings are quoted directly, which is
+        # what the encoder does for them too, without its overhead.
+        values = (quote(body) if body and not body_parts else "null",
+                  encode(query_string_params) if query_string_params else "null",
+                  encode(headers) if headers else "null",
+                  encode(path_parameters) if path_parameters else "null",
+                  quote(path) if path is not None else "null",
+                  "true" if is_base_64_encoded else "false",
+                  quote(source_ip) if source_ip is not None else "null")
+
+        parts = [self._fragments[0]]
+        for index, fragment in zip(self._order, self._fragments[1:]):
+            if index == 0 and body_parts:
+                parts.extend(body_parts)
+            else:
+                parts.append(values[index])
+            parts.append(fragment)
+
+        return "".join(parts)
+
+    @staticmethod
+    def _split(serialized, markers):
+        """
+        Splits the serialized event at the serialized markers of the request fields
+
+        :return tuple(list(str), list(int)): The parts of the event before, between and after the request fields, and
+            the indexes of the markers in the order they are in the event
+        """
+
+        positions = sorted((serialized.index(marker), index, marker) for index, marker in enumerate(markers))
+
+        fragments = []
+        order = []
+        start = 0
+        for position, index, marker in positions:
+            fragments.append(serialized[start:position])
+            order.append(index)
+            start = position + len(marker)
+        fragments.append(serialized[start:])
+
+        return fragments, order
@@ -0,0 +1,158 @@
+"""
+Invokes one function with a batch of payloads for the Local Lambda Service
+"""
+
+import io
+import json
+import threading
+import time
+
+from bsamcli.local.lambdafn.batch import InvokeBatch, elapsed_ms
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound, FunctionThrottled
+from bsamcli.local.services.base_local_service import LambdaOutputParser, LambdaOutputStream
+
+
+class BatchInvocation(InvokeBatch):
+    """
+    Invokes one function with every payload of a batch. Payloads are handed out to worker threads in order, one per
+    concurrency slot of the function, and every invoke holds a slot of the scheduler while it runs. So a batch never
+    runs more invokes of a function at once than the template reserves for it, and shares the slots with any other
+    invokes going through the same scheduler.
+
+    Results are returned in the order of the payloads, no matter in which order the invokes finished. Logs of the
+    function are written per invoke as a whole, so the logs of concurrent invokes don't interleave.
+    """
+
+    # Invokes running at once for functions that do not reserve concurrency
+    _DEFAULT_CONCURRENCY = 10
+
+    def __init__(self, lambda_runner, scheduler, function_name, stderr=None):
+        """
+        Parameters
+        ----------
+        lambda_runner bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner
+            The Lambda runner class capable of invoking the function
+        scheduler bsamcli.local.services.invoke_scheduler.InvokeScheduler
+            Scheduler handing out the concurrency slots
+        function_name str
+            Name of the function to invoke
+        stderr io.BaseIO
+            Optional stream where the stderr from Docker container should be written to
+        """
+        super(BatchInvocation, self).__init__(lambda_runner, function_name, stderr=stderr)
+        self.scheduler = scheduler
+
+        self._payloads = None
+        self._results = None
+        self._stderr_lock = threading.Lock()
+
+    @property
+    def concurrency(self):
+        """
+        Returns
+        -------
+        int
+            Number of invokes of the batch running at the same time
+        """
+        limits = [self.scheduler.function_concurrency.get(self.function_name, self._DEFAULT_CONCURRENCY)]
+        if self.scheduler.max_concurrency is not None:
+            limits.append(self.scheduler.max_concurrency)
+
+        return max(min(limits), 1)
+
+    def run(self, payloads):
+        """
+        Invokes the function with all of the given payloads. Blocks until all invokes completed.
+
+        Parameters
+        ----------
+        payloads list(str)
+            Events to invoke the function with. Each must be a valid JSON string
+
+        Returns
+        -------
+        list(dict)
+            Result of every invoke, in the order of the payloads. See ``_invoke``
+
+        Raises
+        ------
+        FunctionNotFound
+            If the function does not exist. No further payloads are invoked then
+        """
+        self._payloads = payloads
+        self._results = [None] * len(payloads)
+
+        # Payloads are handed out by their index, so every result lands at the index of its payload
+        self._run(range(len(payloads)), min(self.concurrency, len(payloads)), "batch-invocation")
+
+        return self._results
+
+    def _done(self, event, result):
+        self._results[event] = result
+
+    def _invoke(self, event):
+        """
+        Invokes the function with one payload, once a slot is available
+
+        Parameters
+        ----------
+        event int
+            Index of the payload
+
+        Returns
+        -------
+        dict
+            Outcome of the invoke as ``status``, milliseconds spent waiting for a slot as ``queued_ms`` and running
+            the invoke as ``latency_ms``. The response of the function as ``payload``, parsed if it is JSON, unless
+            the invoke timed out, or why it could not run as ``error``. Request ID, duration and whether the
+            container was cold, if the runner measured them.
+        """
+        start = time.time()
+
+        try:
+            self.scheduler.acquire(self.function_name)
+        except FunctionThrottled as ex:
+            return {"status": self.THROTTLED, "queued_ms": elapsed_ms(start), "error": str(ex)}
+
+        queued_ms = elapsed_ms(start)
+        stdout_stream = LambdaOutputStream()
+        stderr_stream = io.BytesIO()
+
+        start = time.time()
+        try:
+            metrics = self.lambda_runner.invoke(self.function_name, self._payloads[event], stdout=stdout_stream,
+                                                stderr=stderr_stream)
+            latency_ms = elapsed_ms(start)
+            lambda_response = stdout_stream.read_response().decode('utf-8', 'replace')
+        except FunctionNotFound:
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            result = self._failed(ex)
+            result.update(queued_ms=queued_ms, latency_ms=elapsed_ms(start))
+            return result
+        finally:
+            self.scheduler.release(self.function_name)
+            self._write_logs(stdout_stream, stderr_stream)
+            stdout_stream.close()
+
+        is_error = LambdaOutputParser.is_lambda_error_response(lambda_response)
+        result = {"queued_ms": queued_ms, "latency_ms": latency_ms}
+        result.update(self._classify(metrics, is_error))
+
+        if result["status"] != self.TIMEOUT:
+            try:
+                result["payload"] = json.loads(lambda_response)
+            except ValueError:
+                result["payload"] = lambda_response
+
+        return result
+
+    def _write_logs(self, stdout_stream, stderr_stream):
+        if not self.stderr:
+            return
+
+        with self._stderr_lock:
+            if stdout_stream.has_logs:
+                stdout_stream.write_logs(self.stderr)
+                self.stderr.write(b"\n")
+            self.stderr.write(stderr_stream.getvalue())
@@ -0,0 +1,293 @@
+"""
+Queue of asynchronous invokes of the Local Lambda Service
+"""
+
+import heapq
+import io
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+
+from bsamcli.local.services.base_local_service import LambdaOutputParser, LambdaOutputStream
+
+LOG = logging.getLogger(__name__)
+
+
+class EventInvokeQueue(object):
+    """
+    Invokes functions asynchronously, like CFC does for the "Event" invocation type. Events are accepted right away and
+    invoked by a pool of worker threads, in the order they arrived. The responses of the functions are discarded.
+
+    Like on CFC, an invoke that fails, because the function returned an error or could not be run at all, is retried,
+    twice by default: the first time ``retry_delay`` seconds later, the second time twice as long after that. Events
+    that still fail, or could not be invoked within 6 hours, are dropped. They are written to the dead-letter file, if
+    there is one, as JSON lines.
+
+    This class is thread-safe.
+    """
+
+    _DEFAULT_WORKERS = 4
+    _DEFAULT_MAX_RETRIES = 2
+    _DEFAULT_RETRY_DELAY = 60
+
+    # CFC drops events that could not be invoked successfully for this many seconds
+    _MAX_EVENT_AGE = 6 * 60 * 60
+
+    def __init__(self, lambda_runner, workers=None, max_retries=None, retry_delay=None, dead_letter_file=None,
+                 stderr=None):
+        """
+        Parameters
+        ----------
+        lambda_runner bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner
+            The Lambda runner class capable of invoking the function
+        workers int
+            Optional. Number of events invoked at the same time. Defaults to 4
+        max_retries int
+            Optional. Number of times a failed invoke is retried. Defaults to 2, like on CFC
+        retry_delay float
+            Optional. Seconds before the first retry. Every further retry waits twice as long. Defaults to 60
+        dead_letter_file str
+            Optional. Path of the file events are appended to, when they are dropped
+        stderr io.BaseIO
+            Optional stream where the stderr from Docker container should be written to
+        """
+        self.lambda_runner = lambda_runner
+        self.workers = workers or self._DEFAULT_WORKERS
+        self.max_retries = max_retries if max_retries is not None else self._DEFAULT_MAX_RETRIES
+        self.retry_delay = retry_delay if retry_delay is not None else self._DEFAULT_RETRY_DELAY
+        self.dead_letter_file = dead_letter_file
+        self.stderr = stderr
+
+        self.accepted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+        self._condition = threading.Condition()
+        self._dead_letter_lock = threading.Lock()
+
+        # (time the event is due, sequence number, event) of events waiting to be invoked. The sequence number keeps
+        # events that are due at the same time in arrival order. Times are of the monotonic clock, so a jump of the
+        # wall clock does not change when events are retried or dropped.
+        self._pending = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+
+        self._stopped = False
+        self._threads = []
+
+    def start(self):
+        """
+        Starts the worker threads
+        """
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._work, name="event-worker-{}".format(index))
+                         for index in range(self.workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """
+        Stops the worker threads once they finished the invokes they are running. Events that were not invoked yet
+        are dropped.
+        """
+        with self._condition:
+            self._stopped = True
+            dropped = len(self._pending)
+            self._pending = []
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if dropped:
+            LOG.warning("Dropped %d asynchronous invokes that did not run before stopping", dropped)
+
+    def put(self, function_name, event):
+        """
+        Queues an asynchronous invoke
+
+        Parameters
+        ----------
+        function_name str
+            Name of the function to invoke
+        event str
+            Event to invoke the function with. Must be a valid JSON string
+
+        Returns
+        -------
+        str
+            Request ID of the invoke
+        """
+        queued = _QueuedEvent(str(uuid.uuid4()), function_name, event, time.time(), time.monotonic())
+
+        with self._condition:
+            self.accepted += 1
+            self._push(queued.queued_at, queued)
+
+        LOG.debug("Queued asynchronous invoke %s of %s", queued.request_id, function_name)
+        return queued.request_id
+
+    @property
+    def stats(self):
+        """
+        Returns
+        -------
+        dict
+            Number of events waiting to be invoked and running, seconds the oldest waiting event is queued for, and
+            the number of events accepted, succeeded and dropped, failed invokes and retries so far
+        """
+        with self._condition:
+            now = time.monotonic()
+            oldest = min([queued.queued_at for _, _, queued in self._pending] or [now])
+
+            return {
+                "depth": len(self._pending),
+                "in_flight": self._in_flight,
+                "oldest_age": round(now - oldest, 3),
+                "accepted": self.accepted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried,
+                "dead_lettered": self.dead_lettered,
+            }
+
+    def _push(self, due, queued):
+        heapq.heappush(self._pending, (due, next(self._sequence), queued))
+        self._condition.notify()
+
+    def _next(self):
+        """
+        Waits for the next event that is due
+
+        Returns
+        -------
+        _QueuedEvent
+            Event to invoke. None, if the queue was stopped
+        """
+        with self._condition:
+            while not self._stopped:
+                if self._pending:
+                    wait = self._pending[0][0] - time.monotonic()
+                    if wait <= 0:
+                        self._in_flight += 1
+                        return heapq.heappop(self._pending)[2]
+                else:
+                    wait = None
+
+                self._condition.wait(wait)
+
+        return None
+
+    def _work(self):
+        while True:
+            queued = self._next()
+            if not queued:
+                return
+
+            try:
+                queued.attempts += 1
+                error = self._invoke(queued)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+
+            if error is None:
+                with self._condition:
+                    self.succeeded += 1
+                continue
+
+            self._retry_or_drop(queued, error)
+
+    def _invoke(self, queued):
+        """
+        Invokes the function with the event once
+
+        Returns
+        -------
+        str
+            Why the invoke failed. None, if it succeeded
+        """
+        stdout_stream = LambdaOutputStream()
+
+        try:
+            # Every attempt runs with the request ID returned by ``put``, like retries on CFC do
+            metrics = self.lambda_runner.invoke(queued.function_name, queued.event, stdout=stdout_stream,
+                                                stderr=self.stderr, request_id=queued.request_id)
+
+            if self.stderr and stdout_stream.has_logs:
+                stdout_stream.write_logs(self.stderr)
+
+            if metrics and metrics.timed_out:
+                return "Task timed out"
+
+            lambda_response = stdout_stream.read_response().decode('utf-8', 'replace')
+            if LambdaOutputParser.is_lambda_error_response(lambda_response):
+                return lambda_response
+
+            return None
+        except Exception as ex:  # pylint: disable=broad-except
+            # Like on CFC, errors of the service are retried just like errors of the function
+            LOG.debug("Asynchronous invoke %s failed", queued.request_id, exc_info=True)
+            return str(ex) or type(ex).__name__
+        finally:
+            stdout_stream.close()
+
+    def _retry_or_drop(self, queued, error):
+        retries = queued.attempts - 1
+        due = time.monotonic() + self.retry_delay * 2 ** retries
+
+        with self._condition:
+            self.failed += 1
+
+            if retries < self.max_retries and due - queued.queued_at <= self._MAX_EVENT_AGE and not self._stopped:
+                LOG.info("Asynchronous invoke %s of %s failed. Retrying in %s seconds",
+                         queued.request_id, queued.function_name, self.retry_delay * 2 ** retries)
+                self.retried += 1
+                self._push(due, queued)
+                return
+
+            self.dead_lettered += 1
+
+        LOG.warning("Asynchronous invoke %s of %s failed %d times. Dropping the event",
+                    queued.request_id, queued.function_name, queued.attempts)
+        self._dead_letter(queued, error)
+
+    def _dead_letter(self, queued, error):
+        if not self.dead_letter_file:
+            return
+
+        line = json.dumps({
+            "timestamp": time.time(),
+            "request_id": queued.request_id,
+            "function_name": queued.function_name,
+            "event": json.loads(queued.event),
+            "enqueued_at": queued.enqueued_at,
+            "attempts": queued.attempts,
+            "error": error,
+        })
+
+        try:
+            with self._dead_letter_lock:
+                with io.open(self.dead_letter_file, 'a', encoding='utf-8') as fp:
+                    fp.write(line + u"\n")
+        except (IOError, OSError) as ex:
+            LOG.warning("Unable to write event %s to %s: %s", queued.request_id, self.dead_letter_file, ex)
+
+
+class _QueuedEvent(object):
+
+    def __init__(self, request_id, function_name, event, enqueued_at, queued_at):
+        self.request_id = request_id
+        self.function_name = function_name
+        self.event = event
+        # Wall clock time, as written to the dead-letter file, and monotonic time the event was queued at
+        self.enqueued_at = enqueued_at
+        self.queued_at = queued_at
+        self.attempts = 0
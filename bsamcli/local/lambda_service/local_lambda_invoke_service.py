@@ -2,13 +2,15 @@
 
 import json
 import logging
-import io
 
 from flask import Flask, request
 
 
-from bsamcli.local.services.base_local_service import BaseLocalService, LambdaOutputParser, CaseInsensitiveDict
+from bsamcli.local.services.base_local_service import BaseLocalService, LambdaOutputParser, LambdaOutputStream, \
+    CaseInsensitiveDict
 from bsamcli.local.lambdafn.exceptions import FunctionNotFound
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler
+from .batch_invocation import BatchInvocation
 from .lambda_error_responses import LambdaErrorResponses
 
 LOG = logging.getLogger(__name__)
@@ -16,7 +18,19 @@ LOG = logging.getLogger(__name__)
 
 class LocalLambdaInvokeService(BaseLocalService):
 
-    def __init__(self, lambda_runner, port, host, stderr=None):
+    # Local only path that returns the state of the queue of asynchronous invokes
+    EVENT_QUEUE_PATH = '/local/event-queue'
+
+    # Invocation types that are supported
+    INVOCATION_TYPES = ('RequestResponse', 'Event')
+
+    # Local only path that invokes a function with every payload of a JSON array
+    BATCH_INVOCATIONS_PATH = '/2015-03-31/functions/<function_name>/batch-invocations'
+
+    # Maximum number of payloads of one batch
+    MAX_BATCH_SIZE = 1000
+
+    def __init__(self, lambda_runner, port, host, stderr=None, server=None, event_queue=None, scheduler=None):
         """
         Creates a Local Lambda Service that will only response to invoking a function
 
@@ -30,10 +44,19 @@ class LocalLambdaInvokeService(BaseLocalService):
             Optional. host to start the service on
         stderr io.BaseIO
             Optional stream where the stderr from Docker container should be written to
+        server bsamcli.local.services.server.PooledServer
+            Optional. Server to run on. Defaults to Flask's development server
+        event_queue bsamcli.local.lambda_service.event_queue.EventInvokeQueue
+            Optional. Queue of asynchronous invokes. The "Event" invocation type is not supported without it
+        scheduler bsamcli.local.services.invoke_scheduler.InvokeScheduler
+            Optional. Scheduler handing out the concurrency slots to batch invocations. Defaults to one without limits
         """
-        super(LocalLambdaInvokeService, self).__init__(lambda_runner.is_debugging(), port=port, host=host)
+        super(LocalLambdaInvokeService, self).__init__(lambda_runner.is_debugging(), port=port, host=host,
+                                                       server=server)
         self.lambda_runner = lambda_runner
         self.stderr = stderr
+        self.event_queue = event_queue
+        self.scheduler = scheduler or InvokeScheduler()
 
     def create(self):
         """
@@ -48,6 +71,18 @@ class LocalLambdaInvokeService(BaseLocalService):
                                methods=['POST'],
                                provide_automatic_options=False)
 
+        self._app.add_url_rule(self.BATCH_INVOCATIONS_PATH,
+                               endpoint=self.BATCH_INVOCATIONS_PATH,
+                               view_func=self._batch_invoke_request_handler,
+                               methods=['POST'],
+                               provide_automatic_options=False)
+
+        self._app.add_url_rule(self.EVENT_QUEUE_PATH,
+                               endpoint=self.EVENT_QUEUE_PATH,
+                               view_func=self._event_queue_handler,
+                               methods=['GET'],
+                               provide_automatic_options=False)
+
         # setup request validation before Flask calls the view_func
         self._app.before_request(LocalLambdaInvokeService.validate_request)
 
@@ -63,7 +98,7 @@ class LocalLambdaInvokeService(BaseLocalService):
             2. Query Parameters are sent to the endpoint
             3. The Request Content-Type is not application/json
             4. 'X-Amz-Log-Type' header is not 'None'
-            5. 'X-Amz-Invocation-Type' header is not 'RequestResponse'
+            5. 'X-Amz-Invocation-Type' header is not 'RequestResponse' or 'Event'
 
         Returns
         -------
@@ -101,10 +136,12 @@ class LocalLambdaInvokeService(BaseLocalService):
                 "log-type: {} is not supported. None is only supported.".format(log_type))
 
         invocation_type = request_headers.get('X-Amz-Invocation-Type', 'RequestResponse')
-        if invocation_type != 'RequestResponse':
-            LOG.warning("invocation-type: %s is not supported. RequestResponse is only supported.", invocation_type)
+        if invocation_type not in LocalLambdaInvokeService.INVOCATION_TYPES:
+            LOG.warning("invocation-type: %s is not supported. RequestResponse and Event are only supported.",
+                        invocation_type)
             return LambdaErrorResponses.not_implemented_locally(
-                "invocation-type: {} is not supported. RequestResponse is only supported.".format(invocation_type))
+                "invocation-type: {} is not supported. RequestResponse and Event are only supported."
+                .format(invocation_type))
 
     def _construct_error_handling(self):
         """
@@ -138,24 +175,121 @@ class LocalLambdaInvokeService(BaseLocalService):
 
         request_data = request_data.decode('utf-8')
 
-        stdout_stream = io.BytesIO()
+        if flask_request.headers.get('X-Amz-Invocation-Type') == 'Event':
+            return self._queue_invoke(function_name, request_data)
+
+        stdout_stream = LambdaOutputStream()
 
+        # The stream is closed here, unless the response is sent from it
+        streamed = False
         try:
-            self.lambda_runner.invoke(function_name, request_data, stdout=stdout_stream, stderr=self.stderr)
+            try:
+                self.lambda_runner.invoke(function_name, request_data, stdout=stdout_stream, stderr=self.stderr)
+            except FunctionNotFound:
+                LOG.debug('%s was not found to invoke.', function_name)
+                return LambdaErrorResponses.resource_not_found(function_name)
+
+            if self.stderr and stdout_stream.has_logs:
+                # Write the logs to stderr if available.
+                stdout_stream.write_logs(self.stderr)
+
+            headers = {'Content-Type': 'application/json'}
+
+            if stdout_stream.response_size <= stdout_stream.spill_threshold:
+                lambda_response = stdout_stream.read_response()
+
+                if LambdaOutputParser.is_lambda_error_response(lambda_response):
+                    headers['x-amz-function-error'] = 'Unhandled'
+
+                return self.service_response(lambda_response, headers, 200)
+
+            # Large responses are sent as they are read back, so they are never held in memory as a whole. Errors
+            # returned by a function are small, so a response this large is not one.
+            headers['Content-Length'] = str(stdout_stream.response_size)
+            response = self.service_response(stdout_stream.iter_response(), headers, 200)
+            response.call_on_close(stdout_stream.close)
+            streamed = True
+
+            return response
+        finally:
+            if not streamed:
+                stdout_stream.close()
+
+    def _batch_invoke_request_handler(self, function_name):
+        """
+        Request Handler for the local only batch invocations path. Invokes the function with every payload of the
+        JSON array in the request, running as many invokes at once as the function has concurrency slots
+
+        Parameters
+        ----------
+        function_name str
+            Name of the function to invoke
+
+        Returns
+        -------
+        A Flask Response with a JSON array of the result of every invoke, in the order of the payloads, see
+        ``BatchInvocation._invoke``
+        """
+        flask_request = request
+
+        if flask_request.headers.get('X-Amz-Invocation-Type') == 'Event':
+            return LambdaErrorResponses.not_implemented_locally(
+                "invocation-type: Event is not supported for batch invocations.")
+
+        payloads = json.loads(flask_request.get_data().decode('utf-8') or '[]')
+        if not isinstance(payloads, list):
+            return LambdaErrorResponses.invalid_request_content("Request body must be a JSON array of payloads")
+
+        if len(payloads) > self.MAX_BATCH_SIZE:
+            return LambdaErrorResponses.invalid_request_content(
+                "A batch can have at most {} payloads".format(self.MAX_BATCH_SIZE))
+
+        batch = BatchInvocation(self.lambda_runner, self.scheduler, function_name, stderr=self.stderr)
+
+        try:
+            results = batch.run([json.dumps(payload) for payload in payloads])
         except FunctionNotFound:
             LOG.debug('%s was not found to invoke.', function_name)
             return LambdaErrorResponses.resource_not_found(function_name)
 
-        lambda_response, lambda_logs, is_lambda_user_error_response = \
-            LambdaOutputParser.get_lambda_output(stdout_stream)
+        return self.service_response(json.dumps(results), {'Content-Type': 'application/json'}, 200)
+
+    def _queue_invoke(self, function_name, request_data):
+        """
+        Queues an asynchronous invoke of the function, and responds right away like Lambda does
+
+        Parameters
+        ----------
+        function_name str
+            Name of the function to invoke
+        request_data str
+            Event to invoke the function with
+
+        Returns
+        -------
+        A Flask Response with status 202 and no body
+        """
+        if not self.event_queue:
+            return LambdaErrorResponses.not_implemented_locally("invocation-type: Event is not enabled.")
+
+        # The function is looked up right away, so an unknown function is reported to the caller, not dropped later
+        if not self.lambda_runner.provider.get(function_name):
+            LOG.debug('%s was not found to invoke.', function_name)
+            return LambdaErrorResponses.resource_not_found(function_name)
+
+        request_id = self.event_queue.put(function_name, request_data)
 
-        if self.stderr and lambda_logs:
-            # Write the logs to stderr if available.
-            self.stderr.write(lambda_logs)
+        return self.service_response('', {'x-amzn-RequestId': request_id}, 202)
+
+    def _event_queue_handler(self):
+        """
+        Returns the state of the queue of asynchronous invokes, see ``EventInvokeQueue.stats``
 
-        if is_lambda_user_error_response:
-            return self.service_response(lambda_response,
-                                         {'Content-Type': 'application/json', 'x-amz-function-error': 'Unhandled'},
-                                         200)
+        Returns
+        -------
+        A Flask Response with the state as JSON. 404, if there is no queue
+        """
+        if not self.event_queue:
+            return LambdaErrorResponses.generic_path_not_found()
 
-        return self.service_response(lambda_response, {'Content-Type': 'application/json'}, 200)
+        return self.service_response(json.dumps(self.event_queue.stats), {'Content-Type': 'application/json'}, 200)
@@ -0,0 +1,291 @@
+"""
+Cache of code artifacts prepared for mounting into function containers
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+LOG = logging.getLogger(__name__)
+
+
+class ArtifactCache(object):
+    """
+    Prepares every version of a code artifact (ex: a jar file) only once. The prepared directory is stored in the cache
+    directory, under the hash of the contents of the artifact, and shared by all invokes that run this version of the
+    artifact. Prepared directories are made read-only, so one invoke can't change the code another invoke runs.
+
+    Once the cache grows beyond its maximum size, directories are removed, least recently used first. Directories used
+    by an invoke of this process, or used by any process within ``min_idle`` seconds, are kept. The cache directory is
+    shared by all processes, ex: the workers of ``--processes``, and the containers of another process, ex: warm ones,
+    may still have a directory mounted that this process does not know to be in use. This class is thread-safe.
+    """
+
+    # Allow 1 GB of prepared artifacts by default
+    _DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+    # Artifacts are prepared in directories with this prefix, and moved in place once they are complete
+    _TMP_PREFIX = ".tmp-"
+
+    _HASH_CHUNK_SIZE = 1024 * 1024
+
+    # Keep directories used within this many seconds. Longer than warm containers, which keep their code mounted
+    # between invokes, stay idle.
+    _DEFAULT_MIN_IDLE = 15 * 60
+
+    def __init__(self, cache_dir=None, max_size=None, min_idle=None):
+        """
+        Initialize the cache
+
+        :param string cache_dir: Optional. Directory to keep the prepared artifacts in. Defaults to a directory in the
+            system's temporary directory
+        :param int max_size: Optional. Maximum number of bytes of prepared artifacts to keep
+        :param int min_idle: Optional. Seconds a directory must not have been used for, by any process, before it may
+            be removed. Defaults to 15 minutes
+        """
+
+        # Docker file sharing does not resolve symlinks (ex: /var/folders on Mac OSX). Use the real path.
+        self.cache_dir = os.path.realpath(cache_dir or os.path.join(tempfile.gettempdir(), "bsam-artifacts"))
+        self.max_size = max_size if max_size is not None else self._DEFAULT_MAX_SIZE
+        self.min_idle = min_idle if min_idle is not None else self._DEFAULT_MIN_IDLE
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        # Key to size of the prepared directory, least recently used first. Loaded from the cache directory on first
+        # use, so artifacts prepared by earlier runs are reused too.
+        self._entries = None
+        self._in_use = {}
+
+        # Hashing a big artifact takes a while. Remember the hash as long as the file is not modified.
+        self._hashes = {}
+
+    @contextmanager
+    def use(self, artifact_path, prepare):
+        """
+        Context manager that provides the prepared directory of the given artifact. The directory is not removed
+        from the cache while the body runs.
+
+            with cache.use("/path/to/function.jar", copy_jar) as code_dir:
+                ...
+
+        :param string artifact_path: Path to the artifact
+        :param callable prepare: Called with the artifact path and an empty directory, if the artifact is not in the
+            cache yet. Must fill the directory with the prepared artifact
+        :return string: Path to the prepared directory. Do not modify its contents
+        """
+
+        key = self._get_key(artifact_path)
+        path = self._prepare(key, artifact_path, prepare)
+
+        try:
+            self._evict()
+            yield path
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+
+    def _prepare(self, key, artifact_path, prepare):
+        """
+        Makes sure the artifact is prepared, and marks it used
+
+        :return string: Path to the prepared directory
+        """
+
+        path = os.path.join(self.cache_dir, key)
+
+        # Concurrent invokes of the same artifact wait for one of them to prepare it
+        with self._get_key_lock(key):
+            with self._lock:
+                size = self._get_entries().get(key)
+
+            if not _touch(path):
+                size = self._prepare_directory(artifact_path, path, prepare)
+            elif size is None:
+                # Prepared by another process
+                size = _get_directory_size(path)
+
+            with self._lock:
+                self._entries[key] = size
+                self._entries.move_to_end(key)
+                self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        return path
+
+    def _prepare_directory(self, artifact_path, path, prepare):
+        LOG.info("Preparing %s for the artifact cache", artifact_path)
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        tmp_path = tempfile.mkdtemp(prefix=self._TMP_PREFIX, dir=self.cache_dir)
+
+        try:
+            prepare(artifact_path, tmp_path)
+            size = _get_directory_size(tmp_path)
+            _make_read_only(tmp_path)
+
+            # Moving the complete directory in place is atomic, so other processes never see a partial directory.
+            # Its modification time is its last use.
+            os.utime(tmp_path, None)
+            os.rename(tmp_path, path)
+        except OSError:
+            if not os.path.isdir(path):
+                _remove_directory(tmp_path)
+                raise
+
+            # Another process prepared the same artifact at the same time. Use theirs.
+            _remove_directory(tmp_path)
+            size = _get_directory_size(path)
+        except Exception:
+            _remove_directory(tmp_path)
+            raise
+
+        return size
+
+    def _evict(self):
+        """
+        Removes least recently used directories that are neither in use nor used recently, until the cache fits into
+        its maximum size
+        """
+
+        with self._lock:
+            candidates = [key for key in self._entries if key not in self._in_use]
+
+        for key in candidates:
+            # Skip artifacts that are being prepared or picked up for an invoke right now
+            key_lock = self._get_key_lock(key)
+            if not key_lock.acquire(False):
+                continue
+
+            try:
+                with self._lock:
+                    if sum(self._entries.values()) <= self.max_size:
+                        return
+
+                    if key in self._in_use or key not in self._entries:
+                        continue
+
+                path = os.path.join(self.cache_dir, key)
+                try:
+                    idle = time.time() - os.path.getmtime(path)
+                except OSError:
+                    idle = None
+
+                if idle is not None and idle < self.min_idle:
+                    # Used recently, ex: by another process. It may still be mounted into a container.
+                    continue
+
+                with self._lock:
+                    del self._entries[key]
+
+                if idle is None:
+                    # Removed by another process
+                    continue
+
+                # Move the directory out of the way first, so it is gone for the next invoke right away
+                trash_path = tempfile.mkdtemp(prefix=self._TMP_PREFIX, dir=self.cache_dir)
+                os.rename(path, os.path.join(trash_path, key))
+            finally:
+                key_lock.release()
+
+            LOG.debug("Removing %s from the artifact cache", key)
+            _remove_directory(trash_path)
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _get_key(self, artifact_path):
+        """
+        :return string: SHA256 hash of the contents of the artifact
+        """
+
+        stats = os.stat(artifact_path)
+        signature = (artifact_path, stats.st_mtime_ns, stats.st_size)
+
+        with self._lock:
+            digest = self._hashes.get(signature)
+
+        if not digest:
+            sha256 = hashlib.sha256()
+            with open(artifact_path, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(self._HASH_CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+
+            digest = sha256.hexdigest()
+            with self._lock:
+                self._hashes[signature] = digest
+
+        return digest
+
+    def _get_entries(self):
+        """
+        Loads the directories prepared by earlier runs, least recently used first. Must be called while holding the
+        lock.
+
+        :return OrderedDict: Key to size of the prepared directory
+        """
+        if self._entries is not None:
+            return self._entries
+
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.startswith(self._TMP_PREFIX) or not os.path.isdir(path):
+                    continue
+
+                found.append((os.path.getmtime(path), name, _get_directory_size(path)))
+
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(found))
+        return self._entries
+
+
+def _touch(path):
+    """
+    Marks the given directory used now. Its modification time is read by the next run and by other processes.
+
+    :return bool: False, if the directory does not exist, ex: because another process removed it
+    """
+    try:
+        os.utime(path, None)
+        return True
+    except OSError:
+        return False
+
+
+def _get_directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path)
+               for name in names)
+
+
+def _make_read_only(path):
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            os.chmod(os.path.join(root, name), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        for name in dirs:
+            os.chmod(os.path.join(root, name), 0o555)
+
+    os.chmod(path, 0o555)
+
+
+def _remove_directory(path):
+    def make_writable(func, failed_path, _):
+        # Directories are read-only. Make the parent writable, so its contents can be removed.
+        os.chmod(os.path.dirname(failed_path), 0o755)
+        os.chmod(failed_path, 0o755)
+        func(failed_path)
+
+    if os.path.exists(path):
+        shutil.rmtree(path, onerror=make_writable)
@@ -0,0 +1,104 @@
+"""
+CFC runtime that runs functions from an asyncio event loop
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+
+from .metrics import InvokeMetrics
+from .runtime import CfcRuntime, _write_event_file, _write_timeout_message
+
+LOG = logging.getLogger(__name__)
+
+
+class AsyncCfcRuntime(CfcRuntime):
+    """
+    Runs CFC functions like ``CfcRuntime``, except that ``invoke`` is a coroutine. While a function runs, no thread is
+    blocked on the Docker socket, so a single event loop can drive thousands of invokes at once instead of needing one
+    thread per invoke.
+
+    Every invoke runs in a container of its own. Reusing containers, debugging and installing dependencies are
+    interactive or stateful and stay with ``CfcRuntime``.
+    """
+
+    def __init__(self, container_manager, artifact_cache=None, metrics_file=None, cpu_curve=None):
+        """
+        Initialize the runtime
+
+        :param bsamcli.local.docker.async_manager.AsyncContainerManager container_manager: Runs the containers
+        :param bsamcli.local.lambdafn.artifact_cache.ArtifactCache artifact_cache: Optional. Cache of jar files copied
+            for mounting into containers
+        :param bsamcli.local.lambdafn.metrics.MetricsFile metrics_file: Optional. File to append the metrics of every
+            invoke to
+        :param bsamcli.local.docker.cpu_curve.CpuCurve cpu_curve: Optional. Gives functions a CPU share proportional to
+            their memory
+        """
+        super(AsyncCfcRuntime, self).__init__(container_manager,
+                                              artifact_cache=artifact_cache,
+                                              metrics_file=metrics_file,
+                                              cpu_curve=cpu_curve)
+
+    async def invoke(self,  # pylint: disable=arguments-differ,invalid-overridden-method
+                     function_config,
+                     cwd,
+                     event,
+                     stdout=None,
+                     stderr=None):
+        """
+        Invoke the given CFC function locally. Returns once the function completed or timed out.
+
+        :param FunctionConfig function_config: Configuration of the function to invoke
+        :param string cwd: Directory relative code paths are resolved against
+        :param event: String input event passed to CFC function
+        :param io.IOBase stdout: Optional. IO Stream to that receives stdout text from container.
+        :param io.IOBase stderr: Optional. IO Stream that receives stderr text from container
+        :return bsamcli.local.lambdafn.metrics.InvokeMetrics: Metrics of the invoke, ex: whether it timed out
+        """
+
+        env_vars = function_config.env_vars.resolve()
+        metrics = InvokeMetrics(function_config.name,
+                                request_id=env_vars.get("_REQUEST_ID"),
+                                memory_size=function_config.memory)
+
+        # Copying a jar into the artifact cache reads the whole file. Keep it off the event loop.
+        code_dir_context = self._get_code_dir(function_config, cwd, None)
+        code_dir = await asyncio.get_event_loop().run_in_executor(None, code_dir_context.__enter__)
+
+        container = None
+        try:
+            container = self._create_container(function_config, code_dir, env_vars)
+            _write_event_file(container.event_path, event)
+            container.metrics = metrics
+
+            output = await self._container_manager.run(container)
+
+            # Like CfcRuntime, the timeout starts once the container started
+            try:
+                await asyncio.wait_for(self._container_manager.wait_for_logs(container, output,
+                                                                             stdout=stdout, stderr=stderr),
+                                       function_config.timeout)
+            except asyncio.TimeoutError:
+                LOG.info("Function '%s' timed out after %d seconds", function_config.name, function_config.timeout)
+                metrics.timed_out = True
+
+            metrics.mark("exited")
+            if metrics.timed_out:
+                _write_timeout_message(stderr, env_vars.get("_REQUEST_ID"), function_config.timeout)
+
+            self._report_metrics(metrics, stderr)
+
+        finally:
+            if container:
+                container.metrics = None
+                await self._container_manager.stop(container)
+                shutil.rmtree(os.path.dirname(container.event_path), ignore_errors=True)
+
+            code_dir_context.__exit__(None, None, None)
+
+        return metrics
+
+    def _get_container_docker_client(self):
+        # Containers of this runtime are driven by the asyncio container manager. They don't talk to Docker themselves.
+        return None
@@ -0,0 +1,156 @@
+"""
+Invokes one function with many events on a pool of worker threads
+"""
+
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class InvokeBatch(object):
+    """
+    Invokes one function with every event of an iterable, on a fixed number of worker threads. Every worker takes the
+    next event as soon as its invoke finished, so slow events don't hold up the others. Every batch classifies the
+    outcome of an invoke the same way.
+
+    Subclasses invoke the function with one event in ``_invoke``, and get the result of the invoke in ``_done``. If
+    the function does not exist, the events cannot be read or a result cannot be handled, no further events are
+    invoked, and ``_run`` raises the error once the running invokes completed.
+    """
+
+    # Outcomes of an invoke
+    SUCCESS = "success"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    THROTTLED = "throttled"
+    FAILED = "failed"
+
+    def __init__(self, lambda_runner, function_name, stderr=None):
+        """
+        :param bsamcli.commands.local.lib.local_lambda.LocalLambdaRunner lambda_runner: Runner to invoke the function
+        :param string function_name: Name of the function to invoke
+        :param io.BaseIO stderr: Optional. Stream the logs of the function are written to, as bytes
+        """
+
+        self.lambda_runner = lambda_runner
+        self.function_name = function_name
+        self.stderr = stderr
+
+        self._events = None
+        self._events_lock = threading.Lock()
+        self._error = None
+
+    def _run(self, events, workers, name):
+        """
+        Invokes the function with all of the given events. Blocks until all invokes completed.
+
+        :param events: Iterable of the events, handed to ``_invoke`` one by one
+        :param int workers: Number of invokes running at the same time
+        :param string name: Prefix of the names of the worker threads
+        :raises FunctionNotFound: If the function does not exist
+        :raises Exception: Any error of reading the events, or of ``_done``
+        """
+
+        self._events = iter(events)
+        self._error = None
+
+        threads = [threading.Thread(target=self._work, name="{}-{}".format(name, index)) for index in range(workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error:
+            raise self._error  # pylint: disable=raising-bad-type
+
+    def _invoke(self, event):
+        """
+        Invokes the function with one event
+
+        :param event: Event of the iterable given to ``_run``
+        :return dict: Result of the invoke
+        :raises FunctionNotFound: If the function does not exist
+        """
+
+        raise NotImplementedError()
+
+    def _done(self, event, result):
+        """
+        Called by the worker thread of an invoke, once the invoke completed
+
+        :param event: Event of the iterable given to ``_run``
+        :param dict result: Result of the invoke, as returned by ``_invoke``
+        """
+
+        raise NotImplementedError()
+
+    def _work(self):
+        try:
+            while True:
+                event = self._take()
+                if event is None:
+                    return
+
+                self._done(event, self._invoke(event))
+        except Exception as ex:  # pylint: disable=broad-except
+            # ex: FunctionNotFound, as every other event would fail the same way. Any other error would end this worker
+            # silently otherwise. The first error stops the batch.
+            with self._events_lock:
+                self._error = self._error or ex
+
+    def _take(self):
+        """
+        :return: Next event to invoke. None, if all events were taken or the batch failed
+        :raises Exception: If the events cannot be read
+        """
+
+        with self._events_lock:
+            if self._error:
+                return None
+            return next(self._events, None)
+
+    def _classify(self, metrics, is_error):
+        """
+        Classifies an invoke that ran, ex: whether it succeeded
+
+        :param bsamcli.local.lambdafn.metrics.InvokeMetrics metrics: Metrics of the invoke. None, if the runner did
+            not measure them
+        :param bool is_error: True, if the function returned an error
+        :return dict: ``status`` of the invoke. Request ID, duration and whether the container was cold, if the runner
+            measured them
+        """
+
+        result = {}
+        if metrics:
+            result.update(request_id=metrics.request_id, duration_ms=metrics.duration, cold=metrics.cold)
+
+        if metrics and metrics.timed_out:
+            result["status"] = self.TIMEOUT
+        else:
+            result["status"] = self.ERROR if is_error else self.SUCCESS
+
+        return result
+
+    def _failed(self, ex):
+        """
+        Classifies an invoke that could not run. One broken invoke, ex: of a container that could not be started, must
+        not stop the batch.
+
+        :param Exception ex: Why the invoke could not run
+        :return dict: ``status`` of the invoke and the ``error``
+        """
+
+        LOG.debug("Invoking %s in a batch failed", self.function_name, exc_info=True)
+        return {"status": self.FAILED, "error": str(ex) or type(ex).__name__}
+
+
+def elapsed_ms(start):
+    """
+    :param float start: Time as returned by ``time.time()``
+    :return float: Milliseconds passed since then
+    """
+
+    return round((time.time() - start) * 1000, 2)
@@ -7,3 +7,9 @@ class FunctionNotFound(Exception):
     """
     Raised when the requested Lambda function is not found
     """
+
+
+class FunctionThrottled(Exception):
+    """
+    Raised when a function can't be invoked right now because too many invokes are running already
+    """
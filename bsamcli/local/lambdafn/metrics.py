@@ -0,0 +1,258 @@
+"""
+Measures where the time of a local invoke goes, and reports it like the REPORT line of CFC
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class InvokeMetrics(object):
+    """
+    Record of one invoke. Phases of the invoke are marked with high resolution timestamps as they happen, relative to
+    the start of the invoke:
+
+        image_checked   Runtime image is available locally
+        created         Container is created
+        attached        Output stream of the container is attached
+        started         Container is started. The function starts running
+        first_output    First output of the function is received
+        exited          Function finished
+
+    Phases that did not happen, like creating a container that was reused, are not recorded.
+    """
+
+    PHASES = ("image_checked", "created", "attached", "started", "first_output", "exited")
+
+    # Billed duration is rounded up to the next multiple of this many milliseconds
+    _BILLING_GRANULARITY_MS = 100
+
+    def __init__(self, function_name, request_id=None, memory_size=None):
+        """
+        Starts the record. Create it when the invoke starts.
+
+        :param string function_name: Name of the invoked function
+        :param string request_id: Optional. ID of the request
+        :param int memory_size: Optional. Memory limit of the function in MB
+        """
+        self.function_name = function_name
+        self.request_id = request_id
+        self.memory_size = memory_size
+
+        # A cold invoke starts a container that did not serve an invoke before
+        self.cold = True
+        self.timed_out = False
+        self.max_memory_used = None
+
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._marks = {}
+
+    def mark(self, phase):
+        """
+        Records that the given phase was reached now. Only the first time a phase is reached counts.
+
+        :param string phase: One of ``PHASES``
+        """
+        if phase not in self._marks:
+            self._marks[phase] = (time.perf_counter() - self._start) * 1000
+
+    def get_mark(self, phase):
+        """
+        :param string phase: One of ``PHASES``
+        :return float: Milliseconds since the start of the invoke when the phase was reached. None, if it was not
+        """
+        return self._marks.get(phase)
+
+    @property
+    def duration(self):
+        """
+        :return float: Milliseconds the function ran, from starting the container to the function finishing
+        """
+        exited = self._marks.get("exited")
+        if exited is None:
+            return None
+
+        return exited - self._marks.get("started", 0)
+
+    @property
+    def init_duration(self):
+        """
+        :return float: Milliseconds it took to get a cold container running. None for warm invokes
+        """
+        if not self.cold or "started" not in self._marks:
+            return None
+
+        return self._marks["started"]
+
+    @property
+    def billed_duration(self):
+        """
+        :return int: Duration rounded up, the way CFC bills it
+        """
+        if self.duration is None:
+            return None
+
+        granularity = self._BILLING_GRANULARITY_MS
+        return int(max(1, math.ceil(self.duration / granularity)) * granularity)
+
+    def report_line(self):
+        """
+        :return string: REPORT line, like the one CFC writes at the end of every invoke
+        """
+        parts = ["REPORT RequestId: {}".format(self.request_id)]
+
+        if self.duration is not None:
+            parts.append("Duration: {:.2f} ms".format(self.duration))
+            parts.append("Billed Duration: {} ms".format(self.billed_duration))
+
+        if self.memory_size:
+            parts.append("Memory Size: {} MB".format(self.memory_size))
+
+        if self.max_memory_used is not None:
+            parts.append("Max Memory Used: {} MB".format(self.max_memory_used))
+
+        if self.init_duration is not None:
+            parts.append("Init Duration: {:.2f} ms".format(self.init_duration))
+
+        if self.timed_out:
+            parts.append("Status: timeout")
+
+        return "\t".join(parts)
+
+    def to_dict(self):
+        """
+        :return dict: Structured record of the invoke, to store as a JSON line
+        """
+        record = {
+            "timestamp": self.started_at,
+            "function_name": self.function_name,
+            "request_id": self.request_id,
+            "cold": self.cold,
+            "timed_out": self.timed_out,
+            "duration_ms": self.duration,
+            "billed_duration_ms": self.billed_duration,
+            "init_duration_ms": self.init_duration,
+            "memory_size_mb": self.memory_size,
+            "max_memory_used_mb": self.max_memory_used,
+        }
+
+        for phase in self.PHASES:
+            record["{}_ms".format(phase)] = self._marks.get(phase)
+
+        return record
+
+
+class MemorySampler(object):
+    """
+    Samples the memory usage of a running container from the Docker stats API in a background thread, and keeps the
+    highest value seen. Docker sends a sample about every second. Invokes shorter than that get the first sample only.
+    """
+
+    def __init__(self, docker_client, container_id, use_peak=True):
+        """
+        :param docker.DockerClient docker_client: Docker client to read stats with
+        :param string container_id: ID of the container to sample
+        :param bool use_peak: Optional. Also take the peak usage cgroup v1 reports. It covers the whole life of the
+            container, so it is only right for a container that serves its first invoke
+        """
+        self.docker_client = docker_client
+        self.container_id = container_id
+        self.use_peak = use_peak
+
+        self._max_usage = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Response of the stats stream. Closed on stop, so the connection does not wait for the next sample.
+        self._response = None
+        self._response_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="bsam-memory-{}".format(self.container_id[:12]))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling. The background thread ends with the next sample.
+
+        :return int: Highest memory usage seen in MB. None, if there was no sample
+        """
+        self._stopped.set()
+
+        with self._response_lock:
+            if self._response is not None:
+                self._response.close()
+
+        if self._max_usage is None:
+            return None
+
+        return int(math.ceil(self._max_usage / 1024.0 / 1024.0))
+
+    def _sample(self):
+        # Same request as the SDK's ``stats``, but keeping hold of the response, so ``stop`` can close it. We are
+        # going to use private methods of the API client here, like the attach API does.
+        api_client = self.docker_client.api
+        url = "{}/containers/{}/stats".format(api_client.base_url, self.container_id)
+
+        try:
+            response = api_client._get(url, params={"stream": True}, stream=True)  # pylint: disable=W0212
+
+            with self._response_lock:
+                self._response = response
+                if self._stopped.is_set():
+                    response.close()
+                    return
+
+            for stats in api_client._stream_helper(response, decode=True):  # pylint: disable=W0212
+                memory = stats.get("memory_stats") or {}
+
+                # cgroup v1 reports the peak itself. Otherwise use the highest current usage seen.
+                usage = memory.get("usage", 0)
+                if self.use_peak:
+                    usage = max(memory.get("max_usage", 0), usage)
+
+                if usage:
+                    self._max_usage = max(self._max_usage or 0, usage)
+
+                if self._stopped.is_set():
+                    break
+        except Exception as ex:  # pylint: disable=broad-except
+            # Stats are best effort. The container may be gone already, or the stream was closed by ``stop``.
+            LOG.debug("Unable to sample memory of container %s: %s", self.container_id, ex)
+        finally:
+            with self._response_lock:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+
+
+class MetricsFile(object):
+    """
+    Appends invoke records to a file, one JSON object per line. This class is thread-safe.
+    """
+
+    def __init__(self, path):
+        """
+        :param string path: Path to the file. Created if it does not exist
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, metrics):
+        """
+        :param InvokeMetrics metrics: Record to append
+        """
+        line = json.dumps(metrics.to_dict(), sort_keys=True) + "\n"
+
+        with self._lock:
+            try:
+                with open(self.path, 'a') as fp:
+                    fp.write(line)
+            except (IOError, OSError) as ex:
+                LOG.warning("Unable to write invoke metrics to %s: %s", self.path, ex)
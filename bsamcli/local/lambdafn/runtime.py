@@ -9,9 +9,15 @@ import signal
 import logging
 import threading
 import json
+import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
-from bsamcli.local.docker.cfc_container import CfcContainer
+from bsamcli.local.docker.cfc_container import CfcContainer, Runtime
+from .artifact_cache import ArtifactCache
+from .metrics import InvokeMetrics, MemorySampler
+from .timeout import get_timeout_manager
 from .zip import unzip
 
 LOG = logging.getLogger(__name__)
@@ -26,14 +32,56 @@ class CfcRuntime(object):
 
     SUPPORTED_ARCHIVE_EXTENSIONS = (".jar")
 
-    def __init__(self, container_manager):
+    # Number of containers of timed out invokes removed at the same time
+    _TIMED_OUT_WORKERS = 4
+
+    def __init__(self,
+                 container_manager,
+                 warm_containers=False,
+                 persistent_containers=False,
+                 standby_containers=False,
+                 timeout_manager=None,
+                 artifact_cache=None,
+                 metrics_file=None,
+                 cpu_curve=None):
         """
         Initialize the Local CFC runtime
 
         :param bsamcli.local.docker.manager.ContainerManager container_manager: Instance of the ContainerManager class
             that can run a local Docker container
+        :param bool warm_containers: Optional. Reuse containers across invocations of the same function instead of
+            creating a new container for every invoke. Defaults to False
+        :param bool persistent_containers: Optional. Keep reused containers running and stream each event into them
+            instead of starting the container again for every invoke. Implies ``warm_containers``. Defaults to False
+        :param bool standby_containers: Optional. Take new containers from the standby containers the container manager
+            creates ahead of time, instead of creating them during the invoke. Defaults to False
+        :param bsamcli.local.lambdafn.timeout.TimeoutManager timeout_manager: Optional. Enforces function timeouts.
+            Defaults to the timeout manager shared by the process
+        :param bsamcli.local.lambdafn.artifact_cache.ArtifactCache artifact_cache: Optional. Cache of jar files copied
+            for mounting into containers. Defaults to a cache in the system's temporary directory
+        :param bsamcli.local.lambdafn.metrics.MetricsFile metrics_file: Optional. File to append the metrics of every
+            invoke to
+        :param bsamcli.local.docker.cpu_curve.CpuCurve cpu_curve: Optional. Gives functions a CPU share proportional to
+            their memory, following this curve, like CFC does. Without it, functions may use all CPUs of the host
         """
         self._container_manager = container_manager
+        self._warm_containers = warm_containers or persistent_containers
+        self._persistent_containers = persistent_containers
+        self._standby_containers = standby_containers
+        self._timeout_manager = timeout_manager or get_timeout_manager()
+        self._artifact_cache = artifact_cache or ArtifactCache()
+        self._metrics_file = metrics_file
+        self._cpu_curve = cpu_curve
+
+        # Code path to the number of times its code changed. Part of the key of warm containers, so containers
+        # running old code are never handed out again.
+        self._code_versions = {}
+        self._code_versions_lock = threading.Lock()
+
+        # Containers of invokes that timed out are removed here. Removing talks to the Docker daemon, and doing that on
+        # the timeout thread would delay every other timeout that expires meanwhile.
+        self._timed_out_executor = ThreadPoolExecutor(max_workers=self._TIMED_OUT_WORKERS,
+                                                      thread_name_prefix="bsam-timed-out")
 
     def invoke(self,
                function_config,
@@ -42,7 +90,8 @@ class CfcRuntime(object):
                debug_context=None,
                is_installing=None,
                stdout=None,
-               stderr=None):
+               stderr=None,
+               request_id=None):
         """
         Invoke the given CFC function locally.
 
@@ -58,9 +107,12 @@ class CfcRuntime(object):
         :param DebugContext debug_context: Debugging context for the function (includes port, args, and path)
         :param io.IOBase stdout: Optional. IO Stream to that receives stdout text from container.
         :param io.IOBase stderr: Optional. IO Stream that receives stderr text from container
+        :param string request_id: Optional. ID of the request, ex: of a queued invoke. Generated by default
+        :return bsamcli.local.lambdafn.metrics.InvokeMetrics: Metrics of the invoke, ex: whether it timed out
         :raises Keyboard
         """
-        timer = None
+        timeout_token = None
+        memory_sampler = None
 
         # Update with event input
         environ = function_config.env_vars
@@ -68,52 +120,225 @@ class CfcRuntime(object):
             environ.add_install_flag()
         # Generate a dictionary of environment variable key:values
         env_vars = environ.resolve()
+        if request_id:
+            env_vars["_REQUEST_ID"] = request_id
+        metrics = InvokeMetrics(function_config.name,
+                                request_id=env_vars.get("_REQUEST_ID"),
+                                memory_size=function_config.memory)
+
         with self._get_code_dir(function_config, cwd, is_installing) as code_dir:
-            event_path = _create_tmp_event_file(event)
-            container = CfcContainer(function_config.runtime,
-                                     function_config.handler,
-                                     code_dir,
-                                     memory_mb=function_config.memory,
-                                     env_vars=env_vars,
-                                     event_path=event_path,
-                                     debug_options=debug_context)
+            key = None
+            warm = False
+            container = None
+            persistent = False
+
+            if self._can_prepare_container(function_config, debug_context, is_installing):
+                key = _get_warm_container_key(function_config, code_dir, env_vars,
+                                              code_version=self._get_code_version(function_config.code_abs_path))
+                warm = self._warm_containers
+                persistent = self._persistent_containers
+
+            if warm:
+                container = self._container_manager.get_warm_container(key)
+
+            # A container that served an invoke before has the runtime loaded already
+            metrics.cold = container is None
+
+            if not container:
+                if key and self._standby_containers:
+                    factory = functools.partial(self._create_container, function_config, code_dir, env_vars,
+                                                persistent=persistent, standby=True, reused=True)
+                    container = self._container_manager.get_standby_container(key, factory)
+                else:
+                    container = self._create_container(function_config, code_dir, env_vars,
+                                                       debug_context=debug_context, persistent=persistent,
+                                                       reused=warm)
+
+            # Persistent containers get the event streamed in on invoke. Everything else reads it from a file.
+            if not persistent:
+                _write_event_file(container.event_path, event)
 
+            # Containers that serve more than one invoke read the request ID from a file too
+            if container.request_id_path:
+                _write_request_id_file(container.request_id_path, env_vars.get("_REQUEST_ID"))
+
+            # Only a container whose invoke completed is known to be usable by the next invoke
+            completed = False
             try:
+                container.metrics = metrics
 
                 # Start the container. This call returns immediately after the container starts
-                self._container_manager.run(container, is_installing)
+                self._container_manager.run(container, is_installing, warm=warm)
+                memory_sampler = self._start_memory_sampler(container, bool(debug_context) or is_installing,
+                                                            cold=metrics.cold)
 
                 # Setup appropriate interrupt - timeout or Ctrl+C - before function starts executing.
                 #
-                # Start the timer **after** container starts. Container startup takes several seconds, only after which,
-                # our CFC function code will run. Starting the timer is a reasonable approximation that function has
-                # started running.
-                timer = self._configure_interrupt(function_config.name,
-                                                  function_config.timeout,
-                                                  container,
-                                                  bool(debug_context),
-                                                  is_installing)
+                # Start the timeout **after** container starts. Container startup takes several seconds, only after
+                # which, our CFC function code will run. Starting the timeout is a reasonable approximation that
+                # function has started running.
+                timeout_token = self._configure_interrupt(function_config.name,
+                                                          function_config.timeout,
+                                                          container,
+                                                          bool(debug_context),
+                                                          is_installing)
 
                 # NOTE: BLOCKING METHOD
                 # Block the thread waiting to fetch logs from the container. This method will return after container
-                # terminates, either successfully or killed by one of the interrupt handlers above.
-                container.wait_for_logs(stdout=stdout, stderr=stderr)
+                # terminates, either successfully or killed by one of the interrupt handlers above. A persistent
+                # container keeps running, so we wait for this one invoke inside of it to finish instead.
+                if persistent:
+                    container.invoke(event, request_id=env_vars.get("_REQUEST_ID"), stdout=stdout, stderr=stderr)
+                else:
+                    container.wait_for_logs(stdout=stdout, stderr=stderr)
+
+                metrics.mark("exited")
+                metrics.timed_out = bool(timeout_token and timeout_token.expired)
+
+                if metrics.timed_out:
+                    _write_timeout_message(stderr, env_vars.get("_REQUEST_ID"), function_config.timeout)
+
+                if memory_sampler:
+                    metrics.max_memory_used = memory_sampler.stop()
+                    memory_sampler = None
+
+                self._report_metrics(metrics, stderr)
+                completed = True
 
             except KeyboardInterrupt:
                 # When user presses Ctrl+C, we receive a Keyboard Interrupt. This is especially very common when
                 # container is in debugging mode. We have special handling of Ctrl+C. So handle KeyboardInterrupt
                 # and swallow the exception. The ``finally`` block will also take care of cleaning it up.
                 LOG.debug("Ctrl+C was pressed. Aborting CFC execution")
+                warm = False
 
             finally:
                 # We will be done with execution, if either the execution completed or an interrupt was fired
-                # Any case, cleanup the timer and container.
+                # Any case, cancel the timeout and cleanup the container.
                 #
-                # If we are in debugging mode, timer would not be created. So skip cleanup of the timer
-                if timer:
-                    timer.cancel()
-                os.unlink(event_path)
-                self._container_manager.stop(container)
+                # If we are in debugging mode, timeout would not be set. So skip cancelling it
+                if timeout_token:
+                    timeout_token.cancel()
+
+                if memory_sampler:
+                    memory_sampler.stop()
+
+                container.metrics = None
+
+                # Warm containers go back to the pool to serve the next invoke, unless their invoke failed, ex: as
+                # the container was killed, or the code changed while they ran. Everything else is removed along with
+                # its event file. A container whose invoke timed out is being removed by the timeout already.
+                if timeout_token and timeout_token.expired:
+                    pass
+                elif warm and completed and key[-1] == self._get_code_version(function_config.code_abs_path):
+                    self._container_manager.release(container, key)
+                else:
+                    self._container_manager.stop(container)
+
+        return metrics
+
+    def invalidate(self, code_path):
+        """
+        Forgets all state kept for functions whose code is at the given path, because the code changed. Warm and
+        standby containers of these functions are removed, and containers running an invoke right now are removed
+        once it finished, instead of being reused. Jar files need no invalidation, the artifact cache keys them by
+        their contents.
+
+        :param string code_path: Absolute path to the code of the functions, as in ``FunctionConfig.code_abs_path``
+        :return int: Number of containers removed
+        """
+        with self._code_versions_lock:
+            self._code_versions[code_path] = self._code_versions.get(code_path, 0) + 1
+
+        return self._container_manager.discard_containers(lambda key: _is_code_dir_of(key[2], code_path))
+
+    def prefetch_images(self, runtimes):
+        """
+        Fetches the Docker images of the given runtimes in parallel, so the first invoke of every function does not
+        have to wait for its image to be pulled.
+
+        :param list runtimes: Names of CFC runtimes
+        """
+        images = [CfcContainer._get_image(runtime) for runtime in set(runtimes)  # pylint: disable=W0212
+                  if Runtime.has_value(runtime)]
+
+        self._container_manager.prefetch_images(images)
+
+    def _start_memory_sampler(self, container, is_interactive, cold=True):
+        """
+        Starts sampling the memory usage of the running container. Interactive containers, which are debugged or
+        install dependencies, are not measured. The peak usage Docker reports covers the whole life of a container,
+        so it is only taken for a container that serves its first invoke.
+
+        :return bsamcli.local.lambdafn.metrics.MemorySampler: Sampler of the container. None, if not sampled
+        """
+        if is_interactive or not container.is_created():
+            return None
+
+        sampler = MemorySampler(container.docker_client, container.id, use_peak=cold)
+        sampler.start()
+        return sampler
+
+    def _report_metrics(self, metrics, stderr):
+        """
+        Writes the REPORT line of the invoke to stderr, and appends the record to the metrics file, if there is one
+        """
+        if stderr:
+            stderr.write((metrics.report_line() + "\n").encode('utf-8'))
+
+        if self._metrics_file:
+            self._metrics_file.append(metrics)
+
+    def _create_container(self, function_config, code_dir, env_vars, debug_context=None, persistent=False,
+                          standby=False, reused=False):
+        """
+        Creates the container object to run the given function in. Docker container is not created yet. Containers
+        that are reused, or created ahead of time, may serve other invokes than the one whose environment they get.
+
+        :return bsamcli.local.docker.cfc_container.CfcContainer: Container for the function
+        """
+
+        # Persistent containers get the event streamed in on invoke. There is no event file to mount.
+        event_path = None if persistent else _create_tmp_event_file("")
+
+        # Restarting a container, as warm containers that are not persistent are, clears a tmpfs /tmp
+        tmpfs_tmp = standby and (persistent or not self._warm_containers)
+
+        return CfcContainer(function_config.runtime,
+                            function_config.handler,
+                            code_dir,
+                            memory_mb=function_config.memory,
+                            env_vars=env_vars,
+                            event_path=event_path,
+                            debug_options=debug_context,
+                            persistent=persistent,
+                            docker_client=self._get_container_docker_client(),
+                            standby=standby,
+                            tmpfs_tmp=tmpfs_tmp,
+                            cpu_curve=self._cpu_curve,
+                            reused=reused)
+
+    def _get_container_docker_client(self):
+        """
+        :return docker.DockerClient: Docker client the containers of this runtime talk to the Docker daemon with
+        """
+        return self._container_manager.docker_client
+
+    def _get_code_version(self, code_path):
+        with self._code_versions_lock:
+            return self._code_versions.get(code_path, 0)
+
+    def _can_prepare_container(self, function_config, debug_context, is_installing):
+        """
+        Containers are reused or created ahead of time only when asked for, and never while debugging or installing,
+        where the container is expected to be interactive. Archives are mounted from the artifact cache, which removes
+        their directory when no invoke uses it, so their containers cannot be prepared either.
+        """
+        if not (self._warm_containers or self._standby_containers) or debug_context or is_installing:
+            return False
+
+        code_path = function_config.code_abs_path
+        return not (os.path.isfile(code_path) and code_path.endswith(self.SUPPORTED_ARCHIVE_EXTENSIONS))
 
     def _configure_interrupt(self, function_name, timeout, container, is_debugging, is_installing):
         """
@@ -125,13 +350,15 @@ class CfcRuntime(object):
         :param integer timeout: Timeout in seconds
         :param bsamcli.local.docker.container.Container container: Instance of a container to terminate
         :param bool is_debugging: Are we debugging?
-        :return threading.Timer: Timer object, if we setup a timer. None otherwise
+        :return bsamcli.local.lambdafn.timeout.TimeoutToken: Token of the function timeout, if we set one up.
+            None otherwise
         """
 
-        def timer_handler():
-            # NOTE: This handler runs in a separate thread. So don't try to mutate any non-thread-safe data structures
+        def timeout_handler():
+            # NOTE: This handler runs in the timeout thread, which enforces the timeouts of all invokes. The token is
+            # flagged as expired already. Removing the container is handed off, so other timeouts are not held up.
             LOG.info("Function '%s' timed out after %d seconds", function_name, timeout)
-            self._container_manager.stop(container)
+            self._timed_out_executor.submit(self._stop_timed_out_container, container)
 
         def signal_handler(sig, frame):
             # NOTE: This handler runs in a separate thread. So don't try to mutate any non-thread-safe data structures
@@ -139,14 +366,26 @@ class CfcRuntime(object):
             self._container_manager.stop(container)
 
         if is_debugging or is_installing:
-            LOG.debug("Setting up SIGTERM interrupt handler")
-            signal.signal(signal.SIGTERM, signal_handler)
-        else:
-            # Start a timer, we'll use this to abort the function if it runs beyond the specified timeout
-            LOG.debug("Starting a timer for %s seconds for function '%s'", timeout, function_name)
-            timer = threading.Timer(timeout, timer_handler, ())
-            timer.start()
-            return timer
+            # Signal handlers can only be installed from the main thread. Invokes that run on the worker threads of
+            # a local service are still stopped by Ctrl+C, which stops the service and with it the container.
+            if threading.current_thread() is threading.main_thread():
+                LOG.debug("Setting up SIGTERM interrupt handler")
+                signal.signal(signal.SIGTERM, signal_handler)
+            return None
+
+        # Abort the function if it runs beyond the specified timeout. All timeouts are enforced by one shared thread.
+        LOG.debug("Setting a timeout of %s seconds for function '%s'", timeout, function_name)
+        return self._timeout_manager.schedule(timeout, timeout_handler)
+
+    def _stop_timed_out_container(self, container):
+        """
+        Removes the container of an invoke that timed out. Runs on a worker of the timed out executor.
+        """
+        try:
+            self._container_manager.stop(container)
+        except Exception:  # pylint: disable=broad-except
+            # Nobody waits for the result of this worker. Report the error here, instead of losing it.
+            LOG.warning("Unable to remove container of timed out function", exc_info=True)
 
     @contextmanager
     def _get_code_dir(self, function_config, cwd, is_installing):
@@ -155,7 +394,7 @@ class CfcRuntime(object):
         be mounted directly inside the Docker container.
 
         This method handles a few different cases for ``code_path``:
-            - ``code_path``is a existent zip/jar file: Unzip in a temp directory and return the temp directory
+            - ``code_path``is a existent jar file: Copy into the artifact cache and return the cached directory
             - ``code_path`` is a existent directory: Return this immediately
             - ``code_path`` is a file/dir that does not exist: Return it as is. May be this method is not clever to
                 detect the existence of the path
@@ -166,28 +405,24 @@ class CfcRuntime(object):
         """
 
         code_path = function_config.code_abs_path
-        tmp_dir = None
 
-        try:
-            if is_installing:
-                if function_config.runtime == "java8":
-                    yield cwd          # where template.yaml is
-                else:
-                    yield code_path
+        if is_installing:
+            if function_config.runtime == "java8":
+                yield cwd          # where template.yaml is
+            else:
+                yield code_path
 
-            elif os.path.isfile(code_path) and code_path.endswith(self.SUPPORTED_ARCHIVE_EXTENSIONS):
-                tmp_dir = _get_tmp_dir(code_path)
-                yield tmp_dir
+        elif os.path.isfile(code_path) and code_path.endswith(self.SUPPORTED_ARCHIVE_EXTENSIONS):
+            # Every version of the jar is copied only once, and shared by all invokes
+            with self._artifact_cache.use(code_path, _copy_jar) as code_dir:
+                yield code_dir
 
-            elif function_config.runtime == "dotnetcore2.2":
-                yield os.path.join(code_path, "bin", "Release", "netcoreapp2.2", "publish/")
+        elif function_config.runtime == "dotnetcore2.2":
+            yield os.path.join(code_path, "bin", "Release", "netcoreapp2.2", "publish/")
 
-            else:
-                LOG.debug("Code %s is not a jar file", code_path)
-                yield code_path
-        finally:
-            if tmp_dir:
-                shutil.rmtree(tmp_dir)
+        else:
+            LOG.debug("Code %s is not a jar file", code_path)
+            yield code_path
 
 
 def _create_tmp_event_file(event_data):
@@ -209,26 +444,92 @@ def _create_tmp_event_file(event_data):
 
     LOG.info("Writing event to a temporary file %s", event)
 
-    with open(event, 'w') as f:
-        f.write(event_data)
+    _write_event_file(event, event_data)
 
     return event
 
 
-def _get_tmp_dir(filepath):
+def _write_event_file(event_path, event_data):
     """
-    copy .jar to a temporary directory
+    Write the event data to the given event file, replacing its previous contents
+
+    :param string event_path: full path of the event file
+    :param string event_data: event string
     """
 
-    tmp_dir = tempfile.mkdtemp()
-    if os.name == 'posix':
-        os.chmod(tmp_dir, 0o755)
+    with open(event_path, 'w') as f:
+        f.write(event_data)
+
+
+def _write_request_id_file(request_id_path, request_id):
+    """
+    Write the request ID of the next invoke to the file the runtime of a reused container reads it from
+
+    :param string request_id_path: full path of the request ID file
+    :param string request_id: ID of the request
+    """
+
+    with open(request_id_path, 'w') as f:
+        f.write(request_id or "")
+
+
+def _write_timeout_message(stderr, request_id, timeout):
+    """
+    Reports a timed out invoke the way CFC does, to the stream that receives the function's logs
+
+    :param io.IOBase stderr: Stream that receives stderr bytes from the container. Nothing is written, if not given
+    :param string request_id: ID of the timed out request
+    :param int timeout: Timeout of the function in seconds
+    """
+
+    if not stderr:
+        return
+
+    timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    message = "{} {} Task timed out after {:.2f} seconds\n".format(timestamp, request_id, timeout)
+    stderr.write(message.encode("utf-8"))
+
+
+def _get_warm_container_key(function_config, code_dir, env_vars, code_version=0):
+    """
+    Key identifying the containers that can serve an invoke of the given function. Two invokes can share a container
+    only when the runtime, handler, code, environment and memory are all the same.
+
+    :param FunctionConfig function_config: Configuration of the function to invoke
+    :param string code_dir: Directory mounted into the container
+    :param dict env_vars: Environment variables of the container
+    :param int code_version: Optional. Number of times the code changed since the runtime was created
+    :return tuple: Hashable key. The code version is the last item
+    """
+
+    # Request ID is regenerated for every invoke and must not prevent reuse
+    env = tuple(sorted((name, value) for name, value in env_vars.items() if name != "_REQUEST_ID"))
 
-    LOG.info("Copying %s to a temporary directory", filepath)
+    return (function_config.runtime,
+            function_config.handler,
+            code_dir,
+            env,
+            function_config.memory,
+            code_version)
+
+
+def _is_code_dir_of(code_dir, code_path):
+    """
+    :return bool: True, if the directory mounted into a container is the given code path, or inside of it
+    """
+    code_dir = os.path.normpath(code_dir)
+    code_path = os.path.normpath(code_path)
+    return code_dir == code_path or code_dir.startswith(code_path + os.sep)
+
+
+def _copy_jar(filepath, target_dir):
+    """
+    copy .jar to the given directory of the artifact cache
+    """
 
-    shutil.copyfile(filepath, os.path.join(tmp_dir, "tmp.jar"))
+    LOG.info("Copying %s to the artifact cache", filepath)
 
-    return os.path.realpath(tmp_dir)
+    shutil.copyfile(filepath, os.path.join(target_dir, "tmp.jar"))
 
 
 def _unzip_file(filepath):
@@ -0,0 +1,187 @@
+"""
+Enforces function timeouts for all invokes of the process from a single thread
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class TimeoutToken(object):
+    """
+    Handle of one scheduled timeout. The invoke cancels it when the function finishes in time. Otherwise the timeout
+    expires and its callback is called from the timeout thread.
+    """
+
+    def __init__(self, manager, timeout, callback):
+        """
+        :param TimeoutManager manager: Manager the timeout is scheduled with
+        :param int timeout: Seconds until the timeout expires
+        :param callable callback: Called without arguments when the timeout expires
+        """
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.callback = callback
+
+        # Set by the manager. A timeout ends up either cancelled or expired, never both.
+        self.cancelled = False
+        self.expired = False
+
+        self._manager = manager
+
+    def cancel(self):
+        """
+        Cancels the timeout, unless it expired already
+
+        :return bool: True, if the timeout was cancelled before it expired
+        """
+        return self._manager.cancel(self)
+
+
+class TimeoutManager(object):
+    """
+    Keeps the timeouts of all running invokes in a heap ordered by deadline, and fires them from one background thread.
+    This replaces starting a new timer thread for every invoke, which adds up to hundreds of threads when a local
+    service is under load. Timeouts can be scheduled and cancelled from any thread.
+
+    Callbacks run on the timeout thread one after the other, so they should return quickly. Deadlines are kept on the
+    monotonic clock, so changes of the wall clock, ex: by NTP or a suspended laptop, don't fire timeouts early or late.
+    """
+
+    # Cancelled timeouts are left in the heap until they reach its top. Rebuild the heap once there are more than this
+    # many of them and they make up more than half of the heap, so long timeouts that were cancelled don't pile up.
+    _COMPACT_THRESHOLD = 64
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._heap = []
+        self._cancelled_count = 0
+        self._sequence = itertools.count()
+        self._thread = None
+
+    def schedule(self, timeout, callback):
+        """
+        Calls the callback after the given number of seconds, unless the returned token is cancelled before
+
+        :param int timeout: Seconds until the timeout expires
+        :param callable callback: Called without arguments from the timeout thread when the timeout expires
+        :return TimeoutToken: Token to cancel the timeout with
+        """
+        token = TimeoutToken(self, timeout, callback)
+
+        with self._condition:
+            # The sequence number keeps tokens with the same deadline from being compared
+            heapq.heappush(self._heap, (token.deadline, next(self._sequence), token))
+            self._ensure_thread()
+
+            if self._heap[0][2] is token:
+                # New earliest deadline. Wake up the thread, so it does not sleep past it.
+                self._condition.notify()
+
+        return token
+
+    @property
+    def pending_count(self):
+        """
+        :return int: Number of timeouts that neither expired nor were cancelled yet
+        """
+        with self._condition:
+            return len(self._heap) - self._cancelled_count
+
+    def cancel(self, token):
+        """
+        Cancels the timeout of the given token, unless it expired already
+
+        :param TimeoutToken token: Token returned by ``schedule``
+        :return bool: True, if the timeout was cancelled before it expired
+        """
+        with self._condition:
+            if token.expired or token.cancelled:
+                return token.cancelled
+
+            token.cancelled = True
+            self._cancelled_count += 1
+
+            if self._cancelled_count > self._COMPACT_THRESHOLD and self._cancelled_count * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_count = 0
+
+            return True
+
+    def _ensure_thread(self):
+        """
+        Starts the timeout thread on first use. Must be called while holding the lock.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="bsam-timeouts")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            for token in self._wait_for_expired():
+                LOG.debug("Timeout of %s seconds expired", token.timeout)
+                try:
+                    token.callback()
+                except Exception:  # pylint: disable=broad-except
+                    # Keep the thread alive for the other invokes
+                    LOG.exception("Unable to handle expired timeout")
+
+    def _wait_for_expired(self):
+        """
+        Blocks until at least one timeout expired
+
+        :return list: Tokens of the expired timeouts
+        """
+        with self._condition:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled_count -= 1
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                remaining = self._heap[0][0] - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+
+                expired = []
+                while self._heap and self._heap[0][0] <= time.monotonic():
+                    token = heapq.heappop(self._heap)[2]
+                    if token.cancelled:
+                        self._cancelled_count -= 1
+                    else:
+                        token.expired = True
+                        expired.append(token)
+
+                if expired:
+                    return expired
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_timeout_manager():
+    """
+    Returns the timeout manager shared by all invokes of this process, creating it on first use
+
+    :return TimeoutManager: Timeout manager
+    """
+
+    global _manager  # pylint: disable=global-statement
+
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = TimeoutManager()
+
+    return _manager
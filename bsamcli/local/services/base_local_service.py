@@ -3,32 +3,90 @@
 import json
 import logging
 import os
+import tempfile
 
 from flask import Response
 
+from .server import DevelopmentServer
+
 LOG = logging.getLogger(__name__)
 
 
 class CaseInsensitiveDict(dict):
     """
     Implement a simple case insensitive dictionary for storing headers. To preserve the original
-    case of the given Header (e.g. X-FooBar-Fizz) this only touches the get and contains magic
-    methods rather than implementing a __setitem__ where we normalize the case of the headers.
+    case of the given Header (e.g. X-FooBar-Fizz) the keys are stored as given, and an index from the
+    lower cased key to the stored key makes lookups constant time. Setting a key that differs from a
+    stored one only in case replaces the value of the stored one.
     """
 
+    def __init__(self, *args, **kwargs):
+        super(CaseInsensitiveDict, self).__init__(*args, **kwargs)
+        self._keys = {key.lower(): key for key in dict.keys(self)}
+
+        if len(self._keys) != len(self):
+            # Some keys differ only in case. Keep the first of them, with the value of the last
+            items = list(dict.items(self))
+            super(CaseInsensitiveDict, self).clear()
+            self._keys = {}
+            for key, value in items:
+                self[key] = value
+
     def __getitem__(self, key):
-        matches = [v for k, v in self.items() if k.lower() == key.lower()]
-        if not matches:
-            raise KeyError(key)
-        return matches[0]
+        return super(CaseInsensitiveDict, self).__getitem__(self._keys.get(key.lower(), key))
+
+    def __setitem__(self, key, value):
+        key = self._keys.setdefault(key.lower(), key)
+        super(CaseInsensitiveDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super(CaseInsensitiveDict, self).__delitem__(self._keys.pop(key.lower(), key))
 
     def __contains__(self, key):
-        return key.lower() in [k.lower() for k in self.keys()]
+        return key.lower() in self._keys
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key not in self and default:
+            return default[0]
+        return super(CaseInsensitiveDict, self).pop(self._keys.pop(key.lower(), key))
+
+    def popitem(self):
+        key, value = super(CaseInsensitiveDict, self).popitem()
+        del self._keys[key.lower()]
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        items = dict(*args, **kwargs)
+        keys = {key.lower(): key for key in items}
+
+        if len(keys) == len(items) and not self._keys.keys() & keys.keys():
+            # No two keys differ only in case. Index and store all of them at once
+            self._keys.update(keys)
+            super(CaseInsensitiveDict, self).update(items)
+            return
+
+        for key, value in items.items():
+            self[key] = value
+
+    def clear(self):
+        super(CaseInsensitiveDict, self).clear()
+        self._keys.clear()
+
+    def copy(self):
+        return CaseInsensitiveDict(self)
 
 
 class BaseLocalService(object):
 
-    def __init__(self, is_debugging, port, host):
+    def __init__(self, is_debugging, port, host, server=None):
         """
         Creates a BaseLocalService class
 
@@ -40,10 +98,13 @@ class BaseLocalService(object):
             Optional. port for the service to start listening on Defaults to 3000
         host str
             Optional. host to start the service on Defaults to '127.0.0.1
+        server bsamcli.local.services.server.PooledServer
+            Optional. Server to run the service on. Defaults to Flask's development server
         """
         self.is_debugging = is_debugging
         self.port = port
         self.host = host
+        self.server = server
         self._app = None
 
     def create(self):
@@ -54,7 +115,7 @@ class BaseLocalService(object):
 
     def run(self):
         """
-        This starts up the (threaded) Local Server.
+        This starts up the Local Server. It serves one request at a time while debugging, and many at once otherwise.
         Note: This is a **blocking call**
 
         Raises
@@ -65,20 +126,8 @@ class BaseLocalService(object):
         if not self._app:
             raise RuntimeError("The application must be created before running")
 
-        # Flask can operate as a single threaded server (which is default) and a multi-threaded server which is
-        # more for development. When the Lambda container is going to be debugged, then it does not make sense
-        # to turn on multi-threading because customers can realistically attach only one container at a time to
-        # the debugger. Keeping this single threaded also enables the Lambda Runner to handle Ctrl+C in order to
-        # kill the container gracefully (Ctrl+C can be handled only by the main thread)
-        multi_threaded = not self.is_debugging
-
-        LOG.debug("Localhost server is starting up. Multi-threading = %s", multi_threaded)
-
-        # This environ signifies we are running a main function for Flask. This is true, since we are using it within
-        # our cli and not on a production server.
-        os.environ['WERKZEUG_RUN_MAIN'] = 'true'
-
-        self._app.run(threaded=multi_threaded, host=self.host, port=self.port)
+        server = self.server or DevelopmentServer()
+        server.serve(self._app, self.host, self.port, self.is_debugging)
 
     @staticmethod
     def service_response(body, headers, status_code):
@@ -96,6 +145,188 @@ class BaseLocalService(object):
         return response
 
 
+class LambdaOutputStream(object):
+    """
+    Stream that receives stdout of a function while it runs. The last line of stdout is the response of the function.
+    Any lines in front of it are logs the function wrote directly to stdout.
+
+    Data is kept in memory up to a threshold and spilled to a temporary file above that. While chunks arrive, the
+    stream keeps track of where the last line starts, so the response and the logs can be read out separately
+    afterwards without holding everything in memory or searching through it again. Call ``close`` when done.
+    """
+
+    # Keep up to this many bytes in memory before spilling to a temporary file
+    _SPILL_THRESHOLD = 1024 * 1024
+
+    # Size of the chunks data is read back in
+    _CHUNK_SIZE = 64 * 1024
+
+    # Whitespace removed around the response, like bytes.strip() does
+    _WHITESPACE = b" \t\n\r\x0b\x0c"
+
+    def __init__(self, spill_threshold=None):
+        """
+        Parameters
+        ----------
+        spill_threshold int
+            Optional. Number of bytes kept in memory before spilling to a temporary file
+        """
+        self.spill_threshold = spill_threshold or self._SPILL_THRESHOLD
+
+        self._file = tempfile.SpooledTemporaryFile(max_size=self.spill_threshold)
+        self._size = 0
+
+        # Position of the last newline, position after the last byte that is not a newline, and the newline that
+        # separates the response from the logs. Everything after the end of content are trailing newlines.
+        self._last_newline = -1
+        self._content_end = 0
+        self._response_newline = -1
+
+        self._response_bounds = None
+
+    def write(self, data):
+        """
+        Appends a chunk of stdout data
+
+        Parameters
+        ----------
+        data bytes
+            Data to append. Any bytes-like object
+
+        Returns
+        -------
+        int
+            Number of bytes written
+        """
+        data = bytes(data)
+
+        # Reading the response moves the position around. Always append at the end.
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(data)
+
+        content_size = len(data.rstrip(b'\n'))
+        if content_size:
+            # New content. The newline in front of the last line of it is either in this chunk, or the last newline
+            # that was written before
+            position = data.rfind(b'\n', 0, content_size)
+            self._response_newline = self._size + position if position >= 0 else self._last_newline
+            self._content_end = self._size + content_size
+
+        position = data.rfind(b'\n')
+        if position >= 0:
+            self._last_newline = self._size + position
+
+        self._size += len(data)
+        self._response_bounds = None
+
+        return len(data)
+
+    @property
+    def has_logs(self):
+        """
+        Returns
+        -------
+        bool
+            True, if the function wrote anything to stdout in front of the response
+        """
+        return self._response_newline > 0
+
+    @property
+    def response_size(self):
+        """
+        Returns
+        -------
+        int
+            Size of the response in bytes
+        """
+        start, end = self._get_response_bounds()
+        return end - start
+
+    def write_logs(self, stream):
+        """
+        Copies the logs in front of the response to the given stream, chunk by chunk
+
+        Parameters
+        ----------
+        stream io.BaseIO
+            Stream to write the logs to
+        """
+        for chunk in self._read_range(0, max(self._response_newline, 0)):
+            stream.write(chunk)
+
+    def read_response(self):
+        """
+        Returns
+        -------
+        bytes
+            Response of the function
+        """
+        return b"".join(self.iter_response())
+
+    def iter_response(self):
+        """
+        Reads the response of the function in chunks, to send it out without holding all of it in memory
+
+        Yields
+        ------
+        bytes
+            Chunks of the response
+        """
+        start, end = self._get_response_bounds()
+        for chunk in self._read_range(start, end):
+            yield chunk
+
+    def close(self):
+        """
+        Releases the memory or temporary file holding the data
+        """
+        self._file.close()
+
+    def _get_response_bounds(self):
+        """
+        Finds the range of the response. If there are logs in front of it, whitespace around the response is stripped.
+        Otherwise only trailing newlines are removed.
+
+        Returns
+        -------
+        tuple(int, int)
+            Start and end position of the response
+        """
+        if self._response_bounds:
+            return self._response_bounds
+
+        start, end = self._response_newline + 1, self._content_end
+
+        if self._response_newline >= 0:
+            while start < end:
+                chunk = next(self._read_range(start, min(end, start + self._CHUNK_SIZE)))
+                stripped = chunk.lstrip(self._WHITESPACE)
+                start += len(chunk) - len(stripped)
+                if stripped:
+                    break
+
+            while start < end:
+                chunk = next(self._read_range(max(start, end - self._CHUNK_SIZE), end))
+                stripped = chunk.rstrip(self._WHITESPACE)
+                end -= len(chunk) - len(stripped)
+                if stripped:
+                    break
+
+        self._response_bounds = (start, end)
+        return self._response_bounds
+
+    def _read_range(self, start, end):
+        position = start
+        while position < end:
+            self._file.seek(position)
+            chunk = self._file.read(min(self._CHUNK_SIZE, end - position))
+            if not chunk:
+                break
+
+            position += len(chunk)
+            yield chunk
+
+
 class LambdaOutputParser(object):
 
     @staticmethod
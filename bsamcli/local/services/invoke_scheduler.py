@@ -0,0 +1,197 @@
+"""
+Limits how many functions are invoked at the same time by the local services
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from bsamcli.local.lambdafn.exceptions import FunctionThrottled
+
+LOG = logging.getLogger(__name__)
+
+
+def get_function_concurrency(functions):
+    """
+    Returns the concurrency limits of functions that reserve concurrency in the template. Values that are not a
+    number, ex: an unresolved ``!Ref`` or ``Fn::If``, are skipped with a warning, leaving the function unlimited.
+
+    :param list functions: Functions, ex: as returned by ``FunctionProvider.get_all``
+    :return dict: Function name to the maximum number of concurrent invokes
+    """
+    concurrency = {}
+
+    for function in functions:
+        if function.reserved_concurrency is None:
+            continue
+
+        limit = _parse_concurrency(function.reserved_concurrency)
+        if limit is None:
+            LOG.warning("Ignoring ReservedConcurrentExecutions of %s. %r is not a whole number",
+                        function.name, function.reserved_concurrency)
+            continue
+
+        concurrency[function.name] = limit
+
+    return concurrency
+
+
+def _parse_concurrency(value):
+    """
+    :return int: Concurrency limit given as a non-negative whole number, or a string of one. None for anything else
+    """
+    if isinstance(value, bool):
+        return None
+
+    if isinstance(value, int):
+        return value if value >= 0 else None
+
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+
+    return None
+
+
+class InvokeScheduler(object):
+    """
+    Hands out concurrency slots to invokes. An invoke runs only when both the number of invokes running in total and
+    the number of invokes of the same function running are below their limits. Otherwise it waits in a bounded queue
+    until a slot frees up. Waiting invokes are served first come, first served, skipping those whose function is still
+    at its limit. When the queue is full, or an invoke waits longer than the queue timeout, the invoke is throttled.
+
+    This class is thread-safe.
+    """
+
+    _DEFAULT_MAX_QUEUE_SIZE = 100
+    _DEFAULT_QUEUE_TIMEOUT = 30
+
+    def __init__(self,
+                 max_concurrency=None,
+                 function_concurrency=None,
+                 max_queue_size=None,
+                 queue_timeout=None):
+        """
+        Initialize the scheduler
+
+        :param int max_concurrency: Optional. Maximum number of invokes running at the same time. Unlimited if not given
+        :param dict function_concurrency: Optional. Function name to the maximum number of invokes of that function
+            running at the same time. Functions that are not listed are only limited by ``max_concurrency``
+        :param int max_queue_size: Optional. Maximum number of invokes waiting for a slot
+        :param int queue_timeout: Optional. Seconds an invoke waits for a slot before it is throttled
+        """
+
+        self.max_concurrency = max_concurrency
+        self.function_concurrency = function_concurrency or {}
+        self.max_queue_size = max_queue_size if max_queue_size is not None else self._DEFAULT_MAX_QUEUE_SIZE
+        self.queue_timeout = queue_timeout if queue_timeout is not None else self._DEFAULT_QUEUE_TIMEOUT
+
+        self._condition = threading.Condition()
+        self._running_total = 0
+        self._running = {}
+
+        # (function name, ticket) of waiting invokes, in arrival order
+        self._queue = deque()
+
+    @contextmanager
+    def slot(self, function_name):
+        """
+        Context manager that holds a concurrency slot for the given function while the body runs
+
+            with scheduler.slot("HelloWorldFunction"):
+                lambda_runner.invoke(...)
+
+        :param string function_name: Name of the function to invoke
+        :raises FunctionThrottled: If no slot became available
+        """
+        self.acquire(function_name)
+        try:
+            yield
+        finally:
+            self.release(function_name)
+
+    def acquire(self, function_name):
+        """
+        Blocks until a slot is available for the given function. Every successful call must be followed by a call
+        to ``release``.
+
+        :param string function_name: Name of the function to invoke
+        :raises FunctionThrottled: If the function can't run at all, the queue is full or the invoke waited too long
+        """
+
+        if self.function_concurrency.get(function_name) == 0:
+            raise FunctionThrottled("Function {} has no concurrency reserved".format(function_name))
+
+        with self._condition:
+            if self._can_run(function_name) and self._next_runnable() is None:
+                self._start(function_name)
+                return
+
+            if len(self._queue) >= self.max_queue_size:
+                LOG.debug("Throttling invoke of %s. %d invokes are waiting already", function_name, len(self._queue))
+                raise FunctionThrottled("Rate exceeded")
+
+            ticket = (function_name, object())
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.queue_timeout
+
+            try:
+                while not (self._can_run(function_name) and self._next_runnable() is ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        LOG.debug("Throttling invoke of %s after waiting %s seconds", function_name,
+                                  self.queue_timeout)
+                        raise FunctionThrottled("Rate exceeded")
+
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # Whether we run or give up, the head of the queue changed. Let the others re-check.
+                self._condition.notify_all()
+
+            self._start(function_name)
+
+    def release(self, function_name):
+        """
+        Frees the slot held by an invoke of the given function
+
+        :param string function_name: Name of the function that finished running
+        """
+        with self._condition:
+            self._running_total -= 1
+            self._running[function_name] -= 1
+            if not self._running[function_name]:
+                del self._running[function_name]
+
+            self._condition.notify_all()
+
+    @property
+    def queue_size(self):
+        """
+        :return int: Number of invokes waiting for a slot
+        """
+        with self._condition:
+            return len(self._queue)
+
+    def _start(self, function_name):
+        self._running_total += 1
+        self._running[function_name] = self._running.get(function_name, 0) + 1
+
+    def _can_run(self, function_name):
+        if self.max_concurrency is not None and self._running_total >= self.max_concurrency:
+            return False
+
+        limit = self.function_concurrency.get(function_name)
+        return limit is None or self._running.get(function_name, 0) < limit
+
+    def _next_runnable(self):
+        """
+        :return tuple: Ticket of the earliest waiting invoke whose function is below its limit. None, if there is none
+        """
+        for ticket in self._queue:
+            limit = self.function_concurrency.get(ticket[0])
+            if limit is None or self._running.get(ticket[0], 0) < limit:
+                return ticket
+
+        return None
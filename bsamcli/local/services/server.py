@@ -0,0 +1,582 @@
+"""
+HTTP servers the local services run on
+"""
+
+import logging
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
+
+LOG = logging.getLogger(__name__)
+
+# Set in the environment of the worker processes of a PooledServer, so they serve instead of starting workers again
+_WORKER_ENV = "BSAM_SERVER_WORKER"
+
+
+def get_server(threads=None, processes=None, drain_timeout=None):
+    """
+    Returns the server to run a local service on, for the given command line options
+
+    :param int threads: Optional. Number of requests served at the same time by every process. Defaults to Flask's
+        development server, which starts a thread for every connection
+    :param int processes: Optional. Number of worker processes sharing the port. Defaults to 1
+    :param float drain_timeout: Optional. Seconds to wait for requests in flight on shutdown
+    :return: Server to pass to the service. None, for Flask's development server
+    :raises ValueError: If the platform does not support several processes sharing a port
+    """
+
+    if not threads and (processes or 1) <= 1:
+        return None
+
+    if (processes or 1) > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        raise ValueError("Several worker processes need SO_REUSEPORT, which this platform does not support")
+
+    return PooledServer(threads=threads, processes=processes, drain_timeout=drain_timeout)
+
+
+class DevelopmentServer(object):
+    """
+    Flask's development server. It starts a new thread for every connection, or serves one request at a time in the
+    main thread while debugging.
+    """
+
+    def serve(self, app, host, port, is_debugging):
+        """
+        Serves the application until the process is interrupted
+
+        :param flask.Flask app: Application to serve
+        :param string host: Hostname or IP address to bind to
+        :param int port: Port to listen on
+        :param bool is_debugging: Is a function debugged?
+        """
+
+        # Flask can operate as a single threaded server (which is default) and a multi-threaded server which is
+        # more for development. When the Lambda container is going to be debugged, then it does not make sense
+        # to turn on multi-threading because customers can realistically attach only one container at a time to
+        # the debugger. Keeping this single threaded also enables the Lambda Runner to handle Ctrl+C in order to
+        # kill the container gracefully (Ctrl+C can be handled only by the main thread)
+        multi_threaded = not is_debugging
+
+        LOG.debug("Localhost server is starting up. Multi-threading = %s", multi_threaded)
+
+        # This environ signifies we are running a main function for Flask. This is true, since we are using it within
+        # our cli and not on a production server.
+        os.environ['WERKZEUG_RUN_MAIN'] = 'true'
+
+        app.run(threaded=multi_threaded, host=host, port=port)
+
+
+class PooledServer(object):
+    """
+    Server for local services shared by many clients, ex: as an integration environment. A fixed pool of threads
+    serves the requests, so a burst of clients queues up instead of starting a thread each. Connections are kept
+    alive across requests (HTTP/1.1), until they are idle for ``keep_alive_timeout`` seconds, or new connections are
+    waiting for a thread.
+
+    With several processes, every process is a copy of the running command, with its own pool of threads and its own
+    warm containers, listening on the same port with SO_REUSEPORT. The kernel spreads the connections across them, so
+    the service uses more than one core. The process that started them waits for them and forwards SIGTERM. Callers
+    check ``supervises`` first, so the supervising process does not set up anything only needed to serve requests,
+    ex: watchers or background workers.
+
+    On SIGTERM or Ctrl+C, the server stops accepting connections and waits up to ``drain_timeout`` seconds for the
+    requests in flight to finish.
+    """
+
+    _DEFAULT_THREADS = 16
+    _DEFAULT_KEEP_ALIVE_TIMEOUT = 5
+    _DEFAULT_DRAIN_TIMEOUT = 10
+
+    def __init__(self, threads=None, processes=None, keep_alive_timeout=None, drain_timeout=None):
+        """
+        :param int threads: Optional. Number of requests every process serves at the same time. Defaults to 16
+        :param int processes: Optional. Number of worker processes. Defaults to 1, serving in this process
+        :param float keep_alive_timeout: Optional. Seconds an idle connection is kept open. Defaults to 5
+        :param float drain_timeout: Optional. Seconds to wait for requests in flight on shutdown. Defaults to 10
+        """
+
+        self.threads = threads or self._DEFAULT_THREADS
+        self.processes = processes or 1
+        self.keep_alive_timeout = keep_alive_timeout or self._DEFAULT_KEEP_ALIVE_TIMEOUT
+        self.drain_timeout = drain_timeout if drain_timeout is not None else self._DEFAULT_DRAIN_TIMEOUT
+
+    def serve(self, app, host, port, is_debugging):
+        """
+        Serves the application until the process is terminated or interrupted, then drains the requests in flight
+
+        :param flask.Flask app: Application to serve
+        :param string host: Hostname or IP address to bind to
+        :param int port: Port to listen on
+        :param bool is_debugging: Is a function debugged? Debugging needs one request at a time in the main thread,
+            so Flask's development server is used then
+        """
+
+        if is_debugging:
+            LOG.info("Serving one request at a time while debugging")
+            DevelopmentServer().serve(app, host, port, is_debugging)
+            return
+
+        if self.supervises(is_debugging):
+            self.supervise()
+            return
+
+        server = self.make_server(app, host, port, reuse_port=bool(os.environ.get(_WORKER_ENV)))
+        LOG.debug("Serving on %s:%d with %d threads", host, port, self.threads)
+
+        with _shutdown_on_sigterm(server.shutdown):
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                LOG.debug("Ctrl+C was pressed. Stopping the server")
+            finally:
+                self._drain(server)
+
+    def supervises(self, is_debugging=False):
+        """
+        Tells whether this process starts worker processes to serve the requests, instead of serving them itself
+
+        :param bool is_debugging: Is a function debugged? Debugging serves in this process
+        :return bool: True, if this process only supervises the worker processes
+        """
+
+        return self.processes > 1 and not is_debugging and not os.environ.get(_WORKER_ENV)
+
+    def make_server(self, app, host, port, reuse_port=False):
+        """
+        Creates the server of one process. It is bound to the port already.
+
+        :return PooledWSGIServer: Server
+        """
+
+        return PooledWSGIServer(host, port, app,
+                                threads=self.threads,
+                                keep_alive_timeout=self.keep_alive_timeout,
+                                reuse_port=reuse_port)
+
+    def _drain(self, server):
+        # Stop accepting connections first, so clients connect to another process or fail fast
+        server.server_close()
+
+        remaining = server.drain(self.drain_timeout)
+        if remaining:
+            LOG.warning("Stopped with %d connections still open after waiting %s seconds for them", remaining,
+                        self.drain_timeout)
+
+    def supervise(self):
+        """
+        Starts the worker processes and waits for all of them to exit. Every worker runs this command again, and
+        serves the requests.
+        """
+
+        env = dict(os.environ)
+        env[_WORKER_ENV] = "1"
+
+        workers = [subprocess.Popen(self._get_worker_command(), env=env) for _ in range(self.processes)]
+        LOG.info("Started %d worker processes", len(workers))
+
+        def terminate():
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.send_signal(signal.SIGTERM)
+
+        with _shutdown_on_sigterm(terminate):
+            while True:
+                try:
+                    for worker in workers:
+                        worker.wait()
+                    break
+                except KeyboardInterrupt:
+                    # Ctrl+C reaches the workers too, as they are in the same process group. They drain and exit.
+                    LOG.debug("Ctrl+C was pressed. Waiting for the worker processes to stop")
+
+        failed = [worker.pid for worker in workers if worker.returncode]
+        if failed:
+            LOG.warning("Worker processes %s exited with an error", failed)
+
+    @staticmethod
+    def _get_worker_command():
+        """
+        :return list: Command line that runs this command again
+        """
+        return [sys.executable] + sys.argv
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server handing the accepted connections to a fixed number of threads. Keeps track of the open connections,
+    so they can be drained on shutdown.
+
+    A kept-alive connection holds its thread while it waits for the next request. So that idle clients cannot starve
+    new ones, the connections idle the longest are closed as soon as connections queue up for a thread, and no
+    connection is kept alive while others are queued.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, keep_alive_timeout, reuse_port=False):
+        """
+        :param string host: Hostname or IP address to bind to
+        :param int port: Port to listen on
+        :param app: WSGI application
+        :param int threads: Number of threads serving connections
+        :param float keep_alive_timeout: Seconds an idle connection is kept open
+        :param bool reuse_port: Allow other processes to listen on the same port
+        """
+
+        self.reuse_port = reuse_port
+        self.draining = False
+
+        self._connections = queue.Queue()
+        self._open_connections = 0
+        self._drained = threading.Condition()
+
+        # Handlers waiting for the next request on their connection, idle the longest first, and the number of
+        # threads serving a connection
+        self._idle_handlers = OrderedDict()
+        self._serving = 0
+        self._idle_lock = threading.Lock()
+
+        handler = type("KeepAliveRequestHandler", (_KeepAliveRequestHandler,), {"timeout": keep_alive_timeout})
+        super(PooledWSGIServer, self).__init__(host, port, app, handler=handler)
+
+        self._threads = [threading.Thread(target=self._work, name="server-{}".format(index))
+                         for index in range(threads)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super(PooledWSGIServer, self).server_bind()
+
+    def process_request(self, request, client_address):
+        """
+        Queues an accepted connection for the next free thread
+        """
+
+        with self._drained:
+            self._open_connections += 1
+        self._connections.put((request, client_address))
+
+        self._close_idle_connections()
+
+    @property
+    def backlog(self):
+        """
+        :return int: Number of accepted connections waiting for a thread
+        """
+        with self._idle_lock:
+            return self._get_backlog()
+
+    def connection_idle(self, handler):
+        """
+        Called by a handler before it waits for the next request on its connection. The connection is closed while
+        waiting, if other connections need the thread.
+
+        :param _KeepAliveRequestHandler handler: Handler of the connection
+        """
+        with self._idle_lock:
+            self._idle_handlers[handler] = True
+
+        self._close_idle_connections()
+
+    def connection_active(self, handler):
+        """
+        Called by a handler once it received a request, or is done with its connection
+
+        :param _KeepAliveRequestHandler handler: Handler of the connection
+        """
+        with self._idle_lock:
+            self._idle_handlers.pop(handler, None)
+
+    def _get_backlog(self):
+        # Must be called while holding the idle lock
+        return max(self._connections.qsize() - (len(self._threads) - self._serving), 0)
+
+    def _close_idle_connections(self):
+        """
+        Closes as many idle connections as connections are waiting for a thread. The handlers see the connection
+        closed, and give their thread to the next connection.
+        """
+        with self._idle_lock:
+            for _ in range(min(self._get_backlog(), len(self._idle_handlers))):
+                handler, _ = self._idle_handlers.popitem(last=False)
+                LOG.debug("Closing idle connection of %s for a waiting connection", handler.client_address)
+                try:
+                    handler.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    # Closed by the client already
+                    pass
+
+    def drain(self, timeout):
+        """
+        Closes every connection once its current request is answered, and waits for all connections to be closed.
+        Call after the server stopped accepting connections.
+
+        :param float timeout: Seconds to wait at most
+        :return int: Number of connections still open after the timeout
+        """
+
+        self.draining = True
+        deadline = time.time() + timeout
+
+        with self._drained:
+            while self._open_connections:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._drained.wait(remaining)
+            open_connections = self._open_connections
+
+        for _ in self._threads:
+            self._connections.put(None)
+
+        return open_connections
+
+    def _work(self):
+        while True:
+            item = self._connections.get()
+            if item is None:
+                return
+
+            request, client_address = item
+            with self._idle_lock:
+                self._serving += 1
+
+            try:
+                self.finish_request(request, client_address)
+            except Exception:  # pylint: disable=broad-except
+                self.handle_error(request, client_address)
+            finally:
+                with self._idle_lock:
+                    self._serving -= 1
+
+                self.shutdown_request(request)
+                with self._drained:
+                    self._open_connections -= 1
+                    self._drained.notify_all()
+
+
+class _KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    Serves requests over one connection until the client closes it, it is idle for ``timeout`` seconds, the server
+    needs the thread for another connection, or the server drains
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # Responses that never have a body, so they need neither a Content-Length nor chunked encoding
+    _BODYLESS_STATUS_CODES = (204, 304)
+
+    # Requests received over the connection
+    requests_received = 0
+
+    def handle_one_request(self):
+        # The first request of a new connection may be on its way already, so only connections kept alive are idle
+        if self.requests_received:
+            self.server.connection_idle(self)
+        super(_KeepAliveRequestHandler, self).handle_one_request()
+
+    def parse_request(self):
+        # A request arrived. The connection is no longer idle.
+        self.server.connection_active(self)
+        self.requests_received += 1
+        return super(_KeepAliveRequestHandler, self).parse_request()
+
+    def finish(self):
+        self.server.connection_active(self)
+        super(_KeepAliveRequestHandler, self).finish()
+
+    @property
+    def keep_alive(self):
+        """
+        :return bool: True, if the connection may be kept open after the current response
+        """
+        return not (self.close_connection or self.server.draining or self.server.backlog)
+
+    def run_wsgi(self):
+        """
+        Runs the application for one request. Unlike Werkzeug's, which closes the connection after every response, it
+        reads exactly the body of the request and frames the response, so the next request can follow on the same
+        connection.
+        """
+
+        if self.headers.get("Expect", "").lower().strip() == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        environ = self.make_environ()
+
+        request_body = None
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            # Where a chunked body ends is only known once the application read it all. Rather than risk reading the
+            # next request as part of it, close the connection afterwards.
+            self.close_connection = True
+        else:
+            request_body = LimitedStream(self.rfile, int(self.headers.get("Content-Length") or 0))
+            environ["wsgi.input"] = request_body
+
+        response = _Response(self, environ["REQUEST_METHOD"])
+
+        try:
+            result = self.server.app(environ, response.start)
+            try:
+                for data in result:
+                    response.write(data)
+                response.finish()
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        except (ConnectionError, socket.timeout) as ex:
+            self.connection_dropped(ex, environ)
+            self.close_connection = True
+            return
+        except Exception:  # pylint: disable=broad-except
+            self.close_connection = True
+            self.server.log("error", "Error on request:\n%s", traceback.format_exc())
+            if not response.headers_sent:
+                response.fail()
+            return
+
+        if request_body is not None:
+            # Skip what the application did not read of the body, so the next request starts where it should
+            request_body.exhaust()
+
+        if not self.keep_alive:
+            self.close_connection = True
+
+
+class _Response(object):
+    """
+    Writes the response of a WSGI application to a keep-alive connection. Without a Content-Length from the
+    application, the body is sent in chunks, so the client still knows where it ends.
+    """
+
+    def __init__(self, handler, method):
+        self.handler = handler
+        self.method = method
+
+        self.status = None
+        self.headers = None
+        self.headers_sent = False
+        self.chunked = False
+        self.size = 0
+
+    def start(self, status, headers, exc_info=None):
+        """
+        ``start_response`` of the WSGI application
+        """
+
+        if exc_info:
+            try:
+                if self.headers_sent:
+                    raise exc_info[1].with_traceback(exc_info[2])
+            finally:
+                exc_info = None
+        elif self.status is not None:
+            raise AssertionError("Headers already set")
+
+        self.status = status
+        self.headers = headers
+        return self.write
+
+    def write(self, data):
+        if self.status is None:
+            raise AssertionError("write() before start_response")
+
+        if not self.headers_sent:
+            self._send_headers()
+
+        if not data or self._is_bodyless():
+            return
+
+        if self.chunked:
+            self.handler.wfile.write("{:x}\r\n".format(len(data)).encode("ascii"))
+            self.handler.wfile.write(data)
+            self.handler.wfile.write(b"\r\n")
+        else:
+            self.handler.wfile.write(data)
+
+        self.size += len(data)
+
+    def finish(self):
+        """
+        Sends the headers, if the application returned no data, and ends a chunked body
+        """
+
+        if not self.headers_sent:
+            self.write(b"")
+
+        if self.chunked:
+            self.handler.wfile.write(b"0\r\n\r\n")
+
+        self.handler.wfile.flush()
+
+    def fail(self):
+        """
+        Answers with a 500 error, if the application raised before sending anything
+        """
+
+        self.status = "500 INTERNAL SERVER ERROR"
+        self.headers = [("Content-Type", "text/plain"), ("Content-Length", "21")]
+        self.write(b"Internal Server Error")
+        self.handler.wfile.flush()
+
+    def _send_headers(self):
+        code, _, reason = self.status.partition(" ")
+        self.handler.send_response(int(code), reason)
+
+        header_names = set()
+        for name, value in self.headers:
+            self.handler.send_header(name, value)
+            header_names.add(name.lower())
+
+        if "content-length" not in header_names and not self._is_bodyless():
+            self.chunked = True
+            self.handler.send_header("Transfer-Encoding", "chunked")
+
+        if not self.handler.keep_alive:
+            # send_header() marks the connection to be closed, too
+            self.handler.send_header("Connection", "close")
+
+        self.handler.end_headers()
+        self.headers_sent = True
+
+    def _is_bodyless(self):
+        code = int(self.status.split(" ", 1)[0])
+        return self.method == "HEAD" or code < 200 or code in _KeepAliveRequestHandler._BODYLESS_STATUS_CODES
+
+
+@contextmanager
+def _shutdown_on_sigterm(shutdown):
+    """
+    Calls the given function in a new thread on SIGTERM, while the body runs. Signal handlers can only be installed
+    from the main thread. Elsewhere, SIGTERM keeps its current handler.
+
+    :param callable shutdown: Stops the server, ex: ``BaseServer.shutdown``, which blocks until the server stopped
+    """
+
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(sig, frame):
+        LOG.debug("Received SIGTERM. Stopping the server")
+        threading.Thread(target=shutdown).start()
+
+    previous = signal.signal(signal.SIGTERM, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
@@ -0,0 +1,132 @@
+"""
+Measures how many API Gateway events per second ``LocalApigwService._construct_event`` builds.
+
+Every scenario builds the event of the same request again and again, both the way it was built before, creating the
+event objects of the request and serializing them with ``json.dumps``, and with the event templates of the routes.
+Headers are looked up in the response of the function with ``CaseInsensitiveDict``, before and after its keys were
+indexed.
+
+Run with:
+
+    python -m tests.benchmark.apigw_event
+"""
+
+import base64
+import json
+import time
+
+from flask import Flask, request
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService
+from bsamcli.local.apigw.path_converter import PathConverter
+from bsamcli.local.events.api_event import ContextIdentity, RequestContext, ApiGatewayLambdaEvent
+from bsamcli.local.services.base_local_service import CaseInsensitiveDict
+
+# (description, number of request headers, size of the body)
+SCENARIOS = [
+    ("GET, 5 headers", 5, 0),
+    ("POST 1 KB, 20 headers", 20, 1024),
+    ("POST 64 KB, 50 headers", 50, 64 * 1024),
+]
+
+EVENTS = 20000
+REPEAT = 3
+
+
+def _construct_event_objects(flask_request, port, binary_types):
+    """
+    The way events were built before this benchmark. Everything is derived again for every request.
+    """
+
+    identity = ContextIdentity(source_ip=flask_request.remote_addr)
+    endpoint = PathConverter.convert_path_to_api_gateway(flask_request.endpoint)
+
+    request_data = flask_request.get_data()
+    if LocalApigwService._should_base64_encode(binary_types, flask_request.mimetype):
+        request_data = base64.b64encode(request_data)
+    if request_data:
+        request_data = request_data.decode('utf-8')
+
+    context = RequestContext(resource_path=endpoint, http_method=flask_request.method, stage="prod",
+                             identity=identity, path=endpoint)
+
+    event_headers = dict(flask_request.headers)
+    event_headers["X-Forwarded-Proto"] = flask_request.scheme
+    event_headers["X-Forwarded-Port"] = str(port)
+
+    event = ApiGatewayLambdaEvent(http_method=flask_request.method,
+                                  body=request_data,
+                                  resource=endpoint,
+                                  request_context=context,
+                                  query_string_params=LocalApigwService._query_string_params(flask_request),
+                                  headers=event_headers,
+                                  path_parameters=flask_request.view_args,
+                                  path=flask_request.path,
+                                  is_base_64_encoded=False)
+
+    return json.dumps(event.to_dict())
+
+
+class _ListCaseInsensitiveDict(dict):
+    """
+    The CaseInsensitiveDict this benchmark compares against. Every lookup scans all keys.
+    """
+
+    def __getitem__(self, key):
+        matches = [v for k, v in self.items() if k.lower() == key.lower()]
+        if not matches:
+            raise KeyError(key)
+        return matches[0]
+
+    def __contains__(self, key):
+        return key.lower() in [k.lower() for k in self.keys()]
+
+
+def _measure(construct, flask_request):
+    started = time.time()
+    for _ in range(EVENTS):
+        construct(flask_request, 3000, [])
+    return time.time() - started
+
+
+def _measure_headers(dict_class, headers):
+    started = time.time()
+    for _ in range(EVENTS):
+        looked_up = dict_class(headers)
+        "Content-Type" in looked_up  # pylint: disable=W0104
+        looked_up["content-length"]  # pylint: disable=W0104
+    return time.time() - started
+
+
+def main():
+    app = Flask(__name__)
+    app.add_url_rule("/users/<user>/<path:proxy>", endpoint="/users/<user>/<path:proxy>", methods=["GET", "POST"])
+
+    print("{:<24}{:>18}{:>18}{:>10}{:>20}".format("Scenario", "objects (ev/s)", "template (ev/s)", "speedup",
+                                                  "headers speedup"))
+
+    for description, header_count, body_size in SCENARIOS:
+        headers = {"X-Header-{}".format(index): "value-{}".format(index) for index in range(header_count)}
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(body_size)
+
+        with app.test_request_context("/users/42/orders/7?expand=items&limit=10",
+                                      method="POST" if body_size else "GET",
+                                      headers=headers,
+                                      data=b"x" * body_size):
+            assert json.loads(_construct_event_objects(request, 3000, [])) == \
+                json.loads(LocalApigwService._construct_event(request, 3000, []))
+
+            baseline = min(_measure(_construct_event_objects, request) for _ in range(REPEAT))
+            templated = min(_measure(LocalApigwService._construct_event, request) for _ in range(REPEAT))
+
+        scanned = min(_measure_headers(_ListCaseInsensitiveDict, headers) for _ in range(REPEAT))
+        indexed = min(_measure_headers(CaseInsensitiveDict, headers) for _ in range(REPEAT))
+
+        print("{:<24}{:>18.0f}{:>18.0f}{:>9.1f}x{:>19.1f}x".format(description, EVENTS / baseline,
+                                                                   EVENTS / templated, baseline / templated,
+                                                                   scanned / indexed))
+
+
+if __name__ == "__main__":
+    main()
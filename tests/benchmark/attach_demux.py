@@ -0,0 +1,102 @@
+"""
+Measures how fast container output is demultiplexed from the Docker attach stream.
+
+A writer thread sends multi-MB log streams, made of frames as Docker sends them, through a real socket pair. The
+stream is read back both with the previous reader, which reads every header and payload separately, and with
+``attach_api._read_socket``. Output is written to a byte stream, like ``Container._write_container_output`` does.
+
+Run with:
+
+    python -m tests.benchmark.attach_demux
+"""
+
+import io
+import socket
+import struct
+import threading
+import time
+
+from docker.utils.socket import read, read_exactly, SocketError
+
+from bsamcli.local.docker.attach_api import _read_socket
+from bsamcli.local.docker.container import Container
+
+# (description, size of one log line, total size of the stream)
+SCENARIOS = [
+    ("80 byte lines, 8 MB", 80, 8 * 1024 * 1024),
+    ("1 KB lines, 32 MB", 1024, 32 * 1024 * 1024),
+    ("64 KB lines, 64 MB", 64 * 1024, 64 * 1024 * 1024),
+]
+
+REPEAT = 3
+
+
+def _per_frame_read_socket(sock):
+    """
+    The reader this benchmark compares against. Reads every header and payload with separate system calls, and
+    hands out a new bytes object for every read.
+    """
+    while True:
+        try:
+            payload_type, payload_size = struct.unpack('>BxxxL', read_exactly(sock, 8))
+        except SocketError:
+            break
+
+        remaining = payload_size
+        while remaining > 0:
+            data = read(sock, remaining)
+            if not data:
+                return
+            remaining -= len(data)
+            yield payload_type, data
+
+
+def _make_stream(line_size, total_size):
+    line = b"x" * (line_size - 1) + b"\n"
+    frames = [struct.pack('>BxxxL', 1 + i % 2, len(line)) + line for i in range(256)]
+    chunk = b"".join(frames)
+
+    return chunk * max(1, total_size // len(line) // len(frames))
+
+
+def _measure(reader, stream, line_size):
+    reader_socket, writer_socket = socket.socketpair()
+
+    def write():
+        writer_socket.sendall(stream)
+        writer_socket.close()
+
+    writer = threading.Thread(target=write)
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+
+    started = time.time()
+    writer.start()
+    Container._write_container_output(reader(reader_socket), stdout=stdout, stderr=stderr)  # pylint: disable=W0212
+    elapsed = time.time() - started
+
+    writer.join()
+    reader_socket.close()
+
+    # Everything but the 8 byte frame headers must come out
+    expected_size = len(stream) - len(stream) // (line_size + 8) * 8
+    assert len(stdout.getvalue()) + len(stderr.getvalue()) == expected_size
+
+    return elapsed
+
+
+def main():
+    print("{:<24}{:>18}{:>18}{:>10}".format("Scenario", "per frame (MB/s)", "buffered (MB/s)", "speedup"))
+
+    for description, line_size, total_size in SCENARIOS:
+        stream = _make_stream(line_size, total_size)
+        megabytes = len(stream) / 1024.0 / 1024.0
+
+        baseline = min(_measure(_per_frame_read_socket, stream, line_size) for _ in range(REPEAT))
+        buffered = min(_measure(_read_socket, stream, line_size) for _ in range(REPEAT))
+
+        print("{:<24}{:>18.1f}{:>18.1f}{:>9.1f}x".format(description, megabytes / baseline, megabytes / buffered,
+                                                         baseline / buffered))
+
+
+if __name__ == "__main__":
+    main()
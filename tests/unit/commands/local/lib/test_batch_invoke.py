@@ -0,0 +1,160 @@
+"""
+Tests invoking a function with a stream of events
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+
+from bsamcli.commands.local.lib.batch_invoke import BatchInvoker, BatchSummary, iter_events
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound
+from bsamcli.local.lambdafn.metrics import InvokeMetrics
+
+
+class TestIterEvents(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as fp:
+            fp.write(content)
+        return path
+
+    def test_must_read_event_files_of_directory_in_order(self):
+        self._write("b.json", '{"b": 1}')
+        self._write("a.json", '{"a": 1}')
+        self._write("notes.txt", "not an event")
+
+        self.assertEqual(list(iter_events(self.dir)), [("a.json", '{"a": 1}'), ("b.json", '{"b": 1}')])
+
+    def test_must_read_one_event_per_line(self):
+        path = self._write("events.jsonl", '{"a": 1}\n\n{"b": 1}\n')
+
+        self.assertEqual(list(iter_events(path)), [("events.jsonl:1", '{"a": 1}'), ("events.jsonl:3", '{"b": 1}')])
+
+
+ERROR_RESPONSE = b'{"errorMessage": "failed", "errorType": "Exception", "stackTrace": []}'
+
+
+class FakeRunner(object):
+
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, function_name, event, stdout=None, stderr=None):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(self.duration)
+
+        with self._lock:
+            self.running -= 1
+
+        if event == "broken":
+            raise RuntimeError("container failed")
+
+        metrics = InvokeMetrics(function_name, request_id="id-" + event)
+        metrics.cold = event == "1"
+        metrics.timed_out = event == "slow"
+        response = ERROR_RESPONSE if event == "error" else event.encode()
+        stdout.write(b"log line\n" + response)
+        stderr.write(b"REPORT\n")
+        return metrics
+
+
+class TestBatchInvoker(TestCase):
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.stderr = io.BytesIO()
+
+    def _run(self, runner, events, concurrency=1):
+        invoker = BatchInvoker(runner, "name", concurrency=concurrency, output=self.output, stderr=self.stderr)
+        summary = invoker.run(("event-{}".format(index), event) for index, event in enumerate(events))
+        results = [json.loads(line) for line in self.output.getvalue().splitlines()]
+        return summary, {result["id"]: result for result in results}
+
+    def test_must_write_one_result_per_event(self):
+        summary, results = self._run(FakeRunner(), ["1", "error", "slow", "broken"])
+
+        self.assertEqual(results["event-0"]["status"], "success")
+        self.assertEqual(results["event-0"]["response"], "1")
+        self.assertEqual(results["event-0"]["request_id"], "id-1")
+        self.assertTrue(results["event-0"]["cold"])
+        self.assertEqual(results["event-1"]["status"], "error")
+        self.assertEqual(results["event-2"]["status"], "timeout")
+        self.assertNotIn("response", results["event-2"])
+        self.assertEqual(results["event-3"]["status"], "failed")
+        self.assertEqual(results["event-3"]["error"], "container failed")
+        self.assertEqual(summary.counts, {"success": 1, "error": 1, "timeout": 1, "failed": 1})
+        self.assertEqual(summary.cold_starts, 1)
+        self.assertEqual(self.stderr.getvalue().count(b"log line\nREPORT\n"), 3)
+
+    def test_must_run_events_concurrently(self):
+        runner = FakeRunner(duration=0.05)
+
+        summary, results = self._run(runner, ["2"] * 20, concurrency=4)
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(runner.max_running, 4)
+        self.assertGreater(summary.throughput, 0)
+
+    def test_must_stop_when_function_is_not_found(self):
+        runner = Mock()
+        runner.invoke.side_effect = FunctionNotFound("not found")
+
+        with self.assertRaises(FunctionNotFound):
+            self._run(runner, ["1", "2", "3"], concurrency=2)
+
+        self.assertLessEqual(runner.invoke.call_count, 2)
+        self.assertEqual(self.output.getvalue(), "")
+
+    def test_must_fail_when_events_cannot_be_read(self):
+        def events():
+            yield "event-0", "1"
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+        invoker = BatchInvoker(FakeRunner(), "name", concurrency=2, output=self.output)
+
+        with self.assertRaises(UnicodeDecodeError):
+            invoker.run(events())
+
+    def test_must_fail_when_result_cannot_be_written(self):
+        self.output = Mock()
+        self.output.write.side_effect = IOError("Broken pipe")
+
+        with self.assertRaises(IOError):
+            self._run(FakeRunner(), ["1", "2", "3"], concurrency=2)
+
+
+class TestBatchSummary(TestCase):
+
+    def test_must_format_summary(self):
+        results = [{"status": "success", "latency_ms": float(latency), "cold": latency == 1}
+                   for latency in range(1, 101)]
+
+        text = BatchSummary(results, 2.0).format()
+
+        self.assertEqual(text.splitlines(), [
+            "Invoked 100 events in 2.00s (50.00 events/s): 100 success",
+            "Cold starts: 1",
+            "Latency (ms): min 1.0, p50 50.0, p90 90.0, p99 99.0, max 100.0",
+        ])
+
+    def test_must_format_empty_batch(self):
+        self.assertEqual(BatchSummary([], 0).format().splitlines(),
+                         ["Invoked 0 events in 0.00s (0.00 events/s): none", "Cold starts: 0"])
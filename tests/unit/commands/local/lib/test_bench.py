@@ -0,0 +1,164 @@
+"""
+Tests the load generator of "local bench"
+"""
+
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock, patch
+from six.moves import BaseHTTPServer
+
+from bsamcli.commands.local.lib.bench import Bench, BenchResult, HttpTarget, InvokeTarget
+from bsamcli.local.lambdafn.metrics import InvokeMetrics
+
+
+class SlowTarget(object):
+
+    def __init__(self, duration=0.0, fail=False):
+        self.duration = duration
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+
+        time.sleep(self.duration)
+
+        if self.fail:
+            raise RuntimeError("connection refused")
+        return False, first
+
+
+class TestBench(TestCase):
+
+    def test_must_keep_calls_in_flight_for_duration(self):
+        target = SlowTarget(duration=0.01)
+
+        result = Bench(target, 0.2, concurrency=2).run()
+
+        self.assertEqual(result.calls, target.calls)
+        self.assertGreater(result.calls, 4)
+        self.assertEqual(result.histogram.total_count, result.calls)
+        self.assertEqual(result.cold_starts, 1)
+        self.assertEqual(result.errors, 0)
+        self.assertGreaterEqual(result.histogram.get_value_at_percentile(50), 10)
+
+    def test_must_start_calls_at_rate(self):
+        target = SlowTarget()
+
+        result = Bench(target, 0.5, concurrency=2, rate=20).run()
+
+        self.assertEqual(result.calls, 10)
+
+    def test_must_count_latency_from_when_call_was_due(self):
+        # One worker can make 10 calls per second at most. The calls due later wait for it.
+        target = SlowTarget(duration=0.1)
+
+        result = Bench(target, 0.3, concurrency=1, rate=20).run()
+
+        self.assertEqual(result.calls, 6)
+        self.assertGreater(result.histogram.max, 250)
+
+    def test_must_count_failures_as_errors(self):
+        result = Bench(SlowTarget(fail=True), 0.05).run()
+
+        self.assertEqual(result.errors, result.calls)
+        self.assertEqual(result.failures, ["connection refused"])
+
+
+class TestInvokeTarget(TestCase):
+
+    def test_must_report_errors_and_cold_starts(self):
+        metrics = InvokeMetrics("name")
+        runner = Mock()
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write(b'{"errorMessage": "failed", "errorType": "Exception", "stackTrace": []}')
+            return metrics
+
+        runner.invoke.side_effect = invoke
+
+        self.assertEqual(InvokeTarget(runner, "name", "{}")(), (True, True))
+
+        runner.invoke.assert_called_with("name", "{}", stdout=runner.invoke.call_args[1]["stdout"],
+                                         stderr=runner.invoke.call_args[1]["stderr"])
+
+    def test_must_report_timeouts_as_errors(self):
+        metrics = InvokeMetrics("name")
+        metrics.timed_out = True
+        metrics.cold = False
+        runner = Mock()
+        runner.invoke.return_value = metrics
+
+        self.assertEqual(InvokeTarget(runner, "name", "{}")(), (True, False))
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_POST(self):
+        Handler.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        if body == b"error":
+            self.send_header("x-amz-function-error", "Unhandled")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpTarget(TestCase):
+
+    def setUp(self):
+        Handler.connections = set()
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = "http://127.0.0.1:{}/2015-03-31/functions/name/invocations".format(self.server.server_port)
+
+    def test_must_reuse_connection(self):
+        target = HttpTarget(self.url, body="{}")
+
+        self.assertEqual([target() for _ in range(3)], [(False, None)] * 3)
+        self.assertEqual(len(Handler.connections), 1)
+
+    def test_must_report_function_errors(self):
+        self.assertEqual(HttpTarget(self.url, body="error")(), (True, None))
+
+    def test_must_reject_other_urls(self):
+        with self.assertRaises(ValueError):
+            HttpTarget("ftp://127.0.0.1/file")
+
+
+class TestBenchResult(TestCase):
+
+    @patch("bsamcli.commands.local.lib.bench.LatencyHistogram")
+    def test_must_format_report(self, LatencyHistogramMock):
+        result = BenchResult()
+        result.histogram.total_count = 4
+        result.histogram.get_value_at_percentile.side_effect = [10.0, 20.0, 30.0]
+        result.histogram.max = 40.0
+        result.add_call(False, True)
+        result.add_call(True, False)
+        result.add_failure("connection refused")
+        result.elapsed = 2.0
+
+        self.assertEqual(result.format().splitlines(), [
+            "Calls:       2 in 2.00s (1.00/s)",
+            "Errors:      1",
+            "Cold starts: 1",
+            "Latency (ms): p50 10.0, p90 20.0, p99 30.0, max 40.0",
+            "Failure: connection refused",
+        ])
@@ -0,0 +1,38 @@
+"""
+Tests invalidating functions when their code changes
+"""
+
+from unittest import TestCase
+
+from mock import Mock, patch, call
+
+from bsamcli.commands.local.lib.code_watcher import CodeWatcher
+
+
+class TestCodeWatcher(TestCase):
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.get_code_paths.return_value = {"First": "/code/first", "Second": "/code/second"}
+        self.on_change = Mock()
+
+    @patch("bsamcli.commands.local.lib.code_watcher.FileWatcher")
+    def test_must_watch_code_of_every_function(self, FileWatcherMock):
+        watcher = CodeWatcher(self.lambda_runner, interval=2, debounce=1)
+        watcher.start()
+        watcher.stop()
+
+        FileWatcherMock.assert_called_once_with(watcher._invalidate, interval=2, debounce=1)
+        file_watcher = FileWatcherMock.return_value
+        file_watcher.watch.assert_has_calls([call("/code/first", "First"), call("/code/second", "Second")],
+                                            any_order=True)
+        file_watcher.start.assert_called_once_with()
+        file_watcher.stop.assert_called_once_with()
+
+    def test_must_invalidate_changed_functions(self):
+        watcher = CodeWatcher(self.lambda_runner, on_change=self.on_change)
+
+        watcher._invalidate({"Second", "First"})
+
+        self.lambda_runner.invalidate.assert_has_calls([call("First"), call("Second")])
+        self.on_change.assert_has_calls([call("First"), call("Second")])
@@ -0,0 +1,160 @@
+"""
+Tests replaying recorded traffic
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+from six.moves import BaseHTTPServer
+
+from bsamcli.commands.local.lib.bench import HttpTarget
+from bsamcli.commands.local.lib.replay import Replayer, ReplayResult, RecordingException, load_recording, \
+    load_durations
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        Handler.requests.append((self.command, self.path, self.headers.get("X-Test"), body, time.time()))
+        self.send_response(500 if self.path.endswith("fail") else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayTestCase(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _write(self, name, lines):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as fp:
+            fp.write("\n".join(json.dumps(line) if isinstance(line, dict) else line for line in lines))
+        return path
+
+
+class TestLoadRecording(ReplayTestCase):
+
+    def test_must_read_requests_with_line_numbers(self):
+        path = self._write("traffic.jsonl", [{"method": "GET", "path": "/a"}, "", {"method": "GET", "path": "/b"}])
+
+        self.assertEqual([line for line, _ in load_recording(path)], [1, 3])
+
+    def test_must_reject_invalid_lines(self):
+        path = self._write("traffic.jsonl", [{"method": "GET", "path": "/a"}, "{not json"])
+
+        with self.assertRaises(RecordingException):
+            list(load_recording(path))
+
+    def test_must_reject_requests_without_path(self):
+        path = self._write("traffic.jsonl", [{"method": "GET"}])
+
+        with self.assertRaises(RecordingException):
+            list(load_recording(path))
+
+    def test_must_read_durations_of_recording_or_results(self):
+        recording = self._write("traffic.jsonl", [{"method": "GET", "path": "/a", "duration_ms": 5},
+                                                  {"method": "GET", "path": "/b"}])
+        results = self._write("results.jsonl", [{"line": 7, "method": "GET", "path": "/a", "duration_ms": 6}])
+
+        self.assertEqual(load_durations(recording), {1: 5})
+        self.assertEqual(load_durations(results), {7: 6})
+
+
+class TestReplayer(ReplayTestCase):
+
+    def setUp(self):
+        super(TestReplayer, self).setUp()
+        Handler.requests = []
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.target = HttpTarget("http://127.0.0.1:{}/stage".format(self.server.server_port))
+
+    def test_must_send_recorded_requests(self):
+        output = io.StringIO()
+        requests = [(1, {"method": "POST", "path": "/hello?a=b", "headers": {"X-Test": "yes", "Host": "prod"},
+                         "body": "aGk=", "is_base64_encoded": True}),
+                    (2, {"method": "GET", "path": "/fail"})]
+
+        result = Replayer(self.target, concurrency=1, speed=0, output=output).run(requests)
+
+        self.assertEqual([request[:4] for request in Handler.requests],
+                         [("POST", "/stage/hello?a=b", "yes", b"hi"), ("GET", "/stage/fail", None, b"")])
+        self.assertEqual([line["status"] for line in map(json.loads, output.getvalue().splitlines())], [200, 500])
+        self.assertEqual(result.errors, 1)
+
+    def test_must_keep_recorded_spacing_scaled_by_speed(self):
+        requests = [(1, {"method": "GET", "path": "/a", "timestamp": 100.0}),
+                    (2, {"method": "GET", "path": "/b", "timestamp": 100.4}),
+                    (3, {"method": "GET", "path": "/c"})]
+
+        Replayer(self.target, concurrency=2, speed=2).run(requests)
+
+        sent = sorted(request[4] for request in Handler.requests)
+        self.assertGreaterEqual(sent[1] - sent[0], 0.18)
+        self.assertLess(sent[2] - sent[1], 0.1)
+
+    def test_must_stop_on_invalid_recording(self):
+        def requests():
+            yield 1, {"method": "GET", "path": "/a"}
+            raise RecordingException("Line 2 is not valid JSON")
+
+        with self.assertRaises(RecordingException):
+            Replayer(self.target, concurrency=2, speed=0).run(requests())
+
+    def test_must_record_failed_requests(self):
+        target = Mock(url="http://127.0.0.1:1")
+        target.send.side_effect = IOError("connection refused")
+
+        result = Replayer(target).run([(1, {"method": "GET", "path": "/a"})])
+
+        self.assertEqual(result.results[0]["error"], "connection refused")
+        self.assertEqual(result.errors, 1)
+
+
+class TestReplayResult(TestCase):
+
+    def test_must_compare_against_baseline(self):
+        results = [{"line": line, "method": "GET", "path": "/{}".format(line), "status": 200,
+                    "duration_ms": float(line * 2)} for line in range(1, 101)]
+
+        text = ReplayResult(results, 10.0).format(baseline={line: float(line) for line in range(1, 101)})
+
+        lines = text.splitlines()
+        self.assertEqual(lines[0], "Replayed 100 requests in 10.00s (10.00/s): 0 errors")
+        self.assertEqual(lines[2].split(), ["p50", "50.000", "100.000", "+50.000", "(+100.0%)"])
+        self.assertEqual(lines[6], "Largest regressions:")
+        self.assertEqual(lines[7], "  GET /100 (line 100): 100.000 ms -> 200.000 ms")
+        self.assertEqual(len(lines), 12)
+
+    def test_must_report_without_baseline(self):
+        results = [{"line": 1, "method": "GET", "path": "/", "status": 200, "duration_ms": 3.0}]
+
+        lines = ReplayResult(results, 1.0).format().splitlines()
+
+        self.assertEqual(lines[2].split(), ["p50", "-", "3.000", "-"])
@@ -0,0 +1,78 @@
+"""
+Tests that local services only set up serving in the worker processes of a PooledServer
+"""
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.commands.local.lib.local_api_service import LocalApiService
+from bsamcli.commands.local.lib.local_lambda_service import LocalLambdaService
+from bsamcli.local.apigw.local_apigw_service import Route
+
+
+class TestLocalLambdaService_supervising(TestCase):
+
+    def setUp(self):
+        self.invoke_context = Mock()
+        self.invoke_context.function_provider.get_all.return_value = []
+        self.lambda_runner = self.invoke_context.local_lambda_runner
+        self.lambda_runner.is_debugging.return_value = False
+        self.server = Mock()
+
+    @patch("bsamcli.commands.local.lib.local_lambda_service.CodeWatcher")
+    @patch("bsamcli.commands.local.lib.local_lambda_service.LocalLambdaInvokeService")
+    def test_must_only_supervise_workers(self, LocalLambdaInvokeServiceMock, CodeWatcherMock):
+        self.server.supervises.return_value = True
+        service = LocalLambdaService(self.invoke_context, 3001, "127.0.0.1", server=self.server)
+        service.event_queue = Mock()
+
+        service.start()
+
+        self.server.supervises.assert_called_once_with(False)
+        self.server.supervise.assert_called_once_with()
+        self.lambda_runner.prefetch_images.assert_not_called()
+        CodeWatcherMock.assert_not_called()
+        service.event_queue.start.assert_not_called()
+        LocalLambdaInvokeServiceMock.return_value.run.assert_not_called()
+
+    @patch("bsamcli.commands.local.lib.local_lambda_service.CodeWatcher")
+    @patch("bsamcli.commands.local.lib.local_lambda_service.LocalLambdaInvokeService")
+    def test_must_set_up_serving_in_worker(self, LocalLambdaInvokeServiceMock, CodeWatcherMock):
+        self.server.supervises.return_value = False
+        service = LocalLambdaService(self.invoke_context, 3001, "127.0.0.1", server=self.server)
+        service.event_queue = Mock()
+        service.event_queue.accepted = 0
+
+        service.start()
+
+        self.server.supervise.assert_not_called()
+        self.lambda_runner.prefetch_images.assert_called_once_with()
+        CodeWatcherMock.return_value.start.assert_called_once_with()
+        service.event_queue.start.assert_called_once_with()
+        LocalLambdaInvokeServiceMock.return_value.run.assert_called_once_with()
+
+
+class TestLocalApiService_supervising(TestCase):
+
+    @patch("bsamcli.commands.local.lib.local_api_service.FileWatcher")
+    @patch("bsamcli.commands.local.lib.local_api_service.LocalApigwService")
+    @patch("bsamcli.commands.local.lib.local_api_service.SamApiProvider")
+    def test_must_only_supervise_workers(self, SamApiProviderMock, LocalApigwServiceMock, FileWatcherMock):
+        invoke_context = Mock()
+        invoke_context.function_provider.get_all.return_value = []
+        invoke_context.local_lambda_runner.is_debugging.return_value = False
+        server = Mock()
+        server.supervises.return_value = True
+
+        service = LocalApiService(invoke_context, 3000, "127.0.0.1", None, server=server)
+        service._make_routing_list = Mock(return_value=[Route(["GET"], "Function", "/")])
+        service._start_code_watcher = Mock()
+
+        service.start()
+
+        server.supervise.assert_called_once_with()
+        invoke_context.local_lambda_runner.prefetch_images.assert_not_called()
+        service._start_code_watcher.assert_not_called()
+        FileWatcherMock.assert_not_called()
+        LocalApigwServiceMock.return_value.run.assert_not_called()
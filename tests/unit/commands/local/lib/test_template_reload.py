@@ -0,0 +1,94 @@
+"""
+Tests reloading the template of a running local API service
+"""
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.commands.local.cli_common.user_exceptions import InvokeContextException
+from bsamcli.commands.local.lib.local_api_service import LocalApiService
+from bsamcli.commands.local.lib.provider import Api, Function
+from bsamcli.local.apigw.local_apigw_service import Route
+
+
+def _function(name, codeuri="code", memory=128):
+    return Function(name=name, runtime="python3", memory=memory, timeout=3, handler="index.handler",
+                    description=None, codeuri=codeuri, environment=None, rolearn=None, reserved_concurrency=None)
+
+
+class _Provider(object):
+
+    def __init__(self, *functions):
+        self.functions = {function.name: function for function in functions}
+
+    def get(self, name):
+        return self.functions.get(name)
+
+    def get_all(self):
+        return iter(self.functions.values())
+
+
+class TestLocalApiService_reload_template(TestCase):
+
+    def setUp(self):
+        self.old_functions = _Provider(_function("Same"), _function("Changed"), _function("Removed"))
+        self.new_functions = _Provider(_function("Same"), _function("Changed", memory=256), _function("Added"))
+
+        self.invoke_context = Mock()
+        self.invoke_context.function_provider = self.new_functions
+        self.lambda_runner = self.invoke_context.local_lambda_runner
+        self.lambda_runner.provider = self.old_functions
+
+        with patch("bsamcli.commands.local.lib.local_api_service.SamApiProvider"):
+            self.api_service = LocalApiService(self.invoke_context, 3000, "127.0.0.1", None)
+
+        self.api_service._service = Mock()
+        self.api_service._routing_list = [Route(["GET"], "Same", "/same")]
+        self.api_service._response_cache = Mock()
+        self.api_service._start_code_watcher = Mock()
+        self.api_service._print_routes = Mock()
+
+    @patch("bsamcli.commands.local.lib.local_api_service.SamApiProvider")
+    def test_must_invalidate_changed_functions_and_swap_routes(self, SamApiProviderMock):
+        SamApiProviderMock.return_value.get_all.return_value = [Api(path="/same", method="GET", function_name="Same"),
+                                                                Api(path="/added", method="GET", function_name="Added")]
+
+        self.api_service._reload_template()
+
+        self.assertEqual([call[0][0] for call in self.lambda_runner.invalidate.call_args_list], ["Changed", "Removed"])
+        self.assertEqual([call[0][0] for call in self.api_service._response_cache.clear.call_args_list],
+                         ["Changed", "Removed"])
+        self.assertEqual(self.lambda_runner.provider, self.new_functions)
+
+        routes = self.api_service._service.update_routes.call_args[0][0]
+        self.assertEqual([(route.function_name, route.path) for route in routes], [("Same", "/same"),
+                                                                                   ("Added", "/added")])
+        self.assertEqual(self.api_service._routing_list, routes)
+        self.api_service._start_code_watcher.assert_called_once_with()
+
+    @patch("bsamcli.commands.local.lib.local_api_service.SamApiProvider")
+    def test_must_keep_routes_that_did_not_change(self, SamApiProviderMock):
+        SamApiProviderMock.return_value.get_all.return_value = [Api(path="/same", method="GET", function_name="Same")]
+
+        self.api_service._reload_template()
+
+        self.api_service._service.update_routes.assert_not_called()
+
+    def test_must_keep_serving_when_template_is_invalid(self):
+        self.invoke_context.reload_template.side_effect = InvokeContextException("Failed to parse template")
+
+        self.api_service._reload_template()
+
+        self.lambda_runner.invalidate.assert_not_called()
+        self.assertEqual(self.lambda_runner.provider, self.old_functions)
+        self.api_service._service.update_routes.assert_not_called()
+
+    @patch("bsamcli.commands.local.lib.local_api_service.SamApiProvider")
+    def test_must_keep_serving_when_template_has_no_apis(self, SamApiProviderMock):
+        SamApiProviderMock.return_value.get_all.return_value = []
+
+        self.api_service._reload_template()
+
+        self.assertEqual(self.lambda_runner.provider, self.old_functions)
+        self.api_service._service.update_routes.assert_not_called()
@@ -0,0 +1,79 @@
+import base64
+import binascii
+import io
+import os
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from bsamcli.lib.utils.base64_stream import PayloadTooLargeError, encode_stream, encoded_size, decode_string, \
+    decoded_size
+
+
+class _ShortReads(io.BytesIO):
+    """
+    Returns fewer bytes than asked for, like a socket does
+    """
+
+    def read(self, size=-1):
+        return super(_ShortReads, self).read(min(size, 5) if size and size > 0 else size)
+
+
+class TestEncodeStream(TestCase):
+
+    @parameterized.expand([(0,), (1,), (2,), (3,), (11,), (12,), (13,), (100,)])
+    def test_must_encode_like_b64encode(self, size):
+        data = os.urandom(size)
+
+        chunks = encode_stream(io.BytesIO(data), chunk_size=12)
+
+        self.assertEqual("".join(chunks), base64.b64encode(data).decode('ascii'))
+        self.assertEqual(encoded_size(size), len("".join(chunks)))
+
+    def test_must_encode_short_reads(self):
+        data = os.urandom(100)
+
+        chunks = encode_stream(_ShortReads(data), chunk_size=12)
+
+        self.assertEqual("".join(chunks), base64.b64encode(data).decode('ascii'))
+        self.assertTrue(all(len(chunk) == 16 for chunk in chunks[:-1]))
+
+    def test_must_stop_reading_above_limit(self):
+        stream = io.BytesIO(b"x" * 100)
+
+        with self.assertRaises(PayloadTooLargeError):
+            encode_stream(stream, limit=20, chunk_size=12)
+
+        self.assertEqual(stream.tell(), 24)
+
+    def test_must_encode_up_to_limit(self):
+        self.assertEqual(len("".join(encode_stream(io.BytesIO(b"x" * 15), limit=20, chunk_size=12))), 20)
+
+    def test_must_fail_for_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            encode_stream(io.BytesIO(b""), chunk_size=10)
+
+
+class TestDecodeString(TestCase):
+
+    @parameterized.expand([(0,), (1,), (2,), (3,), (11,), (12,), (13,), (100,)])
+    def test_must_decode_like_b64decode(self, size):
+        data = os.urandom(size)
+        encoded = base64.b64encode(data).decode('ascii')
+
+        chunks = list(decode_string(encoded, chunk_size=8))
+
+        self.assertEqual(b"".join(chunks), data)
+        self.assertTrue(all(len(chunk) == 6 for chunk in chunks[:-1]))
+        self.assertEqual(decoded_size(encoded), size)
+
+    def test_must_decode_base64_with_line_breaks_at_once(self):
+        data = os.urandom(100)
+        encoded = base64.encodebytes(data).decode('ascii')
+
+        self.assertEqual(list(decode_string(encoded, chunk_size=8)), [data])
+        self.assertIsNone(decoded_size(encoded))
+
+    def test_must_fail_right_away_for_invalid_base64(self):
+        with self.assertRaises(binascii.Error):
+            decode_string("abcde")
@@ -0,0 +1,149 @@
+"""
+Tests watching files for changes
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.lib.utils.file_watcher import FileWatcher
+
+
+class TestFileWatcher(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.code_dir = os.path.join(self.dir, "code")
+        os.makedirs(os.path.join(self.code_dir, "__pycache__"))
+        self.jar = os.path.join(self.dir, "function.jar")
+        self._write(self.jar, "jar")
+        self._write(os.path.join(self.code_dir, "index.py"), "v1")
+
+        self.callback = Mock()
+        self.watcher = FileWatcher(self.callback, debounce=1)
+        self.watcher.watch(self.code_dir, "Code")
+        self.watcher.watch(self.jar, "Jar")
+
+        # Snapshots are taken on start. Keep the thread from polling on its own.
+        with patch("bsamcli.lib.utils.file_watcher.threading"):
+            self.watcher.start()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, path, contents):
+        with open(path, "w") as fp:
+            fp.write(contents)
+
+    @patch("bsamcli.lib.utils.file_watcher.time")
+    def test_must_report_changes_once_quiet(self, time_mock):
+        time_mock.time.return_value = 100
+        self.assertEqual(self.watcher.poll(), set())
+
+        self._write(os.path.join(self.code_dir, "index.py"), "version 2")
+        self.assertEqual(self.watcher.poll(), set())
+
+        # More changes keep postponing the callback
+        time_mock.time.return_value = 100.5
+        self._write(os.path.join(self.code_dir, "util.py"), "new")
+        self.assertEqual(self.watcher.poll(), set())
+
+        time_mock.time.return_value = 101
+        self.assertEqual(self.watcher.poll(), set())
+        self.callback.assert_not_called()
+
+        time_mock.time.return_value = 101.5
+        self.assertEqual(self.watcher.poll(), {"Code"})
+        self.callback.assert_called_once_with({"Code"})
+
+        time_mock.time.return_value = 105
+        self.assertEqual(self.watcher.poll(), set())
+        self.assertEqual(self.callback.call_count, 1)
+
+    @patch("bsamcli.lib.utils.file_watcher.time")
+    def test_must_batch_changes_of_several_paths(self, time_mock):
+        time_mock.time.return_value = 100
+        self._write(self.jar, "new jar")
+        os.remove(os.path.join(self.code_dir, "index.py"))
+        self.watcher.poll()
+
+        time_mock.time.return_value = 101
+        self.assertEqual(self.watcher.poll(), {"Code", "Jar"})
+
+    @patch("bsamcli.lib.utils.file_watcher.time")
+    def test_must_ignore_bytecode(self, time_mock):
+        time_mock.time.return_value = 100
+        self._write(os.path.join(self.code_dir, "__pycache__", "index.cpython-36.pyc"), "bytecode")
+        self._write(os.path.join(self.code_dir, "index.pyc"), "bytecode")
+        self.watcher.poll()
+
+        time_mock.time.return_value = 101
+        self.assertEqual(self.watcher.poll(), set())
+
+    @patch("bsamcli.lib.utils.file_watcher.os.stat", wraps=os.stat)
+    def test_must_not_walk_vcs_and_dependency_directories(self, stat_mock):
+        for directory in (".git", "node_modules"):
+            os.makedirs(os.path.join(self.code_dir, directory, "package"))
+            self._write(os.path.join(self.code_dir, directory, "package", "index.js"), "code")
+
+        snapshot = self.watcher._snapshot(self.code_dir)
+
+        self.assertEqual(sorted(os.path.relpath(path, self.code_dir) for path in snapshot),
+                         ["index.py", "node_modules"])
+        stat_mock.assert_any_call(os.path.join(self.code_dir, "node_modules"))
+        for args, _ in stat_mock.call_args_list:
+            self.assertNotIn("package", args[0])
+
+    @patch("bsamcli.lib.utils.file_watcher.time")
+    def test_must_report_installed_dependency(self, time_mock):
+        os.makedirs(os.path.join(self.code_dir, "node_modules", "left-pad"))
+        self.watcher._snapshots[self.code_dir] = self.watcher._snapshot(self.code_dir)
+
+        time_mock.time.return_value = 100
+        self.assertEqual(self.watcher.poll(), set())
+
+        # Editing a file inside a package goes unnoticed, adding a package does not
+        self._write(os.path.join(self.code_dir, "node_modules", "left-pad", "index.js"), "code")
+        self.assertEqual(self.watcher.poll(), set())
+
+        node_modules = os.path.join(self.code_dir, "node_modules")
+        os.makedirs(os.path.join(node_modules, "right-pad"))
+        os.utime(node_modules, ns=(1, 1))
+        self.watcher.poll()
+
+        time_mock.time.return_value = 101
+        self.assertEqual(self.watcher.poll(), {"Code"})
+
+    @patch("bsamcli.lib.utils.file_watcher.time")
+    def test_must_keep_watching_when_callback_fails(self, time_mock):
+        self.callback.side_effect = ValueError("error")
+
+        time_mock.time.return_value = 100
+        self._write(self.jar, "new jar")
+        self.watcher.poll()
+        time_mock.time.return_value = 101
+        self.assertEqual(self.watcher.poll(), {"Jar"})
+
+        self._write(self.jar, "newer jar")
+        self.watcher.poll()
+        time_mock.time.return_value = 102
+        self.assertEqual(self.watcher.poll(), {"Jar"})
+
+    def test_must_poll_in_background(self):
+        watcher = FileWatcher(self.callback, interval=0.01, debounce=0)
+        watcher.watch(self.jar, "Jar")
+        watcher.start()
+
+        try:
+            self._write(self.jar, "new jar")
+            for _ in range(200):
+                if self.callback.called:
+                    break
+                watcher._stopped.wait(0.01)
+        finally:
+            watcher.stop()
+
+        self.callback.assert_called_with({"Jar"})
@@ -0,0 +1,83 @@
+import io
+
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from bsamcli.lib.utils.histogram import LatencyHistogram
+
+
+class TestLatencyHistogram(TestCase):
+
+    def setUp(self):
+        self.histogram = LatencyHistogram()
+        for value in range(1, 10001):
+            self.histogram.record(value / 10.0)
+
+    @parameterized.expand([
+        (50, 500.0),
+        (90, 900.0),
+        (99, 990.0),
+        (100, 1000.0),
+    ])
+    def test_must_keep_values_within_precision(self, percent, expected):
+        value = self.histogram.get_value_at_percentile(percent)
+
+        self.assertGreaterEqual(value, expected)
+        self.assertLessEqual(value, expected * 1.001)
+
+    def test_must_track_exact_statistics(self):
+        self.assertEqual(self.histogram.total_count, 10000)
+        self.assertEqual(self.histogram.min, 0.1)
+        self.assertEqual(self.histogram.max, 1000.0)
+        self.assertAlmostEqual(self.histogram.mean, 500.05)
+        self.assertAlmostEqual(self.histogram.stddev, 288.675, places=3)
+
+    def test_must_record_small_values_exactly(self):
+        histogram = LatencyHistogram()
+        histogram.record(1.5, count=3)
+        histogram.record(-1)
+
+        self.assertEqual(histogram.get_value_at_percentile(50), 1.5)
+        self.assertEqual(histogram.get_value_at_percentile(0), 0.0)
+        self.assertEqual(histogram.total_count, 4)
+
+    def test_must_merge_histograms(self):
+        other = LatencyHistogram()
+        other.record(5000.0)
+
+        self.histogram.merge(other)
+
+        self.assertEqual(self.histogram.total_count, 10001)
+        self.assertEqual(self.histogram.max, 5000.0)
+        self.assertEqual(self.histogram.get_value_at_percentile(100), 5000.0)
+
+    def test_must_not_merge_histograms_of_other_precision(self):
+        with self.assertRaises(ValueError):
+            self.histogram.merge(LatencyHistogram(significant_digits=2))
+
+    def test_must_iterate_percentiles_in_finer_steps(self):
+        percentiles = [percentile for _, percentile, _ in self.histogram.iter_percentiles()]
+
+        self.assertEqual(percentiles[:7], [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.55])
+        self.assertEqual(percentiles[-1], 1.0)
+        self.assertEqual(percentiles, sorted(percentiles))
+
+    def test_must_write_hgrm_format(self):
+        stream = io.StringIO()
+
+        self.histogram.write_percentiles(stream)
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"])
+        self.assertEqual(lines[2].split(), ["0.100", "0.000000000000", "1", "1.00"])
+        self.assertEqual(lines[-4].split(), ["1000.000", "1.000000000000", "10000"])
+        self.assertEqual(lines[-3], "#[Mean    =      500.050, StdDeviation   =      288.675]")
+        self.assertEqual(lines[-2], "#[Max     =     1000.000, Total count    =        10000]")
+
+    def test_must_write_empty_histogram(self):
+        stream = io.StringIO()
+
+        LatencyHistogram().write_percentiles(stream)
+
+        self.assertIn("Total count    =            0", stream.getvalue())
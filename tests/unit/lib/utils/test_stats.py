@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from bsamcli.lib.utils.stats import percentile, summarize
+
+
+class TestPercentile(TestCase):
+
+    @parameterized.expand([
+        (50, 2),
+        (75, 3),
+        (99, 4),
+        (100, 4),
+        (0, 1),
+    ])
+    def test_must_use_nearest_rank(self, percent, expected):
+        self.assertEqual(percentile([1, 2, 3, 4], percent), expected)
+
+    def test_must_return_none_without_values(self):
+        self.assertIsNone(percentile([], 50))
+
+
+class TestSummarize(TestCase):
+
+    def test_must_summarize_unsorted_values(self):
+        summary = summarize([float(value) for value in range(100, 0, -1)])
+
+        self.assertEqual(summary, {"min": 1.0, "max": 100.0, "mean": 50.5, "p50": 50.0, "p90": 90.0, "p99": 99.0})
+
+    def test_must_return_empty_summary_without_values(self):
+        self.assertEqual(summarize([]), {})
@@ -0,0 +1,40 @@
+import json
+from unittest import TestCase
+
+from flask import Flask, request
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService
+
+
+class TestService_construct_event_from_flask(TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.add_url_rule("/id/<id>/<path:proxy>", endpoint="/id/<id>/<path:proxy>", methods=["POST"])
+
+    def _construct_event(self, path, **kwargs):
+        with self.app.test_request_context(path, method="POST", environ_base={"REMOTE_ADDR": "190.0.0.0"}, **kwargs):
+            return json.loads(LocalApigwService._construct_event(request, 3000, binary_types=["image/gif"]))
+
+    def test_must_construct_event(self):
+        event = self._construct_event("/id/1/a/b?q=1", data=b"data", headers={"Content-Type": "text/plain"})
+
+        self.assertEqual(event["httpMethod"], "POST")
+        self.assertEqual(event["resource"], "/id/{id}/{proxy+}")
+        self.assertEqual(event["requestContext"]["resourcePath"], "/id/{id}/{proxy+}")
+        self.assertEqual(event["requestContext"]["identity"]["sourceIp"], "190.0.0.0")
+        self.assertEqual(event["path"], "/id/1/a/b")
+        self.assertEqual(event["pathParameters"], {"id": "1", "proxy": "a/b"})
+        self.assertEqual(event["queryStringParameters"], {"q": "1"})
+        self.assertEqual(event["headers"]["X-Forwarded-Port"], "3000")
+        self.assertEqual(event["body"], "data")
+        self.assertFalse(event["isBase64Encoded"])
+
+    def test_must_reuse_template_of_route(self):
+        first = self._construct_event("/id/1/a", data=b"one")
+        template = LocalApigwService._event_templates[("/id/<id>/<path:proxy>", "POST")]
+        second = self._construct_event("/id/2/b", data=b"\x00", headers={"Content-Type": "image/gif"})
+
+        self.assertIs(LocalApigwService._event_templates[("/id/<id>/<path:proxy>", "POST")], template)
+        self.assertEqual((first["body"], first["pathParameters"]["id"]), ("one", "1"))
+        self.assertEqual((second["body"], second["isBase64Encoded"]), ("AA==", True))
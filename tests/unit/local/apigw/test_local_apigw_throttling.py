@@ -0,0 +1,33 @@
+"""
+Tests throttling of requests to the local API Gateway service
+"""
+
+from unittest import TestCase
+from mock import Mock, patch
+from flask import Flask
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService
+from bsamcli.local.lambdafn.exceptions import FunctionThrottled
+
+
+class TestLocalApigwService_throttling(TestCase):
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+        self.scheduler = Mock()
+        self.service = LocalApigwService([], self.lambda_runner, scheduler=self.scheduler)
+        self.service._get_current_route = Mock()
+        self.service._get_current_route.return_value.function_name = "HelloWorld"
+        self.service._construct_event = Mock(return_value="event")
+
+    @patch("bsamcli.local.apigw.local_apigw_service.ServiceErrorResponses")
+    def test_must_return_throttled_response(self, error_responses_mock):
+        self.scheduler.slot.side_effect = FunctionThrottled("Rate exceeded")
+
+        with Flask(__name__).test_request_context("/"):
+            result = self.service._request_handler()
+
+        self.assertEqual(result, error_responses_mock.lambda_throttled_response.return_value)
+        self.scheduler.slot.assert_called_with("HelloWorld")
+        self.lambda_runner.invoke.assert_not_called()
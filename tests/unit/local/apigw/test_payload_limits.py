@@ -0,0 +1,142 @@
+import base64
+import io
+import json
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService, Route
+from bsamcli.local.apigw.response_cache import ResponseCache
+
+
+class TestLocalApigwService_binary_payloads(TestCase):
+
+    def setUp(self):
+        self.response = {"statusCode": 200, "body": "hello"}
+        self.events = []
+
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            self.events.append(json.loads(event))
+            stdout.write(json.dumps(self.response).encode())
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        routes = [Route(["POST"], "Images", "/images", binary_types=["image/gif"]),
+                  Route(["GET"], "Cached", "/cached", binary_types=["image/gif"], cache_ttl=60)]
+        self.service = LocalApigwService(routes, self.lambda_runner, port=3000, response_cache=ResponseCache())
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def test_must_encode_binary_request_body(self):
+        data = bytes(range(256)) * 1000
+
+        response = self.client.post("/images", data=data, headers={"Content-Type": "image/gif"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.events[0]["body"], base64.b64encode(data).decode('ascii'))
+        self.assertTrue(self.events[0]["isBase64Encoded"])
+
+    @patch.object(LocalApigwService, "_MAX_REQUEST_PAYLOAD_SIZE", 1000)
+    def test_must_reject_request_body_above_limit_without_invoking(self):
+        # 750 bytes are 1000 bytes of base64
+        response = self.client.post("/images", data=b"x" * 751, headers={"Content-Type": "image/gif"})
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(json.loads(response.get_data()), {"message": "Request Too Long"})
+        self.lambda_runner.invoke.assert_not_called()
+
+    @patch.object(LocalApigwService, "_MAX_REQUEST_PAYLOAD_SIZE", 1000)
+    def test_must_reject_event_above_limit(self):
+        # The body fits, but not along with the rest of the event
+        response = self.client.post("/images", data=b"x" * 600, headers={"Content-Type": "image/gif"})
+
+        self.assertEqual(response.status_code, 413)
+        self.lambda_runner.invoke.assert_not_called()
+
+    def test_must_stream_decoded_binary_response(self):
+        data = bytes(range(256)) * 1000
+        self.response = {"statusCode": 200, "headers": {"Content-Type": "image/gif"}, "isBase64Encoded": True,
+                         "body": base64.b64encode(data).decode('ascii')}
+
+        response = self.client.post("/images", headers={"Accept": "image/gif"})
+
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.headers["Content-Length"], str(len(data)))
+        self.assertEqual(response.get_data(), data)
+
+    def test_must_cache_whole_decoded_binary_response(self):
+        self.response = {"statusCode": 200, "headers": {"Content-Type": "image/gif"}, "isBase64Encoded": True,
+                         "body": base64.b64encode(b"gif").decode('ascii')}
+
+        self.client.get("/cached", headers={"Accept": "image/gif"})
+        response = self.client.get("/cached", headers={"Accept": "image/gif"})
+
+        self.assertEqual(response.headers["X-Cache"], "Hit from bsam")
+        self.assertEqual(response.get_data(), b"gif")
+
+    @patch.object(LocalApigwService, "_MAX_RESPONSE_PAYLOAD_SIZE", 100)
+    def test_must_fail_for_response_above_limit(self):
+        self.response = {"statusCode": 200, "body": "x" * 100}
+
+        response = self.client.post("/images")
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(json.loads(response.get_data()), {"message": "Internal server error"})
+
+
+class TestLocalApigwService_chunked_payloads(TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.recorder = Mock()
+
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            self.events.append(json.loads(event))
+            stdout.write(b'{"statusCode": 200, "body": "hello"}')
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        routes = [Route(["POST"], "Hello", "/hello"), Route(["POST"], "Images", "/images", binary_types=["image/gif"])]
+        self.service = LocalApigwService(routes, self.lambda_runner, port=3000, recorder=self.recorder)
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def _post_chunked(self, path, stream, content_type="text/plain"):
+        headers = {"Content-Type": content_type, "Transfer-Encoding": "chunked"}
+        return self.client.post(path, input_stream=stream, headers=headers,
+                                environ_overrides={"wsgi.input_terminated": True})
+
+    def test_must_read_chunked_body(self):
+        response = self._post_chunked("/hello", io.BytesIO(b"chunked body"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.events[0]["body"], "chunked body")
+        self.assertEqual(self.recorder.record.call_args[1]["body"], b"chunked body")
+
+    @patch.object(LocalApigwService, "_READ_CHUNK_SIZE", 100)
+    @patch.object(LocalApigwService, "_MAX_REQUEST_PAYLOAD_SIZE", 1000)
+    def test_must_stop_reading_chunked_body_above_limit(self):
+        stream = io.BytesIO(b"x" * 100000)
+
+        response = self._post_chunked("/hello", stream)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertLessEqual(stream.tell(), 1100)
+        self.lambda_runner.invoke.assert_not_called()
+
+    @patch.object(LocalApigwService, "_READ_CHUNK_SIZE", 100)
+    @patch.object(LocalApigwService, "_MAX_REQUEST_PAYLOAD_SIZE", 1000)
+    def test_must_stop_reading_chunked_binary_body_above_limit(self):
+        stream = io.BytesIO(b"x" * 100000)
+
+        response = self._post_chunked("/images", stream, content_type="image/gif")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertLessEqual(stream.tell(), 1100)
+        self.lambda_runner.invoke.assert_not_called()
@@ -0,0 +1,159 @@
+"""
+Tests caching responses of the local API Gateway service
+"""
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService, Route
+from bsamcli.local.apigw.response_cache import ResponseCache, CachedResponse
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(max_bytes=10)
+
+    def test_must_count_hits_and_misses(self):
+        self.assertIsNone(self.cache.get("key"))
+
+        self.cache.put("key", 60, CachedResponse(200, {}, b"body"))
+
+        self.assertEqual(self.cache.get("key"), CachedResponse(200, {}, b"body"))
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 1, "evictions": 0, "entries": 1, "bytes": 4})
+
+    @patch("bsamcli.local.apigw.response_cache.time")
+    def test_must_expire_entries(self, time_mock):
+        time_mock.time.return_value = 100
+        self.cache.put("key", 60, CachedResponse(200, {}, b"body"))
+
+        time_mock.time.return_value = 160
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.stats["bytes"], 0)
+
+    def test_must_evict_least_recently_used_entries(self):
+        self.cache.put("a", 60, CachedResponse(200, {}, b"aaaa"))
+        self.cache.put("b", 60, CachedResponse(200, {}, b"bbbb"))
+        self.cache.get("a")
+
+        self.cache.put("c", 60, CachedResponse(200, {}, b"cccc"))
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertEqual(self.cache.stats["bytes"], 8)
+
+    def test_must_not_cache_responses_larger_than_cache(self):
+        self.cache.put("key", 60, CachedResponse(200, {}, b"x" * 11))
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_must_replace_entries(self):
+        self.cache.put("key", 60, CachedResponse(200, {}, b"old"))
+        self.cache.put("key", 60, CachedResponse(200, {}, b"new!"))
+
+        self.assertEqual(self.cache.get("key").body, b"new!")
+        self.assertEqual(self.cache.stats["bytes"], 4)
+
+    def test_must_clear_entries(self):
+        self.cache.put("key", 60, CachedResponse(200, {}, b"body"))
+
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.stats["bytes"], 0)
+
+    def test_must_clear_entries_with_tag(self):
+        self.cache.put("a", 60, CachedResponse(200, {}, b"aaaa"), tag="First")
+        self.cache.put("b", 60, CachedResponse(200, {}, b"bbbb"), tag="Second")
+
+        self.cache.clear("First")
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats["bytes"], 4)
+
+
+class TestLocalApigwService_caching(TestCase):
+
+    def setUp(self):
+        self.status_code = 200
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write('{{"statusCode": {}, "body": "hello"}}'.format(self.status_code).encode())
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        routes = [Route(["GET"], "Cached", "/cached", cache_ttl=60), Route(["GET"], "Uncached", "/uncached")]
+        self.cache = ResponseCache()
+        self.service = LocalApigwService(routes, self.lambda_runner, port=3000, response_cache=self.cache,
+                                         cache_key_headers=["X-Tenant"])
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def test_must_serve_repeated_requests_from_cache(self):
+        first = self.client.get("/cached?a=1&b=2")
+        second = self.client.get("/cached?b=2&a=1")
+
+        self.assertEqual(self.lambda_runner.invoke.call_count, 1)
+        self.assertEqual(first.headers["X-Cache"], "Miss from bsam")
+        self.assertEqual(second.headers["X-Cache"], "Hit from bsam")
+        self.assertEqual(second.get_data(), b"hello")
+        self.assertEqual(second.headers["Content-Type"], "application/json")
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+        self.cache.clear("Cached")
+        self.client.get("/cached?a=1&b=2")
+        self.assertEqual(self.lambda_runner.invoke.call_count, 2)
+
+    def test_must_key_by_query_string_and_headers(self):
+        self.client.get("/cached?a=1")
+        self.client.get("/cached?a=2")
+        self.client.get("/cached?a=1", headers={"X-Tenant": "other"})
+        self.client.get("/cached?a=1", headers={"X-Unrelated": "yes"})
+
+        self.assertEqual(self.lambda_runner.invoke.call_count, 3)
+
+    def test_must_skip_cache_on_request(self):
+        self.client.get("/cached")
+        self.client.get("/cached", headers={"Cache-Control": "max-age=0"})
+
+        self.assertEqual(self.lambda_runner.invoke.call_count, 2)
+
+    def test_must_not_cache_errors(self):
+        self.status_code = 500
+        self.client.get("/cached")
+        self.client.get("/cached")
+
+        self.assertEqual(self.lambda_runner.invoke.call_count, 2)
+
+    def test_must_not_cache_routes_without_ttl(self):
+        response = self.client.get("/uncached")
+        self.client.get("/uncached")
+
+        self.assertEqual(self.lambda_runner.invoke.call_count, 2)
+        self.assertNotIn("X-Cache", response.headers)
+
+    def test_must_serve_stats(self):
+        self.client.get("/cached")
+        self.client.get("/cached")
+
+        response = self.client.get(LocalApigwService.RESPONSE_CACHE_PATH)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), self.cache.stats)
+        self.assertEqual(response.get_json()["hits"], 1)
+
+    def test_must_serve_stats_of_cache_set_after_start(self):
+        self.service.response_cache = None
+        self.assertEqual(self.client.get(LocalApigwService.RESPONSE_CACHE_PATH).status_code, 403)
+
+        self.service.response_cache = self.cache
+        self.service.update_routes([Route(["GET"], "Cached", "/cached", cache_ttl=60)])
+
+        self.assertEqual(self.client.get(LocalApigwService.RESPONSE_CACHE_PATH).get_json(), self.cache.stats)
@@ -0,0 +1,91 @@
+"""
+Tests recording the traffic of the local API Gateway service
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService, Route
+from bsamcli.local.apigw.traffic_recorder import TrafficRecorder, decode_body
+
+
+class TestTrafficRecorder(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "traffic.jsonl")
+
+    def _read(self):
+        with open(self.path) as fp:
+            return [json.loads(line) for line in fp]
+
+    def test_must_append_one_line_per_request(self):
+        recorder = TrafficRecorder(self.path)
+
+        recorder.record(1.5, "POST", "/hello?a=b", {"Content-Type": "text/plain"}, b"hi", 200, {}, b"ok", 12.34567)
+        recorder.record(2.5, "GET", "/image", {}, b"", 200, {}, b"\xff\xd8", 1)
+
+        first, second = self._read()
+        self.assertEqual(first, {"timestamp": 1.5, "method": "POST", "path": "/hello?a=b",
+                                 "headers": {"Content-Type": "text/plain"}, "body": "hi",
+                                 "is_base64_encoded": False, "status": 200, "response_headers": {},
+                                 "response_body": "ok", "response_is_base64_encoded": False,
+                                 "duration_ms": 12.346})
+        self.assertEqual(second["response_body"], "/9g=")
+        self.assertTrue(second["response_is_base64_encoded"])
+        self.assertEqual(decode_body(second["response_body"], True), b"\xff\xd8")
+
+    def test_must_not_fail_request_when_file_cannot_be_written(self):
+        recorder = TrafficRecorder(os.path.join(self.dir, "missing", "traffic.jsonl"))
+
+        recorder.record(1.5, "GET", "/", {}, b"", 200, {}, None, 1)
+
+
+class TestLocalApigwService_recording(TestCase):
+
+    def setUp(self):
+        self.recorder = Mock()
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write(b'{"statusCode": 201, "body": "created"}')
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        route = Route(["POST"], "HelloWorld", "/hello")
+        self.service = LocalApigwService([route], self.lambda_runner, port=3000, recorder=self.recorder)
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def test_must_record_request_and_response(self):
+        self.client.post("/hello?name=bob", data=b"payload", headers={"X-Test": "yes"})
+
+        recorded = self.recorder.record.call_args[1]
+        self.assertEqual(recorded["method"], "POST")
+        self.assertEqual(recorded["path"], "/hello?name=bob")
+        self.assertEqual(recorded["headers"]["X-Test"], "yes")
+        self.assertEqual(recorded["body"], b"payload")
+        self.assertEqual(recorded["status"], 201)
+        self.assertEqual(recorded["response_body"], b"created")
+        self.assertGreaterEqual(recorded["duration_ms"], 0)
+
+    def test_must_record_unknown_routes(self):
+        self.client.get("/unknown")
+
+        self.assertEqual(self.recorder.record.call_args[1]["status"], 403)
+        self.assertEqual(self.recorder.record.call_args[1]["path"], "/unknown")
+
+    def test_must_not_record_without_recorder(self):
+        self.service.recorder = None
+        self.service.create()
+
+        self.service._app.test_client().post("/hello")
+
+        self.recorder.record.assert_not_called()
@@ -0,0 +1,57 @@
+"""
+Tests swapping the routes of a running local API Gateway service
+"""
+
+import threading
+from unittest import TestCase
+
+from mock import Mock
+
+from bsamcli.local.apigw.local_apigw_service import LocalApigwService, Route
+
+
+class TestLocalApigwService_update_routes(TestCase):
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write('{{"statusCode": 200, "body": "{}"}}'.format(function_name).encode())
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        self.service = LocalApigwService([Route(["GET"], "First", "/first"), Route(["GET"], "Shared", "/shared")],
+                                         self.lambda_runner, port=3000)
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def test_must_serve_new_routes(self):
+        self.service.update_routes([Route(["GET", "POST"], "Second", "/second/{id}"),
+                                    Route(["GET"], "Renamed", "/shared")])
+
+        self.assertEqual(self.client.get("/first").status_code, 403)
+        self.assertEqual(self.client.post("/second/1").get_data(), b"Second")
+        self.assertEqual(self.client.get("/shared").get_data(), b"Renamed")
+        self.assertEqual(set(self.service._dict_of_routes), {"/second/<id>:GET", "/second/<id>:POST", "/shared:GET"})
+
+    def test_must_finish_requests_in_flight_on_old_routes(self):
+        started = threading.Event()
+        swapped = threading.Event()
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            started.set()
+            swapped.wait(5)
+            stdout.write('{{"statusCode": 200, "body": "{}"}}'.format(function_name).encode())
+
+        self.lambda_runner.invoke.side_effect = invoke
+        responses = []
+        request = threading.Thread(target=lambda: responses.append(self.client.get("/first")))
+        request.start()
+
+        started.wait(5)
+        self.service.update_routes([Route(["GET"], "Second", "/second")])
+        swapped.set()
+        request.join(5)
+
+        self.assertEqual(responses[0].get_data(), b"First")
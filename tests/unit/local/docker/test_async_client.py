@@ -0,0 +1,262 @@
+"""
+Tests running containers through the asyncio Docker client, against a fake Docker daemon on a Unix socket
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from unittest import TestCase
+
+from mock import Mock
+
+from bsamcli.local.docker.async_client import AsyncDockerClient, AsyncDockerAPIError, AsyncDockerNotFound, \
+    _get_create_config
+from bsamcli.local.docker.async_manager import AsyncContainerManager
+from bsamcli.local.docker.cfc_container import CfcContainer
+from bsamcli.local.docker.image_cache import ImageCache
+from bsamcli.local.docker.manager import DockerImageNotFoundException
+
+
+class FakeDockerDaemon(object):
+    """
+    Serves the parts of the Docker Engine API the asyncio client uses. Containers write ``output`` when started.
+    """
+
+    def __init__(self, loop, socket_path):
+        self.loop = loop
+        self.socket_path = socket_path
+        self.requests = []
+        self.images = {"registry/runtime:python3": {"Id": "sha256:image", "RepoDigests": ["registry/runtime@sha"]}}
+        self.output = [(1, b"response\n"), (2, b"log line\n")]
+        self.pull_error = None
+        self.connections = 0
+        self._attached = {}
+        self._server = None
+
+    def start(self):
+        self._server = self.loop.run_until_complete(asyncio.start_unix_server(self._handle, path=self.socket_path))
+
+    def stop(self):
+        self._server.close()
+        self.loop.run_until_complete(self._server.wait_closed())
+
+        # Let the handlers see their connections closed
+        pending = [task for task in asyncio.all_tasks(self.loop) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.wait(pending))
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+                return
+
+            lines = head.decode('latin-1').split("\r\n")
+            method, url, _ = lines[0].split(" ")
+            headers = dict(line.lower().split(": ", 1) for line in lines[1:] if line)
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            path = re.sub(r"^/v[0-9.]+", "", url)
+            self.requests.append((method, path, json.loads(body.decode()) if body else None))
+
+            if not await self._respond(method, path, writer):
+                # The connection was handed over to the output of a container
+                return
+
+    async def _respond(self, method, path, writer):
+        match = re.match(r"^/containers/(\w+)/attach", path)
+        if match:
+            writer.write(b"HTTP/1.1 101 UPGRADED\r\nConnection: Upgrade\r\nUpgrade: tcp\r\n\r\n")
+            self._attached[match.group(1)] = writer
+            return False
+
+        match = re.match(r"^/containers/(\w+)/start", path)
+        if match:
+            self._send(writer, 204, None)
+            attached = self._attached.pop(match.group(1), None)
+            if attached:
+                for frame_type, data in self.output:
+                    attached.write(struct.pack('>BxxxL', frame_type, len(data)) + data)
+                attached.close()
+            return True
+
+        if path.startswith("/images/create"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n")
+            messages = [{"status": "Pulling"}, {"error": self.pull_error} if self.pull_error else {"status": "Done"}]
+            for message in messages:
+                chunk = (json.dumps(message) + "\r\n").encode()
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            writer.write(b"0\r\n\r\n")
+            self.images["registry/runtime:python3"] = {"Id": "sha256:pulled"}
+            return True
+
+        match = re.match(r"^/images/(.+)/json", path)
+        if match:
+            image = self.images.get(match.group(1))
+            self._send(writer, 200 if image else 404, image or {"message": "No such image"})
+        elif path.startswith("/containers/create"):
+            self._send(writer, 201, {"Id": "abc123", "Warnings": []})
+        elif re.match(r"^/containers/\w+/wait", path):
+            self._send(writer, 200, {"StatusCode": 0})
+        elif method == "DELETE":
+            self._send(writer, 204, None)
+        elif path == "/_ping":
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nOK")
+        else:
+            self._send(writer, 500, {"message": "unexpected request"})
+
+        return True
+
+    @staticmethod
+    def _send(writer, status, body):
+        data = json.dumps(body).encode() if body is not None else b""
+        head = "HTTP/1.1 {} X\r\nContent-Type: application/json\r\n".format(status)
+        if data:
+            head += "Content-Length: {}\r\n".format(len(data))
+        writer.write(head.encode() + b"\r\n" + data)
+
+
+class AsyncDockerTestCase(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        self.daemon = FakeDockerDaemon(self.loop, os.path.join(tmp_dir, "docker.sock"))
+        self.daemon.start()
+        self.addCleanup(self.daemon.stop)
+
+        self.client = AsyncDockerClient(base_url="unix://" + self.daemon.socket_path)
+        self.addCleanup(self.run_async, self.client.close())
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+class TestAsyncDockerClient(AsyncDockerTestCase):
+
+    def test_must_reuse_connection(self):
+        self.assertTrue(self.run_async(self.client.ping()))
+        self.run_async(self.client.inspect_image("registry/runtime:python3"))
+        self.run_async(self.client.wait_container("abc123"))
+
+        self.assertEqual(self.daemon.connections, 1)
+
+    def test_must_raise_not_found(self):
+        with self.assertRaises(AsyncDockerNotFound) as ctx:
+            self.run_async(self.client.inspect_image("missing:latest"))
+
+        self.assertEqual(ctx.exception.message, "No such image")
+
+    def test_must_raise_api_error(self):
+        with self.assertRaises(AsyncDockerAPIError) as ctx:
+            self.run_async(self.client.request("GET", "/unknown"))
+
+        self.assertEqual(ctx.exception.status, 500)
+
+    def test_must_demultiplex_attached_output(self):
+        async def run():
+            output = await self.client.attach("abc123")
+            await self.client.start_container("abc123")
+            return [frame async for frame in output]
+
+        self.assertEqual(self.run_async(run()), self.daemon.output)
+
+    def test_must_stream_pull_progress(self):
+        async def pull():
+            return [message async for message in self.client.pull_image("registry/runtime:python3")]
+
+        self.assertEqual(self.run_async(pull()), [{"status": "Pulling"}, {"status": "Done"}])
+        self.assertEqual(self.daemon.requests[-1][1], "/images/create?fromImage=registry%2Fruntime&tag=python3")
+
+    def test_must_only_connect_to_unix_socket(self):
+        with self.assertRaises(ValueError):
+            AsyncDockerClient(base_url="tcp://127.0.0.1:2375")
+
+
+class TestGetCreateConfig(TestCase):
+
+    def test_must_translate_container_options(self):
+        container = CfcContainer("python3", "index.handler", "/code", memory_mb=256, env_vars={"a": "b"},
+                                 standby=True, tmpfs_tmp=True, docker_client=Mock())
+        container.network_id = "network"
+
+        config = _get_create_config("image", container.get_create_options())
+
+        self.assertEqual(config["Image"], "image")
+        self.assertEqual(config["WorkingDir"], "/var/task")
+        self.assertEqual(config["Env"], ["a=b"])
+        self.assertEqual(config["HostConfig"]["Binds"], ["/code:/var/task:rw"])
+        self.assertEqual(config["HostConfig"]["Memory"], 256 * 1024 * 1024)
+        self.assertEqual(config["HostConfig"]["NetworkMode"], "network")
+        self.assertTrue(config["HostConfig"]["Init"])
+        self.assertIn("/tmp", config["HostConfig"]["Tmpfs"])
+
+    def test_must_reject_unsupported_options(self):
+        with self.assertRaises(ValueError):
+            _get_create_config("image", {"privileged": True})
+
+
+class TestAsyncContainerManager(AsyncDockerTestCase):
+
+    def setUp(self):
+        super(TestAsyncContainerManager, self).setUp()
+        self.manager = AsyncContainerManager(docker_client=self.client, skip_pull_image=True)
+        self.container = CfcContainer("python3", "index.handler", "/code", docker_client=Mock())
+        self.container._image = "registry/runtime:python3"
+        self.container.metrics = Mock()
+
+    def test_must_run_container_and_collect_output(self):
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+
+        async def run():
+            output = await self.manager.run(self.container)
+            await self.manager.wait_for_logs(self.container, output, stdout=stdout, stderr=stderr)
+            await self.manager.stop(self.container)
+
+        self.run_async(run())
+
+        self.assertEqual(stdout.getvalue(), b"response\n")
+        self.assertEqual(stderr.getvalue(), b"log line\n")
+        self.assertIsNone(self.container.id)
+        self.assertEqual([call[0][0] for call in self.container.metrics.mark.call_args_list],
+                         ["image_checked", "created", "attached", "started", "first_output", "first_output"])
+        self.assertEqual(self.daemon.requests[-1][0:2], ("DELETE", "/containers/abc123?force=1"))
+
+    def test_must_check_image_once(self):
+        self.run_async(self.manager.create(self.container))
+        self.container.id = None
+        self.run_async(self.manager.create(self.container))
+
+        image_requests = [path for _, path, _ in self.daemon.requests if path.startswith("/images")]
+        self.assertEqual(len(image_requests), 1)
+
+    def test_must_pull_missing_image(self):
+        self.manager.image_cache = ImageCache()
+        del self.daemon.images["registry/runtime:python3"]
+
+        self.run_async(self.manager.create(self.container))
+
+        self.assertFalse(self.manager.image_cache.is_stale("registry/runtime:python3"))
+        # Inspected once before the pull, not again after it
+        inspect_requests = [path for _, path, _ in self.daemon.requests if re.match(r"^/images/.+/json", path)]
+        self.assertEqual(len(inspect_requests), 1)
+
+    def test_must_raise_when_pull_fails(self):
+        self.manager.skip_pull_image = False
+        self.daemon.pull_error = "manifest unknown"
+
+        with self.assertRaises(DockerImageNotFoundException):
+            self.run_async(self.manager.pull_image("registry/runtime:python3", stream=io.StringIO()))
@@ -0,0 +1,112 @@
+"""
+Tests demultiplexing the output stream of the Docker Attach API
+"""
+
+import struct
+from socket import timeout
+from unittest import TestCase
+
+from mock import patch
+from parameterized import parameterized
+
+from bsamcli.local.docker.attach_api import _read_socket
+
+
+def _frame(frame_type, payload):
+    return struct.pack('>BxxxL', frame_type, len(payload)) + payload
+
+
+class FakeSocket(object):
+    """
+    Returns the given chunks of data from ``recv_into``, one chunk per call. Exceptions in the chunks are raised.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    def recv_into(self, view):
+        self.reads += 1
+        if not self.chunks:
+            return 0
+
+        chunk = self.chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+
+        size = min(len(chunk), len(view))
+        view[:size] = chunk[:size]
+        if size < len(chunk):
+            self.chunks.insert(0, chunk[size:])
+
+        return size
+
+
+def _read_all(socket):
+    """
+    Collects the output per frame type. Data is copied right away, as the iterator reuses its buffer.
+    """
+    output = {}
+    for frame_type, data in _read_socket(socket):
+        output[frame_type] = output.get(frame_type, b"") + bytes(data)
+
+    return output
+
+
+class TestReadSocket(TestCase):
+
+    def test_must_read_many_frames_with_one_read(self):
+        stream = b"".join(_frame(1 + i % 2, "line {}\n".format(i).encode()) for i in range(100))
+        socket = FakeSocket([stream])
+
+        output = _read_all(socket)
+
+        self.assertEqual(output[1], b"".join("line {}\n".format(i).encode() for i in range(0, 100, 2)))
+        self.assertEqual(output[2], b"".join("line {}\n".format(i).encode() for i in range(1, 100, 2)))
+        # One read for the data, one to find out the stream ended
+        self.assertEqual(socket.reads, 2)
+
+    @parameterized.expand([(1,), (3,), (7,), (9,), (1000,)])
+    def test_must_handle_frames_split_across_reads(self, chunk_size):
+        stream = _frame(1, b"hello") + _frame(2, b"") + _frame(2, b"world") + _frame(1, b"!")
+        socket = FakeSocket([stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)])
+
+        self.assertEqual(_read_all(socket), {1: b"hello!", 2: b"world"})
+
+    @patch("bsamcli.local.docker.attach_api._READ_BUFFER_SIZE", 16)
+    def test_must_hand_out_payload_bigger_than_buffer_in_pieces(self):
+        payload = bytes(bytearray(range(256))) * 4
+        socket = FakeSocket([_frame(1, payload) + _frame(2, b"end")])
+
+        pieces = [(frame_type, bytes(data)) for frame_type, data in _read_socket(socket)]
+
+        self.assertTrue(all(len(data) <= 16 for _, data in pieces))
+        self.assertEqual(b"".join(data for frame_type, data in pieces if frame_type == 1), payload)
+        self.assertEqual(pieces[-1], (2, b"end"))
+
+    def test_must_hand_out_views_without_copying(self):
+        socket = FakeSocket([_frame(1, b"hello")])
+
+        frame_type, data = next(_read_socket(socket))
+
+        self.assertIsInstance(data, memoryview)
+        self.assertEqual(data.tobytes(), b"hello")
+
+    def test_must_stop_at_end_of_stream_within_payload(self):
+        socket = FakeSocket([_frame(1, b"hello")[:-2]])
+
+        self.assertEqual(_read_all(socket), {1: b"hel"})
+
+    def test_must_ignore_timeouts(self):
+        socket = FakeSocket([_frame(1, b"hello"), timeout(), _frame(1, b" world")])
+
+        self.assertEqual(_read_all(socket), {1: b"hello world"})
+
+    def test_must_read_sockets_without_recv_into(self):
+        class SdkSocket(object):
+            pass
+
+        with patch("bsamcli.local.docker.attach_api.read") as read_mock:
+            read_mock.side_effect = [_frame(2, b"error"), b""]
+
+            self.assertEqual(_read_all(SdkSocket()), {2: b"error"})
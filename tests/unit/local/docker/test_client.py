@@ -0,0 +1,29 @@
+"""
+Tests the Docker client shared by the process
+"""
+
+from unittest import TestCase
+from mock import patch
+
+from bsamcli.local.docker import client
+
+
+class TestGetDockerClient(TestCase):
+
+    def setUp(self):
+        client._client = None
+        self.addCleanup(setattr, client, "_client", None)
+
+    @patch("bsamcli.local.docker.client.docker")
+    def test_must_create_client_once(self, docker_mock):
+        first = client.get_docker_client()
+        second = client.get_docker_client()
+
+        self.assertIs(first, second)
+        docker_mock.from_env.assert_called_once_with(max_pool_size=client._DEFAULT_MAX_POOL_SIZE)
+
+    @patch("bsamcli.local.docker.client.docker")
+    def test_must_fall_back_when_pool_size_is_not_supported(self, docker_mock):
+        docker_mock.from_env.side_effect = [TypeError("unexpected keyword"), "client"]
+
+        self.assertEqual(client.get_docker_client(), "client")
@@ -0,0 +1,79 @@
+"""
+Tests limiting the CPU of function containers by their memory size
+"""
+
+from unittest import TestCase
+from mock import Mock
+from parameterized import parameterized
+
+from bsamcli.local.docker.cfc_container import CfcContainer
+from bsamcli.local.docker.cpu_curve import CpuCurve
+
+
+class TestCpuCurve(TestCase):
+
+    @parameterized.expand([
+        (128, 0.1),
+        (576, 0.35),
+        (1024, 0.6),
+        (1920, 1.1),
+        (8192, 4.0),
+    ])
+    def test_must_interpolate_cpus(self, memory_mb, expected):
+        curve = CpuCurve([(128, 0.1), (1024, 0.6)], max_cpus=4)
+
+        self.assertAlmostEqual(curve.get_cpus(memory_mb), expected, places=6)
+
+    def test_must_give_one_cpu_at_1769_mb_by_default(self):
+        curve = CpuCurve(max_cpus=8)
+
+        self.assertAlmostEqual(curve.get_cpus(1769), 1.0)
+        self.assertAlmostEqual(curve.get_cpus(128), 128 / 1769.0)
+
+    def test_must_not_go_below_minimum(self):
+        curve = CpuCurve([(128, 0.0), (1024, 1.0)])
+
+        self.assertEqual(curve.get_cpus(64), CpuCurve.MIN_CPUS)
+
+    def test_must_parse_points(self):
+        curve = CpuCurve.parse("1024:0.6, 128:0.1")
+
+        self.assertEqual(curve.points, [(128, 0.1), (1024, 0.6)])
+
+    @parameterized.expand([
+        ("128",),
+        ("128:0.1",),
+        ("128:a,1024:1",),
+        ("128:0.5,1024:0.1",),
+        ("128:0.1,128:0.2",),
+    ])
+    def test_must_reject_invalid_curve(self, spec):
+        with self.assertRaises(ValueError):
+            CpuCurve.parse(spec)
+
+
+class TestCfcContainer_cpu_limit(TestCase):
+
+    def _create_kwargs(self, **kwargs):
+        docker_client = Mock()
+        container = CfcContainer("python3", "index.handler", "code-dir", docker_client=docker_client, **kwargs)
+        container.create()
+        return docker_client.containers.create.call_args[1]
+
+    def test_must_set_cpu_quota_from_memory(self):
+        kwargs = self._create_kwargs(memory_mb=512, cpu_curve=CpuCurve([(0, 0), (1024, 1)], max_cpus=2))
+
+        self.assertEqual(kwargs["cpu_period"], 100000)
+        self.assertEqual(kwargs["cpu_quota"], 50000)
+
+    def test_must_not_limit_cpu_without_curve(self):
+        kwargs = self._create_kwargs(memory_mb=512)
+
+        self.assertNotIn("cpu_quota", kwargs)
+
+    def test_must_not_limit_cpu_while_debugging(self):
+        debug_options = Mock(debug_port=None, debugger_path=None, debug_args=None)
+
+        kwargs = self._create_kwargs(memory_mb=512, cpu_curve=CpuCurve(), debug_options=debug_options)
+
+        self.assertNotIn("cpu_quota", kwargs)
@@ -0,0 +1,91 @@
+"""
+Tests the cache of recently pulled images
+"""
+
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+from mock import Mock, patch
+
+from bsamcli.local.docker.image_cache import ImageCache
+from bsamcli.local.docker.manager import ContainerManager
+
+
+class TestImageCache(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_dir, "config", "image_cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_must_be_stale_when_never_pulled(self):
+        cache = ImageCache(self.cache_file)
+
+        self.assertTrue(cache.is_stale("image"))
+        self.assertFalse(cache.is_verified("image"))
+
+    @patch("bsamcli.local.docker.image_cache.time")
+    def test_must_be_stale_after_ttl(self, time_mock):
+        cache = ImageCache(self.cache_file, ttl=100)
+
+        time_mock.time.return_value = 1000
+        cache.record_pull("image")
+
+        time_mock.time.return_value = 1099
+        self.assertFalse(cache.is_stale("image"))
+        time_mock.time.return_value = 1100
+        self.assertTrue(cache.is_stale("image"))
+
+    def test_must_persist_entries_across_instances(self):
+        ImageCache(self.cache_file).record_pull("image")
+
+        cache = ImageCache(self.cache_file)
+
+        self.assertFalse(cache.is_stale("image"))
+        # Verification is per process only
+        self.assertFalse(cache.is_verified("image"))
+
+    def test_must_ignore_broken_cache_file(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, "w") as fp:
+            fp.write("not json")
+
+        self.assertTrue(ImageCache(self.cache_file).is_stale("image"))
+
+
+class TestContainerManager_ensure_image(TestCase):
+
+    def setUp(self):
+        self.image_cache = ImageCache()
+        self.manager = ContainerManager(docker_client=Mock(), image_cache=self.image_cache)
+        self.manager.has_image = Mock(return_value=True)
+        self.manager.pull_image = Mock()
+
+    def test_must_pull_only_once_per_process(self):
+        self.manager._ensure_image("image")
+        self.manager._ensure_image("image")
+
+        self.manager.pull_image.assert_called_once_with("image")
+        self.manager.has_image.assert_called_once_with("image")
+        self.assertFalse(self.image_cache.is_stale("image"))
+
+    def test_must_not_pull_recently_pulled_image(self):
+        ImageCache.record_pull(self.image_cache, "image")
+        self.image_cache._verified.clear()
+
+        self.manager._ensure_image("image")
+
+        self.manager.pull_image.assert_not_called()
+        self.assertTrue(self.image_cache.is_verified("image"))
+
+    def test_must_pull_missing_image_even_when_skipping(self):
+        self.manager.skip_pull_image = True
+        self.manager.has_image.return_value = False
+
+        self.manager._ensure_image("image")
+
+        self.manager.pull_image.assert_called_once_with("image")
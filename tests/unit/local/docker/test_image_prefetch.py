@@ -0,0 +1,53 @@
+"""
+Tests fetching images ahead of the first invoke
+"""
+
+import io
+
+from unittest import TestCase
+from mock import Mock, call
+
+from bsamcli.local.docker.manager import ContainerManager, DockerImageNotFoundException, _PullProgress
+
+
+class TestContainerManager_prefetch_images(TestCase):
+
+    def setUp(self):
+        self.manager = ContainerManager(docker_client=Mock())
+        self.manager._ensure_image = Mock()
+
+    def test_must_fetch_every_distinct_image(self):
+        self.manager.prefetch_images(["b", "a", "b"])
+
+        self.assertEqual(sorted(self.manager._ensure_image.call_args_list), [call("a"), call("b")])
+
+    def test_must_continue_when_an_image_cannot_be_fetched(self):
+        self.manager._ensure_image.side_effect = [DockerImageNotFoundException("not found"), None]
+
+        self.manager.prefetch_images(["a", "b"], max_workers=1)
+
+        self.assertEqual(self.manager._ensure_image.call_count, 2)
+
+
+class TestPullProgress(TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.progress = _PullProgress("image", self.stream)
+
+    def _downloading(self, layer, current, total):
+        return {"id": layer, "status": "Downloading", "progressDetail": {"current": current, "total": total}}
+
+    def test_must_report_progress_in_steps(self):
+        self.progress.update({"status": "Pulling from cfc-public/runtime"})
+        self.progress.update(self._downloading("layer1", 5, 100))
+        self.progress.update(self._downloading("layer2", 0, 100))
+        self.progress.update(self._downloading("layer1", 50, 100))
+        self.progress.update(self._downloading("layer1", 52, 100))
+        self.progress.done()
+
+        self.assertEqual(self.stream.getvalue(), u"image: 20% of 0.0MB\nimage: done\n")
+
+    def test_must_raise_on_pull_error(self):
+        with self.assertRaises(DockerImageNotFoundException):
+            self.progress.update({"error": "manifest unknown"})
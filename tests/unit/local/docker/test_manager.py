@@ -31,11 +31,6 @@ class TestContainerManager_run(TestCase):
         self.container_mock.create = Mock()
         self.container_mock.is_created = Mock()
 
-    def test_must_error_with_warm(self):
-
-        with self.assertRaises(ValueError):
-            self.manager.run(self.container_mock, warm=True)
-
     def test_must_pull_image_and_run_container(self):
         input_data = "input data"
 
@@ -0,0 +1,116 @@
+"""
+Tests invoking functions in persistent CFC containers
+"""
+
+from unittest import TestCase
+from mock import Mock, patch
+
+from bsamcli.local.docker.cfc_container import CfcContainer
+
+
+class TestCfcContainer_persistent(TestCase):
+
+    def setUp(self):
+        client_patch = patch("bsamcli.local.docker.container.get_docker_client")
+        self.docker_client = client_patch.start().return_value
+        self.addCleanup(client_patch.stop)
+
+        self.container = CfcContainer("python3", "index.handler", "code-dir", persistent=True)
+        self.container.id = "container id"
+
+    def test_must_keep_container_running_instead_of_runtime(self):
+        self.assertEqual(self.container._entrypoint, CfcContainer._PERSISTENT_ENTRY_POINT)
+        self.assertIsNone(self.container.event_path)
+
+    def test_must_start_only_once(self):
+        self.container.start()
+        self.container.start()
+
+        self.docker_client.containers.get.return_value.start.assert_called_once_with()
+
+    def test_must_execute_runtime_command_with_event_as_input(self):
+        self.container.get_image_command = Mock(return_value=["/var/runtime/bin/entry.sh"])
+        self.container.execute = Mock(return_value=0)
+
+        result = self.container.invoke("event", request_id="id", stdout="stdout", stderr="stderr")
+
+        self.assertEqual(result, 0)
+        self.container.execute.assert_called_with(["/bin/sh", "-c", CfcContainer._PERSISTENT_INVOKE_SCRIPT, "sh",
+                                                   "/var/runtime/bin/entry.sh"],
+                                                  input_data=b"event",
+                                                  environment={"_REQUEST_ID": "id"},
+                                                  stdout="stdout",
+                                                  stderr="stderr")
+
+    def test_must_not_invoke_container_that_is_not_persistent(self):
+        container = CfcContainer("python3", "index.handler", "code-dir")
+
+        with self.assertRaises(RuntimeError):
+            container.invoke("event")
+
+
+class TestCfcContainer_standby(TestCase):
+
+    def setUp(self):
+        client_patch = patch("bsamcli.local.docker.container.get_docker_client")
+        self.docker_client = client_patch.start().return_value
+        self.addCleanup(client_patch.stop)
+
+    def test_must_create_standby_container_with_init_and_network(self):
+        container = CfcContainer("python3", "index.handler", "code-dir", standby=True, tmpfs_tmp=True)
+        container.network_id = "network"
+
+        container.create()
+
+        kwargs = self.docker_client.containers.create.call_args[1]
+        self.assertTrue(kwargs["init"])
+        self.assertEqual(kwargs["network"], "network")
+        self.assertIn("/tmp", kwargs["tmpfs"])
+        self.docker_client.networks.get.assert_not_called()
+
+    def test_must_connect_network_after_create_by_default(self):
+        container = CfcContainer("python3", "index.handler", "code-dir")
+        container.network_id = "network"
+
+        container.create()
+
+        kwargs = self.docker_client.containers.create.call_args[1]
+        self.assertNotIn("network", kwargs)
+        self.assertNotIn("init", kwargs)
+        self.docker_client.networks.get.assert_called_with("network")
+
+
+class TestCfcContainer_reused(TestCase):
+
+    def setUp(self):
+        client_patch = patch("bsamcli.local.docker.container.get_docker_client")
+        self.docker_client = client_patch.start().return_value
+        self.addCleanup(client_patch.stop)
+
+    def test_must_wrap_runtime_to_read_request_id_of_every_invoke(self):
+        container = CfcContainer("python3", "index.handler", "code-dir", event_path="/tmp/dir/event.json",
+                                 reused=True)
+        container.get_image_command = Mock(return_value=["/var/runtime/bin/entry.sh"])
+
+        options = container.get_create_options()
+
+        self.assertEqual(container.request_id_path, "/tmp/dir/request_id")
+        self.assertEqual(options["entrypoint"], ["/bin/sh", "-c", CfcContainer._REUSED_INVOKE_SCRIPT, "sh",
+                                                 "/var/runtime/bin/entry.sh"])
+        self.assertIn("/tmp/event/request_id", CfcContainer._REUSED_INVOKE_SCRIPT)
+
+    def test_must_not_wrap_runtime_of_single_use_containers(self):
+        container = CfcContainer("python3", "index.handler", "code-dir", event_path="/tmp/dir/event.json")
+        container.get_image_command = Mock()
+
+        options = container.get_create_options()
+
+        self.assertIsNone(container.request_id_path)
+        self.assertNotIn("entrypoint", options)
+        container.get_image_command.assert_not_called()
+
+    def test_must_not_wrap_runtime_of_persistent_containers(self):
+        container = CfcContainer("python3", "index.handler", "code-dir", persistent=True, reused=True)
+
+        self.assertIsNone(container.request_id_path)
+        self.assertEqual(container.get_create_options()["entrypoint"], CfcContainer._PERSISTENT_ENTRY_POINT)
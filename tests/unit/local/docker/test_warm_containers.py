@@ -0,0 +1,256 @@
+"""
+Tests the warm container pool of the container manager
+"""
+
+from unittest import TestCase
+import docker
+from mock import Mock, MagicMock, patch
+from parameterized import parameterized
+
+from bsamcli.local.docker.manager import ContainerManager
+from bsamcli.local.lambdafn.config import FunctionConfig
+from bsamcli.local.lambdafn.runtime import CfcRuntime, _get_warm_container_key
+
+
+class TestContainerManager_run_warm(TestCase):
+
+    def setUp(self):
+        self.manager = ContainerManager(docker_client=Mock())
+        self.manager.pull_image = Mock()
+
+        self.container = Mock()
+        self.container.image = "image name"
+
+    def test_must_start_created_container_when_warm(self):
+        self.container.is_created.return_value = True
+
+        self.manager.run(self.container, warm=True)
+
+        self.manager.pull_image.assert_not_called()
+        self.container.create.assert_not_called()
+        self.container.start.assert_called_with(input_data=None)
+
+
+class TestContainerManager_warm_pool(TestCase):
+
+    def setUp(self):
+        self.manager = ContainerManager(docker_client=Mock(), warm_pool_size=2, warm_idle_timeout=60)
+        self.manager.stop = Mock()
+
+    def _container(self):
+        container = Mock()
+        container.is_created.return_value = True
+        return container
+
+    def test_must_return_none_when_pool_is_empty(self):
+        self.assertIsNone(self.manager.get_warm_container("key"))
+
+    def test_must_reuse_released_container_with_same_key(self):
+        container = self._container()
+
+        self.manager.release(container, "key")
+
+        self.assertIsNone(self.manager.get_warm_container("other key"))
+        self.assertEqual(self.manager.get_warm_container("key"), container)
+        self.assertIsNone(self.manager.get_warm_container("key"))
+        self.manager.stop.assert_not_called()
+
+    def test_must_not_keep_deleted_container(self):
+        container = self._container()
+        container.is_created.return_value = False
+
+        self.manager.release(container, "key")
+
+        self.assertIsNone(self.manager.get_warm_container("key"))
+
+    def test_must_discard_matching_containers(self):
+        stale = self._container()
+        current = self._container()
+        self.manager.release(stale, ("code", 0))
+        self.manager.release(current, ("code", 1))
+
+        removed = self.manager.discard_containers(lambda key: key == ("code", 0))
+
+        self.assertEqual(removed, 1)
+        self.manager.stop.assert_called_once_with(stale)
+        self.assertIsNone(self.manager.get_warm_container(("code", 0)))
+        self.assertEqual(self.manager.get_warm_container(("code", 1)), current)
+
+    @patch("bsamcli.local.docker.manager.time")
+    def test_must_remove_least_recently_used_container_when_pool_is_full(self, time_mock):
+        first, second, third = self._container(), self._container(), self._container()
+
+        time_mock.time.return_value = 100
+        self.manager.release(first, "a")
+        time_mock.time.return_value = 101
+        self.manager.release(second, "b")
+        time_mock.time.return_value = 102
+        self.manager.release(third, "a")
+
+        self.manager.stop.assert_called_once_with(first)
+        self.assertEqual(self.manager.get_warm_container("a"), third)
+        self.assertEqual(self.manager.get_warm_container("b"), second)
+
+    @patch("bsamcli.local.docker.manager.time")
+    def test_must_remove_idle_containers(self, time_mock):
+        container = self._container()
+
+        time_mock.time.return_value = 100
+        self.manager.release(container, "key")
+        time_mock.time.return_value = 161
+
+        self.assertIsNone(self.manager.get_warm_container("key"))
+        self.manager.stop.assert_called_once_with(container)
+
+    def test_must_remove_all_containers_on_stop(self):
+        first, second = self._container(), self._container()
+        self.manager.release(first, "a")
+        self.manager.release(second, "b")
+
+        self.manager.stop_warm_containers()
+
+        self.assertEqual(self.manager.stop.call_count, 2)
+        self.assertIsNone(self.manager.get_warm_container("a"))
+
+
+class TestContainerManager_standby(TestCase):
+
+    def setUp(self):
+        self.manager = ContainerManager(docker_client=Mock(), skip_pull_image=True, standby_count=2)
+        self.manager.stop = Mock()
+
+        self.created = []
+
+        def factory():
+            container = Mock()
+            container.is_created.side_effect = lambda: container.create.called
+            self.created.append(container)
+            return container
+
+        self.factory = factory
+
+    def _wait_for_refill(self):
+        self.manager._standby_executor.shutdown(wait=True)
+        self.manager._standby_executor = None
+
+    def test_must_return_new_container_and_create_standby_containers(self):
+        container = self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+
+        container.create.assert_not_called()
+        self.assertEqual(len(self.created), 3)
+        for standby in self.created:
+            if standby is not container:
+                standby.create.assert_called_once_with()
+                self.assertEqual(standby.network_id, self.manager.docker_network_id)
+
+    def test_must_hand_out_standby_container_and_refill(self):
+        self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+        standby = list(self.manager._standby_containers["key"])
+
+        container = self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+
+        self.assertEqual(container, standby[0])
+        self.assertEqual(len(self.created), 4)
+        self.assertEqual(len(self.manager._standby_containers["key"]), 2)
+
+    def test_must_not_keep_container_that_failed_to_create(self):
+        self.manager._ensure_image = Mock(side_effect=docker.errors.APIError("error"))
+
+        self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+
+        self.assertEqual(self.manager._standby_containers.get("key", []), [])
+        self.assertEqual(self.manager.stop.call_count, 2)
+
+    def test_must_refill_after_factory_failed(self):
+        factory = Mock(side_effect=OSError("No space left on device"))
+
+        self.manager._refill_standby_containers("key", factory)
+        self._wait_for_refill()
+
+        self.assertEqual(self.manager._standby_pending["key"], 0)
+        self.manager.stop.assert_not_called()
+
+        self.manager._refill_standby_containers("key", self.factory)
+        self._wait_for_refill()
+
+        self.assertEqual(len(self.manager._standby_containers["key"]), 2)
+
+    def test_must_not_keep_container_that_failed_unexpectedly(self):
+        self.manager._ensure_image = Mock(side_effect=ValueError("error"))
+
+        self.manager._refill_standby_containers("key", self.factory)
+        self._wait_for_refill()
+
+        self.assertEqual(self.manager._standby_pending["key"], 0)
+        self.assertEqual(self.manager._standby_containers.get("key", []), [])
+        self.assertEqual(self.manager.stop.call_count, 2)
+
+    def test_must_remove_standby_containers_on_stop(self):
+        self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+
+        self.manager.stop_standby_containers()
+
+        self.assertEqual(self.manager._standby_containers, {})
+        self.assertEqual(self.manager.get_standby_container("key", self.factory), self.created[-1])
+        self.assertEqual(len(self.created), 4)
+
+    def test_must_discard_matching_standby_containers(self):
+        self.manager.get_standby_container("key", self.factory)
+        self._wait_for_refill()
+        standby = list(self.manager._standby_containers["key"])
+
+        removed = self.manager.discard_containers(lambda key: key == "key")
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(self.manager._standby_containers, {})
+        for container in standby:
+            self.manager.stop.assert_any_call(container)
+
+
+class TestContainerManager_failed_invoke(TestCase):
+
+    def setUp(self):
+        self.manager = ContainerManager(docker_client=Mock(), warm_pool_size=2, warm_idle_timeout=60)
+        self.manager.release = Mock(wraps=self.manager.release)
+        self.manager.stop = Mock()
+
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path")
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"a": "b", "_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager, warm_containers=True)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._configure_interrupt = Mock(return_value=None)
+        self.runtime._start_memory_sampler = Mock(return_value=None)
+        self.runtime._report_metrics = Mock()
+
+        for name in ("_write_event_file", "_write_request_id_file"):
+            write_patch = patch("bsamcli.local.lambdafn.runtime." + name)
+            write_patch.start()
+            self.addCleanup(write_patch.stop)
+
+        self.key = _get_warm_container_key(self.func_config, "code-dir", {"a": "b"})
+        self.container = Mock()
+        self.container.is_created.return_value = True
+        self.manager.release(self.container, self.key)
+        self.manager.release.reset_mock()
+
+    @parameterized.expand([
+        ("start",),
+        ("wait_for_logs",),
+    ])
+    def test_must_not_return_container_to_pool(self, failing_method):
+        getattr(self.container, failing_method).side_effect = RuntimeError("Container was killed")
+
+        with self.assertRaises(RuntimeError):
+            self.runtime.invoke(self.func_config, "cwd", "event")
+
+        self.manager.release.assert_not_called()
+        self.manager.stop.assert_called_once_with(self.container)
+        self.assertIsNone(self.manager.get_warm_container(self.key))
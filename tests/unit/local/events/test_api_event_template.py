@@ -0,0 +1,62 @@
+import json
+from unittest import TestCase
+
+from parameterized import parameterized, param
+
+from bsamcli.local.events.api_event import ContextIdentity, RequestContext, ApiGatewayLambdaEvent, \
+    ApiGatewayLambdaEventTemplate
+
+
+class TestApiGatewayLambdaEventTemplate(TestCase):
+
+    @parameterized.expand([
+        param("all fields", 'data "quoted"', {"query": "a"}, {"Content-Type": "text/plain"}, {"id": "1"}, False),
+        param("empty fields", "", {}, {}, {}, False),
+        param("missing fields", None, None, None, None, True),
+        param("unicode", u"été\n", {"q": u"中"}, {"X-Name": u"é"}, {"id": "/"}, False),
+        param("base64", "ZGF0YQ==", None, {"Content-Type": "image/gif"}, {"id": "1"}, True),
+    ])
+    def test_must_serialize_like_event(self, name, body, query_string_params, headers, path_parameters,
+                                       is_base_64_encoded):
+        context = RequestContext(resource_path="/id/{id}",
+                                 http_method="POST",
+                                 stage="prod",
+                                 identity=ContextIdentity(source_ip="190.0.0.0"),
+                                 path="/id/{id}")
+        event = ApiGatewayLambdaEvent(http_method="POST",
+                                      body=body,
+                                      resource="/id/{id}",
+                                      request_context=context,
+                                      query_string_params=query_string_params,
+                                      headers=headers,
+                                      path_parameters=path_parameters,
+                                      path="/id/1",
+                                      is_base_64_encoded=is_base_64_encoded)
+
+        template = ApiGatewayLambdaEventTemplate(http_method="POST", resource="/id/{id}", stage="prod")
+        actual = template.to_json(body=body,
+                                  query_string_params=query_string_params,
+                                  headers=headers,
+                                  path_parameters=path_parameters,
+                                  path="/id/1",
+                                  is_base_64_encoded=is_base_64_encoded,
+                                  source_ip="190.0.0.0")
+
+        self.assertEqual(actual, json.dumps(event.to_dict()))
+
+    def test_must_be_reusable(self):
+        template = ApiGatewayLambdaEventTemplate(http_method="GET", resource="/", stage="prod")
+
+        first = json.loads(template.to_json("one", None, None, None, "/", False, "1.1.1.1"))
+        second = json.loads(template.to_json("two", None, None, None, "/", False, "2.2.2.2"))
+
+        self.assertEqual((first["body"], first["requestContext"]["identity"]["sourceIp"]), ("one", "1.1.1.1"))
+        self.assertEqual((second["body"], second["requestContext"]["identity"]["sourceIp"]), ("two", "2.2.2.2"))
+
+    def test_must_join_chunks_of_base64_body(self):
+        template = ApiGatewayLambdaEventTemplate(http_method="POST", resource="/", stage="prod")
+
+        event = json.loads(template.to_json(["AAAA", "BBBB", "CC=="], None, None, None, "/", True, "1.1.1.1"))
+
+        self.assertEqual(event["body"], "AAAABBBBCC==")
+        self.assertTrue(event["isBase64Encoded"])
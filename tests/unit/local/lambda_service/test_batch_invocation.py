@@ -0,0 +1,164 @@
+import io
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+from parameterized import parameterized
+
+from bsamcli.local.lambda_service.batch_invocation import BatchInvocation
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound, FunctionThrottled
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler
+
+
+class FakeRunner(object):
+    """
+    Echoes the payload back, after sleeping for the "sleep" seconds of the payload, and tracks how many invokes
+    run at the same time
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, function_name, event, stdout=None, stderr=None):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        try:
+            time.sleep(float(event.split(",")[0].strip("[")))
+            stdout.write(event.encode('utf-8') + b"\n")
+            metrics = Mock(request_id="id-" + event, duration=1.5, cold=False, timed_out=False)
+            return metrics
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class TestBatchInvocation_run(TestCase):
+
+    def test_must_return_results_in_order_of_payloads(self):
+        runner = FakeRunner()
+        batch = BatchInvocation(runner, InvokeScheduler(), "Function")
+
+        results = batch.run(["[0.05, 0]", "[0, 1]", "[0.02, 2]"])
+
+        self.assertEqual([result["payload"] for result in results], [[0.05, 0], [0, 1], [0.02, 2]])
+        self.assertEqual([result["status"] for result in results], ["success"] * 3)
+        self.assertEqual(results[1]["request_id"], "id-[0, 1]")
+        self.assertEqual(results[1]["duration_ms"], 1.5)
+        self.assertFalse(results[1]["cold"])
+        self.assertIn("queued_ms", results[1])
+        self.assertIn("latency_ms", results[1])
+
+    def test_must_not_exceed_reserved_concurrency(self):
+        runner = FakeRunner()
+        scheduler = InvokeScheduler(function_concurrency={"Function": 2})
+        batch = BatchInvocation(runner, scheduler, "Function")
+
+        results = batch.run(["[0.02, {}]".format(index) for index in range(6)])
+
+        self.assertEqual(batch.concurrency, 2)
+        self.assertEqual(runner.max_running, 2)
+        self.assertEqual(len(results), 6)
+
+    def test_must_run_invokes_concurrently(self):
+        runner = FakeRunner()
+        batch = BatchInvocation(runner, InvokeScheduler(), "Function")
+
+        batch.run(["[0.05, {}]".format(index) for index in range(4)])
+
+        self.assertEqual(runner.max_running, 4)
+
+    @parameterized.expand([
+        ({}, None, 10),
+        ({"Function": 3}, None, 3),
+        ({"Function": 3}, 2, 2),
+        ({"Other": 3}, 20, 10),
+    ])
+    def test_must_derive_concurrency_from_scheduler(self, function_concurrency, max_concurrency, expected):
+        scheduler = InvokeScheduler(max_concurrency=max_concurrency, function_concurrency=function_concurrency)
+
+        self.assertEqual(BatchInvocation(Mock(), scheduler, "Function").concurrency, expected)
+
+    def test_must_return_empty_results_for_empty_batch(self):
+        runner = Mock()
+
+        self.assertEqual(BatchInvocation(runner, InvokeScheduler(), "Function").run([]), [])
+        runner.invoke.assert_not_called()
+
+    def test_must_raise_when_function_is_not_found(self):
+        runner = Mock()
+        runner.invoke.side_effect = FunctionNotFound()
+        scheduler = InvokeScheduler()
+
+        with self.assertRaises(FunctionNotFound):
+            BatchInvocation(runner, scheduler, "Function").run(["{}", "{}"])
+
+        # Slots are given back
+        self.assertEqual(scheduler._running_total, 0)
+
+
+class TestBatchInvocation_invoke(TestCase):
+
+    def setUp(self):
+        self.runner = Mock()
+        self.scheduler = InvokeScheduler()
+
+    def _run(self, stdout_data=b"", metrics=None, stderr=None):
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write(stdout_data)
+            stderr.write(b"runtime logs\n")
+            return metrics
+
+        self.runner.invoke.side_effect = invoke
+        return BatchInvocation(self.runner, self.scheduler, "Function", stderr=stderr).run(["{}"])[0]
+
+    def test_must_return_string_payload_if_not_json(self):
+        result = self._run(b"not json\n")
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["payload"], "not json")
+        self.assertNotIn("request_id", result)
+
+    def test_must_mark_function_errors(self):
+        result = self._run(b'{"errorMessage": "boom", "errorType": "Error", "stackTrace": []}')
+
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["payload"]["errorMessage"], "boom")
+
+    def test_must_mark_timeouts(self):
+        result = self._run(b"", metrics=Mock(request_id="id", duration=3000.0, cold=True, timed_out=True))
+
+        self.assertEqual(result["status"], "timeout")
+        self.assertNotIn("payload", result)
+        self.assertTrue(result["cold"])
+
+    def test_must_write_logs_to_stderr(self):
+        stderr = io.BytesIO()
+
+        self._run(b"function log\n\"response\"\n", stderr=stderr)
+
+        self.assertEqual(stderr.getvalue(), b"function log\nruntime logs\n")
+
+    def test_must_report_failed_invokes_without_failing_the_batch(self):
+        self.runner.invoke.side_effect = [RuntimeError("container could not start"), None]
+
+        results = BatchInvocation(self.runner, InvokeScheduler(max_concurrency=1), "Function").run(["{}", "{}"])
+
+        self.assertEqual(results[0]["status"], "failed")
+        self.assertEqual(results[0]["error"], "container could not start")
+        self.assertEqual(results[1]["status"], "success")
+
+    def test_must_report_throttled_invokes(self):
+        scheduler = Mock(function_concurrency={}, max_concurrency=None)
+        scheduler.acquire.side_effect = FunctionThrottled("Rate exceeded")
+
+        result = BatchInvocation(self.runner, scheduler, "Function").run(["{}"])[0]
+
+        self.assertEqual(result["status"], "throttled")
+        self.assertEqual(result["error"], "Rate exceeded")
+        self.runner.invoke.assert_not_called()
+        scheduler.release.assert_not_called()
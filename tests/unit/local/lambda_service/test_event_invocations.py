@@ -0,0 +1,62 @@
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from bsamcli.local.lambda_service.local_lambda_invoke_service import LocalLambdaInvokeService
+
+
+class TestLocalLambdaInvokeService_event_invocations(TestCase):
+
+    PATH = '/2015-03-31/functions/{}/invocations'
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+        self.lambda_runner.provider.get.side_effect = lambda name: Mock() if name == "Function" else None
+
+        self.event_queue = Mock()
+        self.event_queue.put.return_value = "request-id"
+        self.event_queue.stats = {"depth": 1}
+
+        service = LocalLambdaInvokeService(self.lambda_runner, port=3001, host="127.0.0.1",
+                                           event_queue=self.event_queue)
+        service.create()
+        self.client = service._app.test_client()
+
+    def test_must_queue_event_invocation(self):
+        response = self.client.post(self.PATH.format("Function"), data='{"key": "value"}',
+                                    headers={"X-Amz-Invocation-Type": "Event"})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_data(), b"")
+        self.assertEqual(response.headers["x-amzn-RequestId"], "request-id")
+        self.event_queue.put.assert_called_once_with("Function", '{"key": "value"}')
+        self.lambda_runner.invoke.assert_not_called()
+
+    def test_must_report_unknown_function_right_away(self):
+        response = self.client.post(self.PATH.format("Unknown"), headers={"X-Amz-Invocation-Type": "Event"})
+
+        self.assertEqual(response.status_code, 404)
+        self.event_queue.put.assert_not_called()
+
+    def test_must_reject_unsupported_invocation_type(self):
+        response = self.client.post(self.PATH.format("Function"), headers={"X-Amz-Invocation-Type": "DryRun"})
+
+        self.assertEqual(response.status_code, 501)
+        self.event_queue.put.assert_not_called()
+
+    def test_must_reject_event_invocation_without_queue(self):
+        service = LocalLambdaInvokeService(self.lambda_runner, port=3001, host="127.0.0.1")
+        service.create()
+
+        response = service._app.test_client().post(self.PATH.format("Function"),
+                                                   headers={"X-Amz-Invocation-Type": "Event"})
+
+        self.assertEqual(response.status_code, 501)
+
+    def test_must_return_queue_stats(self):
+        response = self.client.get(LocalLambdaInvokeService.EVENT_QUEUE_PATH)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data()), {"depth": 1})
@@ -0,0 +1,166 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.local.lambda_service.event_queue import EventInvokeQueue
+
+
+class TestEventInvokeQueue(TestCase):
+
+    def setUp(self):
+        self.responses = {}
+        self.timed_out = set()
+        self.invokes = []
+        self.request_ids = []
+        self.done = threading.Event()
+
+        self.lambda_runner = Mock()
+
+        def invoke(function_name, event, stdout=None, stderr=None, request_id=None):
+            self.invokes.append((function_name, event, time.time()))
+            self.request_ids.append(request_id)
+            response = self.responses.get(function_name, '"ok"')
+            if isinstance(response, Exception):
+                raise response
+            stdout.write(response.encode())
+            return Mock(timed_out=function_name in self.timed_out)
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        self.dir = tempfile.mkdtemp()
+        self.dead_letter_file = os.path.join(self.dir, "dlq.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _wait(self, queue, condition, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition(queue.stats):
+                return
+            time.sleep(0.01)
+        self.fail("Timed out waiting, stats: {}".format(queue.stats))
+
+    def test_must_invoke_queued_events(self):
+        queue = EventInvokeQueue(self.lambda_runner, workers=2)
+        queue.start()
+        try:
+            request_ids = [queue.put("Function", json.dumps({"index": index})) for index in range(5)]
+            self._wait(queue, lambda stats: stats["succeeded"] == 5)
+        finally:
+            queue.stop()
+
+        self.assertEqual(len(set(request_ids)), 5)
+        self.assertEqual(sorted(json.loads(event)["index"] for _, event, _ in self.invokes), list(range(5)))
+        self.assertEqual(queue.stats["depth"], 0)
+        self.assertEqual(queue.stats["failed"], 0)
+        self.assertFalse(os.path.exists(self.dead_letter_file))
+
+    def test_must_retry_with_backoff_and_dead_letter(self):
+        self.responses["Failing"] = '{"errorMessage": "boom", "errorType": "Error", "stackTrace": []}'
+        queue = EventInvokeQueue(self.lambda_runner, retry_delay=0.1, dead_letter_file=self.dead_letter_file)
+        queue.start()
+        try:
+            request_id = queue.put("Failing", '{"key": "value"}')
+            self._wait(queue, lambda stats: stats["dead_lettered"] == 1)
+        finally:
+            queue.stop()
+
+        times = [invoked_at for _, _, invoked_at in self.invokes]
+        self.assertEqual(len(times), 3)
+        self.assertGreaterEqual(times[1] - times[0], 0.1)
+        self.assertGreaterEqual(times[2] - times[1], 0.2)
+
+        stats = queue.stats
+        self.assertEqual((stats["failed"], stats["retried"], stats["succeeded"]), (3, 2, 0))
+
+        with open(self.dead_letter_file) as fp:
+            lines = [json.loads(line) for line in fp]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["request_id"], request_id)
+        self.assertEqual(lines[0]["function_name"], "Failing")
+        self.assertEqual(lines[0]["event"], {"key": "value"})
+        self.assertEqual(lines[0]["attempts"], 3)
+        self.assertIn("boom", lines[0]["error"])
+
+    def test_must_retry_errors_of_invoke(self):
+        self.responses["Broken"] = RuntimeError("Container failed to start")
+        queue = EventInvokeQueue(self.lambda_runner, max_retries=0, dead_letter_file=self.dead_letter_file)
+        queue.start()
+        try:
+            queue.put("Broken", "{}")
+            self._wait(queue, lambda stats: stats["dead_lettered"] == 1)
+        finally:
+            queue.stop()
+
+        self.assertEqual(len(self.invokes), 1)
+        with open(self.dead_letter_file) as fp:
+            self.assertEqual(json.loads(fp.readline())["error"], "Container failed to start")
+
+    def test_must_invoke_with_request_id_of_queued_event(self):
+        self.responses["Failing"] = '{"errorMessage": "boom", "errorType": "Error", "stackTrace": []}'
+        queue = EventInvokeQueue(self.lambda_runner, retry_delay=0.01)
+        queue.start()
+        try:
+            request_id = queue.put("Failing", "{}")
+            self._wait(queue, lambda stats: stats["dead_lettered"] == 1)
+        finally:
+            queue.stop()
+
+        self.assertEqual(self.request_ids, [request_id] * 3)
+
+    def test_must_retry_timed_out_invokes(self):
+        self.timed_out.add("Slow")
+        queue = EventInvokeQueue(self.lambda_runner, max_retries=1, retry_delay=0.01,
+                                 dead_letter_file=self.dead_letter_file)
+        queue.start()
+        try:
+            queue.put("Slow", "{}")
+            self._wait(queue, lambda stats: stats["dead_lettered"] == 1)
+        finally:
+            queue.stop()
+
+        stats = queue.stats
+        self.assertEqual((stats["failed"], stats["retried"], stats["succeeded"]), (2, 1, 0))
+        with open(self.dead_letter_file) as fp:
+            self.assertEqual(json.loads(fp.readline())["error"], "Task timed out")
+
+    def test_must_retry_when_wall_clock_jumps(self):
+        self.responses["Failing"] = '{"errorMessage": "boom", "errorType": "Error", "stackTrace": []}'
+        queue = EventInvokeQueue(self.lambda_runner, retry_delay=0.01)
+
+        # The wall clock jumps by years right after the event is queued
+        with patch("bsamcli.local.lambda_service.event_queue.time.time",
+                   side_effect=itertools.chain([0], itertools.repeat(4e9))):
+            queue.start()
+            try:
+                queue.put("Failing", "{}")
+                self._wait(queue, lambda stats: stats["dead_lettered"] == 1)
+            finally:
+                queue.stop()
+
+        self.assertEqual(queue.stats["retried"], 2)
+        self.assertEqual(len(self.invokes), 3)
+
+    def test_must_report_depth_and_age(self):
+        queue = EventInvokeQueue(self.lambda_runner)
+
+        queue.put("Function", "{}")
+        queue.put("Function", "{}")
+        time.sleep(0.05)
+
+        stats = queue.stats
+        self.assertEqual(stats["depth"], 2)
+        self.assertEqual(stats["accepted"], 2)
+        self.assertGreaterEqual(stats["oldest_age"], 0.05)
+
+        queue.stop()
+        self.assertEqual(queue.stats["depth"], 0)
+        self.lambda_runner.invoke.assert_not_called()
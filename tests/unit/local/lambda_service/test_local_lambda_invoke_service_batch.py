@@ -0,0 +1,84 @@
+import json
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from bsamcli.local.lambda_service.local_lambda_invoke_service import LocalLambdaInvokeService
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound
+
+
+class TestLocalLambdaInvokeService_batch_invocations(TestCase):
+
+    PATH = '/2015-03-31/functions/{}/batch-invocations'
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+
+        def invoke(function_name, event, stdout=None, stderr=None):
+            if function_name != "Function":
+                raise FunctionNotFound()
+            stdout.write(json.dumps({"echo": json.loads(event)}).encode('utf-8'))
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        self.service = LocalLambdaInvokeService(self.lambda_runner, port=3001, host="127.0.0.1")
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def test_must_return_results_in_order(self):
+        response = self.client.post(self.PATH.format("Function"), data='[{"a": 1}, "text", null]')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/json")
+
+        results = json.loads(response.get_data())
+        self.assertEqual([result["payload"] for result in results],
+                         [{"echo": {"a": 1}}, {"echo": "text"}, {"echo": None}])
+        self.assertEqual([result["status"] for result in results], ["success"] * 3)
+
+    def test_must_use_scheduler_of_service(self):
+        scheduler = Mock(function_concurrency={}, max_concurrency=None)
+        service = LocalLambdaInvokeService(self.lambda_runner, port=3001, host="127.0.0.1", scheduler=scheduler)
+        service.create()
+
+        service._app.test_client().post(self.PATH.format("Function"), data='[1, 2]')
+
+        self.assertEqual(scheduler.acquire.call_count, 2)
+        self.assertEqual(scheduler.release.call_count, 2)
+
+    def test_must_return_not_found_for_unknown_function(self):
+        response = self.client.post(self.PATH.format("Unknown"), data='[{}]')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_must_accept_empty_body_as_empty_batch(self):
+        response = self.client.post(self.PATH.format("Function"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data()), [])
+
+    def test_must_reject_body_that_is_not_an_array(self):
+        response = self.client.post(self.PATH.format("Function"), data='{"a": 1}')
+
+        self.assertEqual(response.status_code, 400)
+        self.lambda_runner.invoke.assert_not_called()
+
+    def test_must_reject_invalid_json(self):
+        response = self.client.post(self.PATH.format("Function"), data='[{')
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch.object(LocalLambdaInvokeService, 'MAX_BATCH_SIZE', 2)
+    def test_must_reject_too_large_batches(self):
+        response = self.client.post(self.PATH.format("Function"), data='[1, 2, 3]')
+
+        self.assertEqual(response.status_code, 400)
+        self.lambda_runner.invoke.assert_not_called()
+
+    def test_must_reject_event_invocation_type(self):
+        response = self.client.post(self.PATH.format("Function"), data='[{}]',
+                                    headers={"X-Amz-Invocation-Type": "Event"})
+
+        self.assertEqual(response.status_code, 501)
+        self.lambda_runner.invoke.assert_not_called()
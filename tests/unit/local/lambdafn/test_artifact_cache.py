@@ -0,0 +1,188 @@
+"""
+Tests the cache of prepared code artifacts
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import Mock, MagicMock
+
+from bsamcli.local.lambdafn.artifact_cache import ArtifactCache, _remove_directory
+from bsamcli.local.lambdafn.config import FunctionConfig
+from bsamcli.local.lambdafn.runtime import CfcRuntime
+
+
+def copy_artifact(artifact_path, target_dir):
+    shutil.copyfile(artifact_path, os.path.join(target_dir, "tmp.jar"))
+
+
+class TestArtifactCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(_remove_directory, self.tmp_dir)
+
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.cache = ArtifactCache(cache_dir=self.cache_dir, max_size=250, min_idle=0)
+        self.prepare = Mock(side_effect=copy_artifact)
+
+    def _artifact(self, name, size=100, mtime=1000, content=None):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as fp:
+            fp.write(content or name.encode()[:1] * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def _cached_keys(self):
+        return sorted(name for name in os.listdir(self.cache_dir) if not name.startswith("."))
+
+    def test_must_prepare_artifact_once(self):
+        artifact = self._artifact("a.jar")
+
+        with self.cache.use(artifact, self.prepare) as first:
+            with open(os.path.join(first, "tmp.jar"), 'rb') as fp:
+                self.assertEqual(fp.read(), b"a" * 100)
+
+        with self.cache.use(artifact, self.prepare) as second:
+            self.assertEqual(first, second)
+
+        self.prepare.assert_called_once()
+
+    def test_must_make_prepared_artifact_read_only(self):
+        artifact = self._artifact("a.jar")
+
+        with self.cache.use(artifact, self.prepare) as code_dir:
+            self.assertEqual(os.stat(os.path.join(code_dir, "tmp.jar")).st_mode & 0o777, 0o444)
+            self.assertEqual(os.stat(code_dir).st_mode & 0o777, 0o555)
+
+    def test_must_prepare_again_when_artifact_changes(self):
+        artifact = self._artifact("a.jar")
+
+        with self.cache.use(artifact, self.prepare) as first:
+            pass
+
+        self._artifact("a.jar", mtime=2000, content=b"b" * 100)
+
+        with self.cache.use(artifact, self.prepare) as second:
+            self.assertNotEqual(first, second)
+
+        self.assertEqual(self.prepare.call_count, 2)
+
+    def test_must_not_prepare_again_when_artifact_is_touched(self):
+        artifact = self._artifact("a.jar")
+
+        with self.cache.use(artifact, self.prepare) as first:
+            pass
+
+        os.utime(artifact, (2000, 2000))
+
+        with self.cache.use(artifact, self.prepare) as second:
+            self.assertEqual(first, second)
+
+        self.prepare.assert_called_once()
+        self.assertEqual(len(self._cached_keys()), 1)
+
+    def test_must_evict_least_recently_used_artifact(self):
+        first, second, third = self._artifact("a.jar"), self._artifact("b.jar"), self._artifact("c.jar")
+
+        with self.cache.use(first, self.prepare) as first_dir:
+            pass
+        with self.cache.use(second, self.prepare) as second_dir:
+            pass
+        with self.cache.use(first, self.prepare):
+            pass
+        with self.cache.use(third, self.prepare) as third_dir:
+            pass
+
+        self.assertTrue(os.path.isdir(first_dir))
+        self.assertFalse(os.path.exists(second_dir))
+        self.assertTrue(os.path.isdir(third_dir))
+        # No leftovers of the evicted directory
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), self._cached_keys())
+        self.assertEqual(len(self._cached_keys()), 2)
+
+    def test_must_not_evict_artifact_in_use(self):
+        first, second, third = self._artifact("a.jar"), self._artifact("b.jar"), self._artifact("c.jar")
+
+        with self.cache.use(first, self.prepare) as first_dir:
+            with self.cache.use(second, self.prepare) as second_dir:
+                with self.cache.use(third, self.prepare):
+                    self.assertTrue(os.path.isdir(first_dir))
+                    self.assertTrue(os.path.isdir(second_dir))
+
+    def test_must_not_evict_artifact_used_recently_by_another_process(self):
+        first, second, third = self._artifact("a.jar"), self._artifact("b.jar"), self._artifact("c.jar")
+        other_process = ArtifactCache(cache_dir=self.cache_dir, max_size=250, min_idle=60)
+
+        with self.cache.use(first, self.prepare) as first_dir:
+            pass
+        with self.cache.use(second, self.prepare):
+            pass
+        # This process does not know that the other process uses the first artifact
+        with other_process.use(third, self.prepare):
+            pass
+
+        self.assertTrue(os.path.isdir(first_dir))
+        self.assertEqual(len(self._cached_keys()), 3)
+
+    def test_must_reuse_artifacts_prepared_by_earlier_runs(self):
+        artifact = self._artifact("a.jar")
+
+        with self.cache.use(artifact, self.prepare) as first:
+            pass
+
+        cache = ArtifactCache(cache_dir=self.cache_dir, max_size=250)
+        with cache.use(artifact, self.prepare) as second:
+            self.assertEqual(first, second)
+
+        self.prepare.assert_called_once()
+
+    def test_must_prepare_once_for_concurrent_invokes(self):
+        artifact = self._artifact("a.jar")
+        results = []
+
+        def invoke():
+            with self.cache.use(artifact, self.prepare) as code_dir:
+                results.append(code_dir)
+
+        threads = [threading.Thread(target=invoke) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.prepare.assert_called_once()
+        self.assertEqual(len(set(results)), 1)
+
+    def test_must_clean_up_when_preparing_fails(self):
+        artifact = self._artifact("a.jar")
+        self.prepare.side_effect = ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            with self.cache.use(artifact, self.prepare):
+                pass
+
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+class TestCfcRuntime_get_code_dir(TestCase):
+
+    def test_must_mount_jar_from_artifact_cache(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        jar = os.path.join(tmp_dir, "function.jar")
+        with open(jar, 'wb') as fp:
+            fp.write(b"jar")
+
+        artifact_cache = MagicMock()
+        artifact_cache.use.return_value.__enter__.return_value = "cached-dir"
+        runtime = CfcRuntime(Mock(), artifact_cache=artifact_cache, timeout_manager=Mock())
+        func_config = FunctionConfig("name", "java8", "index.handler", jar)
+
+        with runtime._get_code_dir(func_config, "cwd", None) as code_dir:
+            self.assertEqual(code_dir, "cached-dir")
+
+        self.assertEqual(artifact_cache.use.call_args[0][0], jar)
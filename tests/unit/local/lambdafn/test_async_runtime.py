@@ -0,0 +1,101 @@
+"""
+Tests invoking functions from an asyncio event loop
+"""
+
+import asyncio
+import io
+import os
+from unittest import TestCase
+
+from mock import Mock, MagicMock
+
+from bsamcli.local.lambdafn.async_runtime import AsyncCfcRuntime
+from bsamcli.local.lambdafn.config import FunctionConfig
+
+
+class FakeAsyncContainerManager(object):
+
+    def __init__(self, output=b"response", duration=0):
+        self.docker_client = Mock()
+        self.output = output
+        self.duration = duration
+        self.started = []
+        self.stopped = []
+
+    async def run(self, container):
+        self.started.append(container)
+        with open(container.event_path) as fp:
+            container.received_event = fp.read()
+        return "output"
+
+    async def wait_for_logs(self, container, output, stdout=None, stderr=None):
+        await asyncio.sleep(self.duration)
+        stdout.write(self.output)
+
+    async def stop(self, container):
+        self.stopped.append(container)
+
+
+class TestAsyncCfcRuntime_invoke(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path", timeout=3)
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"_REQUEST_ID": "id"}
+
+    def _invoke(self, manager):
+        runtime = AsyncCfcRuntime(manager)
+        runtime._get_code_dir = MagicMock()
+        runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        self.loop.run_until_complete(runtime.invoke(self.func_config, "cwd", "event", stdout=stdout, stderr=stderr))
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_must_run_container_and_remove_it(self):
+        manager = FakeAsyncContainerManager()
+
+        stdout, stderr = self._invoke(manager)
+
+        container = manager.started[0]
+        self.assertEqual(stdout, b"response")
+        self.assertEqual(container.received_event, "event")
+        self.assertEqual(manager.stopped, [container])
+        self.assertIsNone(container.metrics)
+        self.assertFalse(os.path.exists(container.event_path))
+        self.assertTrue(stderr.startswith(b"REPORT RequestId: id\t"))
+
+    def test_must_stop_function_on_timeout(self):
+        manager = FakeAsyncContainerManager(duration=10)
+        self.func_config.timeout = 0.01
+
+        stdout, stderr = self._invoke(manager)
+
+        self.assertEqual(stdout, b"")
+        self.assertIn(b"id Task timed out after 0.01 seconds\n", stderr)
+        self.assertIn(b"Status: timeout", stderr)
+        self.assertEqual(len(manager.stopped), 1)
+
+    def test_must_run_invokes_concurrently(self):
+        manager = FakeAsyncContainerManager(duration=0.2)
+        runtime = AsyncCfcRuntime(manager)
+        runtime._get_code_dir = MagicMock()
+        runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+
+        async def invoke_all():
+            streams = [io.BytesIO() for _ in range(50)]
+            await asyncio.gather(*[runtime.invoke(self.func_config, "cwd", "event", stdout=stream)
+                                   for stream in streams])
+            return streams
+
+        start = self.loop.time()
+        streams = self.loop.run_until_complete(invoke_all())
+
+        # All invokes waited at the same time instead of one after another
+        self.assertLess(self.loop.time() - start, 5)
+        self.assertTrue(all(stream.getvalue() == b"response" for stream in streams))
+        self.assertEqual(len(manager.stopped), 50)
@@ -0,0 +1,99 @@
+"""
+Tests the worker pool shared by batches of invokes
+"""
+
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+from parameterized import parameterized
+
+from bsamcli.local.lambdafn.batch import InvokeBatch
+from bsamcli.local.lambdafn.exceptions import FunctionNotFound
+
+
+class RecordingBatch(InvokeBatch):
+    """
+    Invokes nothing. Records which events were taken, and by how many workers at the same time.
+    """
+
+    def __init__(self, missing=None):
+        super(RecordingBatch, self).__init__(Mock(), "Function")
+        self.missing = missing
+        self.results = {}
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def _invoke(self, event):
+        if event == self.missing:
+            raise FunctionNotFound()
+
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+
+        return {"status": self.SUCCESS}
+
+    def _done(self, event, result):
+        self.results[event] = result
+
+
+class TestInvokeBatch_run(TestCase):
+
+    def test_must_invoke_every_event_on_the_workers(self):
+        batch = RecordingBatch()
+
+        batch._run(range(6), 3, "test")
+
+        self.assertEqual(sorted(batch.results), list(range(6)))
+        self.assertEqual(batch.max_running, 3)
+
+    def test_must_stop_taking_events_when_function_is_not_found(self):
+        batch = RecordingBatch(missing=0)
+
+        with self.assertRaises(FunctionNotFound):
+            batch._run(range(100), 1, "test")
+
+        self.assertEqual(batch.results, {})
+
+    def test_must_raise_error_of_events(self):
+        def events():
+            yield 0
+            raise IOError("No such file")
+
+        batch = RecordingBatch()
+
+        with self.assertRaises(IOError):
+            batch._run(events(), 2, "test")
+
+        self.assertEqual(list(batch.results), [0])
+
+
+class TestInvokeBatch_classify(TestCase):
+
+    def setUp(self):
+        self.batch = InvokeBatch(Mock(), "Function")
+
+    @parameterized.expand([
+        (False, False, InvokeBatch.SUCCESS),
+        (False, True, InvokeBatch.ERROR),
+        (True, False, InvokeBatch.TIMEOUT),
+        (True, True, InvokeBatch.TIMEOUT),
+    ])
+    def test_must_classify_invokes_that_ran(self, timed_out, is_error, expected):
+        metrics = Mock(request_id="id", duration=12.5, cold=True, timed_out=timed_out)
+
+        result = self.batch._classify(metrics, is_error)
+
+        self.assertEqual(result, {"status": expected, "request_id": "id", "duration_ms": 12.5, "cold": True})
+
+    def test_must_classify_without_metrics(self):
+        self.assertEqual(self.batch._classify(None, False), {"status": InvokeBatch.SUCCESS})
+
+    def test_must_name_error_without_message(self):
+        self.assertEqual(self.batch._failed(RuntimeError()), {"status": InvokeBatch.FAILED, "error": "RuntimeError"})
@@ -0,0 +1,234 @@
+"""
+Tests the metrics of local invokes
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import Mock, MagicMock, patch
+
+from bsamcli.local.docker.container import Container
+from bsamcli.local.lambdafn.config import FunctionConfig
+from bsamcli.local.lambdafn.metrics import InvokeMetrics, MemorySampler, MetricsFile
+from bsamcli.local.lambdafn.runtime import CfcRuntime
+
+
+class TestInvokeMetrics(TestCase):
+
+    def _metrics(self, marks, cold=True):
+        metrics = InvokeMetrics("name", request_id="id", memory_size=128)
+        metrics.cold = cold
+        metrics._marks = marks
+        return metrics
+
+    def test_must_keep_first_mark(self):
+        metrics = InvokeMetrics("name")
+
+        metrics.mark("started")
+        first = metrics.get_mark("started")
+        metrics.mark("started")
+
+        self.assertEqual(metrics.get_mark("started"), first)
+        self.assertIsNone(metrics.get_mark("exited"))
+
+    def test_must_compute_durations_of_cold_invoke(self):
+        metrics = self._metrics({"image_checked": 10.0, "created": 150.0, "started": 400.0, "exited": 1523.4})
+
+        self.assertAlmostEqual(metrics.duration, 1123.4)
+        self.assertEqual(metrics.billed_duration, 1200)
+        self.assertEqual(metrics.init_duration, 400.0)
+
+    def test_must_not_report_init_of_warm_invoke(self):
+        metrics = self._metrics({"started": 20.0, "exited": 20.5}, cold=False)
+
+        self.assertIsNone(metrics.init_duration)
+        self.assertEqual(metrics.billed_duration, 100)
+
+    def test_must_format_report_line(self):
+        metrics = self._metrics({"started": 400.0, "exited": 1523.4})
+        metrics.max_memory_used = 42
+
+        self.assertEqual(metrics.report_line(),
+                         "REPORT RequestId: id\tDuration: 1123.40 ms\tBilled Duration: 1200 ms\tMemory Size: 128 MB\t"
+                         "Max Memory Used: 42 MB\tInit Duration: 400.00 ms")
+
+    def test_must_flag_timeout_in_report_line(self):
+        metrics = self._metrics({"started": 1.0, "exited": 3001.0}, cold=False)
+        metrics.timed_out = True
+
+        self.assertTrue(metrics.report_line().endswith("\tStatus: timeout"))
+
+    def test_must_convert_to_dict(self):
+        metrics = self._metrics({"started": 400.0, "exited": 500.0})
+
+        record = metrics.to_dict()
+
+        self.assertEqual(record["function_name"], "name")
+        self.assertEqual(record["duration_ms"], 100.0)
+        self.assertEqual(record["started_ms"], 400.0)
+        self.assertIsNone(record["first_output_ms"])
+        self.assertTrue(record["cold"])
+
+
+class TestMemorySampler(TestCase):
+
+    def setUp(self):
+        self.docker_client = Mock()
+        self.docker_client.api.base_url = "http+docker://localhost"
+        self.response = self.docker_client.api._get.return_value
+
+    def _sample(self, samples, use_peak=True):
+        self.docker_client.api._stream_helper.return_value = iter(samples)
+
+        sampler = MemorySampler(self.docker_client, "container-id", use_peak=use_peak)
+        sampler.start()
+        sampler._thread.join()
+        return sampler.stop()
+
+    def test_must_keep_highest_usage(self):
+        max_memory_used = self._sample([
+            {"memory_stats": {"usage": 10 * 1024 * 1024}},
+            {"memory_stats": {"usage": 30 * 1024 * 1024 + 1}},
+            {"memory_stats": {}},
+            {"memory_stats": {"usage": 20 * 1024 * 1024}},
+        ])
+
+        self.assertEqual(max_memory_used, 31)
+        self.docker_client.api._get.assert_called_with("http+docker://localhost/containers/container-id/stats",
+                                                       params={"stream": True}, stream=True)
+        self.docker_client.api._stream_helper.assert_called_with(self.response, decode=True)
+
+    def test_must_take_peak_of_container_serving_its_first_invoke(self):
+        samples = [{"memory_stats": {"usage": 10 * 1024 * 1024, "max_usage": 50 * 1024 * 1024}}]
+
+        self.assertEqual(self._sample(samples), 50)
+
+    def test_must_ignore_peak_of_reused_container(self):
+        # The peak was reached by an earlier invoke
+        samples = [{"memory_stats": {"usage": 10 * 1024 * 1024, "max_usage": 50 * 1024 * 1024}}]
+
+        self.assertEqual(self._sample(samples, use_peak=False), 10)
+
+    def test_must_close_stats_stream(self):
+        self._sample([])
+
+        self.response.close.assert_called_with()
+
+    def test_must_close_stats_stream_on_stop_while_waiting_for_sample(self):
+        received = threading.Event()
+        closed = threading.Event()
+        self.response.close.side_effect = closed.set
+
+        def samples():
+            yield {"memory_stats": {"usage": 10 * 1024 * 1024}}
+            received.set()
+            # Like a stream waiting for the next sample, until it is closed
+            closed.wait(5)
+            raise IOError("closed")
+
+        self.docker_client.api._stream_helper.return_value = samples()
+        sampler = MemorySampler(self.docker_client, "container-id")
+        sampler.start()
+        self.assertTrue(received.wait(5))
+
+        self.assertEqual(sampler.stop(), 10)
+        sampler._thread.join(5)
+
+        self.assertTrue(closed.is_set())
+        self.assertFalse(sampler._thread.is_alive())
+
+    def test_must_return_none_without_samples(self):
+        self.docker_client.api._get.side_effect = ValueError("gone")
+
+        self.assertIsNone(self._sample([]))
+
+
+class TestMetricsFile(TestCase):
+
+    def test_must_append_json_lines(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, "metrics.jsonl")
+
+        metrics_file = MetricsFile(path)
+        metrics_file.append(InvokeMetrics("first"))
+        metrics_file.append(InvokeMetrics("second"))
+
+        with open(path) as fp:
+            records = [json.loads(line) for line in fp]
+
+        self.assertEqual([record["function_name"] for record in records], ["first", "second"])
+
+
+class TestContainer_metrics(TestCase):
+
+    def test_must_mark_first_output(self):
+        container = Container("image", "cmd", "/dir", "/host", docker_client=Mock())
+        container.metrics = Mock()
+        frames = [(1, b"a"), (2, b"b")]
+
+        self.assertEqual(list(container._mark_first_output(iter(frames))), frames)
+        container.metrics.mark.assert_called_once_with("first_output")
+
+    def test_must_pass_output_through_without_metrics(self):
+        container = Container("image", "cmd", "/dir", "/host", docker_client=Mock())
+        output_itr = iter([])
+
+        self.assertIs(container._mark_first_output(output_itr), output_itr)
+
+
+class TestCfcRuntime_metrics(TestCase):
+
+    def setUp(self):
+        self.manager_mock = Mock()
+        self.metrics_file = Mock()
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path", memory=256)
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager_mock, timeout_manager=Mock(), metrics_file=self.metrics_file)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._configure_interrupt = Mock(return_value=None)
+
+        self.sampler = Mock()
+        self.sampler.stop.return_value = 42
+        self.runtime._start_memory_sampler = Mock(return_value=self.sampler)
+
+    @patch("bsamcli.local.lambdafn.runtime.MemorySampler")
+    def test_must_take_peak_only_for_first_invoke_of_container(self, MemorySamplerMock):
+        container = Mock()
+        container.is_created.return_value = True
+        runtime = CfcRuntime(self.manager_mock, timeout_manager=Mock())
+
+        runtime._start_memory_sampler(container, False, cold=True)
+        MemorySamplerMock.assert_called_with(container.docker_client, container.id, use_peak=True)
+
+        runtime._start_memory_sampler(container, False, cold=False)
+        MemorySamplerMock.assert_called_with(container.docker_client, container.id, use_peak=False)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_report_invoke(self, CfcContainerMock, create_event_mock, write_event_mock):
+        CfcContainerMock.return_value.request_id_path = None
+        stderr = io.BytesIO()
+
+        self.runtime.invoke(self.func_config, "cwd", "event", stdout=io.BytesIO(), stderr=stderr)
+
+        metrics = self.metrics_file.append.call_args[0][0]
+        self.assertEqual(metrics.request_id, "id")
+        self.assertEqual(metrics.memory_size, 256)
+        self.assertEqual(metrics.max_memory_used, 42)
+        self.assertTrue(metrics.cold)
+        self.assertIsNotNone(metrics.get_mark("exited"))
+
+        self.assertEqual(stderr.getvalue(), (metrics.report_line() + "\n").encode('utf-8'))
+
+        # The container is not measured after the invoke
+        self.assertIsNone(CfcContainerMock.return_value.metrics)
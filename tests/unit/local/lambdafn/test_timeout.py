@@ -0,0 +1,187 @@
+"""
+Tests enforcing function timeouts from a single thread
+"""
+
+import threading
+from unittest import TestCase
+from mock import Mock, MagicMock, patch
+
+from bsamcli.local.lambdafn.runtime import CfcRuntime, _write_timeout_message
+from bsamcli.local.lambdafn.config import FunctionConfig
+from bsamcli.local.lambdafn.timeout import TimeoutManager
+
+
+class TestTimeoutManager(TestCase):
+
+    def setUp(self):
+        self.manager = TimeoutManager()
+
+    def test_must_call_callbacks_in_deadline_order(self):
+        calls = []
+        done = threading.Event()
+
+        self.manager.schedule(0.2, lambda: (calls.append("late"), done.set()))
+        first = self.manager.schedule(0.05, lambda: calls.append("early"))
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, ["early", "late"])
+        self.assertTrue(first.expired)
+        self.assertFalse(first.cancel())
+        self.assertEqual(self.manager.pending_count, 0)
+
+    def test_must_not_call_cancelled_callback(self):
+        callback = Mock()
+        done = threading.Event()
+
+        token = self.manager.schedule(0.05, callback)
+        self.assertTrue(token.cancel())
+        self.manager.schedule(0.1, done.set)
+
+        self.assertTrue(done.wait(5))
+        callback.assert_not_called()
+        self.assertTrue(token.cancelled)
+        self.assertFalse(token.expired)
+
+    def test_must_use_one_thread_for_all_timeouts(self):
+        tokens = [self.manager.schedule(60, Mock()) for _ in range(100)]
+
+        threads = [thread for thread in threading.enumerate() if thread.name == "bsam-timeouts"]
+        self.assertIn(self.manager._thread, threads)
+        self.assertEqual(self.manager.pending_count, 100)
+
+        for token in tokens:
+            token.cancel()
+
+        self.assertEqual(self.manager.pending_count, 0)
+        # Cancelled timeouts were dropped from the heap, instead of waiting there for their deadline
+        self.assertLess(len(self.manager._heap), 100)
+
+    def test_must_keep_running_when_callback_fails(self):
+        done = threading.Event()
+
+        self.manager.schedule(0.01, Mock(side_effect=ValueError("error")))
+        self.manager.schedule(0.05, done.set)
+
+        self.assertTrue(done.wait(5))
+
+    def test_must_not_fire_early_when_wall_clock_jumps(self):
+        callback = Mock()
+        done = threading.Event()
+
+        with patch("bsamcli.local.lambdafn.timeout.time.time", return_value=4e9):
+            token = self.manager.schedule(60, callback)
+            self.manager.schedule(0.05, done.set)
+
+            self.assertTrue(done.wait(5))
+
+        callback.assert_not_called()
+        self.assertFalse(token.expired)
+        token.cancel()
+
+
+class TestCfcRuntime_timeout(TestCase):
+
+    def setUp(self):
+        self.manager_mock = Mock()
+        self.timeout_manager = Mock()
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path", timeout=3)
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager_mock, timeout_manager=self.timeout_manager)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._start_memory_sampler = Mock(return_value=None)
+        self.runtime._report_metrics = Mock()
+
+        request_id_patch = patch("bsamcli.local.lambdafn.runtime._write_request_id_file")
+        request_id_patch.start()
+        self.addCleanup(request_id_patch.stop)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_timeout_message")
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_report_expired_timeout(self, CfcContainerMock, create_event_mock, write_event_mock,
+                                         write_timeout_mock):
+        token = self.timeout_manager.schedule.return_value
+        token.expired = True
+
+        self.runtime.invoke(self.func_config, "cwd", "event", stderr="stderr")
+
+        self.timeout_manager.schedule.assert_called_once()
+        self.assertEqual(self.timeout_manager.schedule.call_args[0][0], 3)
+        write_timeout_mock.assert_called_with("stderr", "id", 3)
+        token.cancel.assert_called_once_with()
+
+    @patch("bsamcli.local.lambdafn.runtime._write_timeout_message")
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_stop_container_when_timeout_expires(self, CfcContainerMock, create_event_mock, write_event_mock,
+                                                      write_timeout_mock):
+        self.timeout_manager.schedule.return_value.expired = False
+
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        write_timeout_mock.assert_not_called()
+        timeout_handler = self.timeout_manager.schedule.call_args[0][1]
+        self.manager_mock.stop.reset_mock()
+        timeout_handler()
+        self.runtime._timed_out_executor.shutdown(wait=True)
+        self.manager_mock.stop.assert_called_with(CfcContainerMock.return_value)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_timeout_message")
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_leave_timed_out_container_to_the_timeout(self, CfcContainerMock, create_event_mock,
+                                                           write_event_mock, write_timeout_mock):
+        self.timeout_manager.schedule.return_value.expired = True
+
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        self.manager_mock.stop.assert_not_called()
+        self.manager_mock.release.assert_not_called()
+
+    def test_must_not_block_timeout_thread_while_removing_container(self):
+        removing = threading.Event()
+        finished = threading.Event()
+        self.manager_mock.stop.side_effect = lambda container: (removing.set(), finished.wait(5))
+
+        self.runtime._configure_interrupt("name", 3, Mock(), False, False)
+        timeout_handler = self.timeout_manager.schedule.call_args[0][1]
+
+        # Returns while the container is still being removed
+        timeout_handler()
+        self.assertTrue(removing.wait(5))
+        finished.set()
+        self.runtime._timed_out_executor.shutdown(wait=True)
+
+    def test_must_log_failure_to_remove_timed_out_container(self):
+        self.manager_mock.stop.side_effect = RuntimeError("error")
+
+        with patch("bsamcli.local.lambdafn.runtime.LOG") as log_mock:
+            self.runtime._stop_timed_out_container(Mock())
+
+        log_mock.warning.assert_called_once()
+
+    @patch("bsamcli.local.lambdafn.runtime.signal")
+    def test_must_not_set_signal_handler_from_worker_thread(self, signal_mock):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            self.runtime._configure_interrupt("name", 3, Mock(), True, False)))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(result, [None])
+        signal_mock.signal.assert_not_called()
+        self.timeout_manager.schedule.assert_not_called()
+
+    def test_must_write_timeout_message_like_cfc(self):
+        stderr = Mock()
+
+        _write_timeout_message(stderr, "id", 3)
+
+        message = stderr.write.call_args[0][0]
+        self.assertTrue(message.endswith(b" id Task timed out after 3.00 seconds\n"))
@@ -0,0 +1,212 @@
+"""
+Tests invoking functions in warm containers
+"""
+
+import os
+from unittest import TestCase
+from mock import Mock, MagicMock, patch, ANY
+
+from parameterized import parameterized
+
+from bsamcli.local.lambdafn.runtime import CfcRuntime, _get_warm_container_key
+from bsamcli.local.lambdafn.config import FunctionConfig
+
+
+class TestCfcRuntime_warm_invoke(TestCase):
+
+    def setUp(self):
+        self.manager_mock = Mock()
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path")
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"a": "b", "_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager_mock, warm_containers=True)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._configure_interrupt = Mock(return_value=None)
+        self.runtime._start_memory_sampler = Mock(return_value=None)
+        self.runtime._report_metrics = Mock()
+
+        request_id_patch = patch("bsamcli.local.lambdafn.runtime._write_request_id_file")
+        self.write_request_id_mock = request_id_patch.start()
+        self.addCleanup(request_id_patch.stop)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    def test_must_run_warm_container_and_release_it(self, write_event_mock):
+        container = Mock()
+        self.manager_mock.get_warm_container.return_value = container
+
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        key = _get_warm_container_key(self.func_config, "code-dir", {"a": "b"})
+        self.manager_mock.get_warm_container.assert_called_with(key)
+        write_event_mock.assert_called_with(container.event_path, "event")
+        self.write_request_id_mock.assert_called_with(container.request_id_path, "id")
+        self.manager_mock.run.assert_called_with(container, None, warm=True)
+        self.manager_mock.release.assert_called_with(container, key)
+        self.manager_mock.stop.assert_not_called()
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    def test_must_run_with_given_request_id(self, write_event_mock):
+        container = Mock()
+        self.manager_mock.get_warm_container.return_value = container
+
+        metrics = self.runtime.invoke(self.func_config, "cwd", "event", request_id="queued-id")
+
+        # The warm container is the same one, no matter the request ID
+        key = _get_warm_container_key(self.func_config, "code-dir", {"a": "b"})
+        self.manager_mock.get_warm_container.assert_called_with(key)
+        self.write_request_id_mock.assert_called_with(container.request_id_path, "queued-id")
+        self.assertEqual(metrics.request_id, "queued-id")
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_not_use_warm_container_when_debugging(self, CfcContainerMock, create_event_mock, write_event_mock):
+        container = CfcContainerMock.return_value
+
+        self.runtime.invoke(self.func_config, "cwd", "event", debug_context=Mock())
+
+        self.manager_mock.get_warm_container.assert_not_called()
+        self.assertFalse(CfcContainerMock.call_args[1]["reused"])
+        self.manager_mock.run.assert_called_with(container, None, warm=False)
+        self.manager_mock.stop.assert_called_with(container)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    def test_must_use_new_key_after_code_changed(self, write_event_mock):
+        self.manager_mock.get_warm_container.return_value = Mock()
+        self.manager_mock.discard_containers.return_value = 3
+
+        self.assertEqual(self.runtime.invalidate("code-path"), 3)
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        key = _get_warm_container_key(self.func_config, "code-dir", {"a": "b"}, code_version=1)
+        self.manager_mock.get_warm_container.assert_called_with(key)
+
+        matches = self.manager_mock.discard_containers.call_args[0][0]
+        self.assertTrue(matches(("python3", "index.handler", "code-path", (), 128, 0)))
+        self.assertTrue(matches(("python3", "index.handler", os.path.join("code-path", "bin"), (), 128, 0)))
+        self.assertFalse(matches(("python3", "index.handler", "code-path-other", (), 128, 0)))
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    def test_must_remove_container_when_code_changed_while_running(self, write_event_mock):
+        container = Mock()
+        self.manager_mock.get_warm_container.return_value = container
+        self.manager_mock.run.side_effect = lambda *args, **kwargs: self.runtime.invalidate("code-path")
+
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        self.manager_mock.release.assert_not_called()
+        self.manager_mock.stop.assert_called_with(container)
+
+
+class TestCfcRuntime_persistent_invoke(TestCase):
+
+    def setUp(self):
+        self.manager_mock = Mock()
+        self.manager_mock.get_warm_container.return_value = None
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path")
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager_mock, persistent_containers=True)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._configure_interrupt = Mock(return_value=None)
+        self.runtime._start_memory_sampler = Mock(return_value=None)
+        self.runtime._report_metrics = Mock()
+
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_stream_event_into_persistent_container(self, CfcContainerMock, create_event_mock):
+        container = CfcContainerMock.return_value
+        container.request_id_path = None
+
+        self.runtime.invoke(self.func_config, "cwd", "event", stdout="stdout", stderr="stderr")
+
+        create_event_mock.assert_not_called()
+        self.assertTrue(CfcContainerMock.call_args[1]["persistent"])
+        self.manager_mock.run.assert_called_with(container, None, warm=True)
+        container.invoke.assert_called_with("event", request_id="id", stdout="stdout", stderr="stderr")
+        container.wait_for_logs.assert_not_called()
+        self.manager_mock.release.assert_called_with(container, ANY)
+
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_must_remove_persistent_container_when_invoke_failed(self, CfcContainerMock, create_event_mock):
+        container = CfcContainerMock.return_value
+        container.request_id_path = None
+        # ex: the container was killed, so exec fails with "container is not running"
+        container.invoke.side_effect = RuntimeError("409 Conflict")
+
+        with self.assertRaises(RuntimeError):
+            self.runtime.invoke(self.func_config, "cwd", "event")
+
+        self.manager_mock.release.assert_not_called()
+        self.manager_mock.stop.assert_called_with(container)
+
+
+class TestCfcRuntime_standby_invoke(TestCase):
+
+    def setUp(self):
+        self.manager_mock = Mock()
+        self.func_config = FunctionConfig("name", "python3", "index.handler", "code-path")
+        self.func_config.env_vars = Mock()
+        self.func_config.env_vars.resolve.return_value = {"_REQUEST_ID": "id"}
+
+        self.runtime = CfcRuntime(self.manager_mock, standby_containers=True)
+        self.runtime._get_code_dir = MagicMock()
+        self.runtime._get_code_dir.return_value.__enter__.return_value = "code-dir"
+        self.runtime._configure_interrupt = Mock(return_value=None)
+        self.runtime._start_memory_sampler = Mock(return_value=None)
+        self.runtime._report_metrics = Mock()
+
+        request_id_patch = patch("bsamcli.local.lambdafn.runtime._write_request_id_file")
+        self.write_request_id_mock = request_id_patch.start()
+        self.addCleanup(request_id_patch.stop)
+
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    def test_must_run_standby_container_and_remove_it(self, write_event_mock):
+        container = Mock()
+        self.manager_mock.get_standby_container.return_value = container
+
+        self.runtime.invoke(self.func_config, "cwd", "event")
+
+        key = _get_warm_container_key(self.func_config, "code-dir", {})
+        self.manager_mock.get_standby_container.assert_called_with(key, ANY)
+        self.manager_mock.get_warm_container.assert_not_called()
+        write_event_mock.assert_called_with(container.event_path, "event")
+        self.write_request_id_mock.assert_called_with(container.request_id_path, "id")
+        self.manager_mock.run.assert_called_with(container, None, warm=False)
+        self.manager_mock.stop.assert_called_with(container)
+
+    @parameterized.expand([
+        (False, False, True),
+        (True, False, False),
+        (False, True, True),
+    ])
+    @patch("bsamcli.local.lambdafn.runtime._write_event_file")
+    @patch("bsamcli.local.lambdafn.runtime._create_tmp_event_file")
+    @patch("bsamcli.local.lambdafn.runtime.CfcContainer")
+    def test_standby_container_factory(self, warm, persistent, tmpfs_tmp, CfcContainerMock, create_event_mock,
+                                       write_event_mock):
+        runtime = CfcRuntime(self.manager_mock, warm_containers=warm, persistent_containers=persistent,
+                             standby_containers=True)
+        runtime._get_code_dir = self.runtime._get_code_dir
+        runtime._configure_interrupt = Mock(return_value=None)
+        runtime._start_memory_sampler = Mock(return_value=None)
+        runtime._report_metrics = Mock()
+        self.manager_mock.get_warm_container.return_value = None
+        self.manager_mock.get_standby_container.return_value = Mock()
+
+        runtime.invoke(self.func_config, "cwd", "event")
+
+        factory = self.manager_mock.get_standby_container.call_args[0][1]
+        self.assertEqual(factory(), CfcContainerMock.return_value)
+
+        kwargs = CfcContainerMock.call_args[1]
+        self.assertTrue(kwargs["standby"])
+        # Standby containers are created for whichever invoke comes next
+        self.assertTrue(kwargs["reused"])
+        self.assertEqual(kwargs["persistent"], persistent)
+        self.assertEqual(kwargs["tmpfs_tmp"], tmpfs_tmp)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from bsamcli.local.services.base_local_service import CaseInsensitiveDict
+
+
+class TestCaseInsensitiveDict(TestCase):
+
+    def setUp(self):
+        self.data = CaseInsensitiveDict({
+            'Content-Type': 'text/html',
+            'Browser': 'APIGW',
+        })
+
+    def test_must_get_in_any_case(self):
+        self.assertEqual(self.data['content-type'], 'text/html')
+        self.assertEqual(self.data['CONTENT-TYPE'], 'text/html')
+        self.assertEqual(self.data.get('browser'), 'APIGW')
+        self.assertIsNone(self.data.get('Dog-Food'))
+        self.assertTrue('content-TYPE' in self.data)
+
+    def test_must_replace_value_and_keep_original_case(self):
+        self.data['content-type'] = 'application/json'
+
+        self.assertEqual(dict(self.data), {'Content-Type': 'application/json', 'Browser': 'APIGW'})
+
+    def test_must_delete_in_any_case(self):
+        del self.data['BROWSER']
+        self.assertEqual(self.data.pop('content-type'), 'text/html')
+
+        self.assertEqual(dict(self.data), {})
+        self.assertFalse('browser' in self.data)
+        self.assertEqual(self.data.pop('browser', 'default'), 'default')
+
+        with self.assertRaises(KeyError):
+            del self.data['browser']
+
+    def test_must_keep_one_key_for_keys_differing_in_case(self):
+        data = CaseInsensitiveDict([('X-Test', 'one'), ('x-test', 'two')])
+        data.setdefault('X-TEST', 'three')
+        data.update({'X-Other': 'value'})
+
+        self.assertEqual(dict(data), {'X-Test': 'two', 'X-Other': 'value'})
+
+    def test_must_copy(self):
+        copy = self.data.copy()
+        copy['browser'] = 'Other'
+
+        self.assertIsInstance(copy, CaseInsensitiveDict)
+        self.assertEqual(self.data['Browser'], 'APIGW')
+        self.assertEqual(copy['BROWSER'], 'Other')
+
+    def test_keyerror(self):
+        with self.assertRaises(KeyError):
+            self.data['does-not-exist']
@@ -0,0 +1,132 @@
+"""
+Tests the scheduler limiting concurrent invokes
+"""
+
+import threading
+
+from unittest import TestCase
+
+from mock import Mock, patch
+from parameterized import parameterized
+
+from bsamcli.local.lambdafn.exceptions import FunctionThrottled
+from bsamcli.local.services.invoke_scheduler import InvokeScheduler, get_function_concurrency
+
+
+class TestInvokeScheduler(TestCase):
+
+    def test_must_run_without_limits(self):
+        scheduler = InvokeScheduler()
+
+        scheduler.acquire("a")
+        scheduler.acquire("a")
+        scheduler.release("a")
+        scheduler.release("a")
+
+        self.assertEqual(scheduler.queue_size, 0)
+
+    def test_must_throttle_function_without_reserved_concurrency(self):
+        scheduler = InvokeScheduler(function_concurrency={"a": 0})
+
+        with self.assertRaises(FunctionThrottled):
+            scheduler.acquire("a")
+
+    def test_must_throttle_when_queue_is_full(self):
+        scheduler = InvokeScheduler(max_concurrency=1, max_queue_size=0)
+        scheduler.acquire("a")
+
+        with self.assertRaises(FunctionThrottled):
+            scheduler.acquire("b")
+
+    def test_must_throttle_after_queue_timeout(self):
+        scheduler = InvokeScheduler(function_concurrency={"a": 1}, queue_timeout=0.01)
+        scheduler.acquire("a")
+
+        with self.assertRaises(FunctionThrottled):
+            scheduler.acquire("a")
+
+        self.assertEqual(scheduler.queue_size, 0)
+        # Other functions are not affected by the limit of "a"
+        scheduler.acquire("b")
+
+    def test_must_not_throttle_early_when_wall_clock_jumps(self):
+        scheduler = InvokeScheduler(function_concurrency={"a": 1}, queue_timeout=5)
+        scheduler.acquire("a")
+        threading.Timer(0.1, scheduler.release, args=("a",)).start()
+
+        # A wall clock far in the future must not expire the deadline of the waiting invoke
+        with patch("bsamcli.local.services.invoke_scheduler.time.time", side_effect=[0] + [4e9] * 100):
+            scheduler.acquire("a")
+
+        self.assertEqual(scheduler.queue_size, 0)
+
+    def test_must_run_waiting_invoke_when_slot_is_released(self):
+        scheduler = InvokeScheduler(max_concurrency=1, queue_timeout=5)
+        scheduler.acquire("a")
+        started = threading.Event()
+
+        def invoke():
+            with scheduler.slot("b"):
+                started.set()
+
+        thread = threading.Thread(target=invoke)
+        thread.start()
+
+        self.assertFalse(started.wait(0.05))
+        scheduler.release("a")
+        thread.join(5)
+
+        self.assertTrue(started.is_set())
+
+    def test_must_serve_waiting_invokes_in_order(self):
+        scheduler = InvokeScheduler(max_concurrency=1, queue_timeout=5)
+        scheduler.acquire("first")
+        order = []
+
+        def invoke(name):
+            with scheduler.slot(name):
+                order.append(name)
+
+        threads = []
+        for name in ["a", "b", "c"]:
+            thread = threading.Thread(target=invoke, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Wait for the thread to queue up before starting the next one
+            while scheduler.queue_size < len(threads):
+                pass
+
+        scheduler.release("first")
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(order, ["a", "b", "c"])
+
+
+class TestGetFunctionConcurrency(TestCase):
+
+    @staticmethod
+    def _function(name, reserved_concurrency):
+        function = Mock(reserved_concurrency=reserved_concurrency)
+        function.name = name
+        return function
+
+    def test_must_return_limits_of_functions_that_reserve_concurrency(self):
+        functions = [self._function("a", 2), self._function("b", None), self._function("c", "0")]
+
+        self.assertEqual(get_function_concurrency(functions), {"a": 2, "c": 0})
+
+    @parameterized.expand([
+        ({"Ref": "Concurrency"},),
+        ({"Fn::If": ["IsProd", 10, 1]},),
+        ("many",),
+        (2.5,),
+        (-1,),
+        (True,),
+    ])
+    def test_must_skip_values_that_are_not_whole_numbers(self, value):
+        with patch("bsamcli.local.services.invoke_scheduler.LOG") as log_mock:
+            concurrency = get_function_concurrency([self._function("a", value), self._function("b", 3)])
+
+        self.assertEqual(concurrency, {"b": 3})
+        log_mock.warning.assert_called_once()
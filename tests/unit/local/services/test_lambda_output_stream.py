@@ -0,0 +1,119 @@
+"""
+Tests collecting function output incrementally
+"""
+
+import io
+from unittest import TestCase
+
+from mock import Mock, patch
+from parameterized import parameterized
+
+from bsamcli.local.services.base_local_service import LambdaOutputParser, LambdaOutputStream
+from bsamcli.local.lambda_service.local_lambda_invoke_service import LocalLambdaInvokeService
+
+
+OUTPUTS = [
+    (b'{"a": "b"}',),
+    (b'{"a": "b"}\n\n',),
+    (b'log line\n{"a": "b"}\n',),
+    (b'first log\nsecond log\n  {"a": "b"}  \r\n\n',),
+    (b'log line\n\n\n{"a": "b"}',),
+    (b'\n{"a": "b"}',),
+    (b'',),
+    (b'\n\n',),
+]
+
+
+class TestLambdaOutputStream(TestCase):
+
+    def _write(self, data, chunk_size, spill_threshold=None):
+        stream = LambdaOutputStream(spill_threshold=spill_threshold)
+        for i in range(0, len(data), chunk_size):
+            stream.write(memoryview(data)[i:i + chunk_size])
+
+        self.addCleanup(stream.close)
+        return stream
+
+    @parameterized.expand(OUTPUTS)
+    def test_must_split_like_the_parser(self, data):
+        response, logs, _ = LambdaOutputParser.get_lambda_output(io.BytesIO(data))
+
+        for chunk_size in (1, 2, 5, len(data) or 1):
+            stream = self._write(data, chunk_size)
+
+            self.assertEqual(stream.read_response().decode('utf-8'), response)
+            self.assertEqual(stream.response_size, len(response))
+
+            written_logs = io.BytesIO()
+            stream.write_logs(written_logs)
+            self.assertEqual(written_logs.getvalue(), logs or b"")
+            self.assertEqual(stream.has_logs, bool(logs))
+
+    def test_must_spill_large_output_to_file(self):
+        logs = b"log line\n" * 10000
+        response = b'{"a": "' + b"x" * 100000 + b'"}'
+
+        stream = self._write(logs + response + b"\n", 4096, spill_threshold=1024)
+
+        self.assertTrue(stream._file._rolled)
+        self.assertEqual(stream.response_size, len(response))
+        self.assertEqual(b"".join(stream.iter_response()), response)
+        self.assertTrue(all(len(chunk) <= LambdaOutputStream._CHUNK_SIZE for chunk in stream.iter_response()))
+
+        written_logs = io.BytesIO()
+        stream.write_logs(written_logs)
+        self.assertEqual(written_logs.getvalue(), logs[:-1])
+
+
+class TestLocalLambdaInvokeService_output(TestCase):
+
+    def setUp(self):
+        self.lambda_runner = Mock()
+        self.lambda_runner.is_debugging.return_value = False
+        self.stderr = io.BytesIO()
+
+        self.service = LocalLambdaInvokeService(self.lambda_runner, port=3001, host="127.0.0.1", stderr=self.stderr)
+        self.service.create()
+        self.client = self.service._app.test_client()
+
+    def _invoke_with_output(self, output):
+        def invoke(function_name, event, stdout=None, stderr=None):
+            stdout.write(output)
+
+        self.lambda_runner.invoke.side_effect = invoke
+
+        return self.client.post("/2015-03-31/functions/HelloWorld/invocations", data="{}",
+                                content_type="application/json")
+
+    def test_must_return_response_and_write_logs(self):
+        response = self._invoke_with_output(b'log\n{"a": "b"}\n')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'{"a": "b"}')
+        self.assertEqual(self.stderr.getvalue(), b"log")
+        self.assertNotIn("x-amz-function-error", response.headers)
+
+    def test_must_flag_error_response(self):
+        response = self._invoke_with_output(b'{"errorMessage": "m", "errorType": "t", "stackTrace": []}')
+
+        self.assertEqual(response.headers["x-amz-function-error"], "Unhandled")
+
+    def test_must_stream_large_response(self):
+        payload = b'"' + b"x" * (LambdaOutputStream._SPILL_THRESHOLD * 2) + b'"'
+
+        response = self._invoke_with_output(payload)
+
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.headers["Content-Length"], str(len(payload)))
+        self.assertEqual(response.data, payload)
+
+    @patch("bsamcli.local.lambda_service.local_lambda_invoke_service.LambdaOutputStream")
+    def test_must_close_output_when_invoke_fails(self, LambdaOutputStreamMock):
+        self.lambda_runner.invoke.side_effect = RuntimeError("container is not running")
+        self.service._app.testing = False
+
+        response = self.client.post("/2015-03-31/functions/HelloWorld/invocations", data="{}",
+                                    content_type="application/json")
+
+        self.assertEqual(response.status_code, 500)
+        LambdaOutputStreamMock.return_value.close.assert_called_once_with()
@@ -0,0 +1,266 @@
+"""
+Tests the servers local services run on
+"""
+
+import http.client
+import os
+import threading
+import time
+from unittest import TestCase
+
+from flask import Flask, request
+from mock import Mock, patch
+
+from bsamcli.local.services.server import get_server, DevelopmentServer, PooledServer, PooledWSGIServer
+
+
+class TestGetServer(TestCase):
+
+    def test_must_default_to_development_server(self):
+        self.assertIsNone(get_server())
+        self.assertIsNone(get_server(processes=1, drain_timeout=3))
+
+    def test_must_return_pooled_server(self):
+        server = get_server(threads=4, drain_timeout=3)
+
+        self.assertEqual((server.threads, server.processes, server.drain_timeout), (4, 1, 3))
+        self.assertEqual(get_server(processes=2).threads, 16)
+
+    @patch("bsamcli.local.services.server.socket", spec=[])
+    def test_must_fail_without_reuse_port(self, socket_mock):
+        with self.assertRaises(ValueError):
+            get_server(processes=2)
+
+
+class TestPooledServer_serve(TestCase):
+
+    @patch.dict(os.environ, {"BSAM_SERVER_WORKER": ""})
+    def test_must_supervise_only_with_several_processes(self):
+        self.assertTrue(PooledServer(processes=2).supervises())
+        self.assertFalse(PooledServer(processes=2).supervises(is_debugging=True))
+        self.assertFalse(PooledServer(processes=1).supervises())
+
+    @patch.dict(os.environ, {"BSAM_SERVER_WORKER": "1"})
+    def test_worker_must_not_supervise(self):
+        self.assertFalse(PooledServer(processes=2).supervises())
+
+    def test_must_serve_one_request_at_a_time_when_debugging(self):
+        app = Mock()
+
+        PooledServer(threads=4).serve(app, "127.0.0.1", 3000, True)
+
+        app.run.assert_called_once_with(threaded=False, host="127.0.0.1", port=3000)
+
+    @patch.dict(os.environ, {"BSAM_SERVER_WORKER": ""})
+    @patch("bsamcli.local.services.server.subprocess")
+    def test_must_start_worker_processes(self, subprocess_mock):
+        worker = subprocess_mock.Popen.return_value
+        worker.returncode = 0
+
+        server = PooledServer(processes=3)
+        server._get_worker_command = Mock(return_value=["bsam", "local", "start-api"])
+        server.serve(Mock(), "127.0.0.1", 3000, False)
+
+        self.assertEqual(subprocess_mock.Popen.call_count, 3)
+        args, kwargs = subprocess_mock.Popen.call_args
+        self.assertEqual(args[0], ["bsam", "local", "start-api"])
+        self.assertEqual(kwargs["env"]["BSAM_SERVER_WORKER"], "1")
+        self.assertEqual(worker.wait.call_count, 3)
+
+    @patch.dict(os.environ, {"BSAM_SERVER_WORKER": "1"})
+    def test_worker_must_share_port_and_drain(self):
+        server = PooledServer(processes=3, drain_timeout=2)
+        server.make_server = Mock()
+        wsgi_server = server.make_server.return_value
+        wsgi_server.drain.return_value = 0
+
+        server.serve("app", "127.0.0.1", 3000, False)
+
+        server.make_server.assert_called_once_with("app", "127.0.0.1", 3000, reuse_port=True)
+        wsgi_server.serve_forever.assert_called_once_with()
+        wsgi_server.server_close.assert_called_once_with()
+        wsgi_server.drain.assert_called_once_with(2)
+
+
+class TestPooledWSGIServer(TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        app = Flask(__name__)
+
+        @app.route("/port")
+        def port():
+            return request.environ["REMOTE_PORT"] if isinstance(request.environ["REMOTE_PORT"], str) \
+                else str(request.environ["REMOTE_PORT"])
+
+        @app.route("/slow")
+        def slow():
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.release.wait(5)
+            with self.lock:
+                self.in_flight -= 1
+            return "done"
+
+        @app.route("/ignore", methods=["POST"])
+        def ignore():
+            # Neither reads the body, nor has a Content-Length
+            return app.response_class(iter([b"ign", b"ored"]))
+
+        self.server = PooledWSGIServer("127.0.0.1", 0, app, threads=2, keep_alive_timeout=5)
+        self.port = self.server.server_address[1]
+        self.serving = threading.Thread(target=self.server.serve_forever)
+        self.serving.start()
+
+    def tearDown(self):
+        self.release.set()
+        self._stop()
+
+    def _stop(self):
+        if self.serving.is_alive():
+            self.server.shutdown()
+            self.serving.join(5)
+            self.server.server_close()
+
+    def _get(self, path, responses):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        connection.request("GET", path)
+        response = connection.getresponse()
+        responses.append((response.status, response.read()))
+        connection.close()
+
+    def test_must_keep_connections_alive(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+        ports = []
+        for _ in range(3):
+            connection.request("GET", "/port")
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            ports.append(response.read())
+        connection.close()
+
+        self.assertEqual(len(set(ports)), 1)
+
+    def test_must_keep_connection_alive_past_unread_body_and_streamed_response(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+        connection.request("POST", "/ignore", body=b"x" * 1000)
+        response = connection.getresponse()
+        self.assertEqual(response.getheader("Transfer-Encoding"), "chunked")
+        self.assertEqual(response.read(), b"ignored")
+
+        connection.request("GET", "/port")
+        first = connection.getresponse().read()
+        connection.request("GET", "/port")
+        second = connection.getresponse().read()
+        connection.close()
+
+        self.assertEqual(first, second)
+
+    def test_must_serve_with_bounded_threads(self):
+        responses = []
+        clients = [threading.Thread(target=self._get, args=("/slow", responses)) for _ in range(4)]
+        for client in clients:
+            client.start()
+
+        time.sleep(0.3)
+        self.assertEqual(self.in_flight, 2)
+
+        self.release.set()
+        for client in clients:
+            client.join(5)
+
+        self.assertEqual(responses, [(200, b"done")] * 4)
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_must_close_idle_connections_for_waiting_clients(self):
+        idle_connections = []
+        for _ in range(3):
+            # More clients than threads, each idle after a request
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            connection.request("GET", "/port")
+            connection.getresponse().read()
+            idle_connections.append(connection)
+
+        start = time.time()
+        responses = []
+        self._get("/port", responses)
+
+        self.assertEqual(responses[0][0], 200)
+        # Well before the idle connections time out
+        self.assertLess(time.time() - start, 2)
+        for connection in idle_connections:
+            connection.close()
+
+    def test_must_not_keep_connections_alive_while_clients_wait(self):
+        responses = []
+        clients = [threading.Thread(target=self._get, args=("/slow", responses)) for _ in range(2)]
+        for client in clients:
+            client.start()
+        while self.in_flight < 2:
+            time.sleep(0.01)
+
+        waiting = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        waiting.request("GET", "/port")
+        time.sleep(0.2)
+        self.assertEqual(self.server.backlog, 1)
+
+        self.release.set()
+        for client in clients:
+            client.join(5)
+        response = waiting.getresponse()
+        response.read()
+        waiting.close()
+
+        self.assertEqual(responses, [(200, b"done")] * 2)
+        self.assertEqual(response.status, 200)
+
+    def test_must_drain_requests_in_flight(self):
+        responses = []
+        client = threading.Thread(target=self._get, args=("/slow", responses))
+        client.start()
+        while not self.in_flight:
+            time.sleep(0.01)
+
+        self._stop()
+        threading.Timer(0.2, self.release.set).start()
+
+        self.assertEqual(self.server.drain(5), 0)
+        client.join(5)
+        self.assertEqual(responses, [(200, b"done")])
+
+    def test_must_stop_draining_after_timeout(self):
+        client = threading.Thread(target=self._get, args=("/slow", []))
+        client.start()
+        while not self.in_flight:
+            time.sleep(0.01)
+
+        self._stop()
+
+        self.assertEqual(self.server.drain(0.1), 1)
+
+    def test_must_share_port_with_reuse_port(self):
+        first = PooledWSGIServer("127.0.0.1", 0, Mock(), threads=1, keep_alive_timeout=1, reuse_port=True)
+        port = first.server_address[1]
+
+        second = PooledWSGIServer("127.0.0.1", port, Mock(), threads=1, keep_alive_timeout=1, reuse_port=True)
+
+        self.assertEqual(second.server_address[1], port)
+        first.server_close()
+        second.server_close()
+
+
+class TestDevelopmentServer(TestCase):
+
+    def test_must_run_flask_server(self):
+        app = Mock()
+
+        DevelopmentServer().serve(app, "127.0.0.1", 3000, False)
+
+        app.run.assert_called_once_with(threaded=True, host="127.0.0.1", port=3000)